@@ -17,3 +17,46 @@
 DEFAULT_LOG_OUTPUT_DIRECTORY = "/tmp/silk"
 WPANTUND_PATH = "/usr/local/sbin/wpantund"
 WPANCTL_PATH = "/usr/local/bin/wpanctl"
+
+# Keep one interactive wpanctl process per node instead of spawning wpanctl for every command
+WPANCTL_PERSISTENT_SESSION = False
+
+# Query and update wpantund properties over D-Bus instead of wpanctl (requires jeepney)
+WPANTUND_DBUS_BACKEND = False
+
+# Maximum number of devices brought up or torn down concurrently by the test harness
+DEVICE_SET_UP_MAX_WORKERS = 8
+
+# Maximum number of boards behind one USB hub that are flashed at once, and retries of a failed flash
+FLASH_MAX_PER_HUB = 2
+FLASH_RETRIES = 2
+
+# Flash boards even if the firmware cache shows the image is already installed
+FIRMWARE_FORCE_FLASH = False
+
+# Maximum number of subprocess output lines (e.g. wpantund logs) waiting for subscribers; further lines are dropped
+SUBPROCESS_MAX_QUEUED_LINES = 10000
+
+# Run the system calls and wpantund output of all nodes on one shared asyncio event loop instead of threads per node
+# (requires Python 3.8), and the number of threads that event loop uses for blocking work
+NODE_EVENT_LOOP = False
+NODE_EVENT_LOOP_MAX_WORKERS = 8
+
+# Maximum number of consecutive read-only commands of one node that run at the same time
+SYSTEM_CALL_MAX_CONCURRENT = 4
+
+# Run the commands of each network namespace through a long-running root helper that entered the namespace, instead of
+# a `sudo ip netns exec` shell per command
+NETNS_HELPER = False
+
+# Query the addresses, routes and links of each network namespace in-process over netlink, instead of parsing ip,
+# ifconfig and wpanctl output (requires root privileges)
+NETLINK_QUERIES = False
+
+# Seconds that node property values read from wpantund, or reported in its log, are served from memory by get() and
+# getprop(); 0 disables the property cache
+PROPERTY_CACHE_MAX_AGE = 0
+
+# Seconds the OTNS events of all nodes are held to be sent together by one thread, with the consecutive status events of
+# a node joined in one datagram; 0 sends every event from the caller at once
+OTNS_EVENT_BATCH_WINDOW = 0
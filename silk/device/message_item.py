@@ -17,6 +17,19 @@ message_item.py
 This module provides a base class for message items processed by the embedded shell and system call manager
 """
 
+import asyncio
+import enum
+
+
+class ItemOrdering(enum.Enum):
+    """How a queued item is ordered against the other items of its queue.
+
+    SERIAL items run alone, after every item queued before them has completed. Consecutive CONCURRENT items may run at
+    the same time, so they must not change the state of the node, e.g. read-only commands.
+    """
+    SERIAL = 0
+    CONCURRENT = 1
+
 
 class MessageItemDelegates(object):
 
@@ -51,8 +64,9 @@ class MessageItemBase(object):
     """Base class used to encapsulate message/work objects handled by EmbeddedShell's message queue.
     """
 
-    def __init__(self):
+    def __init__(self, ordering: ItemOrdering = ItemOrdering.SERIAL):
         self._delegates = None
+        self.ordering = ordering
 
     # Set the delegates
     # @param delegates Some delegates
@@ -66,6 +80,13 @@ class MessageItemBase(object):
         """
         raise NotImplementedError()
 
+    async def invoke_async(self, parent):
+        """ Invoke the action from a coroutine on the parent's event loop.
+
+        The action may block, so it runs on the event loop's thread pool.
+        """
+        return await asyncio.get_event_loop().run_in_executor(None, self.invoke, parent)
+
 
 class MessageCallableItem(MessageItemBase):
     """Class to encapsulate a command/expect message into the message queue.
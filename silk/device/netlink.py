@@ -0,0 +1,477 @@
+# Copyright 2020 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Minimal rtnetlink client for querying links, addresses and routes of a network namespace in-process.
+
+Listing the addresses of a node with `ifconfig` or `ip` through `sudo ip netns exec` starts several processes and
+returns text that has to be parsed. A NetlinkReader instead opens a NETLINK_ROUTE socket inside the namespace once,
+and answers each query with a single dump request on that socket, returning structured entries. An
+AddressSubscription receives the kernel's address change notifications, so that waiting for an address does not need
+polling.
+
+Netlink sockets stay bound to the namespace they were created in, so the socket is created by a short-lived thread
+that enters the namespace with setns(), which requires root privileges. Only the standard library is used.
+"""
+
+import collections
+import ipaddress
+import os
+import socket
+import struct
+import threading
+import time
+
+from silk.device.netns_helper import enter_netns
+
+NETLINK_ROUTE = 0
+
+NLMSG_ERROR = 2
+NLMSG_DONE = 3
+RTM_NEWLINK = 16
+RTM_GETLINK = 18
+RTM_NEWADDR = 20
+RTM_DELADDR = 21
+RTM_GETADDR = 22
+RTM_NEWROUTE = 24
+RTM_GETROUTE = 26
+
+NLM_F_REQUEST = 0x1
+NLM_F_ACK = 0x4
+NLM_F_EXCL = 0x200
+NLM_F_CREATE = 0x400
+NLM_F_DUMP = 0x300
+
+RTMGRP_IPV4_IFADDR = 0x10
+RTMGRP_IPV6_IFADDR = 0x100
+
+IFLA_IFNAME = 3
+IFA_ADDRESS = 1
+IFA_LOCAL = 2
+IFA_FLAGS = 8
+RTA_DST = 1
+RTA_OIF = 4
+RTA_GATEWAY = 5
+RTA_PRIORITY = 6
+RTA_TABLE = 15
+
+IFF_UP = 0x1
+RT_TABLE_MAIN = 254
+
+NLMSG_HEADER = struct.Struct("=LHHLL")
+RTATTR_HEADER = struct.Struct("=HH")
+IFINFOMSG = struct.Struct("=BxHiII")
+IFADDRMSG = struct.Struct("=BBBBi")
+RTMSG = struct.Struct("=BBBBBBBBI")
+U32 = struct.Struct("=I")
+S32 = struct.Struct("=i")
+
+RECEIVE_BUFFER_SIZE = 64 * 1024
+# Seconds to wait for the kernel to answer a request
+REQUEST_TIMEOUT = 5
+
+# up (bool): whether the link is administratively up.
+Link = collections.namedtuple("Link", ["index", "name", "up", "flags"])
+# address (ipaddress.IPv4Interface or IPv6Interface): address with its prefix length.
+Address = collections.namedtuple("Address", ["interface", "index", "address", "scope", "flags"])
+# destination (ipaddress.IPv4Network or IPv6Network): destination, e.g. ::/0 for the default route.
+# gateway (ipaddress.IPv4Address or IPv6Address): next hop, or None for a directly connected route.
+Route = collections.namedtuple("Route", ["destination", "gateway", "interface", "index", "table", "priority"])
+NetlinkState = collections.namedtuple("NetlinkState", ["links", "addresses", "routes"])
+# added (bool): True for a new address, False for a deleted one.
+AddressEvent = collections.namedtuple("AddressEvent", ["added", "address"])
+
+
+def _align(length):
+    return (length + 3) & ~3
+
+
+def parse_messages(data: bytes):
+    """Split the data received from a netlink socket into messages.
+
+    Returns:
+        list: (type, flags, sequence number, payload) of each message.
+    """
+    messages = []
+    offset = 0
+    while offset + NLMSG_HEADER.size <= len(data):
+        length, msg_type, flags, seq, _ = NLMSG_HEADER.unpack_from(data, offset)
+        if length < NLMSG_HEADER.size:
+            break
+        messages.append((msg_type, flags, seq, data[offset + NLMSG_HEADER.size:offset + length]))
+        offset += _align(length)
+    return messages
+
+
+def parse_attributes(data: bytes) -> dict:
+    """Parse route attributes into a dict of attribute type to raw value.
+    """
+    attributes = {}
+    offset = 0
+    while offset + RTATTR_HEADER.size <= len(data):
+        length, attr_type = RTATTR_HEADER.unpack_from(data, offset)
+        if length < RTATTR_HEADER.size:
+            break
+        attributes[attr_type] = data[offset + RTATTR_HEADER.size:offset + length]
+        offset += _align(length)
+    return attributes
+
+
+def pack_attribute(attr_type: int, value: bytes) -> bytes:
+    """Pack a route attribute, padded to the netlink alignment.
+    """
+    length = RTATTR_HEADER.size + len(value)
+    return RTATTR_HEADER.pack(length, attr_type) + value + b"\0" * (_align(length) - length)
+
+
+def parse_link(payload: bytes) -> Link:
+    _, _, index, flags, _ = IFINFOMSG.unpack_from(payload)
+    attributes = parse_attributes(payload[IFINFOMSG.size:])
+    name = attributes.get(IFLA_IFNAME, b"").split(b"\0", 1)[0].decode()
+    return Link(index, name, bool(flags & IFF_UP), flags)
+
+
+def parse_address(payload: bytes, names: dict) -> Address:
+    """Parse an RTM_NEWADDR or RTM_DELADDR payload.
+
+    Args:
+        payload (bytes): message payload.
+        names (dict): interface names keyed by index.
+    """
+    _, prefix_len, flags, scope, index = IFADDRMSG.unpack_from(payload)
+    attributes = parse_attributes(payload[IFADDRMSG.size:])
+    # IFA_ADDRESS is the peer address of point-to-point links, IFA_LOCAL the address of the interface
+    raw_address = attributes.get(IFA_LOCAL, attributes.get(IFA_ADDRESS))
+    if IFA_FLAGS in attributes:
+        flags = U32.unpack(attributes[IFA_FLAGS][:U32.size])[0]
+    address = ipaddress.ip_interface("%s/%d" % (ipaddress.ip_address(raw_address), prefix_len))
+    return Address(names.get(index), index, address, scope, flags)
+
+
+def parse_route(payload: bytes, names: dict) -> Route:
+    """Parse an RTM_NEWROUTE payload.
+
+    Args:
+        payload (bytes): message payload.
+        names (dict): interface names keyed by index.
+    """
+    family, dst_len, _, _, table, _, _, _, _ = RTMSG.unpack(payload[:RTMSG.size])
+    attributes = parse_attributes(payload[RTMSG.size:])
+    if RTA_DST in attributes:
+        destination = ipaddress.ip_network("%s/%d" % (ipaddress.ip_address(attributes[RTA_DST]), dst_len))
+    else:
+        destination = ipaddress.ip_network("::/0" if family == socket.AF_INET6 else "0.0.0.0/0")
+    gateway = ipaddress.ip_address(attributes[RTA_GATEWAY]) if RTA_GATEWAY in attributes else None
+    index = U32.unpack(attributes[RTA_OIF])[0] if RTA_OIF in attributes else None
+    if RTA_TABLE in attributes:
+        table = U32.unpack(attributes[RTA_TABLE])[0]
+    priority = U32.unpack(attributes[RTA_PRIORITY])[0] if RTA_PRIORITY in attributes else None
+    return Route(destination, gateway, names.get(index), index, table, priority)
+
+
+def address_has_prefix(address, prefix: str) -> bool:
+    """Check whether an address starts with a prefix string such as "fd00:abba::", like the wpanctl address lists.
+    """
+    if len(prefix) > 2 and prefix.endswith("::"):
+        prefix = prefix[:-1]
+    return str(address).startswith(prefix)
+
+
+def open_socket(netns: str = None, groups: int = 0) -> socket.socket:
+    """Open a NETLINK_ROUTE socket, inside a network namespace if given.
+
+    Args:
+        netns (str, optional): name or path of the namespace, see netns_helper.enter_netns(). Defaults to None, the
+            namespace of the caller.
+        groups (int, optional): multicast groups to receive notifications from. Defaults to 0.
+
+    Raises:
+        OSError: if the namespace cannot be entered or the socket cannot be opened.
+    """
+
+    def open_bound():
+        sock = socket.socket(socket.AF_NETLINK, socket.SOCK_RAW, NETLINK_ROUTE)
+        try:
+            sock.bind((0, groups))
+        except OSError:
+            sock.close()
+            raise
+        return sock
+
+    if netns is None:
+        return open_bound()
+
+    result = {}
+
+    def open_in_netns():
+        # setns() only moves this thread, which ends right after
+        try:
+            enter_netns(netns)
+            result["socket"] = open_bound()
+        except OSError as error:
+            result["error"] = error
+
+    thread = threading.Thread(target=open_in_netns, name="netlink-%s" % netns)
+    thread.start()
+    thread.join()
+    if "error" in result:
+        raise result["error"]
+    return result["socket"]
+
+
+class NetlinkReader(object):
+    """Queries the links, addresses and routes of a network namespace over rtnetlink.
+
+    Attributes:
+        netns (str): name or path of the namespace, or None for the namespace of the caller.
+    """
+
+    def __init__(self, netns: str = None):
+        """Open the netlink socket.
+
+        Raises:
+            OSError: if the namespace cannot be entered.
+        """
+        self.netns = netns
+        self._socket = open_socket(netns)
+        self._socket.settimeout(REQUEST_TIMEOUT)
+        self._lock = threading.Lock()
+        self._sequence = 0
+        self._names = {}
+
+    def close(self):
+        """Close the netlink socket.
+        """
+        self._socket.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def request(self, msg_type: int, flags: int, payload: bytes) -> list:
+        """Send a request and collect the messages of its answer.
+
+        Args:
+            msg_type (int): message type, e.g. RTM_GETADDR.
+            flags (int): flags besides NLM_F_REQUEST, e.g. NLM_F_DUMP or NLM_F_ACK.
+            payload (bytes): message payload.
+
+        Returns:
+            list: (type, payload) of the answer messages.
+
+        Raises:
+            OSError: if the kernel rejected the request or did not answer in time.
+        """
+        with self._lock:
+            self._sequence += 1
+            sequence = self._sequence
+            header = NLMSG_HEADER.pack(NLMSG_HEADER.size + len(payload), msg_type, flags | NLM_F_REQUEST, sequence, 0)
+            self._socket.send(header + payload)
+
+            answers = []
+            while True:
+                try:
+                    data = self._socket.recv(RECEIVE_BUFFER_SIZE)
+                except socket.timeout:
+                    raise OSError("Timed out waiting for netlink message %d" % msg_type)
+
+                for answer_type, _, answer_sequence, answer in parse_messages(data):
+                    if answer_sequence != sequence:
+                        continue
+                    if answer_type in (NLMSG_DONE, NLMSG_ERROR):
+                        # Both carry a negative errno, which is 0 for the acknowledgement of a successful request
+                        error = -S32.unpack(answer[:S32.size])[0] if len(answer) >= S32.size else 0
+                        if error > 0:
+                            raise OSError(error, os.strerror(error))
+                        return answers
+                    answers.append((answer_type, answer))
+
+    def links(self) -> list:
+        """List the links of the namespace, as Link.
+        """
+        answers = self.request(RTM_GETLINK, NLM_F_DUMP, IFINFOMSG.pack(socket.AF_UNSPEC, 0, 0, 0, 0))
+        links = [parse_link(payload) for msg_type, payload in answers if msg_type == RTM_NEWLINK]
+        self._names = {link.index: link.name for link in links}
+        return links
+
+    def interface_names(self, refresh: bool = False) -> dict:
+        """Get the interface names keyed by index, listing the links if they are not known yet or refresh is True.
+        """
+        if refresh or not self._names:
+            self.links()
+        return self._names
+
+    def interface_index(self, interface: str) -> int:
+        """Get the index of an interface.
+
+        Raises:
+            OSError: if there is no such interface.
+        """
+        for refresh in (False, True):
+            names = self.interface_names(refresh)
+            for index, name in names.items():
+                if name == interface:
+                    return index
+        raise OSError("No interface %s in %s" % (interface, self.netns or "the current namespace"))
+
+    def addresses(self, family: int = socket.AF_INET6, interface: str = None) -> list:
+        """List the addresses of the namespace, as Address.
+
+        Args:
+            family (int, optional): address family, or socket.AF_UNSPEC for all. Defaults to socket.AF_INET6.
+            interface (str, optional): only list the addresses of this interface. Defaults to None.
+        """
+        answers = self.request(RTM_GETADDR, NLM_F_DUMP, IFADDRMSG.pack(family, 0, 0, 0, 0))
+        names = self.interface_names()
+        addresses = []
+        for msg_type, payload in answers:
+            if msg_type != RTM_NEWADDR:
+                continue
+            address = parse_address(payload, names)
+            if address.interface is None:
+                # New interface since the names were listed
+                address = parse_address(payload, self.interface_names(refresh=True))
+            if interface is None or address.interface == interface:
+                addresses.append(address)
+        return addresses
+
+    def routes(self, family: int = socket.AF_INET6, table: int = RT_TABLE_MAIN) -> list:
+        """List the routes of the namespace, as Route.
+
+        Args:
+            family (int, optional): address family. Defaults to socket.AF_INET6.
+            table (int, optional): routing table, or None for all tables. Defaults to RT_TABLE_MAIN.
+        """
+        answers = self.request(RTM_GETROUTE, NLM_F_DUMP, RTMSG.pack(family, 0, 0, 0, 0, 0, 0, 0, 0))
+        names = self.interface_names()
+        routes = [parse_route(payload, names) for msg_type, payload in answers if msg_type == RTM_NEWROUTE]
+        return [route for route in routes if table is None or route.table == table]
+
+    def state(self, family: int = socket.AF_INET6) -> NetlinkState:
+        """Get the links, addresses and routes of the namespace at once.
+        """
+        links = self.links()
+        return NetlinkState(links, self.addresses(family), self.routes(family))
+
+    def find_addresses(self, prefix: str, interface: str = None) -> list:
+        """List the addresses starting with a prefix, e.g. "fd00:abba::", as strings without prefix length.
+        """
+        family = socket.AF_INET if "." in prefix else socket.AF_INET6
+        return [
+            str(address.address.ip)
+            for address in self.addresses(family, interface)
+            if address_has_prefix(address.address.ip, prefix)
+        ]
+
+    def add_address(self, interface: str, address: str):
+        """Add an address, e.g. "fd00::1/64", to an interface.
+
+        Raises:
+            OSError: if the address cannot be added, e.g. with EEXIST if it already exists.
+        """
+        self.__update_address(RTM_NEWADDR, NLM_F_ACK | NLM_F_CREATE | NLM_F_EXCL, interface, address)
+
+    def delete_address(self, interface: str, address: str):
+        """Delete an address, e.g. "fd00::1/64", from an interface.
+
+        Raises:
+            OSError: if the address cannot be deleted, e.g. with EADDRNOTAVAIL if it does not exist.
+        """
+        self.__update_address(RTM_DELADDR, NLM_F_ACK, interface, address)
+
+    def __update_address(self, msg_type, flags, interface, address):
+        address = ipaddress.ip_interface(address)
+        family = socket.AF_INET6 if address.version == 6 else socket.AF_INET
+        payload = IFADDRMSG.pack(family, address.network.prefixlen, 0, 0, self.interface_index(interface))
+        payload += pack_attribute(IFA_LOCAL, address.ip.packed) + pack_attribute(IFA_ADDRESS, address.ip.packed)
+        self.request(msg_type, flags, payload)
+
+    def subscribe_addresses(self):
+        """Start receiving address change notifications of the namespace.
+
+        Returns:
+            AddressSubscription: the subscription, to be closed by the caller.
+        """
+        return AddressSubscription(self)
+
+    def wait_for_address(self, prefix: str, timeout: float, interface: str = None) -> str:
+        """Wait until an address starting with a prefix is assigned.
+
+        Returns:
+            str: the first matching address, or "" if none was assigned before the timeout.
+        """
+        with self.subscribe_addresses() as subscription:
+            # Subscribe before listing, so that no change in between is missed
+            addresses = self.find_addresses(prefix, interface)
+            if addresses:
+                return addresses[0]
+
+            t_end = time.time() + timeout
+            while True:
+                event = subscription.next_event(t_end - time.time())
+                if event is None:
+                    return ""
+                address = event.address
+                if event.added and (interface is None or address.interface == interface) and address_has_prefix(
+                        address.address.ip, prefix):
+                    return str(address.address.ip)
+
+
+class AddressSubscription(object):
+    """Receives address change notifications of the namespace of a NetlinkReader.
+    """
+
+    def __init__(self, reader: NetlinkReader):
+        self._reader = reader
+        self._socket = open_socket(reader.netns, RTMGRP_IPV4_IFADDR | RTMGRP_IPV6_IFADDR)
+        self._events = collections.deque()
+
+    def close(self):
+        self._socket.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def next_event(self, timeout: float):
+        """Get the next address change.
+
+        Args:
+            timeout (float): seconds to wait for a change.
+
+        Returns:
+            AddressEvent: the change, or None if there was none before the timeout.
+        """
+        t_end = time.time() + timeout
+        while not self._events:
+            remaining = t_end - time.time()
+            if remaining <= 0:
+                return None
+            self._socket.settimeout(remaining)
+            try:
+                data = self._socket.recv(RECEIVE_BUFFER_SIZE)
+            except socket.timeout:
+                return None
+
+            for msg_type, _, _, payload in parse_messages(data):
+                if msg_type not in (RTM_NEWADDR, RTM_DELADDR):
+                    continue
+                address = parse_address(payload, self._reader.interface_names())
+                if address.interface is None:
+                    address = parse_address(payload, self._reader.interface_names(refresh=True))
+                self._events.append(AddressEvent(msg_type == RTM_NEWADDR, address))
+
+        return self._events.popleft()
@@ -14,12 +14,18 @@
 """Base class for network namespace controller.
 """
 
+import asyncio
 import logging
 import os
 import subprocess
 
-from silk.device.system_call_manager import SystemCallManager
+from silk.device.message_item import ItemOrdering
+from silk.device.netlink import NetlinkReader
+from silk.device.netns_helper import NetnsHelperClient
+from silk.device.netns_topology import collecting_provisioner
+from silk.device.system_call_manager import MessageSystemCallItem, SystemCallManager, SystemCallOutput
 from silk.node.base_node import BaseNode
+import silk.config.defaults as defaults
 import silk.postprocessing.ip as silk_ip
 
 
@@ -31,6 +37,21 @@ def create_link_pair(interface_1, interface_2):
     return proc.communicate()[0]
 
 
+class MessageNetnsCallItem(MessageSystemCallItem):
+    """Queued command that runs through the controller's make_netns_call() method.
+
+    This lets the controller decide on the worker thread whether the command is run by the netns helper or with
+    `ip netns exec`.
+    """
+
+    def execute(self):
+        return self.parent.make_netns_call(self.cmd, self.timeout)
+
+    async def execute_async(self):
+        # The helper client blocks while reading the command output
+        return await asyncio.get_event_loop().run_in_executor(None, self.execute)
+
+
 class NetnsController(SystemCallManager):
     """
     This class contains methods for creating, destroying, and manipulating network namespaces. It also provides
@@ -50,20 +71,42 @@ class NetnsController(SystemCallManager):
 
     _hw_model = None
 
-    def __init__(self, netns: str = None, device_path: str = None):
+    # NetnsHelperClient running commands in the namespace, or None to run them with `ip netns exec`
+    netns_helper = None
+
+    # NetlinkReader querying the namespace in-process, or None to query it with ip and ifconfig commands
+    netlink = None
+
+    # TopologyProvisioner that created the namespace in bulk, or None if it was created on its own
+    netns_topology = None
+
+    def __init__(self, netns: str = None, device_path: str = None, event_loop=None):
         """
         Carve out a unique network namespace for this device instance.
         Initialize the necessary synchronization mechanisms for async
         operations.
-        Startup the system call worker thread.
+        Startup the system call worker thread, or run system calls on
+        event_loop (a NodeEventLoop) if given.
         """
         self.netns = netns
         if netns is not None and device_path is None:
             self.device_path = ""
         else:
             self.device_path = device_path
+        SystemCallManager.__init__(self, event_loop)
         self.create_netns()
-        SystemCallManager.__init__(self)
+        if defaults.NETNS_HELPER:
+            self.__when_provisioned(self.start_netns_helper)
+        if defaults.NETLINK_QUERIES:
+            self.__when_provisioned(self.open_netlink)
+
+    def __when_provisioned(self, callback):
+        """Call `callback` once the namespace exists, which is later if it is created in bulk.
+        """
+        if self.pending_topology is not None:
+            self.pending_topology.on_applied(callback)
+        else:
+            callback()
 
     def create_netns(self):
         """
@@ -75,6 +118,14 @@ class NetnsController(SystemCallManager):
         self.log_info("Adding network namespace for %s" % self.device_path)
         if self.netns is None:
             self.netns = os.path.basename(self.device_path)
+
+        topology = collecting_provisioner()
+        if topology is not None:
+            # Created in bulk at the end of the collect() block
+            topology.add_netns(self.netns)
+            self.netns_topology = topology
+            return self.netns
+
         command = "sudo ip netns add %s" % self.netns
         self._make_system_call("netns-add", command, 2)
         return self.netns
@@ -83,10 +134,72 @@ class NetnsController(SystemCallManager):
         """Delete netns containing this device.
         """
         self.log_info("Deleting network namespace for %s" % self.device_path)
+        self.stop_netns_helper()
+        self.close_netlink()
+
+        if self.netns_topology is not None and self.netns_topology.applied:
+            self.log_info("Network namespace %s is deleted in bulk with its topology" % self.netns)
+            return
 
         command = "sudo ip netns del %s" % self.netns
         self._make_system_call("netns-del", command, 2)
 
+    @property
+    def pending_topology(self):
+        """TopologyProvisioner still collecting the operations of this namespace, or None.
+
+        Link, address and route operations are recorded with it instead of being run one by one.
+        """
+        if self.netns_topology is not None and not self.netns_topology.applied:
+            return self.netns_topology
+        return None
+
+    def start_netns_helper(self):
+        """Start a helper that runs the commands of this namespace without a shell, sudo and ip per command.
+
+        Commands fall back to `ip netns exec` if the helper cannot be started.
+        """
+        if self.netns_helper is not None and self.netns_helper.is_alive():
+            return
+
+        helper = NetnsHelperClient(self.netns)
+        if helper.start():
+            self.log_info("Started netns helper for %s" % self.netns)
+            self.netns_helper = helper
+        else:
+            self.log_warning("Failed to start netns helper for %s, using ip netns exec" % self.netns)
+            self.netns_helper = None
+
+    def stop_netns_helper(self):
+        """Stop the netns helper if it is running.
+        """
+        if self.netns_helper is not None:
+            self.netns_helper.stop()
+            self.netns_helper = None
+
+    def open_netlink(self):
+        """Open a netlink socket in this namespace to query its addresses, routes and links without commands.
+
+        Queries fall back to commands if the namespace cannot be entered, e.g. without root privileges.
+        """
+        if self.netlink is not None:
+            return
+
+        try:
+            self.netlink = NetlinkReader(self.netns)
+        except OSError as error:
+            self.log_warning("Failed to open netlink socket in %s, using commands: %s" % (self.netns, error))
+            self.netlink = None
+        else:
+            self.log_info("Opened netlink socket in %s" % self.netns)
+
+    def close_netlink(self):
+        """Close the netlink socket if it is open.
+        """
+        if self.netlink is not None:
+            self.netlink.close()
+            self.netlink = None
+
     def netns_pids(self):
         """List all PIDs running in this device's netns.
         """
@@ -110,6 +223,8 @@ class NetnsController(SystemCallManager):
         Delete the netns.
         """
         self.log_info("Cleaning up network namespace for %s" % self.device_path)
+        # The helper runs inside the namespace, stop it before its processes are killed
+        self.stop_netns_helper()
         self.netns_killall()
         self.delete_netns()
 
@@ -126,17 +241,52 @@ class NetnsController(SystemCallManager):
         Format the command so that it will be called in this network namespace.
         Make the system call with a timeout.
         """
+        if self.netns_helper is not None:
+            output = self.__make_netns_helper_call(command, timeout)
+            if output is not None:
+                return output
+            self.log_warning("netns helper unavailable, running \"%s\" with ip netns exec" % command)
+
         command = self.construct_netns_command(command)
         return self._make_system_call("netns-exec", command, timeout)
 
-    def make_netns_call_async(self, command, expect, timeout, field=None, exact_match: bool = False):
+    def __make_netns_helper_call(self, command, timeout):
+        """Run a command through the netns helper.
+
+        Returns the output, or None if the helper could not run the command.
+        """
+        self.log_debug("Making system call for netns-exec")
+        self.log_debug(command)
+
+        collector = SystemCallOutput(self.log_debug)
+        if not self.netns_helper.run(command, timeout, collector):
+            return None
+        collector.finish()
+        return collector.getvalue()
+
+    def make_netns_call_async(self,
+                              command,
+                              expect,
+                              timeout,
+                              field=None,
+                              exact_match: bool = False,
+                              read_only: bool = False):
         """
         Take a standard system call (eg: ifconfig, ping, etc.).
         Format the command so that it will be called in this network namespace.
         Make the system call with a timeout.
+        A read_only command may run concurrently with adjacent read-only commands.
         """
+        if self.netns_helper is not None:
+            self.log_info("Enqueuing command \"%s\"" % command)
+            ordering = ItemOrdering.CONCURRENT if read_only else ItemOrdering.SERIAL
+            item = MessageNetnsCallItem("netns-exec", command, expect, timeout, field, exact_match=exact_match,
+                                        ordering=ordering)
+            self._enqueue_message_item(item)
+            return
+
         command = self.construct_netns_command(command)
-        return self.make_system_call_async("netns-exec", command, expect, timeout, field, exact_match)
+        return self.make_system_call_async("netns-exec", command, expect, timeout, field, exact_match, read_only)
 
     def link_set(self, interface_name, virtual_eth_peer):
         """
@@ -160,10 +310,32 @@ class NetnsController(SystemCallManager):
         interface.
         """
         new_ip = silk_ip.assemble(prefix, subnet, mac)
-        command = "ip addr add %s/64 dev %s" % (new_ip, interface)
         self.store_data(new_ip, interface_label)
+        if self.pending_topology is not None:
+            self.pending_topology.add_address(self.netns, interface, "%s/64" % new_ip)
+            return
+
+        if self.netlink is not None:
+            self.make_function_call_async(self.__add_netlink_address, interface, "%s/64" % new_ip)
+            return
+
+        command = "ip addr add %s/64 dev %s" % (new_ip, interface)
         self.make_netns_call_async(command, "", 1)
-        self.make_netns_call_async("ifconfig", "", 1)
+        self.make_netns_call_async("ifconfig", "", 1, read_only=True)
+
+    def __add_netlink_address(self, interface, address, delegates):
+        """Queued counterpart of `ip addr add` followed by `ifconfig`, logging the resulting addresses.
+        """
+        try:
+            self.netlink.add_address(interface, address)
+            addresses = self.netlink.addresses(interface=interface)
+        except OSError as error:
+            # Like the ip command, a failure does not fail the queue
+            self.log_warning("Failed to add %s to %s: %s" % (address, interface, error))
+            return True
+
+        self.log_debug("Addresses of %s: %s" % (interface, ", ".join(str(entry.address) for entry in addresses)))
+        return True
 
     def set_default_route(self, default_interface=None):
         if default_interface is None:
@@ -180,6 +352,10 @@ class NetnsController(SystemCallManager):
         self.make_netns_call_async(command, "", 1, None)
 
     def add_route(self, dest, dest_subnet_length, via_addr, interface_name):
+        if self.pending_topology is not None:
+            self.pending_topology.add_route(self.netns, "%s/%s" % (dest, dest_subnet_length), via_addr, interface_name)
+            return
+
         command = "ip -6 route add %s/%s via %s dev %s" % (dest, dest_subnet_length, via_addr, interface_name)
         self.make_netns_call_async(command, "", 1, None)
 
@@ -188,10 +364,10 @@ class StandaloneNetworkNamespace(NetnsController, BaseNode):
     """Class to control a standalone network namespace that is not associated with a development board.
     """
 
-    def __init__(self, netns_name):
+    def __init__(self, netns_name, event_loop=None):
         device_path = os.path.join("/dev", netns_name)
         BaseNode.__init__(self, netns_name)
-        NetnsController.__init__(self, netns_name, device_path)
+        NetnsController.__init__(self, netns_name, device_path, event_loop)
 
     def tear_down(self):
         self.cleanup_netns()
@@ -0,0 +1,381 @@
+# Copyright 2020 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Long-running helper that runs commands inside a network namespace.
+
+Running `sudo ip netns exec <netns> <command>` through a shell starts /bin/sh, sudo and ip before every command. The
+helper is started once per namespace with root privileges, enters the namespace with setns(), and then serves
+commands over a Unix socket, executing each one directly from an argv list. Only commands using shell syntax are run
+through /bin/sh.
+
+For each command the client connects to the socket and sends a JSON request together with the write end of a pipe
+(SCM_RIGHTS). The command writes its output to that pipe, so the client reads it just like the output of a local
+subprocess. The helper replies with a JSON line holding the return code once the command exits, and kills the command
+when the client sends "kill" or disconnects.
+
+This module only depends on the standard library, since the helper runs it as a script, e.g. under sudo.
+"""
+
+import argparse
+import array
+import ctypes
+import json
+import os
+import select
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+CLONE_NEWNET = 0x40000000
+NETNS_RUN_DIR = "/var/run/netns"
+HELPER_PATH = os.path.abspath(__file__)
+READY_LINE = b"netns-helper-ready\n"
+KILL_MESSAGE = b"kill\n"
+MAX_REQUEST_SIZE = 64 * 1024
+READ_CHUNK_SIZE = 64 * 1024
+EXIT_POLL_INTERVAL = 0.05
+# Characters with a meaning to /bin/sh; commands without any of them are split on whitespace and executed directly
+SHELL_CHARACTERS = frozenset("|&;<>()$`\\\"'*?[]#~={}\n")
+
+
+def command_argv(command: str) -> list:
+    """Convert a command line to the argv list the helper executes.
+
+    Args:
+        command (str): command line.
+
+    Returns:
+        list: argv of the command, run through /bin/sh if the command uses shell syntax.
+    """
+    if SHELL_CHARACTERS.intersection(command):
+        return ["/bin/sh", "-c", command]
+    return command.split()
+
+
+def enter_netns(netns: str):
+    """Move the calling thread into a network namespace.
+
+    Threads and processes started afterwards from the calling thread inherit the namespace, so this should be called
+    before any other thread is started.
+
+    Args:
+        netns (str): name of a namespace created by `ip netns add`, or path of a namespace file, e.g.
+            /proc/<pid>/ns/net.
+
+    Raises:
+        OSError: if the namespace cannot be entered.
+    """
+    path = netns if os.sep in netns else os.path.join(NETNS_RUN_DIR, netns)
+    libc = ctypes.CDLL(None, use_errno=True)
+    with open(path) as netns_file:
+        if libc.setns(netns_file.fileno(), CLONE_NEWNET) != 0:
+            errno = ctypes.get_errno()
+            raise OSError(errno, os.strerror(errno), path)
+
+
+def send_request(conn: socket.socket, request: dict, output_fd: int):
+    """Send a command request along with the file descriptor for its output.
+    """
+    fds = array.array("i", [output_fd])
+    conn.sendmsg([json.dumps(request).encode() + b"\n"], [(socket.SOL_SOCKET, socket.SCM_RIGHTS, fds)])
+
+
+def receive_request(conn: socket.socket):
+    """Receive a command request sent with send_request().
+
+    Returns:
+        tuple: the request and the output file descriptor, which is None if none was received.
+    """
+    fds = array.array("i")
+    data, ancillary, _, _ = conn.recvmsg(MAX_REQUEST_SIZE, socket.CMSG_SPACE(fds.itemsize))
+    for level, kind, cmsg_data in ancillary:
+        if level == socket.SOL_SOCKET and kind == socket.SCM_RIGHTS:
+            fds.frombytes(cmsg_data[:len(cmsg_data) - (len(cmsg_data) % fds.itemsize)])
+
+    while not data.endswith(b"\n"):
+        chunk = conn.recv(MAX_REQUEST_SIZE)
+        if not chunk:
+            break
+        data += chunk
+
+    output_fd = fds[0] if fds else None
+    for fd in fds[1:]:
+        os.close(fd)
+    return json.loads(data.decode()), output_fd
+
+
+class NetnsHelper(object):
+    """Server side of the helper, serving commands from a Unix socket.
+
+    Attributes:
+        socket_path (str): path of the Unix socket.
+    """
+
+    def __init__(self, socket_path: str):
+        self.socket_path = socket_path
+
+    def serve(self):
+        """Serve commands until standard input is closed.
+        """
+        server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        server.bind(self.socket_path)
+        os.chmod(self.socket_path, 0o600)
+        # Under sudo, let the user who started the helper connect to it
+        if "SUDO_UID" in os.environ:
+            os.chown(self.socket_path, int(os.environ["SUDO_UID"]), int(os.environ.get("SUDO_GID", -1)))
+        server.listen(socket.SOMAXCONN)
+
+        threading.Thread(target=self.__wait_for_parent, daemon=True).start()
+
+        sys.stdout.buffer.write(READY_LINE)
+        sys.stdout.flush()
+
+        while True:
+            conn, _ = server.accept()
+            threading.Thread(target=self.__serve_command, args=(conn,), daemon=True).start()
+
+    def __wait_for_parent(self):
+        """Exit once the client closes standard input, which it does on stop or when it dies.
+        """
+        while sys.stdin.buffer.read(1024):
+            pass
+        os._exit(0)
+
+    def __serve_command(self, conn):
+        with conn:
+            try:
+                request, output_fd = receive_request(conn)
+            except (OSError, ValueError):
+                return
+            if output_fd is None:
+                return
+
+            argv = request["argv"]
+            try:
+                proc = subprocess.Popen(argv, stdin=subprocess.DEVNULL, stdout=output_fd, stderr=subprocess.STDOUT)
+            except OSError as error:
+                # Report like a shell would, since the command did not go through one
+                os.write(output_fd, ("%s: %s\n" % (argv[0], error.strerror)).encode())
+                self.__reply(conn, {"returncode": 127})
+                return
+            finally:
+                os.close(output_fd)
+
+            threading.Thread(target=self.__watch_client, args=(conn, proc), daemon=True).start()
+            self.__reply(conn, {"returncode": proc.wait()})
+            try:
+                # Wake up the client watcher
+                conn.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+
+    def __watch_client(self, conn, proc):
+        """Kill the command when the client asks for it or goes away.
+        """
+        try:
+            data = conn.recv(len(KILL_MESSAGE))
+        except OSError:
+            data = b""
+
+        if (not data or data == KILL_MESSAGE) and proc.poll() is None:
+            try:
+                proc.kill()
+            except OSError:
+                pass
+
+    def __reply(self, conn, reply):
+        try:
+            conn.sendall(json.dumps(reply).encode() + b"\n")
+        except OSError:
+            pass
+
+
+class NetnsHelperClient(object):
+    """Starts a NetnsHelper and runs commands through it.
+
+    Attributes:
+        netns (str): namespace the helper enters, or None to run commands in the namespace the helper starts in.
+        launcher (list): command prefix that starts the helper, e.g. with root privileges.
+        socket_path (str): path of the Unix socket of the helper.
+    """
+
+    def __init__(self, netns: str = None, launcher=("sudo",), start_timeout: float = 10):
+        """Initialize a client. The helper is started by start().
+
+        Args:
+            netns (str, optional): name or path of the namespace to run commands in. Defaults to None.
+            launcher (list, optional): command prefix that starts the helper. Defaults to ("sudo",).
+            start_timeout (float, optional): seconds to wait for the helper to be ready. Defaults to 10.
+        """
+        self.netns = netns
+        self.launcher = list(launcher)
+        self.start_timeout = start_timeout
+
+        self._socket_dir = None
+        self.socket_path = None
+        self._process = None
+
+    def start(self) -> bool:
+        """Start the helper and wait until it serves commands.
+
+        Returns:
+            bool: True if the helper is ready.
+        """
+        self._socket_dir = tempfile.mkdtemp(prefix="silk-netns-")
+        self.socket_path = os.path.join(self._socket_dir, "helper.sock")
+
+        command = self.launcher + [sys.executable, HELPER_PATH, "--socket", self.socket_path]
+        if self.netns is not None:
+            command += ["--netns", self.netns]
+
+        try:
+            self._process = subprocess.Popen(command, stdin=subprocess.PIPE, stdout=subprocess.PIPE)
+        except OSError:
+            self.stop()
+            return False
+
+        if select.select([self._process.stdout], [], [], self.start_timeout)[0]:
+            if self._process.stdout.readline() == READY_LINE:
+                return True
+
+        self.stop()
+        return False
+
+    def is_alive(self) -> bool:
+        """Check whether the helper is running.
+        """
+        return self._process is not None and self._process.poll() is None
+
+    def stop(self, timeout: float = 5):
+        """Stop the helper.
+
+        Args:
+            timeout (float, optional): seconds to wait for the helper to exit before killing it. Defaults to 5.
+        """
+        if self._process is not None:
+            self._process.stdin.close()
+            try:
+                self._process.wait(timeout)
+            except subprocess.TimeoutExpired:
+                self._process.kill()
+                self._process.wait()
+            self._process.stdout.close()
+            self._process = None
+
+        if self._socket_dir is not None:
+            shutil.rmtree(self._socket_dir, ignore_errors=True)
+            self._socket_dir = None
+            self.socket_path = None
+
+    def run(self, command: str, timeout: float, collector) -> bool:
+        """Run a command through the helper.
+
+        The call returns once the command closes its output or exits, or once the timeout expires, in which case the
+        command is killed.
+
+        Args:
+            command (str): command line to run.
+            timeout (float): timeout in seconds.
+            collector (SystemCallOutput): receives the output of the command.
+
+        Returns:
+            bool: False if the helper could not be reached, in which case the command did not run.
+        """
+        if self.socket_path is None:
+            return False
+
+        read_fd, write_fd = os.pipe()
+        conn = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            conn.connect(self.socket_path)
+            send_request(conn, {"argv": command_argv(command)}, write_fd)
+        except OSError:
+            conn.close()
+            os.close(read_fd)
+            return False
+        finally:
+            os.close(write_fd)
+
+        os.set_blocking(read_fd, False)
+        try:
+            self.__read_output(conn, read_fd, timeout, collector)
+        finally:
+            conn.close()
+            os.close(read_fd)
+        return True
+
+    def __read_output(self, conn, read_fd, timeout, collector):
+        t_end = time.time() + timeout
+        exited = False
+        eof = False
+        while not eof:
+            remaining = t_end - time.time()
+            if remaining <= 0:
+                try:
+                    conn.sendall(KILL_MESSAGE)
+                except OSError:
+                    pass
+                break
+
+            # As in SystemCallManager._make_system_call, the poll interval bounds how long we take to notice a command
+            # that exited while a background descendant still holds the output open
+            waiting = [read_fd] if exited else [read_fd, conn]
+            readable = select.select(waiting, [], [], min(remaining, EXIT_POLL_INTERVAL))[0]
+
+            if conn in readable:
+                # The only reply is the return code, or end of file if the helper went away
+                conn.recv(MAX_REQUEST_SIZE)
+                exited = True
+            if read_fd in readable:
+                eof = self.__read_available(read_fd, collector)
+            elif exited and conn not in readable:
+                break
+
+        if not eof:
+            self.__read_available(read_fd, collector)
+
+    def __read_available(self, fd, collector) -> bool:
+        """Read everything currently available into the collector.
+
+        Returns True if the end of the output has been reached.
+        """
+        while True:
+            try:
+                data = os.read(fd, READ_CHUNK_SIZE)
+            except BlockingIOError:
+                return False
+            except OSError:
+                return True
+
+            if not data:
+                return True
+            collector.feed(data)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run commands inside a network namespace for silk.")
+    parser.add_argument("--socket", required=True, help="path of the Unix socket to serve commands on")
+    parser.add_argument("--netns", help="name or path of the network namespace to enter")
+    args = parser.parse_args()
+
+    if args.netns is not None:
+        enter_netns(args.netns)
+    NetnsHelper(args.socket).serve()
+
+
+if __name__ == "__main__":
+    main()
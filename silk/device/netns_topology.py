@@ -0,0 +1,360 @@
+# Copyright 2020 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Bulk provisioning of network namespaces, veth links and addresses.
+
+Creating a namespace, a veth pair, moving it and adding its addresses one `sudo ip` call at a time costs several
+subprocesses per node. A TopologyProvisioner collects these operations and applies them with one `ip -batch` for the
+root namespace followed by one `ip -n <netns> -batch` per namespace, all from a single shell under sudo. veth ends are
+created directly inside their namespaces. The result is verified from a single dump of all namespaces, and everything
+is deleted in one batch on tear down.
+"""
+
+import collections
+import contextlib
+import ipaddress
+import re
+import shlex
+import subprocess
+
+# Seconds allowed for running a batch, plus some per operation
+BATCH_TIMEOUT = 10
+BATCH_TIMEOUT_PER_OPERATION = 0.1
+DUMP_NETNS_MARKER = "--silk-netns--"
+# Stands for the root namespace in dumps
+ROOT_NETNS = ""
+
+LINK_LINE_REGEX = re.compile(r"^\d+:\s+(?P<name>[^:@\s]+)(?:@\S+)?:\s+<(?P<flags>[^>]*)>")
+ADDRESS_LINE_REGEX = re.compile(r"^\d+:\s+(?P<name>\S+)\s+inet6?\s+(?P<address>\S+)")
+ROUTE_LINE_REGEX = re.compile(r"^(?P<destination>\S+)"
+                              r"(?:\s+via(?:\s+inet6?)?\s+(?P<via>\S+))?\s+dev\s+(?P<interface>\S+)")
+
+# links (dict): interface name to whether it is up.
+# addresses (set): (interface name, ipaddress.ip_interface) pairs.
+# routes (set): route keys, see route_key().
+NetnsState = collections.namedtuple("NetnsState", ["links", "addresses", "routes"])
+LinkPair = collections.namedtuple("LinkPair", ["interface", "netns", "peer", "peer_netns"])
+
+# Provisioners collecting the operations of new network namespace controllers, see TopologyProvisioner.collect()
+_collecting = []
+
+
+def route_key(destination: str, via: str, interface: str) -> tuple:
+    """Normalize a route as added, or as listed by `ip route show`, so that both compare equal.
+
+    Returns:
+        tuple: (destination network or "default", gateway address or None, interface name).
+    """
+    if destination != "default":
+        destination = ipaddress.ip_network(destination, strict=False)
+    return destination, ipaddress.ip_address(via) if via else None, interface
+
+
+def collecting_provisioner():
+    """Get the provisioner collecting operations in the current TopologyProvisioner.collect() block, if any.
+    """
+    return _collecting[-1] if _collecting else None
+
+
+class TopologyError(Exception):
+    """Raised when a topology could not be provisioned.
+
+    Attributes:
+        problems (list): descriptions of what is missing.
+    """
+
+    def __init__(self, problems):
+        self.problems = problems
+        super().__init__("Topology provisioning failed: %s" % "; ".join(problems))
+
+
+class TopologyProvisioner(object):
+    """Collects network namespace, link and address operations and applies them in bulk.
+
+    Attributes:
+        command_prefix (str): prefix of the shell command running the batches, e.g. for privileges.
+        namespaces (list): names of the network namespaces to create.
+        link_pairs (list): veth pairs to create, as LinkPair.
+        addresses (list): (netns, interface, address) to add, the netns being None for the root namespace.
+        routes (list): (netns, destination, via, interface) to add.
+        applied (bool): whether the operations have been applied.
+    """
+
+    def __init__(self, command_prefix: str = "sudo ", logger=None):
+        """Initialize an empty topology.
+
+        Args:
+            command_prefix (str, optional): prefix of the shell command running the batches. Defaults to "sudo ".
+            logger (logging.Logger, optional): logger for the provisioner. Defaults to None.
+        """
+        self.command_prefix = command_prefix
+        self.logger = logger
+
+        self.namespaces = []
+        self.link_pairs = []
+        self.addresses = []
+        self.routes = []
+        self.applied = False
+        self.__on_applied = []
+
+    def add_netns(self, netns: str):
+        """Add a network namespace.
+        """
+        if netns not in self.namespaces:
+            self.namespaces.append(netns)
+
+    def add_link_pair(self, interface: str, peer: str, netns: str = None, peer_netns: str = None):
+        """Add a veth pair, with each end created in its namespace and brought up.
+
+        Args:
+            interface (str): name of the first end.
+            peer (str): name of the second end.
+            netns (str, optional): namespace of the first end. Defaults to None, the root namespace.
+            peer_netns (str, optional): namespace of the second end. Defaults to None, the root namespace.
+        """
+        self.link_pairs.append(LinkPair(interface, netns, peer, peer_netns))
+
+    def add_address(self, netns: str, interface: str, address: str):
+        """Add an address, e.g. "fd00::1/64", to an interface.
+        """
+        self.addresses.append((netns, interface, address))
+
+    def add_route(self, netns: str, destination: str, via: str, interface: str):
+        """Add a route, e.g. to "fd00:1::/64" via a gateway address.
+        """
+        self.routes.append((netns, destination, via, interface))
+
+    def on_applied(self, callback):
+        """Call `callback` once the operations have been applied successfully.
+        """
+        self.__on_applied.append(callback)
+
+    @property
+    def operation_count(self):
+        """Number of collected operations.
+        """
+        return len(self.namespaces) + len(self.link_pairs) + len(self.addresses) + len(self.routes)
+
+    def batches(self):
+        """Build the `ip -batch` input for each namespace.
+
+        Returns:
+            collections.OrderedDict: batch lines keyed by namespace, ROOT_NETNS first.
+        """
+        batches = collections.OrderedDict([(ROOT_NETNS, [])])
+        root = batches[ROOT_NETNS]
+
+        for netns in self.namespaces:
+            root.append("netns add %s" % netns)
+            batches[netns] = []
+
+        for pair in self.link_pairs:
+            line = "link add name %s" % pair.interface
+            if pair.netns is not None:
+                line += " netns %s" % pair.netns
+            line += " type veth peer name %s" % pair.peer
+            if pair.peer_netns is not None:
+                line += " netns %s" % pair.peer_netns
+            root.append(line)
+
+            for interface, netns in ((pair.interface, pair.netns), (pair.peer, pair.peer_netns)):
+                batches.setdefault(netns or ROOT_NETNS, []).append("link set dev %s up" % interface)
+
+        for netns, interface, address in self.addresses:
+            batches.setdefault(netns or ROOT_NETNS, []).append("address add %s dev %s" % (address, interface))
+
+        for netns, destination, via, interface in self.routes:
+            batches.setdefault(netns or ROOT_NETNS,
+                               []).append("route add %s via %s dev %s" % (destination, via, interface))
+
+        return batches
+
+    def apply(self) -> bool:
+        """Apply all collected operations and verify them.
+
+        Returns:
+            bool: True if the topology is in place.
+        """
+        self.__log("info", "Provisioning %d namespace(s), %d link pair(s), %d address(es) and %d route(s)" %
+                   (len(self.namespaces), len(self.link_pairs), len(self.addresses), len(self.routes)))
+
+        script = "\n".join(self.__batch_command(netns, lines) for netns, lines in self.batches().items() if lines)
+        self.__run(script)
+
+        problems = self.verify()
+        for problem in problems:
+            self.__log("error", problem)
+        if problems:
+            return False
+
+        self.applied = True
+        for callback in self.__on_applied:
+            callback()
+        return True
+
+    def dump(self):
+        """Dump the links, addresses and routes of the root namespace and of all collected namespaces at once.
+
+        Returns:
+            dict: NetnsState keyed by namespace, ROOT_NETNS for the root namespace. Namespaces that do not exist have
+                no entry.
+        """
+        commands = []
+        for netns in [ROOT_NETNS] + self.namespaces:
+            batch = self.__batch_command(netns, ["link show", "address show", "route show"], "-o")
+            # A batch cannot switch the address family, so IPv6 routes are listed by a separate call
+            ipv6_routes = "%s -6 route show" % self.__ip_command(netns)
+            commands.append("echo %s%s; %s\n%s" % (DUMP_NETNS_MARKER, netns, batch, ipv6_routes))
+        script = "\n".join(commands)
+
+        states = {}
+        state = None
+        for line in self.__run(script).splitlines():
+            if line.startswith(DUMP_NETNS_MARKER):
+                state = NetnsState({}, set(), set())
+                states[line[len(DUMP_NETNS_MARKER):]] = state
+                continue
+            if state is None:
+                continue
+
+            match = LINK_LINE_REGEX.match(line)
+            if match:
+                state.links[match.group("name")] = "UP" in match.group("flags").split(",")
+                continue
+
+            match = ADDRESS_LINE_REGEX.match(line)
+            if match:
+                state.addresses.add((match.group("name"), ipaddress.ip_interface(match.group("address"))))
+                continue
+
+            match = ROUTE_LINE_REGEX.match(line)
+            if match:
+                try:
+                    state.routes.add(route_key(match.group("destination"), match.group("via"),
+                                               match.group("interface")))
+                except ValueError:
+                    # e.g. routes of another type such as "unreachable", which are never added
+                    pass
+
+        # Every namespace has a loopback interface, so a namespace without links could not be opened
+        return {netns: state for netns, state in states.items() if state.links}
+
+    def verify(self, states=None):
+        """Check that the collected operations are reflected by a dump.
+
+        Args:
+            states (dict, optional): result of dump(). Defaults to None, which takes a new dump.
+
+        Returns:
+            list: descriptions of what is missing, empty if the topology is in place.
+        """
+        if states is None:
+            states = self.dump()
+
+        problems = []
+        for netns in self.namespaces:
+            if netns not in states:
+                problems.append("Network namespace %s does not exist" % netns)
+
+        for pair in self.link_pairs:
+            for interface, netns in ((pair.interface, pair.netns), (pair.peer, pair.peer_netns)):
+                state = states.get(netns or ROOT_NETNS)
+                if state is None:
+                    continue
+                if interface not in state.links:
+                    problems.append("Link %s is missing in %s" % (interface, self.__netns_label(netns)))
+                elif not state.links[interface]:
+                    problems.append("Link %s is down in %s" % (interface, self.__netns_label(netns)))
+
+        for netns, interface, address in self.addresses:
+            state = states.get(netns or ROOT_NETNS)
+            if state is not None and (interface, ipaddress.ip_interface(address)) not in state.addresses:
+                problems.append("Address %s is missing on %s in %s" % (address, interface,
+                                                                       self.__netns_label(netns)))
+
+        for netns, destination, via, interface in self.routes:
+            state = states.get(netns or ROOT_NETNS)
+            if state is not None and route_key(destination, via, interface) not in state.routes:
+                problems.append("Route to %s via %s is missing on %s in %s" %
+                                (destination, via, interface, self.__netns_label(netns)))
+
+        return problems
+
+    def tear_down(self):
+        """Delete all collected namespaces and root namespace links in one batch.
+
+        Links inside the namespaces, and their peers, are deleted along with the namespaces.
+        """
+        lines = ["link delete dev %s" % pair.interface for pair in self.link_pairs if pair.netns is None]
+        lines += ["link delete dev %s" % pair.peer for pair in self.link_pairs
+                  if pair.netns is not None and pair.peer_netns is None]
+        lines += ["netns delete %s" % netns for netns in self.namespaces]
+        if lines:
+            self.__log("info", "Deleting %d namespace(s)" % len(self.namespaces))
+            self.__run(self.__batch_command(ROOT_NETNS, lines))
+        self.applied = False
+
+    @contextlib.contextmanager
+    def collect(self):
+        """Collect the operations of the network namespace controllers created in the block, and apply them at its end.
+
+        Raises:
+            TopologyError: if the topology could not be provisioned.
+        """
+        _collecting.append(self)
+        try:
+            yield self
+        finally:
+            _collecting.remove(self)
+
+        if not self.apply():
+            raise TopologyError(self.verify())
+
+    def __ip_command(self, netns):
+        return "ip -n %s" % netns if netns else "ip"
+
+    def __batch_command(self, netns, lines, options=""):
+        command = self.__ip_command(netns)
+        if options:
+            command += " " + options
+        return "%s -force -batch - <<'EOF'\n%s\nEOF" % (command, "\n".join(lines))
+
+    def __run(self, script):
+        command = self.command_prefix + "sh -c " + shlex.quote(script)
+        timeout = BATCH_TIMEOUT + BATCH_TIMEOUT_PER_OPERATION * self.operation_count
+        try:
+            proc = subprocess.run(command,
+                                  shell=True,
+                                  stdout=subprocess.PIPE,
+                                  stderr=subprocess.STDOUT,
+                                  timeout=timeout)
+        except subprocess.TimeoutExpired as error:
+            self.__log("error", "Timed out after %ss: %s" % (timeout, command))
+            output = error.output or b""
+        else:
+            output = proc.stdout
+
+        output = output.decode("utf-8", errors="replace")
+        for line in output.splitlines():
+            if line and not line.startswith(DUMP_NETNS_MARKER) and not re.match(r"\d+:", line) and \
+                    not ROUTE_LINE_REGEX.match(line):
+                # Besides dumps, ip only prints errors, e.g. for operations that were already done
+                self.__log("debug", line)
+        return output
+
+    def __netns_label(self, netns):
+        return "namespace %s" % netns if netns else "the root namespace"
+
+    def __log(self, level, message):
+        if self.logger is not None:
+            getattr(self.logger, level)(message)
@@ -12,6 +12,10 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+from concurrent.futures import ThreadPoolExecutor
+import asyncio
+import codecs
+import collections
 import fcntl
 import os
 import queue
@@ -22,15 +26,79 @@ import threading
 import time
 
 from . import message_item
+from .message_item import ItemOrdering
 from silk.node.base_node import BaseNode
+import silk.config.defaults as defaults
+
+READ_CHUNK_SIZE = 64 * 1024
+EXIT_POLL_INTERVAL = 0.05
+KILL_WAIT_TIMEOUT = 1
+
+
+class SystemCallOutput(object):
+    """Accumulates the output of a system call and logs each complete line as it arrives.
+
+    Bytes are decoded incrementally, so multi-byte UTF-8 characters split across reads are handled correctly.
+    """
+
+    def __init__(self, log_debug):
+        self._log_debug = log_debug
+        self._decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+        self._chunks = []
+        self._partial_line = []
+
+    def feed(self, data):
+        """Decode a chunk of raw output and log the lines it completes.
+        """
+        text = self._decoder.decode(data)
+        if not text:
+            return
+
+        self._chunks.append(text)
+
+        end = text.rfind("\n")
+        if end < 0:
+            self._partial_line.append(text)
+            return
+
+        self._partial_line.append(text[:end])
+        self.__log_lines("".join(self._partial_line))
+        self._partial_line = [text[end + 1:]]
+
+    def finish(self):
+        """Flush the decoder and log any trailing line without a newline.
+        """
+        text = self._decoder.decode(b"", True)
+        self._chunks.append(text)
+        self._partial_line.append(text)
+        self.__log_lines("".join(self._partial_line))
+        self._partial_line = []
+
+    def getvalue(self):
+        """Return all output received so far.
+        """
+        return "".join(self._chunks)
+
+    def __log_lines(self, text):
+        for line in text.split("\n"):
+            if line and not line.isspace():
+                self._log_debug("[stdout] %s" % line.rstrip())
 
 
 class MessageSystemCallItem(message_item.MessageItemBase):
     """Class to encapsulate a system call into the message queue.
     """
 
-    def __init__(self, action, cmd, expect, timeout, field, refresh=0, exact_match: bool = False):
-        super(MessageSystemCallItem, self).__init__()
+    def __init__(self,
+                 action,
+                 cmd,
+                 expect,
+                 timeout,
+                 field,
+                 refresh=0,
+                 exact_match: bool = False,
+                 ordering: ItemOrdering = ItemOrdering.SERIAL):
+        super(MessageSystemCallItem, self).__init__(ordering)
 
         self.action = action
         self.cmd = cmd
@@ -75,7 +143,28 @@ class MessageSystemCallItem(message_item.MessageItemBase):
         response = None
 
         if self.cmd is not None:
-            response = self.parent._make_system_call(self.action, self.cmd, self.timeout)
+            response = self.execute()
+        self.handle_response(response)
+
+    async def invoke_async(self, parent):
+        """Coroutine version of invoke() for managers running on an event loop.
+        """
+        self.parent = parent
+
+        if self.expect is None:
+            self.expect = ""
+
+        self.parent.log_debug("Dequeuing command \"%s\"" % self.cmd)
+
+        response = None
+
+        if self.cmd is not None:
+            response = await self.execute_async()
+        self.handle_response(response)
+
+    def handle_response(self, response):
+        """Match the command output against the expected value and store the requested fields.
+        """
         if response is None:
             self.log_response_failure()
             return
@@ -101,41 +190,109 @@ class MessageSystemCallItem(message_item.MessageItemBase):
             elif type(self.field) is list:
                 self.store_groupdict_match(match)
 
+    def execute(self):
+        """Run the command and return its output, or None if it could not be run.
+        """
+        return self.parent._make_system_call(self.action, self.cmd, self.timeout)
+
+    async def execute_async(self):
+        """Coroutine version of execute().
+        """
+        return await self.parent._make_system_call_async(self.action, self.cmd, self.timeout)
+
 
 class SystemCallManager(object):
+    """Serializes the system calls and Python functions queued for a node.
+
+    By default each manager has its own worker thread. With an event loop, queued items run as coroutines on that
+    loop instead, so many nodes can share a single thread; system calls then run as asyncio subprocesses.
+
+    Items run in the order they were queued, except that consecutive items queued as read-only (ItemOrdering.CONCURRENT)
+    run together, in groups of up to max_concurrent_calls. An error drops the items that have not started yet.
+    """
+
+    def __init__(self, event_loop=None):
+        """Start processing queued items.
+
+        Args:
+            event_loop (NodeEventLoop, optional): event loop to run queued items on. Defaults to None, which starts a
+                worker thread for this manager.
+        """
+        self.__event_loop = event_loop
+        self.max_concurrent_calls = defaults.SYSTEM_CALL_MAX_CONCURRENT
+        if event_loop is not None:
+            # Nodes initialize again on set up; items queued before must not be lost or drained twice
+            if not hasattr(self, "_SystemCallManager__pending_items"):
+                self.__event_lock = threading.Lock()
+                self.__pending_items = collections.deque()
+                self.__queue_generation = 0
+                self.__draining = False
+                self.set_all_clear(True)
+            return
 
-    def __init__(self):
-        self.__message_queue = queue.Queue()
         self.__event_lock = threading.Lock()
+        self.__message_queue = queue.Queue()
+        # Incremented whenever an error clears the queue, so that items dequeued before are dropped too
+        self.__queue_generation = 0
+        self.__concurrent_executor = None
         self.__worker_thread = threading.Thread(target=self.__worker_run, name="thread-" + self._name)
         self.__worker_thread.daemon = True
         self.__worker_thread.start()
 
-    def make_system_call_async(self, action, command, expect, timeout, field=None, exact_match: bool = False):
+    @property
+    def event_loop(self):
+        """Event loop this manager runs on, or None if it has a worker thread.
+        """
+        return getattr(self, "_SystemCallManager__event_loop", None)
+
+    def make_system_call_async(self,
+                               action,
+                               command,
+                               expect,
+                               timeout,
+                               field=None,
+                               exact_match: bool = False,
+                               read_only: bool = False):
         """Post a command, timeout, and expect value to a queue for the consumer thread.
+
+        A read_only command does not change the state of the node, so it may run concurrently with adjacent read-only
+        commands.
         """
         self.log_info("Enqueuing command \"%s\"" % command)
-        item = MessageSystemCallItem(action, command, expect, timeout, field, exact_match)
-
-        with self.__event_lock:
-            self.set_all_clear(False)
-            self.__message_queue.put_nowait(item)
-            self.log_debug("Message enqueued")
+        ordering = ItemOrdering.CONCURRENT if read_only else ItemOrdering.SERIAL
+        item = MessageSystemCallItem(action, command, expect, timeout, field, exact_match=exact_match, ordering=ordering)
+        self._enqueue_message_item(item)
 
     def make_function_call_async(self, function, *args):
         """Enqueue a Python function to be called on the worker thread.
         """
         self.log_info("Enqueueing function %s with args %s" % (function, args))
         item = message_item.MessageCallableItem(function, args)
+        self._enqueue_message_item(item)
 
+    def _enqueue_message_item(self, item):
+        """Post a message item to the queue for the consumer thread.
+        """
         with self.__event_lock:
             self.set_all_clear(False)
-            self.__message_queue.put_nowait(item)
+            if self.__event_loop is None:
+                self.__message_queue.put_nowait(item)
+            else:
+                self.__pending_items.append(item)
+                if not self.__draining:
+                    self.__draining = True
+                    self.__event_loop.call_soon(self.__start_draining)
             self.log_debug("Message enqueued")
 
     def _make_system_call(self, action, command, timeout):
         """Generic method for making a system call with timeout.
+
+        Output is read in chunks as soon as it is available and decoded incrementally. The call returns as soon as
+        the child closes its output or exits, or once the timeout expires, in which case the child is killed.
         """
+        event_loop = self.event_loop
+        if event_loop is not None:
+            return event_loop.run(self._make_system_call_async(action, command, timeout))
 
         log_line = "Making system call for %s" % action
         self.log_debug(log_line)
@@ -150,33 +307,67 @@ class SystemCallManager(object):
         flags = fcntl.fcntl(proc.stdout, fcntl.F_GETFL)
         fcntl.fcntl(proc.stdout, fcntl.F_SETFL, flags | os.O_NONBLOCK)
 
-        stdout = ""
-        curr_line = ""
+        collector = SystemCallOutput(self.log_debug)
+        read_buffer = memoryview(bytearray(READ_CHUNK_SIZE))
+
+        t_end = time.time() + timeout
+        eof = False
+        while not eof:
+            remaining = t_end - time.time()
+            if remaining <= 0:
+                try:
+                    proc.kill()
+                except OSError:
+                    pass
 
-        t_start = time.time()
-        while True:
-            if proc.poll() == 0:
                 break
 
             try:
-                # Poll proc.stdout, no write list, no exception list, timeout=1s
-                # If proc.stdout is closed, this will throw an exception
-                # select.select is portable between OS X and Ubuntu.
-                poll_list = select.select([proc.stdout], [], [], 1)
-
-                # Check the length of the read list to see if there is new data
-                if len(poll_list[0]) > 0:
-                    curr_line += proc.stdout.read(1).decode("utf-8")
-            except Exception as err:
-                print("EXCEPTION:{}".format(err))
+                # select.select is portable between OS X and Ubuntu. The poll interval only bounds how long we take to
+                # notice a child that exited while a background descendant still holds the pipe open.
+                readable = select.select([proc.stdout], [], [], min(remaining, EXIT_POLL_INTERVAL))[0]
+            except (OSError, ValueError) as err:
+                self.log_error("Failed to poll subprocess output: %s" % err)
                 break
 
-            if len(curr_line) > 0 and curr_line[-1] == "\n" and not curr_line.isspace():
-                self.log_debug("[stdout] %s" % (curr_line.rstrip()))
-                stdout += curr_line
-                curr_line = ""
+            if readable:
+                eof = self.__read_available(proc.stdout, read_buffer, collector)
+            elif proc.poll() is not None:
+                break
 
-            if time.time() - t_start > timeout:
+        if not eof:
+            self.__read_available(proc.stdout, read_buffer, collector)
+
+        proc.stdout.close()
+        collector.finish()
+        return collector.getvalue()
+
+    async def _make_system_call_async(self, action, command, timeout):
+        """Coroutine version of _make_system_call(), to run on an event loop.
+        """
+        log_line = "Making system call for %s" % action
+        self.log_debug(log_line)
+        self.log_debug(command)
+        try:
+            proc = await asyncio.create_subprocess_exec("/bin/sh",
+                                                        "-c",
+                                                        command,
+                                                        stdout=subprocess.PIPE,
+                                                        stderr=subprocess.STDOUT)
+        except Exception as error:
+            self.log_error("Failed to start subprocess: %s" % error)
+            self.log_error("\tCommand: %s" % command)
+            return None
+
+        collector = SystemCallOutput(self.log_debug)
+        loop = asyncio.get_event_loop()
+        t_end = loop.time() + timeout
+        # The read is kept across polls rather than cancelled on timeout, so that no output is lost
+        read_task = None
+        exited = False
+        while True:
+            remaining = t_end - loop.time()
+            if remaining <= 0:
                 try:
                     proc.kill()
                 except OSError:
@@ -184,29 +375,104 @@ class SystemCallManager(object):
 
                 break
 
-        try:
-            this_stdout = ""
-            while True:
-                try:
-                    new_char = proc.stdout.read(1)
-                    if not new_char:
+            if read_task is None:
+                read_task = asyncio.ensure_future(proc.stdout.read(READ_CHUNK_SIZE))
+
+            # Like select() in _make_system_call, the poll interval bounds how long we take to notice a child that
+            # exited while a background descendant still holds the pipe open
+            done, _ = await asyncio.wait([read_task], timeout=min(remaining, EXIT_POLL_INTERVAL))
+            if not done:
+                if proc.returncode is not None:
+                    # Give output written just before the exit one more poll interval to arrive
+                    if exited:
                         break
-                    this_stdout += new_char.decode("utf-8")
-                except Exception as err:
-                    print("Exception: {}".format(err))
-                    break
-            if this_stdout:
-                this_stdout = curr_line + this_stdout
-                for line in this_stdout.splitlines():
-                    self.log_debug("[stdout] %s" % (line.rstrip()))
-                stdout += this_stdout
-        except ValueError:
-            pass
-        return stdout
+                    exited = True
+                continue
+
+            try:
+                data = read_task.result()
+            except OSError as err:
+                self.log_error("Failed to read subprocess output: %s" % err)
+                break
+            finally:
+                read_task = None
+
+            if not data:
+                break
+            collector.feed(data)
+
+        if read_task is not None:
+            read_task.cancel()
+
+        if proc.returncode is None:
+            try:
+                await asyncio.wait_for(proc.wait(), KILL_WAIT_TIMEOUT)
+            except asyncio.TimeoutError:
+                self.log_error("Subprocess did not exit: %s" % command)
+        collector.finish()
+        return collector.getvalue()
+
+    def __start_draining(self):
+        asyncio.ensure_future(self.__drain_items(), loop=self.__event_loop.loop)
+
+    async def __drain_items(self):
+        """Coroutine that processes queued items in order, the event loop counterpart of the worker thread.
+        """
+        while True:
+            with self.__event_lock:
+                if not self.__pending_items:
+                    self.__draining = False
+                    self.set_all_clear(True)
+                    return
+                batch = [self.__pending_items.popleft()]
+                if batch[0].ordering is ItemOrdering.CONCURRENT:
+                    while (self.__pending_items and len(batch) < self.max_concurrent_calls
+                           and self.__pending_items[0].ordering is ItemOrdering.CONCURRENT):
+                        batch.append(self.__pending_items.popleft())
+                generation = self.__queue_generation
+
+            await asyncio.gather(*(self.__invoke_item_async(item, generation) for item in batch))
+
+    async def __invoke_item_async(self, item, generation):
+        if generation != self.__queue_generation:
+            # An error cleared the queue after the item was dequeued
+            return
+
+        item.set_delegates(self.__item_delegates())
+
+        try:
+            await item.invoke_async(self)
+        except Exception as error:
+            self.__set_error("Failed to process queued item: %r" % error)
+
+    def __read_available(self, stream, read_buffer, collector):
+        """Read everything currently available on a non-blocking stream into the collector.
+
+        Returns True if the end of the stream has been reached.
+        """
+        while True:
+            try:
+                size = stream.readinto(read_buffer)
+            except OSError as err:
+                self.log_error("Failed to read subprocess output: %s" % err)
+                return True
+
+            if size is None:
+                return False
+            if size == 0:
+                return True
+
+            collector.feed(read_buffer[:size])
 
     def __clear_message_queue(self):
         """Remove all pending messages in queue.
         """
+        with self.__event_lock:
+            self.__queue_generation += 1
+            if self.__event_loop is not None:
+                self.__pending_items.clear()
+                return
+
         try:
             while True:
                 self.__message_queue.get_nowait()
@@ -220,32 +486,73 @@ class SystemCallManager(object):
         self.post_error(msg)
         self.__clear_message_queue()
 
+    def __item_delegates(self):
+        error_handler = lambda me, error_str: me.__set_error(error_str)
+
+        return message_item.MessageItemDelegates(self, None, None, error_handler)
+
+    def __invoke_item(self, item, generation):
+        if generation != self.__queue_generation:
+            # An error cleared the queue after the item was dequeued
+            return
+
+        item.set_delegates(self.__item_delegates())
+
+        item.invoke(self)
+
+    def __invoke_concurrently(self, batch, generation):
+        """Invoke a group of concurrent items on the thread pool of this manager and wait for all of them.
+        """
+        if self.__concurrent_executor is None:
+            self.__concurrent_executor = ThreadPoolExecutor(max_workers=self.max_concurrent_calls,
+                                                            thread_name_prefix="thread-" + self._name)
+
+        list(self.__concurrent_executor.map(lambda item: self.__invoke_item(item, generation), batch))
+
     def __worker_run(self):
         """
         Consumer thread for serializing and asynchronously handling command inputs and expected returns.
-        Serialize requests to make system calls.
+        Serialize requests to make system calls, running consecutive concurrent items together.
         Make system calls using the _make_system_call method.
         """
+        # Serial item dequeued while collecting a group of concurrent items
+        next_item = None
+        generation = 0
         while True:
             self.__event_lock.acquire()
-            self.set_all_clear(self.__message_queue.empty())
+            self.set_all_clear(next_item is None and self.__message_queue.empty())
             self.__event_lock.release()
 
-            item = self.__message_queue.get()
-
-            error_handler = lambda me, error_str: me.__set_error(error_str)
-
-            delegates = message_item.MessageItemDelegates(self, None, None, error_handler)
+            if next_item is None:
+                item = self.__message_queue.get()
+                generation = self.__queue_generation
+            else:
+                item = next_item
+                next_item = None
+
+            batch = [item]
+            if item.ordering is ItemOrdering.CONCURRENT:
+                while len(batch) < self.max_concurrent_calls:
+                    try:
+                        queued_item = self.__message_queue.get_nowait()
+                    except queue.Empty:
+                        break
 
-            item.set_delegates(delegates)
+                    if queued_item.ordering is not ItemOrdering.CONCURRENT:
+                        next_item = queued_item
+                        break
+                    batch.append(queued_item)
 
-            item.invoke(self)
+            if len(batch) == 1:
+                self.__invoke_item(item, generation)
+            else:
+                self.__invoke_concurrently(batch, generation)
 
 
 class TemporarySystemCallManager(SystemCallManager, BaseNode):
     """Class that can be used to make simple system calls with timeouts and logging functionality.
     """
 
-    def __init__(self, name="TemporarySystemCallManager"):
+    def __init__(self, name="TemporarySystemCallManager", event_loop=None):
         BaseNode.__init__(self, name)
-        SystemCallManager.__init__(self)
+        SystemCallManager.__init__(self, event_loop)
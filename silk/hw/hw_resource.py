@@ -56,6 +56,12 @@ class HwResource(object):
         self._cluster_id = 1
         self._virtual = virtual
 
+    @property
+    def config_filename(self):
+        """Path of the hardware config file.
+        """
+        return self._filename
+
     def load_config(self):
         """Returns a Config object from a given INI file.
         """
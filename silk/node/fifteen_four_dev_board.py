@@ -15,23 +15,32 @@
 import datetime
 import logging
 import os
-import re
+import shlex
+import threading
 import time
 import traceback
 
 from silk.config import wpan_constants as wpan
+from silk.device.message_item import ItemOrdering
 from silk.device.netns_base import create_link_pair
 from silk.device.netns_base import NetnsController
 from silk.device.netns_base import StandaloneNetworkNamespace
+from silk.node.wpanctl_session import MessageWpanctlCallItem
+from silk.node.wpanctl_session import WpanctlSession
+from silk.node.wpanctl_session import WpanctlSessionError
+from silk.node.wpantund_base import is_read_only_command
 from silk.node.wpantund_base import role_is_thread
 from silk.node.wpantund_base import WpantundWpanNode
+from silk.node.wpantund_dbus import WpantundDbusClient
 from silk.postprocessing import ip as silk_ip
 from silk.tools import wpan_table_parser
-from silk.utils import signal, subprocess_runner
+from silk.utils import signal, subprocess_runner, wpantund_log
 from silk.utils.directorypath import DirectoryPath
+from silk.utils.event_loop import shared_event_loop
 from silk.utils.jsonfile import JsonFile
 from silk.utils.network import get_local_ip
 from silk.utils.process import Process
+from silk.utils.wpantund_log import LogEventType
 import silk.config.defaults as defaults
 import silk.hw.hw_module as hw_module
 import silk.hw.hw_resource as hw_resource
@@ -39,50 +48,116 @@ import silk.hw.hw_resource as hw_resource
 LOG_PATH = "/opt/openthread_test/results/"
 POSIX_PATH = "/opt/openthread_test/posix"
 RETRY = 3
+# Separates the outputs of the commands in a wpanctl batch
+WPANCTL_BATCH_MARKER = "--silk-wpanctl-batch--"
+# Seconds between address queries when waiting for an address without netlink notifications
+ADDRESS_POLL_INTERVAL = 1
 
 
 class WpantundMonitor(signal.Subscriber):
     """Class for logging wpantund output and reacting to state changes.
+
+    State changes are also signalled through events, so that callers can block until wpantund is ready instead of
+    polling the flags:
+        ready: set when the NCP finished initializing.
+        fault: set when wpantund reports an `uninitialized:fault` state.
+        crash: set when wpantund reports a fatal error.
+
+    The state and node type changes are also fed to `property_cache`, if set, which is invalidated on NCP resets.
+
+    Without a logger attached, the monitor only receives the lines that affect its state.
     """
 
     running = False
     crashed = False
     state = None
-    logger = None
+
+    line_keywords = wpantund_log.MONITOR_KEYWORDS
+    batch_lines = True
 
     framing_errors = 0
 
-    state_regex = re.compile(r"State change: \"(?P<old_state>[.]+)\" -> \"(?P<new_state>[.]+)\"")
+    property_cache = None
+
+    def __init__(self, publisher=None, source_name=None):
+        self._condition = threading.Condition()
+        self.ready = threading.Event()
+        self.fault = threading.Event()
+        self.crash = threading.Event()
+        self._logger = None
+        super().__init__(publisher, source_name)
+
+    @property
+    def logger(self):
+        """Logger for every wpantund output line, or None.
+        """
+        return self._logger
+
+    @logger.setter
+    def logger(self, value):
+        self._logger = value
+        # Every line has to be delivered to be logged
+        self.set_line_filter(None if value is not None else signal.keyword_filter(self.line_keywords))
 
     def log_debug(self, line):
         if self.logger is not None:
             self.logger.debug(line)
 
     def subscribe_handle(self, sender, **kwargs):
-        # Unconditionally log incoming line
-        line = kwargs["line"]
-        self.log_debug(line)
+        lines = kwargs["lines"]
+        # Unconditionally log incoming lines
+        for line in lines:
+            self.log_debug(line)
 
-        # Check to see if there has been a state transition
-        match = self.state_regex.search(line)
-        if match is not None:
-            self.state = match.group("new_state")
+        with self._condition:
+            for line in lines:
+                self.__handle_line(line)
+            self._condition.notify_all()
 
-            if self.state == "uninitialized:fault":
-                self.running = False
+    def wait_for_start(self, timeout: float) -> bool:
+        """Block until wpantund is running, has crashed, or `timeout` seconds passed.
+
+        An `uninitialized:fault` state does not end the wait: wpantund resets the NCP and may still finish
+        initializing before the deadline.
+
+        Args:
+            timeout (float): maximum time to wait in seconds.
+
+        Returns:
+            bool: True if wpantund is running.
+        """
+        with self._condition:
+            self._condition.wait_for(lambda: self.running or self.crash.is_set(), timeout)
+            return self.running
 
+    def __handle_line(self, line):
+        event = wpantund_log.classify(line)
+        if event is None:
             return
 
-        # Check if wpantund has crashed
-        if "FATAL ERROR" in line:
+        if self.property_cache is not None:
+            self.property_cache.handle_event(event)
+
+        if event.type is LogEventType.STATE_CHANGE:
+            self.state = event.value
+
+            if self.state == "uninitialized:fault":
+                self.running = False
+                self.ready.clear()
+                self.fault.set()
+
+        elif event.type is LogEventType.FATAL_ERROR:
             self.crashed = True
             self.running = False
-            return
+            self.ready.clear()
+            self.crash.set()
 
-        if "Finished initializing NCP" in line:
+        elif event.type is LogEventType.NCP_INITIALIZED:
             self.running = True
+            self.fault.clear()
+            self.ready.set()
 
-        if "Framing error" in line:
+        elif event.type is LogEventType.FRAMING_ERROR:
             self.framing_errors += 1
 
 
@@ -99,7 +174,10 @@ class FifteenFourDevBoardNode(WpantundWpanNode, NetnsController):
                  virtual=False,
                  virtual_name="",
                  device=None,
-                 device_path=None):
+                 device_path=None,
+                 persistent_wpanctl=None,
+                 dbus_backend=None,
+                 use_event_loop=None):
         self.logger = None
         self.wpantund_logger = None
         self.netns = None
@@ -109,7 +187,23 @@ class FifteenFourDevBoardNode(WpantundWpanNode, NetnsController):
         self.sw_version = sw_version
         self.virtual_eth_peer = "v-eth1"
         self.flash_result = False
+        # Seconds to let the board settle after erasing and after flashing
+        self.flash_erase_settle_time = 2
+        self.flash_settle_time = 5
         self.otns_manager = None
+        self.wpanctl_session = None
+
+        if persistent_wpanctl is None:
+            persistent_wpanctl = defaults.WPANCTL_PERSISTENT_SESSION
+        self.persistent_wpanctl = persistent_wpanctl
+
+        if dbus_backend is None:
+            dbus_backend = defaults.WPANTUND_DBUS_BACKEND
+        self.dbus_backend = dbus_backend
+
+        if use_event_loop is None:
+            use_event_loop = defaults.NODE_EVENT_LOOP
+        self.use_event_loop = use_event_loop
 
         self.wpantund_verbose_debug = wpantund_verbose_debug
         self.thread_mode = "NCP"
@@ -149,7 +243,12 @@ class FifteenFourDevBoardNode(WpantundWpanNode, NetnsController):
             self.log_info(f"Device Path: {self.device_path}")
 
             # Setup netns
-            NetnsController.__init__(self, self.netns, self.device_path)
+            NetnsController.__init__(self, self.netns, self.device_path, self.__node_event_loop())
+
+    def __node_event_loop(self):
+        """Event loop for the system calls and wpantund output of this node, or None to use threads.
+        """
+        return shared_event_loop() if self.use_event_loop else None
 
 #################################
 #   Logging functions
@@ -207,12 +306,18 @@ class FifteenFourDevBoardNode(WpantundWpanNode, NetnsController):
             self.__start_wpantund(self.thread_mode)
             time.sleep(5)
 
+            if self.persistent_wpanctl:
+                self.__start_wpanctl_session()
+
+            if self.dbus_backend:
+                self.__start_dbus_client()
+
             self.wpanctl_async("setup", "getprop NCP:HardwareAddress", "[0-9a-fA-F]{16}", 1, self.wpan_mac_addr_label)
         except (RuntimeError, ValueError) as e:
             self.logger.critical(e.message)
             self.logger.debug(f"Cannot start wpantund on {self.netns}")
 
-        NetnsController.__init__(self, self.netns, self.device_path)
+        NetnsController.__init__(self, self.netns, self.device_path, self.__node_event_loop())
 
         self.thread_interface = self.netns
         self.legacy_interface = self.netns + "-L"
@@ -268,19 +373,100 @@ class FifteenFourDevBoardNode(WpantundWpanNode, NetnsController):
     def wpanctl_async(self, action, command, expect, timeout, field=None):
         """Queue a system call into wpanctl inside the network namespace.
         """
+        self._invalidate_on_command(command)
+        # Read-only commands, e.g. the getprops of _get_addr, may run concurrently
+        read_only = is_read_only_command(command)
+
+        if self.wpanctl_session is not None:
+            self.log_info("Enqueuing wpanctl command \"%s\"" % command)
+            ordering = ItemOrdering.CONCURRENT if read_only else ItemOrdering.SERIAL
+            self._enqueue_message_item(MessageWpanctlCallItem(action, command, expect, timeout, field,
+                                                              ordering=ordering))
+            return
+
         wpanctl_command = defaults.WPANCTL_PATH + f" -I {self.netns} "
         wpanctl_command += command
-        self.make_netns_call_async(wpanctl_command, expect, timeout, field)
+        self.make_netns_call_async(wpanctl_command, expect, timeout, field, read_only=read_only)
 
     def wpanctl(self, action, command, timeout):
         """Make a system call into wpanctl inside the network namespace.
         Return the response
         """
+        self._invalidate_on_command(command)
+
+        if self.wpanctl_session is not None:
+            try:
+                output = self.wpanctl_session.execute(command, timeout)
+            except WpanctlSessionError as error:
+                # the command may already have changed the wpantund state, so only queries are run again
+                if not is_read_only_command(command):
+                    self.log_warning("%s, not running it again" % error)
+                    return error.output
+                self.log_warning("%s, running it again as a separate process" % error)
+            else:
+                if output is not None:
+                    for line in output.splitlines():
+                        if line and not line.isspace():
+                            self.log_debug("[stdout] %s" % line.rstrip())
+                    return output
+                self.log_warning("wpanctl session unavailable, running \"%s\" as a separate process" % command)
+
         wpanctl_command = defaults.WPANCTL_PATH + f" -I {self.netns} "
         wpanctl_command += command
         output = self.make_netns_call(wpanctl_command, timeout)
         return output
 
+    def wpanctl_batch(self, action, commands, timeout):
+        """Run several wpanctl commands in one round trip and return their outputs in order.
+
+        With a persistent session the commands are pipelined to it. Otherwise they run from a single shell inside the
+        network namespace, with a marker line between outputs, so the sudo and namespace setup is paid once.
+        """
+        if self.wpanctl_session is not None or not commands:
+            return super().wpanctl_batch(action, commands, timeout)
+
+        for command in commands:
+            self._invalidate_on_command(command)
+
+        wpanctl_command = defaults.WPANCTL_PATH + f" -I {self.netns} "
+        script = "; ".join(f"echo {WPANCTL_BATCH_MARKER}; {wpanctl_command}{command}" for command in commands)
+        output = self.make_netns_call("sh -c " + shlex.quote(script), timeout * len(commands))
+
+        outputs = [part.lstrip("\n") for part in output.split(WPANCTL_BATCH_MARKER)[1:]]
+        outputs += [""] * (len(commands) - len(outputs))
+        return outputs
+
+    def __start_wpanctl_session(self):
+        """Start a persistent interactive wpanctl process inside the network namespace.
+        """
+        command = self.construct_netns_command(defaults.WPANCTL_PATH + f" -I {self.netns}")
+        self.wpanctl_session = WpanctlSession(command, logger=self.logger)
+        if not self.wpanctl_session.start():
+            self.log_warning("Failed to start wpanctl session, it will be retried on the next command")
+
+    def __stop_wpanctl_session(self):
+        """Stop the persistent wpanctl process, if any.
+        """
+        if self.wpanctl_session is not None:
+            self.wpanctl_session.close()
+            self.wpanctl_session = None
+
+    def __start_dbus_client(self):
+        """Connect to wpantund over D-Bus for property access.
+        """
+        try:
+            self.dbus_client = WpantundDbusClient(self.netns)
+        except RuntimeError as error:
+            self.log_warning(f"D-Bus backend unavailable, using wpanctl: {error}")
+            self.dbus_client = None
+
+    def __stop_dbus_client(self):
+        """Close the D-Bus connection, if any.
+        """
+        if self.dbus_client is not None:
+            self.dbus_client.close()
+            self.dbus_client = None
+
     def __start_wpantund(self, thread_mode="NCP"):
         """Start wpantund inside a network namespace.
         """
@@ -313,13 +499,17 @@ class FifteenFourDevBoardNode(WpantundWpanNode, NetnsController):
         self.log_info("Starting wpantund with command %s" % command)
 
         try:
-            self.wpantund_process = subprocess_runner.SubprocessRunner(command)
+            if self.event_loop is not None:
+                self.wpantund_process = subprocess_runner.AsyncSubprocessRunner(command, self.event_loop)
+            else:
+                self.wpantund_process = subprocess_runner.SubprocessRunner(command)
 
         except Exception:
             print(traceback.format_exc())
 
         # Install signal listeners here
         self.wpantund_monitor = WpantundMonitor(publisher=self.wpantund_process)
+        self.wpantund_monitor.property_cache = self.property_cache
 
         if self.otns_manager is not None:
             self.otns_manager.subscribe_to_node(self)
@@ -329,11 +519,7 @@ class FifteenFourDevBoardNode(WpantundWpanNode, NetnsController):
 
         self.wpantund_process.start()
 
-        start_time = time.time()
-        while (time.time() - start_time) < self.wpantund_start_time:
-            if self.wpantund_monitor.running:
-                break
-        else:
+        if not self.wpantund_monitor.wait_for_start(self.wpantund_start_time):
             self.log_error("wpantund failed to start.")
             self.__stop_wpantund()
             raise RuntimeError(f"Not able to start wpantund on {self.device.name()}")
@@ -344,6 +530,9 @@ class FifteenFourDevBoardNode(WpantundWpanNode, NetnsController):
         """
         self.log_info("Stopping wpantund")
 
+        self.__stop_wpanctl_session()
+        self.__stop_dbus_client()
+
         if self.wpantund_process is not None:
             self.wpantund_process.stop(1)
 
@@ -356,6 +545,11 @@ class FifteenFourDevBoardNode(WpantundWpanNode, NetnsController):
         netns_if = veth_name + "-netns-if"
         self.virtual_eth_peer = veth_name
 
+        if self.pending_topology is not None:
+            # Created directly inside the namespace and brought up, in bulk with the rest of the topology
+            self.pending_topology.add_link_pair(self.virtual_eth_peer, netns_if, peer_netns=self.netns)
+            return self.virtual_eth_peer
+
         # Create network namespace virtual link
         output = create_link_pair(self.virtual_eth_peer, netns_if)
 
@@ -437,7 +631,7 @@ class FifteenFourDevBoardNode(WpantundWpanNode, NetnsController):
         if not self.__verify_image_flash(log):
             flash_rel = False
 
-        time.sleep(2)
+        time.sleep(self.flash_erase_settle_time)
 
         cmd = shell_path + f"nrfjprog.sh --flash {fw_file} {serial_number}"
         self.logger.debug(cmd)
@@ -453,7 +647,7 @@ class FifteenFourDevBoardNode(WpantundWpanNode, NetnsController):
         if result_log_path:
             self.__write_to_log(result_log_path, "nrf52840_flash.log", ret)
 
-        time.sleep(5)
+        time.sleep(self.flash_settle_time)
 
         self.flash_result = flash_rel
 
@@ -476,7 +670,7 @@ class FifteenFourDevBoardNode(WpantundWpanNode, NetnsController):
         if result_log_path:
             self.__write_to_log(result_log_path, "efr32_flash.log", log)
 
-        time.sleep(5)
+        time.sleep(self.flash_settle_time)
 
         self.flash_result = flash_rel
 
@@ -490,43 +684,71 @@ class FifteenFourDevBoardNode(WpantundWpanNode, NetnsController):
 
     def __write_to_log(self, file_path, filename, data):
         if not os.path.exists(file_path):
-            os.mkdir(file_path)
+            os.makedirs(file_path, exist_ok=True)
 
         with open(os.path.join(file_path, filename), "w") as fn:
             fn.write(data)
 
-    def firmware_update(self, fw_file):
-        """
-        1. Bring down wpantund and all other processes in the netns
-        2. Upgrading firmware
-        """
-        self.log_info("Firmware file:{}".format(fw_file))
+    def flash_firmware(self, fw_file, result_log_path=None):
+        """Flash `fw_file` onto the board and verify the result. Blocks until flashing is done.
+
+        Args:
+            fw_file (str): firmware image path. The image name selects the flashing script.
+            result_log_path (str, optional): directory for the flashing log. Defaults to a new dated directory
+                under LOG_PATH.
+
+        Raises:
+            ValueError: if the firmware image is not supported.
 
-        def do_flash_nrf52840(delegates):
+        Returns:
+            bool: True if the image was flashed and verified.
+        """
+        if result_log_path is None:
             date_string = datetime.datetime.now().strftime("%b%d%Y_%H_%M_%S")
             result_log_path = LOG_PATH + date_string
 
-            jlink_serial_number = self.device.get_dut_serial()
-            self.log_info(jlink_serial_number)
+        jlink_serial_number = self.device.get_dut_serial()
+        self.log_info(jlink_serial_number)
 
+        if "nrf52840" in fw_file:
             return self.image_flash_nrf52840(jlink_serial_number, fw_file, result_log_path)
+        elif "efr32" in fw_file:
+            return self.image_flash_efr32(jlink_serial_number, fw_file, result_log_path)
+        raise ValueError("Silk does not support the image flashing for {}".format(fw_file))
 
-        def do_flash_efr32(delegates):
-            date_string = datetime.datetime.now().strftime("%b%d%Y_%H_%M_%S")
-            result_log_path = LOG_PATH + date_string
+    def restart_wpantund(self):
+        """Restart wpantund in the network namespace, e.g. after the NCP was flashed with wpantund stopped.
 
-            jlink_serial_number = self.device.get_dut_serial()
-            self.log_info(jlink_serial_number)
+        Properties read from the previous wpantund are discarded.
 
-            return self.image_flash_efr32(jlink_serial_number, fw_file, result_log_path)
+        Raises:
+            RuntimeError: if wpantund does not start.
+        """
+        self.__stop_wpantund()
+        self.invalidate_properties()
+        self.__start_wpantund(self.thread_mode)
+
+        if self.persistent_wpanctl:
+            self.__start_wpanctl_session()
+
+        if self.dbus_backend:
+            self.__start_dbus_client()
+
+    def firmware_update(self, fw_file):
+        """
+        1. Bring down wpantund and all other processes in the netns
+        2. Upgrading firmware
+        """
+        self.log_info("Firmware file:{}".format(fw_file))
+
+        def do_flash(delegates):
+            return self.flash_firmware(fw_file)
 
         for process in self.netns_pids():
             self.make_system_call_async("firmware-update", "kill -SIGINT %s" % process, None, 1)
 
-        if "nrf52840" in fw_file:
-            self.make_function_call_async(do_flash_nrf52840)
-        elif "efr32" in fw_file:
-            self.make_function_call_async(do_flash_efr32)
+        if "nrf52840" in fw_file or "efr32" in fw_file:
+            self.make_function_call_async(do_flash)
         else:
             self.log_critical("Silk does not support the image flashing for {}".format(fw_file))
 
@@ -534,6 +756,21 @@ class FifteenFourDevBoardNode(WpantundWpanNode, NetnsController):
     def framing_errors(self):
         return self.wpantund_monitor.framing_errors
 
+    def subscribe_state_changes(self, handle):
+        """Call `handle` whenever a command may have changed the node state or wpantund logs a state change.
+        """
+        super().subscribe_state_changes(handle)
+        if self.wpantund_process is not None:
+            self.wpantund_process.subscribe(handle,
+                                            line_filter=signal.keyword_filter(wpantund_log.STATE_CHANGE_KEYWORDS),
+                                            weak=False,
+                                            batch=True)
+
+    def unsubscribe_state_changes(self, handle):
+        super().unsubscribe_state_changes(handle)
+        if self.wpantund_process is not None:
+            self.wpantund_process.unsubscribe(handle)
+
 
 #################################
 #  Ipv6 methods
@@ -545,19 +782,48 @@ class FifteenFourDevBoardNode(WpantundWpanNode, NetnsController):
         Returns a string containing the IPv6 address matching the prefix or
         empty string if no address found.
         """
+        if self.netlink is not None:
+            try:
+                matched_addr = self.netlink.find_addresses(prefix, self.thread_interface)
+                return matched_addr[0] if len(matched_addr) >= 1 else ""
+            except OSError as error:
+                self.log_warning(f"Netlink address query failed, falling back to wpanctl: {error}")
+
         if len(prefix) > 2 and prefix[-1] == ":" and prefix[-2] == ":":
             prefix = prefix[:-1]
         all_addrs = wpan_table_parser.parse_list(self.get(wpan.WPAN_IP6_ALL_ADDRESSES))
         matched_addr = [addr for addr in all_addrs if addr.startswith(prefix)]
         return matched_addr[0] if len(matched_addr) >= 1 else ""
 
+    def wait_for_ip6_address_with_prefix(self, prefix, timeout):
+        """Wait for an IPv6 address matching a given prefix to be assigned to the node.
+        With netlink queries, this waits for the kernel's address notification instead of polling.
+        Returns a string containing the IPv6 address or empty string if none was assigned within
+        `timeout` seconds.
+        """
+        if self.netlink is not None:
+            try:
+                return self.netlink.wait_for_address(prefix, timeout, self.thread_interface)
+            except OSError as error:
+                self.log_warning(f"Netlink address notifications failed, falling back to polling: {error}")
+
+        t_end = time.time() + timeout
+        while True:
+            address = self.find_ip6_address_with_prefix(prefix)
+            if address or time.time() >= t_end:
+                return address
+            time.sleep(ADDRESS_POLL_INTERVAL)
+
     def add_ip6_address_on_interface(self, address, prefix_len=64):
         """Adds an IPv6 interface on the network interface.
         `address` should be string containing the IPv6 address.
         `prefix_len` is an `int` specifying the prefix length.
-        NOTE: this method uses linux `ip` command.
+        NOTE: this method uses linux `ip` command, or netlink if enabled.
         """
         interface = self.thread_interface
+        if self.netlink is not None:
+            return self.__update_netlink_address(self.netlink.add_address, f"{address}/{prefix_len}")
+
         cmd = f"ip -6 address add {address}/{prefix_len} dev {interface}"
         result = self.make_netns_call(cmd, 15)
 
@@ -567,14 +833,27 @@ class FifteenFourDevBoardNode(WpantundWpanNode, NetnsController):
         """Removes an IPv6 interface on the network interface.
         `address` should be string containing the IPv6 address.
         `prefix_len` is an `int` specifying the prefix length.
-        NOTE: this method uses linux `ip` command.
+        NOTE: this method uses linux `ip` command, or netlink if enabled.
         """
         interface = self.thread_interface
+        if self.netlink is not None:
+            return self.__update_netlink_address(self.netlink.delete_address, f"{address}/{prefix_len}")
+
         cmd = f"ip -6 address del {address}/{prefix_len} dev {interface}"
         result = self.make_netns_call(cmd, 15)
 
         return result
 
+    def __update_netlink_address(self, update, address):
+        """Add or delete an address over netlink.
+        Returns an empty string on success or the error, like the output of the `ip` command.
+        """
+        try:
+            update(self.thread_interface, address)
+        except OSError as error:
+            return f"RTNETLINK answers: {error.strerror or error}\n"
+        return ""
+
 
 class FifteenFourDevBoardThreadNode(FifteenFourDevBoardNode):
     """
@@ -0,0 +1,180 @@
+# Copyright 2020 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Persistent interactive wpanctl session.
+
+Instead of spawning `sudo ip netns exec <netns> wpanctl -I <netns> <command>` for every query, a node can keep a
+single interactive wpanctl process alive inside its network namespace and pipeline commands to it. Responses are
+framed by the interactive prompt that wpanctl prints once it is ready for the next command.
+"""
+
+import asyncio
+import re
+import threading
+
+import pexpect
+
+from silk.device.system_call_manager import MessageSystemCallItem
+
+PROMPT_REGEX = r"wpanctl:[^\s>]*> "
+
+
+class WpanctlSessionError(Exception):
+    """A command was written to the session but no prompt followed it.
+
+    The command may have run in wpantund, so it must not be blindly retried.
+    """
+
+    def __init__(self, command: str, reason: str, output: str):
+        self.command = command
+        self.reason = reason
+        self.output = output
+
+    def __str__(self):
+        return "wpanctl session failed on \"{0}\": {1}".format(self.command, self.reason)
+
+
+class WpanctlSession(object):
+    """A long-lived interactive wpanctl process.
+
+    Commands are serialized: each one is written to the process and its output is collected up to the next prompt.
+    If the process dies or a command times out the session is closed, and restarted on the next command.
+
+    Attributes:
+        command (str): shell command that starts interactive wpanctl.
+        prompt_regex (str): regular expression matching the interactive prompt.
+        logger (logging.Logger): logger for the session.
+    """
+
+    def __init__(self, command: str, prompt_regex: str = PROMPT_REGEX, start_timeout: float = 5, logger=None):
+        """Initialize a wpanctl session. The process is started on the first command.
+
+        Args:
+            command (str): shell command that starts interactive wpanctl.
+            prompt_regex (str, optional): regular expression matching the interactive prompt.
+                Defaults to PROMPT_REGEX.
+            start_timeout (float, optional): seconds to wait for the first prompt. Defaults to 5.
+            logger (logging.Logger, optional): logger for the session. Defaults to None.
+        """
+        self.command = command
+        self.prompt_regex = prompt_regex
+        self.start_timeout = start_timeout
+        self.logger = logger
+
+        self._process = None
+        self._lock = threading.Lock()
+
+    def log_debug(self, line: str):
+        if self.logger is not None:
+            self.logger.debug(line)
+
+    @property
+    def alive(self) -> bool:
+        """Whether the wpanctl process is running.
+        """
+        return self._process is not None and self._process.isalive()
+
+    def start(self) -> bool:
+        """Start the wpanctl process and wait for its first prompt.
+
+        Returns:
+            bool: True if the session is ready for commands.
+        """
+        with self._lock:
+            return self.__start()
+
+    def execute(self, command: str, timeout: float):
+        """Run a wpanctl command in the session.
+
+        Args:
+            command (str): wpanctl command, without the `wpanctl -I <interface>` prefix.
+            timeout (float): seconds to wait for the response.
+
+        Returns:
+            str: the command output, or None if the session could not be started and the command was not sent.
+
+        Raises:
+            WpanctlSessionError: if the command was sent but the session failed before its response completed.
+        """
+        with self._lock:
+            if not self.alive and not self.__start():
+                return None
+
+            self.log_debug("[session] %s" % command)
+            try:
+                self._process.sendline(command)
+                self._process.expect(self.prompt_regex, timeout=timeout)
+            except (pexpect.TIMEOUT, pexpect.EOF, OSError) as error:
+                # pexpect only updates `before` when expect() gives up, not when writing the command fails
+                output = "" if isinstance(error, OSError) else self.__strip_echo(command, self._process.before or "")
+                session_error = WpanctlSessionError(command, type(error).__name__, output)
+                self.log_debug(str(session_error))
+                self.__close()
+                raise session_error
+
+            return self.__strip_echo(command, self._process.before)
+
+    def close(self):
+        """Terminate the wpanctl process.
+        """
+        with self._lock:
+            self.__close()
+
+    def __start(self) -> bool:
+        self.__close()
+
+        self.log_debug("Starting wpanctl session: %s" % self.command)
+        try:
+            self._process = pexpect.spawn("/bin/sh", ["-c", self.command], encoding="utf-8", codec_errors="replace")
+            # pexpect sleeps before every send by default, which would dominate the per-command latency
+            self._process.delaybeforesend = None
+            self._process.expect(self.prompt_regex, timeout=self.start_timeout)
+        except (pexpect.TIMEOUT, pexpect.EOF, pexpect.ExceptionPexpect, OSError) as error:
+            self.log_debug("Failed to start wpanctl session: %s" % type(error).__name__)
+            self.__close()
+            return False
+
+        return True
+
+    def __close(self):
+        if self._process is not None:
+            try:
+                self._process.close(force=True)
+            except (pexpect.ExceptionPexpect, OSError):
+                pass
+            self._process = None
+
+    @staticmethod
+    def __strip_echo(command: str, output: str) -> str:
+        """Normalize terminal line endings and remove the echoed command line.
+        """
+        output = output.replace("\r\n", "\n")
+        first_line, separator, rest = output.partition("\n")
+        if re.sub(r"\s+", " ", first_line).strip() == re.sub(r"\s+", " ", command).strip():
+            return rest
+        return output
+
+
+class MessageWpanctlCallItem(MessageSystemCallItem):
+    """Queued wpanctl command that runs through the node's wpanctl() method.
+
+    This lets the node decide on the worker thread whether the command is sent to a persistent session or run as a
+    separate process.
+    """
+
+    def execute(self):
+        return self.parent.wpanctl(self.action, self.cmd, self.timeout)
+
+    async def execute_async(self):
+        # A persistent session blocks while waiting for its prompt
+        return await asyncio.get_event_loop().run_in_executor(None, self.execute)
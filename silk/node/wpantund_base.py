@@ -13,10 +13,28 @@
 # limitations under the License.
 
 import random
+import threading
+import time
 
 import silk.hw.hw_resource
 from silk.config import wpan_constants as wpan
 from silk.node import wpan_node
+from silk.node.wpantund_dbus import WpantundDbusError
+from silk.tools import wpan_table_parser
+from silk.utils import signal
+from silk.utils.wpantund_log import LogEventType
+import silk.config.defaults as defaults
+
+
+# wpanctl commands that only read state and therefore do not invalidate property snapshots
+READ_ONLY_WPANCTL_COMMANDS = frozenset(["get", "getprop", "status"])
+
+
+def is_read_only_command(command):
+    """Check whether a wpanctl command leaves the wpantund state unchanged.
+    """
+    words = command.split()
+    return bool(words) and words[0] in READ_ONLY_WPANCTL_COMMANDS
 
 
 def role_is_thread(role):
@@ -25,6 +43,149 @@ def role_is_thread(role):
     return role in [2, 3, 4]
 
 
+class PropertySnapshot(object):
+    """Short-lived view of a set of node properties fetched in one round trip.
+
+    A snapshot is stale once it is older than `max_age` seconds or once the node ran a command that may change its
+    state. Reading a property from a stale snapshot fetches all properties again.
+
+    Attributes:
+        node (WpantundWpanNode): node the properties belong to.
+        prop_names (list): names of the properties in the snapshot.
+        max_age (float): seconds after which the snapshot is stale.
+    """
+
+    DEFAULT_MAX_AGE = 1.0
+
+    def __init__(self, node, prop_names, max_age=DEFAULT_MAX_AGE):
+        self.node = node
+        self.prop_names = list(prop_names)
+        self.max_age = max_age
+        self._values = {}
+        self._timestamp = None
+        self._generation = None
+        self.refresh()
+
+    @property
+    def valid(self):
+        """Whether the snapshot still reflects the node state.
+        """
+        return (self._timestamp is not None and time.time() - self._timestamp <= self.max_age and
+                self._generation == self.node.property_generation)
+
+    def refresh(self):
+        """Fetch all properties of the snapshot from the node.
+        """
+        self._generation = self.node.property_generation
+        self._values = self.node.get_many(self.prop_names)
+        self._timestamp = time.time()
+
+    def invalidate(self):
+        """Force the next read to fetch the properties again.
+        """
+        self._timestamp = None
+
+    def get(self, prop_name):
+        """Get a property value, as returned by the node's get().
+        """
+        if prop_name not in self.prop_names:
+            self.prop_names.append(prop_name)
+            self._timestamp = None
+        if not self.valid:
+            self.refresh()
+        return self._values[prop_name]
+
+    def __getitem__(self, prop_name):
+        return self.get(prop_name)
+
+
+class PropertyCache(object):
+    """Per-node cache of wpantund property values, kept fresh by wpantund log events.
+
+    Values of CACHED_PROPERTIES read from wpantund are served from memory for up to `max_age` seconds. wpantund log
+    events update the properties they report, e.g. "State change" lines set WPAN_STATE, and drop the other values that
+    may have changed along. Commands that may change the node state drop all values.
+
+    Attributes:
+        max_age (float): seconds a value is served from memory, 0 to disable the cache.
+        hits (int): number of reads served from memory, each sparing a wpanctl call.
+        misses (int): number of reads of CACHED_PROPERTIES that went to wpantund.
+    """
+
+    # Properties that only change along with a command or a log event seen by the cache
+    CACHED_PROPERTIES = frozenset([
+        wpan.WPAN_STATE, wpan.WPAN_NODE_TYPE, wpan.WPAN_NAME, wpan.WPAN_PANID, wpan.WPAN_XPANID, wpan.WPAN_CHANNEL,
+        wpan.WPAN_HW_ADDRESS, wpan.WPAN_EXT_ADDRESS, wpan.WPAN_NCP_VERSION, wpan.WPAN_IP6_MESH_LOCAL_PREFIX,
+        wpan.WPAN_IP6_MESH_LOCAL_ADDRESS, wpan.WPAN_IP6_LINK_LOCAL_ADDRESS, wpan.WPAN_THREAD_RLOC16
+    ])
+
+    def __init__(self, max_age: float = 0):
+        self.max_age = max_age
+        self.hits = 0
+        self.misses = 0
+        self._values = {}
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_age > 0
+
+    def get(self, prop_name: str):
+        """Get a fresh cached value, as returned by the node's get(), or None.
+        """
+        if not self.enabled or prop_name not in self.CACHED_PROPERTIES:
+            return None
+
+        with self._lock:
+            entry = self._values.get(prop_name)
+            if entry is not None and time.time() - entry[1] <= self.max_age:
+                self.hits += 1
+                return entry[0]
+            self.misses += 1
+            return None
+
+    def put(self, prop_name: str, value: str):
+        """Store a value read from wpantund, unless the property is not cached or the read failed.
+        """
+        if not self.enabled or prop_name not in self.CACHED_PROPERTIES or not value:
+            return
+        lowered = value.lower()
+        if "error" in lowered or "failed" in lowered:
+            return
+
+        with self._lock:
+            self._values[prop_name] = (value, time.time())
+
+    def invalidate(self):
+        """Drop all cached values.
+        """
+        with self._lock:
+            self._values.clear()
+
+    def handle_event(self, event):
+        """Update the cache from a classified wpantund log event.
+
+        Args:
+            event (LogEvent): the event, see silk.utils.wpantund_log.
+        """
+        if event.type is LogEventType.STATE_CHANGE:
+            self.__replace({wpan.WPAN_STATE: "\"%s\"" % event.value})
+        elif event.type is LogEventType.NODE_TYPE_CHANGE:
+            # The NCP state is unaffected, the addresses and RLOC16 of the node change with its type
+            self.__replace({wpan.WPAN_NODE_TYPE: "\"%s\"" % event.value}, keep=(wpan.WPAN_STATE,))
+        elif event.type in (LogEventType.NCP_RESET, LogEventType.NCP_INITIALIZED, LogEventType.FATAL_ERROR):
+            self.invalidate()
+
+    def __replace(self, values, keep=()):
+        """Drop all cached values but those in `keep`, then store `values`.
+        """
+        now = time.time()
+        with self._lock:
+            kept = {prop_name: self._values[prop_name] for prop_name in keep if prop_name in self._values}
+            self._values = kept
+            self._values.update((prop_name, (value, now)) for prop_name, value in values.items())
+
+
 class WpantundWpanNode(wpan_node.WpanNode):
     """
     This is the base class for controlling interactions with wpantund. This should provide a flexible overlay that
@@ -50,6 +211,18 @@ class WpantundWpanNode(wpan_node.WpanNode):
     _ip6_thread_ula_regex = "[fF][dD][a-fA-F0-9:]+"
     _xpanid_regex = "0x[a-fA-F0-9]{16}"
 
+    # Optional WpantundDbusClient used for property access instead of wpanctl
+    dbus_client = None
+
+    # Incremented whenever a command may change wpantund state, see PropertySnapshot
+    property_generation = 0
+
+    # Publisher emitting the new property_generation, created by the first subscribe_state_changes() call
+    _property_publisher = None
+
+    # PropertyCache of the node, created on first use
+    _property_cache = None
+
     def wpanctl(self, command, *args, **kwargs):
         """Implemented by inheriting class.
         """
@@ -60,6 +233,51 @@ class WpantundWpanNode(wpan_node.WpanNode):
         """
         pass
 
+    def wpanctl_batch(self, action, commands, timeout):
+        """Run several wpanctl commands and return their outputs in order.
+
+        Inheriting classes may override this to run all commands in a single round trip.
+        """
+        return [self.wpanctl(action, command, timeout) for command in commands]
+
+    def invalidate_properties(self):
+        """Mark property snapshots taken so far as stale.
+        """
+        self.property_generation += 1
+        if self._property_cache is not None:
+            self._property_cache.invalidate()
+        if self._property_publisher is not None:
+            self._property_publisher.emit(property_generation=self.property_generation)
+
+    @property
+    def property_cache(self):
+        """PropertyCache serving get() and getprop(), see defaults.PROPERTY_CACHE_MAX_AGE.
+        """
+        if self._property_cache is None:
+            self._property_cache = PropertyCache(defaults.PROPERTY_CACHE_MAX_AGE)
+        return self._property_cache
+
+    def subscribe_state_changes(self, handle):
+        """Call `handle` with a `sender` and keyword arguments whenever the state of the node may have changed.
+
+        See silk.utils.state_change.StateChangeMonitor.
+        """
+        if self._property_publisher is None:
+            self._property_publisher = signal.Publisher()
+        self._property_publisher.subscribe(handle, weak=False)
+
+    def unsubscribe_state_changes(self, handle):
+        """Stop calling a handle passed to subscribe_state_changes().
+        """
+        if self._property_publisher is not None:
+            self._property_publisher.unsubscribe(handle)
+
+    def _invalidate_on_command(self, command):
+        """Invalidate property snapshots unless `command` is a read-only wpanctl command.
+        """
+        if not is_read_only_command(command):
+            self.invalidate_properties()
+
     def free_device(self):
         """Free up hardware resources consumed by this class.
         """
@@ -403,26 +621,92 @@ class WpantundWpanNode(wpan_node.WpanNode):
         """
         Make a call into wpanctl setprop to set the desired parameter.
         """
+        self.invalidate_properties()
+
+        if self.dbus_client is not None:
+            output = self._dbus_update_prop("set", key, value, data)
+            if output is not None:
+                return output
+
         if not data:
             output = self.wpanctl("setprop", "setprop %s %s" % (key, value), 2)
         else:
             output = self.wpanctl("setprop", "setprop %s --data %s" % (key, value), 2)
         return output
 
-    def getprop(self, property_name):
+    def getprop(self, property_name, live=False):
         """
         Make a call into wpanctl getprop to query the desired parameter.
+
+        Properties are served from the property cache while it holds a fresh value, unless `live` is True.
         """
+        if not live:
+            value = self.property_cache.get(property_name)
+            if value is not None:
+                return value
+
+        if self.dbus_client is not None:
+            value = self._dbus_get_string(property_name)
+            if value is not None:
+                self.property_cache.put(property_name, value)
+                return value
+
         prop = self.wpanctl("getprop", "getprop %s" % property_name, 2)
-        return prop.split("=")[1].strip() if "=" in prop else prop
+        value = prop.split("=")[1].strip() if "=" in prop else prop
+        self.property_cache.put(property_name, value)
+        return value
+
+    def get(self, prop_name, value_only=True, live=False):
+        """Get a property as printed by `wpanctl getprop -v`, or as "<name> = <value>" unless `value_only`.
+
+        Properties are served from the property cache while it holds a fresh value, unless `live` is True.
+        """
+        if not live:
+            value = self.property_cache.get(prop_name)
+            if value is not None:
+                return value if value_only else "%s = %s" % (prop_name, value)
+
+        if self.dbus_client is not None:
+            value = self._dbus_get_string(prop_name)
+            if value is not None:
+                self.property_cache.put(prop_name, value)
+                return value if value_only else "%s = %s" % (prop_name, value)
 
-    def get(self, prop_name, value_only=True):
         if value_only:
-            output = self.wpanctl("getprop", "getprop -v %s" % prop_name, 2)
-        else:
-            output = self.wpanctl("getprop", "getprop  %s" % prop_name, 2)
+            output = self.wpanctl("getprop", "getprop -v %s" % prop_name, 2).strip()
+            self.property_cache.put(prop_name, output)
+            return output
+        output = self.wpanctl("getprop", "getprop  %s" % prop_name, 2)
         return output.strip()
 
+    def get_many(self, prop_names):
+        """Get several properties in a single round trip.
+
+        Args:
+            prop_names (list): names of the properties to query.
+
+        Returns:
+            dict: property name to value, each value as returned by get().
+        """
+        prop_names = list(prop_names)
+        values = {}
+        if self.dbus_client is not None:
+            for prop_name in prop_names:
+                value = self._dbus_get_string(prop_name)
+                if value is not None:
+                    values[prop_name] = value
+
+        missing = [prop_name for prop_name in prop_names if prop_name not in values]
+        if missing:
+            outputs = self.wpanctl_batch("getprop", ["getprop -v %s" % prop_name for prop_name in missing], 2)
+            values.update((prop_name, output.strip()) for prop_name, output in zip(missing, outputs))
+        return values
+
+    def snapshot(self, prop_names, max_age=PropertySnapshot.DEFAULT_MAX_AGE):
+        """Fetch several properties at once into a short-lived PropertySnapshot.
+        """
+        return PropertySnapshot(self, prop_names, max_age)
+
     def set(self, prop_name, value, binary_data=False):
         return self._update_prop("set", prop_name, value, binary_data)
 
@@ -432,7 +716,63 @@ class WpantundWpanNode(wpan_node.WpanNode):
     def remove(self, prop_name, value, binary_data=False):
         return self._update_prop("remove", prop_name, value, binary_data)
 
+    def get_value(self, prop_name):
+        """Get a property as a typed value. Requires the D-Bus backend.
+        """
+        return self.dbus_client.get(prop_name)
+
+    def get_table(self, prop_name):
+        """Get a table or list property as a list of structured entries. Requires the D-Bus backend.
+        """
+        return self.dbus_client.get_table(prop_name)
+
+    def table_snapshot(self, prop_name, previous=None):
+        """Read a table property into a TableSnapshot, indexing its entries by their key, see TableEntry.
+
+        Args:
+            prop_name (str): table property, one of wpan_table_parser.TABLE_ENTRY_CLASSES.
+            previous (TableSnapshot, optional): earlier snapshot of the table, whose unchanged entries are reused
+                instead of being parsed again. Defaults to None.
+
+        Returns:
+            TableSnapshot: the table.
+        """
+        entry_class = wpan_table_parser.TABLE_ENTRY_CLASSES[prop_name]
+        return wpan_table_parser.TableSnapshot.from_output(entry_class, self.get(prop_name), previous)
+
+    def _dbus_get_string(self, prop_name):
+        """Get a property over D-Bus formatted like wpanctl output, or None if the request failed.
+        """
+        try:
+            return self.dbus_client.get_string(prop_name)
+        except WpantundDbusError as error:
+            return "Error: %s" % error
+        except Exception as error:
+            self.log_error("D-Bus get %s failed, falling back to wpanctl: %s" % (prop_name, error))
+            return None
+
+    def _dbus_update_prop(self, action, prop_name, value, binary_data):
+        """Update a property over D-Bus. Returns "" on success, an error line, or None if the request failed.
+        """
+        if binary_data:
+            value = bytes.fromhex(value)
+        try:
+            getattr(self.dbus_client, action)(prop_name, value)
+        except WpantundDbusError as error:
+            return "Error: %s" % error
+        except Exception as error:
+            self.log_error("D-Bus %s %s failed, falling back to wpanctl: %s" % (action, prop_name, error))
+            return None
+        return ""
+
     def _update_prop(self, action, prop_name, value, binary_data):
+        self.invalidate_properties()
+
+        if self.dbus_client is not None:
+            output = self._dbus_update_prop(action, prop_name, value, binary_data)
+            if output is not None:
+                return output
+
         return self.wpanctl(action, action + " " + prop_name + " " + ("-d " if binary_data else "") + "-v " + value,
                             2)  # use -v to handle values starting with `-`.
 
@@ -0,0 +1,264 @@
+# Copyright 2020 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Direct D-Bus access to wpantund properties.
+
+wpantund exposes every property that wpanctl can query on the system bus. Talking to it directly avoids a wpanctl
+process per query and returns typed values instead of text that has to be parsed back.
+
+The D-Bus client library (jeepney) is optional; it is only needed when the D-Bus backend is enabled.
+"""
+
+import threading
+
+from silk.config import wpan_constants as wpan
+from silk.tools import wpan_table_parser
+
+try:
+    from jeepney import DBusAddress, MessageType, new_method_call
+    from jeepney.io.blocking import open_dbus_connection
+except ImportError:
+    open_dbus_connection = None
+
+WPANTUND_DBUS_NAME = "com.nestlabs.WPANTunnelDriver"
+WPANTUND_DBUS_PATH = "/com/nestlabs/WPANTunnelDriver"
+WPANTUND_DBUS_APIV1_PATH = "/org/wpantund"
+WPANTUND_DBUS_APIV1_INTERFACE = "org.wpantund.v1"
+
+METHOD_GET_INTERFACES = "GetInterfaces"
+METHOD_PROP_GET = "PropGet"
+METHOD_PROP_SET = "PropSet"
+METHOD_PROP_INSERT = "PropInsert"
+METHOD_PROP_REMOVE = "PropRemove"
+
+# Table properties returned as one string per entry, and the parser class for each entry
+TABLE_ENTRY_CLASSES = dict(wpan_table_parser.TABLE_ENTRY_CLASSES)
+TABLE_ENTRY_CLASSES[wpan.WPAN_THREAD_ON_MESH_PREFIXES] = wpan_table_parser.OnMeshPrefix
+
+# List properties whose entries start with an IPv6 address or prefix
+ADDRESS_LIST_PROPERTIES = (
+    wpan.WPAN_IP6_ALL_ADDRESSES,
+    wpan.WPAN_IP6_MULTICAST_ADDRESSES,
+    wpan.WPAN_THREAD_OFF_MESH_ROUTES,
+)
+
+
+class WpantundDbusError(Exception):
+    """Error returned by wpantund for a D-Bus property request.
+    """
+
+    def __init__(self, method: str, prop_name: str, status):
+        self.method = method
+        self.prop_name = prop_name
+        self.status = status
+
+    def __str__(self):
+        return "wpantund {0} {1} failed with status {2}".format(self.method, self.prop_name, self.status)
+
+
+class JeepneyDbusTransport(object):
+    """Blocking system bus connection used by WpantundDbusClient.
+
+    The connection is opened on the first call and reused afterwards.
+    """
+
+    def __init__(self, bus: str = "SYSTEM"):
+        if open_dbus_connection is None:
+            raise RuntimeError("The jeepney package is required for the wpantund D-Bus backend")
+
+        self.bus = bus
+        self._connection = None
+        self._lock = threading.Lock()
+
+    def call(self, bus_name: str, path: str, interface: str, method: str, signature: str = None, body=(),
+             timeout: float = None):
+        """Call a D-Bus method and return the reply body.
+
+        Raises:
+            RuntimeError: if the method call returned a D-Bus error.
+        """
+        with self._lock:
+            if self._connection is None:
+                self._connection = open_dbus_connection(bus=self.bus)
+
+            address = DBusAddress(path, bus_name=bus_name, interface=interface)
+            message = new_method_call(address, method, signature, body)
+            reply = self._connection.send_and_get_reply(message, timeout=timeout)
+
+        if reply.header.message_type == MessageType.error:
+            raise RuntimeError("D-Bus {0} failed: {1}".format(method, reply.body))
+        return reply.body
+
+    def close(self):
+        """Close the bus connection.
+        """
+        with self._lock:
+            if self._connection is not None:
+                self._connection.close()
+                self._connection = None
+
+
+def unwrap_variant(variant):
+    """Convert a (signature, value) D-Bus variant into a plain Python value.
+    """
+    signature, value = variant
+    if signature == "v":
+        return unwrap_variant(value)
+    if signature == "ay":
+        return bytes(value)
+    if signature == "a{sv}":
+        return {key: unwrap_variant(item) for key, item in value.items()}
+    if signature == "aa{sv}":
+        return [{key: unwrap_variant(item) for key, item in entry.items()} for entry in value]
+    return value
+
+
+def format_variant(variant) -> str:
+    """Format a (signature, value) D-Bus variant the way `wpanctl getprop -v` prints it.
+    """
+    signature, value = variant
+    if signature == "v":
+        return format_variant(value)
+    if signature == "b":
+        return "true" if value else "false"
+    if signature == "y":
+        return "0x%02X" % value
+    if signature == "q":
+        return "0x%04X" % value
+    if signature == "t":
+        return "0x%016X" % value
+    if signature in ("n", "i", "u", "x", "d"):
+        return str(value)
+    if signature == "s":
+        return "\"%s\"" % value
+    if signature == "ay":
+        return "[%s]" % bytes(value).hex().upper()
+    if signature == "as":
+        return "[\n" + "".join("\t\"%s\"\n" % item for item in value) + "]"
+    return str(unwrap_variant(variant))
+
+
+def guess_variant(value):
+    """Build a (signature, value) variant for a property value given as a string or Python value.
+    """
+    if isinstance(value, bool):
+        return "b", value
+    if isinstance(value, int):
+        return "i", value
+    if isinstance(value, (bytes, bytearray)):
+        return "ay", bytes(value)
+    return "s", str(value)
+
+
+class WpantundDbusClient(object):
+    """Client for the wpantund D-Bus API of a single interface.
+
+    One client is created per node and reused for all property requests.
+
+    Attributes:
+        interface_name (str): wpantund network interface name.
+        transport (JeepneyDbusTransport): D-Bus connection, or a stand-in with the same call() method.
+        timeout (float): timeout of a single D-Bus call in seconds.
+    """
+
+    def __init__(self, interface_name: str, transport=None, timeout: float = 5):
+        """Initialize a wpantund D-Bus client.
+
+        Args:
+            interface_name (str): wpantund network interface name.
+            transport (JeepneyDbusTransport, optional): D-Bus connection. Defaults to a new system bus connection.
+            timeout (float, optional): timeout of a single D-Bus call in seconds. Defaults to 5.
+        """
+        self.interface_name = interface_name
+        self.transport = transport if transport is not None else JeepneyDbusTransport()
+        self.timeout = timeout
+        self.path = "%s/%s" % (WPANTUND_DBUS_APIV1_PATH, interface_name)
+        self._bus_name = None
+
+    @property
+    def bus_name(self) -> str:
+        """D-Bus name of the wpantund instance serving this interface.
+        """
+        if self._bus_name is None:
+            self._bus_name = WPANTUND_DBUS_NAME
+            (interfaces,) = self.transport.call(WPANTUND_DBUS_NAME, WPANTUND_DBUS_PATH, WPANTUND_DBUS_NAME,
+                                                METHOD_GET_INTERFACES, timeout=self.timeout)
+            for interface_name, bus_name in interfaces:
+                if interface_name == self.interface_name:
+                    self._bus_name = bus_name
+                    break
+        return self._bus_name
+
+    def close(self):
+        """Close the underlying D-Bus connection.
+        """
+        self.transport.close()
+
+    def get_variant(self, prop_name: str):
+        """Get a property as a (signature, value) variant.
+
+        Raises:
+            WpantundDbusError: if wpantund returned a non-zero status.
+        """
+        status, variant = self.__call(METHOD_PROP_GET, "s", (prop_name,))
+        if status != 0:
+            raise WpantundDbusError(METHOD_PROP_GET, prop_name, status)
+        return variant
+
+    def get(self, prop_name: str):
+        """Get a property as a typed Python value.
+        """
+        return unwrap_variant(self.get_variant(prop_name))
+
+    def get_string(self, prop_name: str) -> str:
+        """Get a property formatted like `wpanctl getprop -v` output.
+        """
+        return format_variant(self.get_variant(prop_name))
+
+    def get_table(self, prop_name: str) -> list:
+        """Get a table or list property as a list of structured entries.
+
+        Known tables are parsed into wpan_table_parser entry objects, address lists into a list of addresses and
+        `AsValMap` properties into a list of dictionaries.
+        """
+        value = self.get(prop_name)
+        if prop_name in TABLE_ENTRY_CLASSES:
+            entry_class = TABLE_ENTRY_CLASSES[prop_name]
+            return [entry_class("\t\"%s\"" % item) for item in value]
+        if prop_name in ADDRESS_LIST_PROPERTIES:
+            return [item.split()[0] for item in value if item.strip()]
+        return list(value)
+
+    def set(self, prop_name: str, value):
+        """Set a property.
+        """
+        self.__update(METHOD_PROP_SET, prop_name, value)
+
+    def add(self, prop_name: str, value):
+        """Insert a value into a list property.
+        """
+        self.__update(METHOD_PROP_INSERT, prop_name, value)
+
+    def remove(self, prop_name: str, value):
+        """Remove a value from a list property.
+        """
+        self.__update(METHOD_PROP_REMOVE, prop_name, value)
+
+    def __update(self, method: str, prop_name: str, value):
+        (status,) = self.__call(method, "sv", (prop_name, guess_variant(value)))
+        if status != 0:
+            raise WpantundDbusError(method, prop_name, status)
+
+    def __call(self, method: str, signature: str, body: tuple):
+        return self.transport.call(self.bus_name, self.path, WPANTUND_DBUS_APIV1_INTERFACE, method, signature, body,
+                                   timeout=self.timeout)
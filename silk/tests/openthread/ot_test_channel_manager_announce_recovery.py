@@ -50,7 +50,7 @@ class TestChannelManagerAnnounceRecovery(testcase.TestCase):
         for device in cls.all_nodes:
             device.set_logger(cls.logger)
             cls.add_test_device(device)
-            device.set_up()
+        cls.set_up_devices(cls.all_nodes)
 
         cls.network_data = WpanCredentials(network_name="SILK-{0:04X}".format(random.randint(0, 0xffff)),
                                            psk="00112233445566778899aabbccdd{0:04x}".format(random.randint(0, 0xffff)),
@@ -62,8 +62,7 @@ class TestChannelManagerAnnounceRecovery(testcase.TestCase):
     @classmethod
     @testcase.teardown_class_decorator
     def tearDownClass(cls):
-        for device in cls.device_list:
-            device.tear_down()
+        cls.tear_down_devices(cls.device_list)
 
     @testcase.setup_decorator
     def setUp(self):
@@ -74,8 +74,7 @@ class TestDataPollInterval(testcase.TestCase):
         cls.add_test_device(cls.router)
         cls.add_test_device(cls.sed)
 
-        cls.router.set_up()
-        cls.sed.set_up()
+        cls.set_up_devices([cls.router, cls.sed])
 
         cls.network_data = WpanCredentials(network_name="SILK-{0:04X}".format(random.randint(0, 0xffff)),
                                            psk="00112233445566778899aabbccdd{0:04x}".format(random.randint(0, 0xffff)),
@@ -87,8 +86,7 @@ class TestDataPollInterval(testcase.TestCase):
     @classmethod
     @testcase.teardown_class_decorator
     def tearDownClass(cls):
-        for device in cls.device_list:
-            device.tear_down()
+        cls.tear_down_devices(cls.device_list)
 
     @testcase.setup_decorator
     def setUp(self):
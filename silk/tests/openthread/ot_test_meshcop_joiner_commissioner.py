@@ -62,14 +62,12 @@ class TestMeshcopJoinerCommissioner(testcase.TestCase):
         cls.add_test_device(cls.commissioner)
         cls.add_test_device(cls.joiner)
 
-        cls.commissioner.set_up()
-        cls.joiner.set_up()
+        cls.set_up_devices([cls.commissioner, cls.joiner])
 
     @classmethod
     @testcase.teardown_class_decorator
     def tearDownClass(cls):
-        for device in cls.device_list:
-            device.tear_down()
+        cls.tear_down_devices(cls.device_list)
 
     @testcase.setup_decorator
     def setUp(self):
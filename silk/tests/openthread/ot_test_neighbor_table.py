@@ -65,7 +65,7 @@ class TestNeighborTable(testcase.TestCase):
 
         for device in cls.device_list:
             device.set_logger(cls.logger)
-            device.set_up()
+        cls.set_up_devices(cls.device_list)
 
         total_networks = NUM_ROUTERS
         cls.network_data_list = []
@@ -82,8 +82,7 @@ class TestNeighborTable(testcase.TestCase):
     @classmethod
     @testcase.teardown_class_decorator
     def tearDownClass(cls):
-        for device in cls.device_list:
-            device.tear_down()
+        cls.tear_down_devices(cls.device_list)
 
     @testcase.setup_decorator
     def setUp(self):
@@ -159,7 +158,7 @@ class TestNeighborTable(testcase.TestCase):
     @testcase.test_method_decorator
     def test03_Verify_Children(self):
         neighbor_table = self.routers[0].wpanctl("get", "get " + wpan.WPAN_THREAD_NEIGHBOR_TABLE, 2)
-        neighbor_table = wpan_table_parser.parse_neighbor_table_result(neighbor_table)
+        neighbor_table = wpan_table_parser.TableSnapshot.from_output(wpan_table_parser.NeighborEntry, neighbor_table)
 
         print(neighbor_table)
 
@@ -170,11 +169,9 @@ class TestNeighborTable(testcase.TestCase):
         for child in self.children:
             ext_addr = child.getprop(wpan.WPAN_EXT_ADDRESS)[1:-1]
 
-            for entry in neighbor_table:
-                if entry.ext_address == ext_addr:
-                    break
-            else:
-                self.assertTrue(0, "Failed to find a child entry for extended address {} in table".format(ext_addr))
+            entry = neighbor_table.get(ext_addr)
+            self.assertIsNotNone(entry,
+                                 "Failed to find a child entry for extended address {} in table".format(ext_addr))
 
             self.assertEqual(int(entry.rloc16, 16), int(child.getprop(wpan.WPAN_THREAD_RLOC16), 16))
             self.assertFalse(entry.is_ftd())
@@ -185,7 +182,7 @@ class TestNeighborTable(testcase.TestCase):
     def test04_Verify_Router(self):
         # Verify that all other routers are seen in the neighbor table
         neighbor_table = self.routers[0].wpanctl("get", "get " + wpan.WPAN_THREAD_NEIGHBOR_TABLE, 2)
-        neighbor_table = wpan_table_parser.parse_neighbor_table_result(neighbor_table)
+        neighbor_table = wpan_table_parser.TableSnapshot.from_output(wpan_table_parser.NeighborEntry, neighbor_table)
 
         print(neighbor_table)
 
@@ -196,11 +193,9 @@ class TestNeighborTable(testcase.TestCase):
         for router in self.routers[1:]:
             ext_addr = router.getprop(wpan.WPAN_EXT_ADDRESS)[1:-1]
 
-            for entry in neighbor_table:
-                if entry.ext_address == ext_addr:
-                    break
-            else:
-                self.assertTrue(0, "Failed to find a router entry for extended address {} in table".format(ext_addr))
+            entry = neighbor_table.get(ext_addr)
+            self.assertIsNotNone(entry,
+                                 "Failed to find a router entry for extended address {} in table".format(ext_addr))
             self.assertEqual(int(entry.rloc16, 16), int(router.getprop(wpan.WPAN_THREAD_RLOC16), 16))
 
             self.assertTrue(entry.is_ftd())
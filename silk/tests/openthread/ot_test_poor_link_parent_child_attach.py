@@ -53,8 +53,7 @@ class TestPoorLinkParentChildAttach(testcase.TestCase):
         cls.add_test_device(cls.parent)
         cls.add_test_device(cls.child)
 
-        cls.parent.set_up()
-        cls.child.set_up()
+        cls.set_up_devices([cls.parent, cls.child])
 
         cls.network_data = WpanCredentials(network_name="SILK-{0:04X}".format(random.randint(0, 0xffff)),
                                            psk="00112233445566778899aabbccdd{0:04x}".format(random.randint(0, 0xffff)),
@@ -66,8 +65,7 @@ class TestPoorLinkParentChildAttach(testcase.TestCase):
     @classmethod
     @testcase.teardown_class_decorator
     def tearDownClass(cls):
-        for device in cls.device_list:
-            device.tear_down()
+        cls.tear_down_devices(cls.device_list)
 
     @testcase.setup_decorator
     def setUp(self):
@@ -18,8 +18,7 @@ import time
 
 from silk.config import wpan_constants as wpan
 from silk.node.wpan_node import WpanCredentials
-from silk.tools import wpan_table_parser
-from silk.tools.wpan_util import verify, VerifyError, verify_within
+from silk.tools.wpan_util import verify, wait_for_table
 from silk.utils import process_cleanup
 import silk.hw.hw_resource as hwr
 import silk.node.fifteen_four_dev_board as ffdb
@@ -64,7 +63,7 @@ class TestRouterTable(testcase.TestCase):
 
         for device in cls.device_list:
             device.set_logger(cls.logger)
-            device.set_up()
+        cls.set_up_devices(cls.device_list)
 
         cls.network_data = WpanCredentials(network_name="SILK-{0:04X}".format(random.randint(0, 0xffff)),
                                            psk="00112233445566778899aabbccdd{0:04x}".format(random.randint(0, 0xffff)),
@@ -76,8 +75,7 @@ class TestRouterTable(testcase.TestCase):
     @classmethod
     @testcase.teardown_class_decorator
     def tearDownClass(cls):
-        for device in cls.device_list:
-            device.tear_down()
+        cls.tear_down_devices(cls.device_list)
 
     @testcase.setup_decorator
     def setUp(self):
@@ -159,28 +157,23 @@ class TestRouterTable(testcase.TestCase):
         r3_rloc = int(self.r3.get(wpan.WPAN_THREAD_RLOC16), 16)
         r4_rloc = int(self.r4.get(wpan.WPAN_THREAD_RLOC16), 16)
 
-        def check_r1_router_table():
-            router_table = wpan_table_parser.parse_router_table_result(self.r1.get(wpan.WPAN_THREAD_ROUTER_TABLE))
+        def check_r1_router_table(router_table, delta):
             verify(len(router_table) == 4)
-            for entry in router_table:
-                if entry.rloc16 == r1_rloc:
-                    pass
-                elif entry.rloc16 == r2_rloc:
-                    # r1 should be directly connected to r2.
-                    verify(entry.is_link_established())
-                    verify(entry.ext_address == r2_ext_addr)
-                elif entry.rloc16 == r3_rloc:
-                    # r1 should be directly connected to r3.
-                    verify(entry.is_link_established())
-                    verify(entry.ext_address == r3_ext_addr)
-                elif entry.rloc16 == r4_rloc:
-                    # r1's next hop towards r4 should be through r3.
-                    verify(not entry.is_link_established())
-                    verify(entry.next_hop == r3_id)
-                else:
-                    raise VerifyError
-
-        verify_within(check_r1_router_table, WAIT_TIME)
+            verify({entry.rloc16 for entry in router_table} == {r1_rloc, r2_rloc, r3_rloc, r4_rloc})
+            # r1 should be directly connected to r2.
+            entry = router_table.by_rloc16(r2_rloc)
+            verify(entry.is_link_established())
+            verify(entry.ext_address == r2_ext_addr)
+            # r1 should be directly connected to r3.
+            entry = router_table.by_rloc16(r3_rloc)
+            verify(entry.is_link_established())
+            verify(entry.ext_address == r3_ext_addr)
+            # r1's next hop towards r4 should be through r3.
+            entry = router_table.by_rloc16(r4_rloc)
+            verify(not entry.is_link_established())
+            verify(entry.next_hop == r3_id)
+
+        wait_for_table(self.r1, wpan.WPAN_THREAD_ROUTER_TABLE, check_r1_router_table, WAIT_TIME)
 
     @testcase.test_method_decorator
     def test04_Verify_r3_Router_Table(self):
@@ -194,28 +187,16 @@ class TestRouterTable(testcase.TestCase):
         r3_rloc = int(self.r3.get(wpan.WPAN_THREAD_RLOC16), 16)
         r4_rloc = int(self.r4.get(wpan.WPAN_THREAD_RLOC16), 16)
 
-        def check_r3_router_table():
-            router_table = wpan_table_parser.parse_router_table_result(self.r3.get(wpan.WPAN_THREAD_ROUTER_TABLE))
+        def check_r3_router_table(router_table, delta):
             verify(len(router_table) == 4)
-            for entry in router_table:
-                if entry.rloc16 == r1_rloc:
-                    # r3 should be directly connected to r1.
-                    verify(entry.is_link_established())
-                    verify(entry.ext_address == r1_ext_addr)
-                elif entry.rloc16 == r2_rloc:
-                    # r3 should be directly connected to r2.
-                    verify(entry.is_link_established())
-                    verify(entry.ext_address == r2_ext_addr)
-                elif entry.rloc16 == r3_rloc:
-                    pass
-                elif entry.rloc16 == r4_rloc:
-                    # r3 should be directly connected to r4.
-                    verify(entry.is_link_established())
-                    verify(entry.ext_address == r4_ext_addr)
-                else:
-                    raise VerifyError
-
-        verify_within(check_r3_router_table, WAIT_TIME)
+            verify({entry.rloc16 for entry in router_table} == {r1_rloc, r2_rloc, r3_rloc, r4_rloc})
+            # r3 should be directly connected to r1, r2 and r4.
+            for rloc16, ext_addr in ((r1_rloc, r1_ext_addr), (r2_rloc, r2_ext_addr), (r4_rloc, r4_ext_addr)):
+                entry = router_table.by_rloc16(rloc16)
+                verify(entry.is_link_established())
+                verify(entry.ext_address == ext_addr)
+
+        wait_for_table(self.r3, wpan.WPAN_THREAD_ROUTER_TABLE, check_r3_router_table, WAIT_TIME)
 
     @testcase.test_method_decorator
     def test05_Verify_r4_Router_Table(self):
@@ -229,28 +210,20 @@ class TestRouterTable(testcase.TestCase):
         r3_rloc = int(self.r3.get(wpan.WPAN_THREAD_RLOC16), 16)
         r4_rloc = int(self.r4.get(wpan.WPAN_THREAD_RLOC16), 16)
 
-        def check_r4_router_table():
-            router_table = wpan_table_parser.parse_router_table_result(self.r4.get(wpan.WPAN_THREAD_ROUTER_TABLE))
+        def check_r4_router_table(router_table, delta):
             verify(len(router_table) == 4)
-            for entry in router_table:
-                if entry.rloc16 == r1_rloc:
-                    # r4's next hop towards r1 should be through r3.
-                    verify(not entry.is_link_established())
-                    verify(entry.next_hop == r3_id)
-                elif entry.rloc16 == r2_rloc:
-                    # r4's next hop towards r2 should be through r3.
-                    verify(not entry.is_link_established())
-                    verify(entry.next_hop == r3_id)
-                elif entry.rloc16 == r3_rloc:
-                    # r4 should be directly connected to r3.
-                    verify(entry.is_link_established())
-                    verify(entry.ext_address == r3_ext_addr)
-                elif entry.rloc16 == r4_rloc:
-                    pass
-                else:
-                    raise VerifyError
-
-        verify_within(check_r4_router_table, WAIT_TIME)
+            verify({entry.rloc16 for entry in router_table} == {r1_rloc, r2_rloc, r3_rloc, r4_rloc})
+            # r4's next hop towards r1 and r2 should be through r3.
+            for rloc16 in (r1_rloc, r2_rloc):
+                entry = router_table.by_rloc16(rloc16)
+                verify(not entry.is_link_established())
+                verify(entry.next_hop == r3_id)
+            # r4 should be directly connected to r3.
+            entry = router_table.by_rloc16(r3_rloc)
+            verify(entry.is_link_established())
+            verify(entry.ext_address == r3_ext_addr)
+
+        wait_for_table(self.r4, wpan.WPAN_THREAD_ROUTER_TABLE, check_r4_router_table, WAIT_TIME)
 
 
 if __name__ == "__main__":
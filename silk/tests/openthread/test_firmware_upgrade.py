@@ -12,9 +12,12 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
-import time
+import os
 
+from silk.tools.firmware_cache import FirmwareCache
+from silk.tools.fleet_flasher import FleetFlasher
 from silk.utils import process_cleanup
+import silk.config.defaults as defaults
 import silk.hw.hw_resource as hwr
 import silk.node.fifteen_four_dev_board as ffdb
 import silk.tests.testcase as testcase
@@ -51,13 +54,12 @@ class TestFirmwareUpgrade(testcase.TestCase):
 
         for d in cls.device_list:
             d.set_logger(cls.logger)
-            d.set_up()
+        cls.set_up_devices(cls.device_list)
 
     @classmethod
     @testcase.teardown_class_decorator
     def tearDownClass(cls):
-        for d in cls.device_list:
-            d.tear_down()
+        cls.tear_down_devices(cls.device_list)
 
     @testcase.setup_decorator
     def setUp(self):
@@ -69,13 +71,11 @@ class TestFirmwareUpgrade(testcase.TestCase):
 
     @testcase.test_method_decorator
     def test01_Firmware_upgrade(self):
-        result_list = []
-        for device in self.device_list:
-            time.sleep(3)
-            device.firmware_update(FIRMWARE_FILE_CDC)
-            self.wait_for_completion(self.device_list)
-            result_list.append((device.device.get_dut_serial(), device.flash_result))
+        flasher = FleetFlasher(cache=FirmwareCache(), logger=self.logger)
+        results = flasher.flash(self.device_list, FIRMWARE_FILE_CDC, force=defaults.FIRMWARE_FORCE_FLASH)
+        flasher.write_report(results, os.path.join(self.current_output_directory, "firmware_upgrade.json"))
 
+        result_list = [(result.serial, result.success) for result in results]
         self.logger.info("Firmware upgrade results:")
         self.logger.info(result_list)
 
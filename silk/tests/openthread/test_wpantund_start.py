@@ -56,13 +56,12 @@ class TestWpantundStart(testcase.TestCase):
 
         for d in cls.device_list:
             d.set_logger(cls.logger)
-            d.set_up()
+        cls.set_up_devices(cls.device_list)
 
     @classmethod
     @testcase.teardown_class_decorator
     def tearDownClass(cls):
-        for d in cls.device_list:
-            d.tear_down()
+        cls.tear_down_devices(cls.device_list)
 
         process_cleanup.ps_cleanup()
 
@@ -18,12 +18,19 @@ Enables replaying Silk log with OTNS enabled through OTNS visualization.
 
 from datetime import datetime
 import argparse
+import bisect
+import collections
 import enum
+import json
 import logging
 import os
 import re
 import sys
+import threading
 import time
+from typing import Dict
+
+import pandas
 
 from silk.tools.otns_manager import OtnsManager, OtnsNodeSummaryCollection
 from silk.tools.otns_manager import RegexType as OtnsRegexType
@@ -43,6 +50,187 @@ class RegexType(enum.Enum):
     TEARDOWN_CLASS = r"TEAR DOWN CLASS (\w+)"
     TEARDOWN_CLASS_DONE = r"TEAR DOWN CLASS DONE (\w+)"
     RUNNING_TEST = r"RUNNING TEST ([\w._]+)"
+    # any test phase marker, the longer markers first
+    PHASE_MARKER = r"(SET UP CLASS|TEAR DOWN CLASS DONE|TEAR DOWN CLASS|SET UP|RUNNING TEST|TEAR DOWN) ([\w._]+)$"
+
+
+LOG_LINE_REGEX = re.compile(RegexType.LOG_LINE.value)
+PHASE_MARKER_REGEX = re.compile(RegexType.PHASE_MARKER.value)
+
+# regexes matched against most log lines, compiled once
+SET_UP_CLASS_REGEX = re.compile(RegexType.SET_UP_CLASS.value)
+TEARDOWN_CLASS_REGEX = re.compile(RegexType.TEARDOWN_CLASS.value)
+TEARDOWN_CLASS_DONE_REGEX = re.compile(RegexType.TEARDOWN_CLASS_DONE.value)
+RUNNING_TEST_REGEX = re.compile(RegexType.RUNNING_TEST.value)
+START_WPANTUND_RES_REGEX = re.compile(OtnsRegexType.START_WPANTUND_RES.value)
+STOP_WPANTUND_REQ_REGEX = re.compile(OtnsRegexType.STOP_WPANTUND_REQ.value)
+GET_EXTADDR_RES_REGEX = re.compile(OtnsRegexType.GET_EXTADDR_RES.value)
+NCP_VERSION_REGEX = re.compile(OtnsRegexType.NCP_VERSION.value)
+STATUS_REGEX = re.compile(OtnsRegexType.STATUS.value)
+
+# kind (str): marker text, e.g. "SET UP CLASS" or "RUNNING TEST".
+# name (str): test class or test method name following the marker, e.g. "TestFormNetwork.test01_Pairing".
+# line (int): line number of the marker.
+# offset (int): byte offset of the line in the log.
+# timestamp (str): timestamp of the line, in DATE_FORMAT.
+PhaseMarker = collections.namedtuple("PhaseMarker", ["kind", "name", "line", "offset", "timestamp"])
+
+
+def parse_log_time(value: str) -> datetime:
+    """Parse a log line timestamp in DATE_FORMAT with milliseconds, e.g. "2020-08-27 16:11:55,328".
+
+    The fields are sliced at their fixed positions, which is several times faster than datetime.strptime. Timestamps
+    in another layout are left to datetime.strptime.
+    """
+    try:
+        if len(value) == 23 and value[19] == ",":
+            return datetime(int(value[0:4]), int(value[5:7]), int(value[8:10]), int(value[11:13]), int(value[14:16]),
+                            int(value[17:19]), int(value[20:23]) * 1000)
+    except ValueError:
+        pass
+    return datetime.strptime(value, DATE_FORMAT)
+
+
+def parse_time(value: str) -> datetime:
+    """Parse a timestamp in DATE_FORMAT, with or without milliseconds.
+    """
+    try:
+        return datetime.strptime(value, DATE_FORMAT)
+    except ValueError:
+        return datetime.strptime(value, "%Y-%m-%d %H:%M:%S")
+
+
+class LogIndex(object):
+    """Sidecar index of a Silk log, to start a replay at a line, a time or a test phase without rescanning the log.
+
+    The index holds a checkpoint, i.e. the line number, byte offset and timestamp of a log line, every
+    CHECKPOINT_INTERVAL lines, and the test phase markers. It is built in one pass over the log and cached next to it,
+    in `<log path>.index.json`, until the size or modification time of the log changes.
+
+    Attributes:
+        log_path (str): path of the indexed log.
+        checkpoints (List[Tuple[int, int, str]]): (line number, byte offset, timestamp) of the checkpoints.
+        phases (List[PhaseMarker]): test phase markers in log order.
+    """
+
+    VERSION = 1
+    CHECKPOINT_INTERVAL = 1000
+
+    def __init__(self, log_path: str, checkpoints, phases):
+        self.log_path = log_path
+        self.checkpoints = [tuple(checkpoint) for checkpoint in checkpoints]
+        self.phases = [PhaseMarker(*marker) for marker in phases]
+        positions = sorted(set([(line, offset) for line, offset, _ in self.checkpoints] +
+                               [(marker.line, marker.offset) for marker in self.phases]))
+        self._position_lines = [line for line, _ in positions]
+        self._position_offsets = [offset for _, offset in positions]
+        self._checkpoint_times = [timestamp for _, _, timestamp in self.checkpoints]
+
+    @staticmethod
+    def cache_path(log_path: str) -> str:
+        return log_path + ".index.json"
+
+    @classmethod
+    def load(cls, log_path: str, logger: logging.Logger = None) -> "LogIndex":
+        """Load the cached index of a log, or build and cache it if it is missing or outdated.
+
+        Args:
+            log_path (str): path of the log.
+            logger (logging.Logger, optional): logger for cache problems. Defaults to None.
+
+        Returns:
+            LogIndex: the index.
+        """
+        stat = os.stat(log_path)
+        signature = {"version": cls.VERSION, "interval": cls.CHECKPOINT_INTERVAL, "size": stat.st_size,
+                     "mtime_ns": stat.st_mtime_ns}
+        try:
+            with open(cls.cache_path(log_path), "r") as cache_file:
+                data = json.load(cache_file)
+            if all(data.get(key) == value for key, value in signature.items()):
+                return cls(log_path, data["checkpoints"], data["phases"])
+        except (OSError, ValueError, KeyError, TypeError):
+            pass
+
+        index = cls.build(log_path)
+        data = dict(signature, checkpoints=index.checkpoints, phases=[list(marker) for marker in index.phases])
+        temp_path = cls.cache_path(log_path) + ".tmp"
+        try:
+            with open(temp_path, "w") as cache_file:
+                json.dump(data, cache_file)
+            os.replace(temp_path, cls.cache_path(log_path))
+        except OSError as error:
+            if logger is not None:
+                logger.debug("Cannot cache the index of %s: %s" % (log_path, error))
+        return index
+
+    @classmethod
+    def build(cls, log_path: str) -> "LogIndex":
+        """Index a log in one pass.
+
+        Only the checkpoint lines and the lines logged by the test framework are decoded and matched.
+        """
+        checkpoints = []
+        phases = []
+        next_checkpoint = 0
+        offset = 0
+        with open(log_path, "rb") as file:
+            for line_number, raw_line in enumerate(file):
+                if line_number >= next_checkpoint or b"] [silk] [" in raw_line:
+                    line_match = LOG_LINE_REGEX.match(raw_line.decode("utf-8", "replace"))
+                    if line_match:
+                        timestamp = line_match.group(1)
+                        if line_number >= next_checkpoint:
+                            checkpoints.append((line_number, offset, timestamp))
+                            next_checkpoint = line_number + cls.CHECKPOINT_INTERVAL
+                        if line_match.group(2) == "silk":
+                            marker_match = PHASE_MARKER_REGEX.match(line_match.group(4))
+                            if marker_match:
+                                phases.append(
+                                    PhaseMarker(marker_match.group(1), marker_match.group(2), line_number, offset,
+                                                timestamp))
+                offset += len(raw_line)
+        return cls(log_path, checkpoints, phases)
+
+    def seek(self, file, line: int = 0, start_time: datetime = None) -> int:
+        """Move a log file opened for reading to the closest indexed line before a line or a time.
+
+        Args:
+            file (IO): the log file.
+            line (int, optional): line number to reach. Defaults to 0.
+            start_time (datetime.datetime, optional): time to reach, the line is ignored if set. Defaults to None.
+
+        Returns:
+            int: line number of the line the file was moved to.
+        """
+        if start_time is not None:
+            # Lines logged at start_time may precede a checkpoint with the same time
+            position = bisect.bisect_left(self._checkpoint_times, start_time.strftime(DATE_FORMAT)[:-3]) - 1
+            line, offset = self.checkpoints[position][:2] if position >= 0 else (0, 0)
+        else:
+            position = bisect.bisect_right(self._position_lines, line) - 1
+            if position >= 0:
+                line, offset = self._position_lines[position], self._position_offsets[position]
+            else:
+                line, offset = 0, 0
+        file.seek(offset)
+        return line
+
+    def phase_lines(self, name: str):
+        """Find the lines of a test class or test method, from its first marker to the marker following its last one.
+
+        Args:
+            name (str): test class name, e.g. "TestFormNetwork", or test name, e.g. "TestFormNetwork.test01_Pairing".
+
+        Returns:
+            Tuple[int, int]: first line and line to stop at, None to replay to the end of the log.
+        """
+        positions = [position for position, marker in enumerate(self.phases) if marker.name == name]
+        if not positions:
+            raise ValueError(f"No test phase {name} in {self.log_path}")
+        stop_position = positions[-1] + 1
+        stop_line = self.phases[stop_position].line if stop_position < len(self.phases) else None
+        return self.phases[positions[0]].line, stop_line
 
 
 class SilkReplayer(object):
@@ -59,10 +247,15 @@ class SilkReplayer(object):
         device_name_map (Dict[str, ThreadDevBoard]): map from device name to
         ThreadDevBoard instance.
         otns_manager (OtnsManager): manager for OTNS communications.
+        analyze (bool): if the log is replayed headless as fast as possible, only to produce the node summaries.
 
         last_time (datetime.datetime): timestamp of the last line of log processed.
+        next_line (int): line number the last run stopped at, where a replay continues without a jump in time.
+        poll_interval (float): seconds between checks for new lines when following a log.
     """
 
+    FOLLOW_POLL_INTERVAL = 0.2
+
     def __init__(self, argv=None, run_now: bool = True):
         """Initialize a Silk log replayer.
 
@@ -80,18 +273,42 @@ class SilkReplayer(object):
         self.input_path = args.path
         self.log_filename = os.path.basename(args.path)
         self.speed = float(args.playback_speed)
+        self.analyze = args.analyze
 
         self.set_up_logger(args.results_dir or os.getcwd())
         self.acquire_devices(args.hw_conf_file)
 
-        self.otns_manager = OtnsManager(server_host=args.otns_server, logger=self.logger.getChild("otnsManager"))
+        self.otns_manager = OtnsManager(server_host=args.otns_server,
+                                        logger=self.logger.getChild("otnsManager"),
+                                        headless=self.analyze)
 
         self.last_time = None
+        self.next_line = 0
+        self._log_index = None
+        self.poll_interval = SilkReplayer.FOLLOW_POLL_INTERVAL
+        self._stop_following = threading.Event()
+        # Set while following a log and replaying the lines it had before the first wait for new lines
+        self._catching_up = False
 
         if run_now:
-            self.run()
-            if args.results_dir:
-                result_path = os.path.join(args.results_dir, f"silk_replay_summary_for_{self.log_filename}.csv")
+            if args.phase:
+                self.run_phase(args.phase)
+            elif args.follow:
+                try:
+                    self.run(start_time=args.start_time,
+                             stop_time=args.stop_time,
+                             follow=True,
+                             idle_timeout=args.idle_timeout,
+                             from_end=args.from_end)
+                except KeyboardInterrupt:
+                    pass
+            else:
+                self.run(start_time=args.start_time, stop_time=args.stop_time)
+            # send the events still queued before exiting
+            self.otns_manager.close()
+            if args.results_dir or self.analyze:
+                result_path = os.path.join(args.results_dir or os.getcwd(),
+                                           f"silk_replay_summary_for_{self.log_filename}.csv")
                 self.output_summary(coalesced=True, csv_path=result_path)
 
     def set_up_logger(self, result_dir: str):
@@ -167,6 +384,38 @@ class SilkReplayer(object):
                             default=1.0,
                             metavar="PlaybackSpeed",
                             help="Speed of log replay")
+        parser.add_argument("--analyze",
+                            dest="analyze",
+                            action="store_true",
+                            help="Replay headless without waiting or connecting to OTNS, only writing the summary")
+        parser.add_argument("--phase",
+                            dest="phase",
+                            metavar="Phase",
+                            help="Only replay a test class or test, e.g. TestFormNetwork.test01_Pairing")
+        parser.add_argument("--start-time",
+                            dest="start_time",
+                            type=parse_time,
+                            metavar="StartTime",
+                            help="Start replaying at a time, e.g. \"2020-08-27 16:11:55\"")
+        parser.add_argument("--stop-time",
+                            dest="stop_time",
+                            type=parse_time,
+                            metavar="StopTime",
+                            help="Stop replaying after a time")
+        parser.add_argument("-f",
+                            "--follow",
+                            dest="follow",
+                            action="store_true",
+                            help="Keep replaying the lines appended to the log by a running test, until interrupted")
+        parser.add_argument("--idle-timeout",
+                            dest="idle_timeout",
+                            type=float,
+                            metavar="IdleTimeout",
+                            help="Stop following the log after this many seconds without a new line")
+        parser.add_argument("--from-end",
+                            dest="from_end",
+                            action="store_true",
+                            help="When following, only replay the lines appended from now on")
         parser.add_argument("path", metavar="P", help="Log file path")
         return parser.parse_args(argv[1:])
 
@@ -192,22 +441,22 @@ class SilkReplayer(object):
         """
         parts = entity_name.split(".")
         if len(parts) == 1 and parts[0] == "silk":
-            set_up_class_match = re.match(RegexType.SET_UP_CLASS.value, message)
+            set_up_class_match = SET_UP_CLASS_REGEX.match(message)
             if set_up_class_match:
                 self.otns_manager.set_test_title(f"{set_up_class_match.group(1)}.set_up")
                 return
 
-            teardown_class_done_match = re.match(RegexType.TEARDOWN_CLASS_DONE.value, message)
+            teardown_class_done_match = TEARDOWN_CLASS_DONE_REGEX.match(message)
             if teardown_class_done_match:
                 self.otns_manager.set_test_title("")
                 return
 
-            teardown_class_match = re.match(RegexType.TEARDOWN_CLASS.value, message)
+            teardown_class_match = TEARDOWN_CLASS_REGEX.match(message)
             if teardown_class_match:
                 self.otns_manager.set_test_title(f"{teardown_class_match.group(1)}.tear_down")
                 return
 
-            running_test_match = re.match(RegexType.RUNNING_TEST.value, message)
+            running_test_match = RUNNING_TEST_REGEX.match(message)
             if running_test_match:
                 self.otns_manager.set_test_title(running_test_match.group(1))
                 return
@@ -224,28 +473,28 @@ class SilkReplayer(object):
         else:
             device = self.device_name_map[device_name]
 
-        start_match = re.match(OtnsRegexType.START_WPANTUND_RES.value, message)
+        start_match = START_WPANTUND_RES_REGEX.match(message)
         if start_match:
             self.otns_manager.add_node(device)
             return
 
-        stop_match = re.match(OtnsRegexType.STOP_WPANTUND_REQ.value, message)
+        stop_match = STOP_WPANTUND_REQ_REGEX.match(message)
         if stop_match:
             self.otns_manager.remove_node(device)
             return
 
-        extaddr_match = re.search(OtnsRegexType.GET_EXTADDR_RES.value, message)
+        extaddr_match = GET_EXTADDR_RES_REGEX.search(message)
         if extaddr_match:
             self.otns_manager.update_extaddr(device, int(extaddr_match.group(1), 16), time=timestamp)
             return
 
-        ncp_version_match = re.search(OtnsRegexType.NCP_VERSION.value, message)
+        ncp_version_match = NCP_VERSION_REGEX.search(message)
         if ncp_version_match:
             ncp_version = ncp_version_match.group(1)
             self.otns_manager.set_ncp_version(ncp_version)
             return
 
-        status_match = re.match(OtnsRegexType.STATUS.value, message)
+        status_match = STATUS_REGEX.match(message)
         if status_match:
             self.otns_manager.process_node_status(device, message, time=timestamp)
             return
@@ -257,10 +506,7 @@ class SilkReplayer(object):
             coalesced (bool): if the summary should be printed grouped by time.
             csv_path (str): path to CSV output file
         """
-        extaddr_map = {}
-        for summary in self.otns_manager.node_summaries.values():
-            if summary.extaddr_history:
-                extaddr_map[summary.extaddr_history[-1][1]] = summary.node_id
+        extaddr_map = self.summary_extaddr_map()
         if csv_path:
             collection = OtnsNodeSummaryCollection(self.otns_manager.node_summaries.values())
             data_frame = collection.to_csv(extaddr_map)
@@ -272,44 +518,205 @@ class SilkReplayer(object):
             for summary in self.otns_manager.node_summaries.values():
                 self.logger.debug(summary.to_string(extaddr_map))
 
-    def run(self, start_line: int = 0, stop_regex: str = None) -> int:
+    def summary_extaddr_map(self) -> Dict[int, int]:
+        """Map the last extended address of each summarized node to its node ID.
+        """
+        extaddr_map = {}
+        for summary in self.otns_manager.node_summaries.values():
+            if summary.extaddr_history:
+                extaddr_map[summary.extaddr_history[-1][1]] = summary.node_id
+        return extaddr_map
+
+    def summary_history(self) -> pandas.DataFrame:
+        """Get the history of the replayed nodes with one row per event.
+
+        Returns:
+            pandas.DataFrame: DataFrame of events, see OtnsNodeSummaryCollection.to_history.
+        """
+        collection = OtnsNodeSummaryCollection(self.otns_manager.node_summaries.values())
+        return collection.to_history(self.summary_extaddr_map())
+
+    @property
+    def log_index(self) -> LogIndex:
+        """Index of the input log, loaded or built on first use.
+        """
+        if self._log_index is None:
+            self._log_index = LogIndex.load(self.input_path, self.logger)
+        return self._log_index
+
+    def run_phase(self, phase: str) -> int:
+        """Replay the lines of a test class or test only, jumping to them through the log index.
+
+        Args:
+            phase (str): test class name, e.g. "TestFormNetwork", or test name, e.g. "TestFormNetwork.test01_Pairing".
+
+        Returns:
+            int: the last processed line number.
+        """
+        start_line, stop_line = self.log_index.phase_lines(phase)
+        return self.run(start_line=start_line, stop_line=stop_line)
+
+    def stop(self):
+        """Stop a replay following the log, from another thread.
+        """
+        self._stop_following.set()
+
+    def _rotated(self, file) -> bool:
+        """Check if the log file was replaced, or truncated, since it was opened.
+        """
+        try:
+            stat = os.stat(self.input_path)
+        except FileNotFoundError:
+            # moved away, the new log is not created yet
+            return False
+        return stat.st_ino != os.fstat(file.fileno()).st_ino or stat.st_size < file.tell()
+
+    def follow_lines(self, file, first_line: int, idle_timeout: float = None):
+        """Read the lines of the log as they are appended, like tail -f.
+
+        At the end of the log, the size and inode of the log are polled every poll_interval. A line is only yielded
+        once it is complete. When the log is rotated, the rest of the old log is read before reopening the log path,
+        whose line numbers start from 0 again. Reaching the end of the log the first time ends the catch up, see run.
+
+        Args:
+            file (IO): the log file, opened for reading.
+            first_line (int): line number of the next line of the file.
+            idle_timeout (float, optional): stop after this many seconds without a new line. Defaults to None, to
+                follow until stop() is called.
+
+        Yields:
+            Tuple[int, str]: line number and line.
+        """
+        line_number = first_line
+        partial_line = ""
+        idle_since = time.monotonic()
+        opened_file = None
+        try:
+            while not self._stop_following.is_set():
+                line = file.readline()
+                if line:
+                    idle_since = time.monotonic()
+                    if not line.endswith("\n"):
+                        partial_line += line
+                        continue
+                    yield line_number, partial_line + line
+                    partial_line = ""
+                    line_number += 1
+                elif self._rotated(file):
+                    self.logger.info(f"{self.input_path} rotated, reopening it")
+                    if opened_file is not None:
+                        opened_file.close()
+                    file = opened_file = open(file=self.input_path, mode="r")
+                    line_number = 0
+                    partial_line = ""
+                elif idle_timeout is not None and time.monotonic() - idle_since >= idle_timeout:
+                    return
+                else:
+                    self._catching_up = False
+                    # Do not wait again for the time spent waiting for the next line
+                    self.last_time = None
+                    self._stop_following.wait(self.poll_interval)
+        finally:
+            if opened_file is not None:
+                opened_file.close()
+
+    def run(self,
+            start_line: int = 0,
+            stop_regex: str = None,
+            stop_line: int = None,
+            start_time: datetime = None,
+            stop_time: datetime = None,
+            follow: bool = False,
+            idle_timeout: float = None,
+            from_end: bool = False) -> int:
         """Run the Silk log replayer.
 
-        This method provides two optional arguments to allow for unit testing.
+        Starting past the beginning of the log jumps close to the start through the log index instead of reading all
+        the lines before it. In analyze mode, the lines are processed without waiting for the time between them.
+        In follow mode, the replay does not stop at the end of the log but waits for new lines, see follow_lines. The
+        lines already in the log are replayed without waiting, so that the replay catches up with the running test
+        before following it in real time.
 
         Args:
             start_line (int, optional): start reading the log file at the specified line number. Defaults to 0.
             stop_regex (str, optional): stop running if the pattern matches a log line. Defaults to None.
+            stop_line (int, optional): stop running at the specified line number. Defaults to None.
+            start_time (datetime.datetime, optional): skip the lines logged before this time. Defaults to None.
+            stop_time (datetime.datetime, optional): stop running at the first line logged after this time.
+                Defaults to None.
+            follow (bool, optional): keep replaying the lines appended to the log. Defaults to False.
+            idle_timeout (float, optional): when following, stop after this many seconds without a new line.
+                Defaults to None, to follow until stop() is called.
+            from_end (bool, optional): when following, skip the lines already in the log and only replay the lines
+                appended afterwards. Defaults to False.
 
         Returns:
-            int: the last processed line number.
+            int: the last processed line number, or the line number running stopped at.
         """
         self.otns_manager.set_replay_speed(self.speed)
+        if start_line != self.next_line or start_time is not None or from_end:
+            # Do not wait for the time between the last processed line and the start
+            self.last_time = None
+
+        line_number = start_line
         with open(file=self.input_path, mode="r") as file:
-            for line_number, line in enumerate(file):
-                if line_number < start_line:
-                    continue
-                if stop_regex and re.search(stop_regex, line):
+            first_line = 0
+            if start_line > 0 or start_time is not None:
+                first_line = self.log_index.seek(file, start_line, start_time)
+            while first_line < start_line and file.readline():
+                first_line += 1
+
+            if follow:
+                if from_end:
+                    first_line = self.__seek_to_end(file)
+                self._stop_following.clear()
+                self._catching_up = not from_end
+                lines = self.follow_lines(file, first_line, idle_timeout)
+            else:
+                lines = enumerate(file, first_line)
+
+            for line_number, line in lines:
+                if line_number == stop_line or (stop_regex and re.search(stop_regex, line)):
+                    self.next_line = line_number
                     return line_number
-                line_match = re.search(RegexType.LOG_LINE.value, line)
+                line_match = LOG_LINE_REGEX.search(line)
                 if line_match:
-                    timestamp = datetime.strptime(line_match.group(1), DATE_FORMAT)
-                    if not self.last_time:
-                        self.last_time = timestamp
-                    time_diff = timestamp - self.last_time
-                    delay = time_diff.total_seconds() / self.speed
+                    timestamp = parse_log_time(line_match.group(1))
+                    if start_time is not None:
+                        if timestamp < start_time:
+                            continue
+                        start_time = None
+                    if stop_time is not None and timestamp > stop_time:
+                        self.next_line = line_number
+                        return line_number
+                    if self.last_time and not self.analyze and not (follow and self._catching_up):
+                        # delay for the time difference between two log lines
+                        delay = (timestamp - self.last_time).total_seconds() / self.speed
+                        if delay > 0:
+                            time.sleep(delay)
                     self.last_time = timestamp
 
-                    entity_name = line_match.group(2)
-                    message = line_match.group(4)
-
-                    # delay for the time difference between two log lines
-                    if delay > 0:
-                        time.sleep(delay)
-                    self.execute_message(entity_name, message, timestamp)
+                    self.execute_message(line_match.group(2), line_match.group(4), timestamp)
 
+            self.next_line = line_number + 1
             return line_number
 
+    def __seek_to_end(self, file) -> int:
+        """Move a log file opened for reading past its last complete line, jumping close to it through the log index.
+
+        Returns:
+            int: line number of the next line of the file.
+        """
+        line_number = self.log_index.seek(file, sys.maxsize)
+        while True:
+            position = file.tell()
+            line = file.readline()
+            if not line.endswith("\n"):
+                # a partially written line is read once complete
+                file.seek(position)
+                return line_number
+            line_number += 1
+
 
 if __name__ == "__main__":
     SilkReplayer(argv=sys.argv)
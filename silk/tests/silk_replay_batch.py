@@ -0,0 +1,252 @@
+# Copyright 2020 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Silk Test Log Batch Analyzer.
+
+Analyzes all the Silk logs of a results directory with the headless replayer, one log per worker process, and merges
+the node histories into one CSV with a test class column.
+
+The history of each log is cached in a CSV named after the content hash of the log and of the hardware config, so
+analyzing a directory again only replays the new or changed logs.
+"""
+
+from concurrent.futures import ProcessPoolExecutor
+import argparse
+import hashlib
+import logging
+import os
+import re
+import sys
+import tempfile
+from typing import List, Tuple
+
+import pandas
+
+from silk.tests.silk_replay import LOG_LINE_FORMAT, SilkReplayer
+
+LOG_FILENAME = "silk.log"
+CACHE_DIRNAME = ".silk_replay_cache"
+SUMMARY_FILENAME = "silk_replay_summary.csv"
+HASH_CHUNK_SIZE = 1024 * 1024
+# bump to invalidate the cached histories when the replay output changes
+CACHE_VERSION = b"1"
+
+# test output directories are named <start time>_<test class>, e.g. 2020-08-27_16.11.55_TestFormNetwork
+OUTPUT_DIRECTORY_REGEX = re.compile(r"\d{4}-\d{2}-\d{2}_\d{2}\.\d{2}\.\d{2}_(\w+)$")
+HISTORY_COLUMNS = ["test_class", "log", "timestamp", "node", "history", "event"]
+
+
+def find_logs(results_dir: str) -> List[str]:
+    """Find the Silk logs under a results directory.
+
+    Args:
+        results_dir (str): results directory.
+
+    Returns:
+        List[str]: sorted paths of the logs.
+    """
+    logs = []
+    for dir_path, dir_names, file_names in os.walk(results_dir):
+        dir_names[:] = [dir_name for dir_name in dir_names if dir_name != CACHE_DIRNAME]
+        if LOG_FILENAME in file_names:
+            logs.append(os.path.join(dir_path, LOG_FILENAME))
+    return sorted(logs)
+
+
+def class_name_of_log(log_path: str) -> str:
+    """Get the test class of a log from the name of its output directory, or the directory name if it does not match.
+    """
+    dir_name = os.path.basename(os.path.dirname(os.path.abspath(log_path)))
+    match = OUTPUT_DIRECTORY_REGEX.match(dir_name)
+    return match.group(1) if match else dir_name
+
+
+def hash_file(path: str, digest=None):
+    """Feed the content of a file to a SHA-256 digest.
+
+    Args:
+        path (str): file path.
+        digest (hashlib._Hash, optional): digest to update. Defaults to a new SHA-256 digest.
+
+    Returns:
+        hashlib._Hash: the updated digest.
+    """
+    if digest is None:
+        digest = hashlib.sha256()
+    with open(path, "rb") as file:
+        for chunk in iter(lambda: file.read(HASH_CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest
+
+
+def analyze_log(log_path: str, hw_conf_file: str, cache_dir: str, config_hash: str) -> Tuple[str, bool]:
+    """Replay a log headless and cache the history of its nodes, unless it is already cached.
+
+    Runs in a worker process.
+
+    Args:
+        log_path (str): path of the log.
+        hw_conf_file (str): hardware config file the log was recorded with.
+        cache_dir (str): directory of the cached histories.
+        config_hash (str): content hash of the hardware config file.
+
+    Returns:
+        Tuple[str, bool]: path of the cached history, and if it was cached before.
+    """
+    digest = hashlib.sha256(CACHE_VERSION + config_hash.encode())
+    cache_path = os.path.join(cache_dir, hash_file(log_path, digest).hexdigest() + ".csv")
+    if os.path.exists(cache_path):
+        return cache_path, True
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        replayer = SilkReplayer(
+            argv=["silk_replay.py", "-v0", "-c", hw_conf_file, "-r", temp_dir, "--analyze", log_path], run_now=False)
+        try:
+            replayer.run()
+            history = replayer.summary_history()
+        finally:
+            for handler in replayer.logger.handlers:
+                handler.close()
+
+    temp_path = f"{cache_path}.{os.getpid()}.tmp"
+    history.to_csv(temp_path, index=False)
+    os.replace(temp_path, cache_path)
+    return cache_path, False
+
+
+class SilkReplayBatch(object):
+    """Analyze the Silk logs of a results directory in parallel.
+
+    Attributes:
+        results_dir (str): directory searched for logs.
+        hw_conf_file (str): hardware config file the logs were recorded with.
+        cache_dir (str): directory of the cached histories.
+        jobs (int): number of worker processes, None for one per CPU.
+        output_path (str): path of the merged history CSV.
+        logger (logging.Logger): logger for the analyzer.
+
+        analyzed (List[str]): logs replayed by the last run.
+        cached (List[str]): logs whose history was cached before the last run.
+        failed (List[str]): logs that could not be replayed in the last run.
+    """
+
+    def __init__(self, argv=None, run_now: bool = True):
+        """Initialize a batch analyzer.
+
+        Args:
+            argv (List[str], optional): command line arguments. Defaults to None.
+            run_now (bool, optional): if the analyzer should start running immediately. Useful to set to False to
+                run tests on this class.
+        """
+        args = SilkReplayBatch.parse_args(argv)
+        self.results_dir = args.results_dir
+        self.hw_conf_file = args.hw_conf_file
+        self.cache_dir = args.cache_dir or os.path.join(args.results_dir, CACHE_DIRNAME)
+        self.jobs = args.jobs
+        self.output_path = args.output or os.path.join(args.results_dir, SUMMARY_FILENAME)
+
+        self.logger = logging.getLogger("silk_replay_batch")
+        logging.basicConfig(format=LOG_LINE_FORMAT)
+        self.logger.setLevel(logging.WARNING if args.verbosity == 0 else logging.INFO)
+
+        self.analyzed = []
+        self.cached = []
+        self.failed = []
+
+        if run_now:
+            self.run()
+
+    @staticmethod
+    def parse_args(argv):
+        """Parse arguments.
+
+        Args:
+            argv (List[str]): command line arguments.
+
+        Returns:
+            argparse.Namespace: parsed arguments attributes.
+        """
+        parser = argparse.ArgumentParser(description="Analyze the Silk test logs of a results directory")
+        parser.add_argument("-c",
+                            "--hwconfig",
+                            dest="hw_conf_file",
+                            metavar="ConfFile",
+                            default="/opt/openthread_test/hwconfig.ini",
+                            help="Name the hardware config file")
+        parser.add_argument("-v",
+                            "--verbose",
+                            "--verbosity",
+                            type=int,
+                            default=1,
+                            choices=list(range(0, 2)),
+                            dest="verbosity",
+                            metavar="X",
+                            help="Verbosity level (0=quiet, 1=default)")
+        parser.add_argument("-j",
+                            "--jobs",
+                            dest="jobs",
+                            type=int,
+                            metavar="Jobs",
+                            help="Number of logs analyzed in parallel, defaults to the number of CPUs")
+        parser.add_argument("-o",
+                            "--output",
+                            dest="output",
+                            metavar="OutputPath",
+                            help=f"Merged history CSV path, defaults to {SUMMARY_FILENAME} in the results directory")
+        parser.add_argument("--cache",
+                            dest="cache_dir",
+                            metavar="CachePath",
+                            help=f"Cached histories directory, defaults to {CACHE_DIRNAME} in the results directory")
+        parser.add_argument("results_dir", metavar="ResPath", help="Results directory to search for logs")
+        return parser.parse_args(argv[1:])
+
+    def run(self) -> pandas.DataFrame:
+        """Analyze the logs of the results directory, and write their merged history.
+
+        Returns:
+            pandas.DataFrame: merged history, see HISTORY_COLUMNS.
+        """
+        logs = find_logs(self.results_dir)
+        os.makedirs(self.cache_dir, exist_ok=True)
+        config_hash = hash_file(self.hw_conf_file).hexdigest()
+        self.analyzed, self.cached, self.failed = [], [], []
+
+        cache_paths = {}
+        with ProcessPoolExecutor(max_workers=self.jobs) as executor:
+            futures = [(log_path, executor.submit(analyze_log, log_path, self.hw_conf_file, self.cache_dir,
+                                                  config_hash)) for log_path in logs]
+            for log_path, future in futures:
+                try:
+                    cache_paths[log_path], cached = future.result()
+                except Exception as error:
+                    self.logger.warning(f"Failed to analyze {log_path}: {error}")
+                    self.failed.append(log_path)
+                    continue
+                (self.cached if cached else self.analyzed).append(log_path)
+
+        histories = []
+        for log_path, cache_path in cache_paths.items():
+            history = pandas.read_csv(cache_path)
+            history.insert(0, "log", os.path.relpath(log_path, self.results_dir))
+            history.insert(0, "test_class", class_name_of_log(log_path))
+            histories.append(history)
+        merged = pandas.concat(histories, ignore_index=True) if histories else pandas.DataFrame(columns=HISTORY_COLUMNS)
+        merged.to_csv(self.output_path, index=False)
+
+        self.logger.info(f"Analyzed {len(self.analyzed)} logs, {len(self.cached)} cached, {len(self.failed)} failed; "
+                         f"history written to {self.output_path}")
+        return merged
+
+
+if __name__ == "__main__":
+    SilkReplayBatch(argv=sys.argv)
@@ -16,6 +16,7 @@
 All Silk tests should inherit from this class.
 """
 
+from concurrent.futures import ThreadPoolExecutor
 import collections
 import json
 import logging
@@ -27,6 +28,7 @@ import traceback
 import unittest
 
 from silk.config import wpan_constants as wpan
+from silk.device.netns_topology import TopologyProvisioner
 from silk.hw.hw_resource import HardwareNotFound
 from silk.node.fifteen_four_dev_board import ThreadDevBoard
 from silk.tools.otns_manager import OtnsManager
@@ -43,6 +45,7 @@ CASE_ID = "case_id"
 PING_SENT = "pings_sent"
 PING_RECEIVED = "pings_received"
 PING_ROUND_TRIP_TIME = "ping_rtt"
+DEVICE_SET_UP_TIME = "device_set_up_time"
 
 _STREAM_VERBOSITY = 1
 _FILE_HANDLER = None
@@ -132,6 +135,19 @@ def get_framework_logger(output_dest):
     return new_logger
 
 
+class DeviceSetUpError(Exception):
+    """Raised when one or more devices fail to set up or tear down.
+
+    Attributes:
+        failures (dict): device name to the exception raised by that device.
+    """
+
+    def __init__(self, action, failures):
+        self.failures = failures
+        message = "; ".join("%s: %r" % (name, error) for name, error in failures.items())
+        super().__init__("%s failed on %d device(s): %s" % (action, len(failures), message))
+
+
 def setup_decorator(func):
     """This decorator should be used as a wrapper for all setUp methods in silk.
 
@@ -263,6 +279,7 @@ def setup_class_decorator(func):
             json.dump(cls.results, output_file, indent=4)
             output_file.close()
 
+            cls.tear_down_topology()
             raise
 
         except:
@@ -283,6 +300,7 @@ def setup_class_decorator(func):
             cls.logger.info(("%s" % cls.__name__).ljust(34, ".") + "FAILED SETUPCLASS".rjust(34, "."))
             cls.logger.info("=" * 70)
             cls.release_devices()
+            cls.tear_down_topology()
             raise
 
     return wrapper
@@ -307,6 +325,7 @@ def teardown_class_decorator(func):
 
         # Call the user teardown class function
         func(*args, **kwargs)
+        cls.tear_down_topology()
 
         cls.logger.info("TEAR DOWN CLASS DONE %s" % cls.current_test_class)
 
@@ -318,7 +337,7 @@ def teardown_class_decorator(func):
             cls.logger.info(test_class)
 
             for test_case in cls.results[test_class]:
-                if test_case == SUITE_ID:
+                if test_case in (SUITE_ID, DEVICE_SET_UP_TIME):
                     continue
 
                 test_case_name = test_case
@@ -349,6 +368,7 @@ def teardown_class_decorator(func):
         if cls.otns_manager:
             cls.otns_manager.unsubscribe_from_all_nodes()
             cls.otns_manager.set_test_title("")
+            cls.otns_manager.close()
 
     return wrapper
 
@@ -640,13 +660,108 @@ class TestCase(unittest.TestCase):
                 if cls.otns_manager and isinstance(device, ThreadDevBoard):
                     cls.otns_manager.remove_node(device)
 
+    @classmethod
+    def set_up_devices(cls, devices, max_workers=None):
+        """Call set_up() on all `devices` concurrently.
+
+        The time each device took is recorded in the results. When any device fails, the remaining ones still
+        finish and a DeviceSetUpError listing every failure is raised; the setup_class_decorator then releases all
+        claimed hardware.
+
+        Args:
+            devices (list): devices to set up.
+            max_workers (int, optional): maximum number of devices set up at once.
+                Defaults to silk.config.defaults.DEVICE_SET_UP_MAX_WORKERS.
+        """
+        durations = cls.results[cls.current_test_class].setdefault(DEVICE_SET_UP_TIME, collections.OrderedDict())
+        cls._run_on_devices("set_up", devices, max_workers, durations)
+
+    @classmethod
+    def tear_down_devices(cls, devices, max_workers=None):
+        """Call tear_down() on all `devices` concurrently.
+
+        Args:
+            devices (list): devices to tear down.
+            max_workers (int, optional): maximum number of devices torn down at once.
+                Defaults to silk.config.defaults.DEVICE_SET_UP_MAX_WORKERS.
+        """
+        cls._run_on_devices("tear_down", devices, max_workers)
+
+    @classmethod
+    def _run_on_devices(cls, action, devices, max_workers=None, durations=None):
+        """Call the `action` method of all `devices` on a bounded thread pool and collect failures per device.
+        """
+        devices = list(devices)
+        if not devices:
+            return
+        if max_workers is None:
+            max_workers = silk.config.defaults.DEVICE_SET_UP_MAX_WORKERS
+
+        elapsed = {}
+
+        def run(device):
+            start_time = time.time()
+            try:
+                getattr(device, action)()
+            finally:
+                elapsed[device.name] = round(time.time() - start_time, 3)
+
+        cls.logger.info("Running %s on %d device(s)" % (action, len(devices)))
+        failures = collections.OrderedDict()
+        with ThreadPoolExecutor(max_workers=min(max_workers, len(devices))) as executor:
+            futures = [(device, executor.submit(run, device)) for device in devices]
+            for device, future in futures:
+                error = future.exception()
+                if error is not None:
+                    cls.logger.error("%s failed on %s: %r" % (action, device.name, error))
+                    failures[device.name] = error
+                if durations is not None:
+                    durations[device.name] = elapsed[device.name]
+
+        if failures:
+            raise DeviceSetUpError(action, failures)
+
+    @classmethod
+    def provision_topology(cls):
+        """Context manager creating the network namespaces of the nodes constructed in its block in bulk.
+
+        The namespaces, veth links, addresses and routes of the nodes are collected and applied in one batch at the
+        end of the block, then deleted in one batch on tearDownClass. Use it in setUpClass:
+
+            with cls.provision_topology():
+                cls.router = ffdb.ThreadDevBoard()
+                cls.router.configure_virtual_eth_peer("v-eth1")
+
+        Raises:
+            TopologyError: at the end of the block, if the topology could not be provisioned.
+        """
+        cls.topology = TopologyProvisioner(logger=cls.logger.getChild("topology"))
+        return cls.topology.collect()
+
+    @classmethod
+    def tear_down_topology(cls):
+        """Delete the topology created by provision_topology(), if any.
+        """
+        topology = getattr(cls, "topology", None)
+        if topology is not None:
+            topology.tear_down()
+            cls.topology = None
+
     @classmethod
     def release_devices(cls):
         # Release any claimed hardware
+        devices = list(getattr(cls, "device_list", []))
         for attr in dir(cls):
             device = getattr(cls, attr)
-            if isinstance(device, silk.node.base_node.BaseNode):
-                device.tear_down()
+            if isinstance(device, silk.node.base_node.BaseNode) and device not in devices:
+                devices.append(device)
+
+        try:
+            cls.tear_down_devices(devices)
+        except DeviceSetUpError:
+            pass
+
+        for device in devices:
             if cls.otns_manager and isinstance(device, ThreadDevBoard):
                 cls.otns_manager.remove_node(device)
 
@@ -0,0 +1,154 @@
+# Copyright 2020 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Record of the firmware image installed on each board.
+
+For every board (keyed by its DUT serial number) the cache keeps the content hash of the last image that was flashed
+and verified, and the NCP version string the board reported afterwards. A board whose record matches both the image
+to flash and its current NCP version does not need to be flashed again.
+
+The record is a small JSON file kept next to hwconfig.ini.
+"""
+
+import datetime
+import hashlib
+import json
+import os
+import threading
+
+import silk.hw.hw_resource as hw_resource
+
+FIRMWARE_CACHE_FILENAME = "firmware_cache.json"
+HASH_CHUNK_SIZE = 1024 * 1024
+
+IMAGE_HASH = "image_hash"
+IMAGE_PATH = "image_path"
+NCP_VERSION = "ncp_version"
+FLASHED_AT = "flashed_at"
+
+# Text of wpanctl messages returned instead of a version, e.g. when wpantund is not running
+VERSION_ERRORS = ("error", "failed", "not found", "unable to")
+
+
+def hash_image(fw_file: str) -> str:
+    """Compute the SHA-256 hash of a firmware image file.
+
+    Args:
+        fw_file (str): firmware image path.
+
+    Returns:
+        str: hex digest of the image content.
+    """
+    digest = hashlib.sha256()
+    with open(fw_file, "rb") as image:
+        for chunk in iter(lambda: image.read(HASH_CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def is_valid_version(ncp_version: str) -> bool:
+    """Check whether an NCP version string was actually read from the board, rather than a wpanctl error message.
+    """
+    if not ncp_version or "\n" in ncp_version.strip():
+        return False
+    lower_version = ncp_version.lower()
+    return not any(error in lower_version for error in VERSION_ERRORS)
+
+
+class FirmwareCache(object):
+    """Per-board record of the last successfully flashed firmware image.
+
+    Attributes:
+        path (str): path of the JSON record file.
+    """
+
+    def __init__(self, path: str = None):
+        """Initialize a firmware cache and load the existing record, if any.
+
+        Args:
+            path (str, optional): path of the JSON record file. Defaults to FIRMWARE_CACHE_FILENAME next to the
+                hardware config file.
+        """
+        if path is None:
+            config_dir = os.path.dirname(hw_resource.global_instance().config_filename)
+            path = os.path.join(config_dir, FIRMWARE_CACHE_FILENAME)
+
+        self.path = path
+        self._lock = threading.Lock()
+        self._records = {}
+        if os.path.isfile(path):
+            with open(path) as record_file:
+                self._records = json.load(record_file)
+
+    def get(self, serial: str) -> dict:
+        """Get the record of a board, or None if the board has no record.
+        """
+        with self._lock:
+            record = self._records.get(serial)
+            return dict(record) if record is not None else None
+
+    def is_current(self, serial: str, image_hash: str, ncp_version: str) -> bool:
+        """Check whether a board already runs the given image.
+
+        A board is current when its record has the same image hash and NCP version. A record without a version,
+        e.g. when the version could not be read after the flash, never matches.
+
+        Args:
+            serial (str): board DUT serial number.
+            image_hash (str): hash of the image to flash.
+            ncp_version (str): NCP version the board reports now.
+
+        Returns:
+            bool: True if flashing can be skipped.
+        """
+        if not is_valid_version(ncp_version):
+            return False
+
+        with self._lock:
+            record = self._records.get(serial)
+            if record is None or record[IMAGE_HASH] != image_hash:
+                return False
+
+            return record[NCP_VERSION] == ncp_version
+
+    def record_flash(self, serial: str, fw_file: str, image_hash: str, ncp_version: str = None):
+        """Record a successful and verified flash.
+
+        Args:
+            serial (str): board DUT serial number.
+            fw_file (str): firmware image path.
+            image_hash (str): hash of the flashed image.
+            ncp_version (str, optional): NCP version read after flashing. Without a valid version the board is flashed
+                again on the next run.
+        """
+        with self._lock:
+            self._records[serial] = {
+                IMAGE_HASH: image_hash,
+                IMAGE_PATH: fw_file,
+                NCP_VERSION: ncp_version if is_valid_version(ncp_version) else None,
+                FLASHED_AT: datetime.datetime.now().isoformat(),
+            }
+            self.__save()
+
+    def invalidate(self, serial: str):
+        """Forget the record of a board, e.g. after a failed flash.
+        """
+        with self._lock:
+            if self._records.pop(serial, None) is not None:
+                self.__save()
+
+    def __save(self):
+        temp_path = self.path + ".tmp"
+        with open(temp_path, "w") as record_file:
+            json.dump(self._records, record_file, sort_keys=True, indent=2)
+        os.replace(temp_path, self.path)
@@ -0,0 +1,221 @@
+# Copyright 2020 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Concurrent firmware flashing for many dev boards.
+
+Boards are flashed in parallel, with a limit on how many boards behind the same USB hub are flashed at once, since
+the hub bandwidth and power budget are shared. Each board is flashed with its own flash_firmware() method, which runs
+the flashing scripts and verifies their output, and is retried on failure.
+
+With a FirmwareCache, boards that already run the image (same image hash and NCP version as their last verified flash)
+are skipped. wpantund is then restarted on each flashed board to read the NCP version of the new image.
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+import collections
+import datetime
+import json
+import logging
+import os
+import re
+import threading
+import time
+
+from silk.node.fifteen_four_dev_board import LOG_PATH
+from silk.tools.firmware_cache import hash_image
+import silk.config.defaults as defaults
+
+UNKNOWN_HUB = "unknown"
+
+# A USB port in sysfs, e.g. "1-1.3" is port 3 of the hub on port 1 of bus 1
+USB_PORT_REGEX = re.compile(r"(?P<bus>\d+)-(?P<ports>[\d.]+)")
+
+FlashResult = collections.namedtuple("FlashResult",
+                                     ["name", "serial", "hub", "success", "attempts", "duration", "error", "skipped"])
+
+
+def usb_hub_of(port: str) -> str:
+    """Find the USB hub a serial device is attached to.
+
+    Args:
+        port (str): serial device path, e.g. /dev/ttyACM0.
+
+    Returns:
+        str: sysfs name of the hub, e.g. "1-1" or "usb1" for a root hub, or UNKNOWN_HUB.
+    """
+    if not port:
+        return UNKNOWN_HUB
+
+    device_path = os.path.realpath("/sys/class/tty/%s/device" % os.path.basename(port))
+    for component in reversed(device_path.split("/")):
+        match = USB_PORT_REGEX.fullmatch(component)
+        if match is not None:
+            if "." in match.group("ports"):
+                return component.rsplit(".", 1)[0]
+            return "usb" + match.group("bus")
+    return UNKNOWN_HUB
+
+
+class FleetFlasher(object):
+    """Flash a firmware image onto many boards concurrently.
+
+    Attributes:
+        max_per_hub (int): maximum number of boards flashed at once behind one USB hub.
+        retries (int): number of times a failed flash is retried.
+        retry_delay (float): seconds to wait before retrying a failed flash.
+        cache (FirmwareCache): record of installed images, or None to always flash.
+        logger (logging.Logger): logger for the flasher.
+    """
+
+    def __init__(self,
+                 max_per_hub: int = None,
+                 retries: int = None,
+                 retry_delay: float = 5,
+                 hub_of=usb_hub_of,
+                 cache=None,
+                 logger: logging.Logger = None):
+        """Initialize a fleet flasher.
+
+        Args:
+            max_per_hub (int, optional): maximum number of boards flashed at once behind one USB hub.
+                Defaults to defaults.FLASH_MAX_PER_HUB.
+            retries (int, optional): number of times a failed flash is retried. Defaults to defaults.FLASH_RETRIES.
+            retry_delay (float, optional): seconds to wait before retrying a failed flash. Defaults to 5.
+            hub_of (Callable[[str], str], optional): maps a board's serial port to its USB hub.
+                Defaults to usb_hub_of.
+            cache (FirmwareCache, optional): record of installed images used to skip boards that are up to date.
+                Defaults to None, which always flashes.
+            logger (logging.Logger, optional): logger for the flasher. Defaults to the module logger.
+        """
+        self.max_per_hub = max_per_hub if max_per_hub is not None else defaults.FLASH_MAX_PER_HUB
+        self.retries = retries if retries is not None else defaults.FLASH_RETRIES
+        self.retry_delay = retry_delay
+        self.hub_of = hub_of
+        self.cache = cache
+        self.logger = logger or logging.getLogger(__name__)
+
+        self._hub_semaphores = {}
+        self._lock = threading.Lock()
+
+    def flash(self, boards, fw_file: str, result_log_path: str = None, force: bool = False):
+        """Flash `fw_file` onto all `boards` and wait for all of them to finish.
+
+        Processes running in each board's network namespace are stopped before it is flashed. With a cache, wpantund
+        is restarted on the boards flashed successfully to record their NCP version.
+
+        Args:
+            boards (List[ThreadDevBoard]): boards to flash.
+            fw_file (str): firmware image path.
+            result_log_path (str, optional): directory for the flashing logs, one subdirectory per board.
+                Defaults to a new dated directory under the node log path.
+            force (bool, optional): flash every board even if the cache says it is up to date. Defaults to False.
+
+        Returns:
+            List[FlashResult]: result of each board, in the order of `boards`.
+        """
+        boards = list(boards)
+        if not boards:
+            return []
+
+        if result_log_path is None:
+            result_log_path = LOG_PATH + datetime.datetime.now().strftime("%b%d%Y_%H_%M_%S")
+
+        image_hash = hash_image(fw_file) if self.cache is not None else None
+
+        self.logger.info("Flashing {} onto {} board(s)".format(fw_file, len(boards)))
+        with ThreadPoolExecutor(max_workers=len(boards)) as executor:
+            futures = [
+                executor.submit(self.__flash_board, board, fw_file, result_log_path, image_hash, force)
+                for board in boards
+            ]
+            results = [future.result() for future in futures]
+
+        for result in results:
+            if result.skipped:
+                self.logger.info("{} ({}): image already installed, skipped".format(result.name, result.serial))
+                continue
+            self.logger.info("{} ({}, hub {}): {} after {} attempt(s) in {:.1f}s{}".format(
+                result.name, result.serial, result.hub, "PASS" if result.success else "FAIL", result.attempts,
+                result.duration, ": " + result.error if result.error else ""))
+        return results
+
+    @staticmethod
+    def write_report(results, path: str):
+        """Write flashing results to a JSON file.
+
+        Args:
+            results (List[FlashResult]): results returned by flash().
+            path (str): report file path.
+        """
+        with open(path, "w") as report_file:
+            json.dump([result._asdict() for result in results], report_file, indent=4)
+
+    def __hub_semaphore(self, hub: str) -> threading.Semaphore:
+        with self._lock:
+            if hub not in self._hub_semaphores:
+                self._hub_semaphores[hub] = threading.BoundedSemaphore(self.max_per_hub)
+            return self._hub_semaphores[hub]
+
+    def __flash_board(self, board, fw_file: str, result_log_path: str, image_hash: str, force: bool) -> FlashResult:
+        serial = board.device.get_dut_serial()
+        hub = self.hub_of(board.device.port())
+        log_path = os.path.join(result_log_path, str(serial))
+
+        start_time = time.time()
+        if self.cache is not None and not force:
+            if self.cache.is_current(serial, image_hash, self.__read_version(board)):
+                return FlashResult(board.name, serial, hub, True, 0, round(time.time() - start_time, 3), None, True)
+
+        success = False
+        error = None
+        attempts = 0
+        with self.__hub_semaphore(hub):
+            board.netns_killall()
+            while attempts <= self.retries and not success:
+                if attempts > 0:
+                    self.logger.warning("Retrying flash of {} ({}/{})".format(board.name, attempts, self.retries))
+                    time.sleep(self.retry_delay)
+                attempts += 1
+                try:
+                    success = board.flash_firmware(fw_file, log_path)
+                    error = None if success else "image flash not verified"
+                except ValueError as e:
+                    error = str(e)
+                    break
+                except Exception as e:
+                    error = repr(e)
+
+        if self.cache is not None:
+            if success:
+                self.cache.record_flash(serial, fw_file, image_hash, self.__read_flashed_version(board))
+            else:
+                self.cache.invalidate(serial)
+
+        return FlashResult(board.name, serial, hub, success, attempts, round(time.time() - start_time, 3), error,
+                           False)
+
+    def __read_version(self, board) -> str:
+        try:
+            return board.firmware_version()
+        except Exception as e:
+            self.logger.debug("Cannot read NCP version of {}: {!r}".format(board.name, e))
+            return None
+
+    def __read_flashed_version(self, board) -> str:
+        # wpantund was stopped for the flash, the flashed image reports its version once it runs again
+        try:
+            board.restart_wpantund()
+        except Exception as e:
+            self.logger.warning("Cannot restart wpantund on {} after flashing: {!r}".format(board.name, e))
+            return None
+        return self.__read_version(board)
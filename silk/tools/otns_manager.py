@@ -18,12 +18,14 @@ dispatcher, for visualization purposes.
 """
 
 from datetime import datetime
+import collections
 import enum
 import logging
 import math
-import re
 import socket
 import struct
+import threading
+import time
 from typing import Dict, List, Tuple
 
 import grpc
@@ -33,13 +35,17 @@ from silk.hw.hw_module import HwModule
 from silk.node.fifteen_four_dev_board import ThreadDevBoard
 from silk.tools.pb import visualize_grpc_pb2
 from silk.tools.pb import visualize_grpc_pb2_grpc
-from silk.utils import signal
+from silk.utils import signal, wpantund_log
 from silk.utils.network import get_local_ip
+from silk.utils.wpantund_log import LogEventType
+import silk.config.defaults as defaults
 
 DATE_FORMAT = "%Y-%m-%d %H:%M:%S,%f"
 
 GRPC_SERVER_PORT = 8999
 SERVER_PORT = 9000
+# maximum data size of status events joined by the event transport
+MAX_STATUS_SIZE = 1024
 
 
 class RegexType(enum.Enum):
@@ -265,6 +271,131 @@ class Event:
         return self.data.decode("ascii")
 
 
+class EventTransport(object):
+    """Batched transport of the OTNS events of all nodes.
+
+    Events are queued by the nodes and sent by one sender thread every window, instead of one sendto per event in the
+    caller. OTNS tells nodes apart by the source port of their events, so each node still sends from its own socket,
+    but the consecutive status events of a node are joined in one datagram with ";", which OTNS splits status pushes
+    on. The events of each node are sent in order.
+
+    Attributes:
+        window (float): seconds events are held to be sent together.
+        max_size (int): maximum data size of joined status events.
+        logger (logging.Logger): logger for the transport.
+        sent_datagrams (int): number of datagrams sent.
+    """
+
+    def __init__(self, window: float, logger: logging.Logger, max_size: int = MAX_STATUS_SIZE):
+        """Initialize an event transport.
+
+        Args:
+            window (float): seconds events are held to be sent together.
+            logger (logging.Logger): logger for the transport.
+            max_size (int, optional): maximum data size of joined status events. Defaults to MAX_STATUS_SIZE.
+        """
+        self.window = window
+        self.max_size = max_size
+        self.logger = logger
+        self.sent_datagrams = 0
+
+        self._pending = []
+        self._condition = threading.Condition()
+        self._send_lock = threading.Lock()
+        self._thread = None
+        self._closed = False
+
+    def send(self, node: "OtnsNode", event_packet: bytes):
+        """Queue an event of a node.
+
+        Args:
+            node (OtnsNode): node sending the event.
+            event_packet (bytes): packaged event content in bytes.
+        """
+        with self._condition:
+            if self._closed:
+                node.sock.sendto(event_packet, node.dest_addr)
+                return
+            self._pending.append((node, event_packet))
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="OtnsEventTransport", daemon=True)
+                self._thread.start()
+            if len(self._pending) == 1:
+                self._condition.notify()
+
+    def _run(self):
+        """Send the queued events every window, until the transport is closed.
+        """
+        while True:
+            with self._condition:
+                while not self._pending and not self._closed:
+                    self._condition.wait()
+                if self._closed:
+                    return
+            time.sleep(self.window)
+            self.flush()
+
+    def flush(self):
+        """Send the queued events now.
+        """
+        with self._send_lock:
+            with self._condition:
+                pending, self._pending = self._pending, []
+
+            node_packets = collections.OrderedDict()
+            for node, event_packet in pending:
+                node_packets.setdefault(node, []).append(event_packet)
+
+            for node, event_packets in node_packets.items():
+                for datagram in self.coalesce(event_packets):
+                    try:
+                        node.sock.sendto(datagram, node.dest_addr)
+                    except OSError as error:
+                        self.logger.debug(f"Node {node.node_id} failed to send an event: {error}")
+                        break
+                    self.sent_datagrams += 1
+
+    def coalesce(self, event_packets: List[bytes]) -> List[bytes]:
+        """Join the consecutive status events of a node, up to max_size.
+
+        Args:
+            event_packets (List[bytes]): packaged events of a node, in order.
+
+        Returns:
+            List[bytes]: datagrams to send, in order.
+        """
+        datagrams = []
+        status = None
+        status_event = EventType.OTNS_STATUS_PUSH.value
+        for event_packet in event_packets:
+            delay, event, length = struct.unpack_from("<QBH", event_packet)
+            if event == status_event and delay == 0:
+                if status is not None and len(status) + 1 + length <= self.max_size:
+                    status += b";" + event_packet[11:]
+                    continue
+                if status is not None:
+                    datagrams.append(Event(status, EventType.OTNS_STATUS_PUSH).to_bytes())
+                status = event_packet[11:]
+            else:
+                if status is not None:
+                    datagrams.append(Event(status, EventType.OTNS_STATUS_PUSH).to_bytes())
+                    status = None
+                datagrams.append(event_packet)
+        if status is not None:
+            datagrams.append(Event(status, EventType.OTNS_STATUS_PUSH).to_bytes())
+        return datagrams
+
+    def close(self):
+        """Send the queued events and stop the sender thread. Events sent afterwards are sent at once.
+        """
+        with self._condition:
+            self._closed = True
+            self._condition.notify()
+        if self._thread is not None:
+            self._thread.join()
+        self.flush()
+
+
 class OtnsNode(object):
     """Class that represents a Thread network node for OTNS integration.
 
@@ -277,7 +408,8 @@ class OtnsNode(object):
         source_addr (str, int): UDP source address.
         dest_addr (str, int): UDP destination address.
 
-        grpc_client (GRpcClient): gRPC client instance from the manager.
+        grpc_client (GRpcClient): gRPC client instance from the manager, None for a headless node.
+        transport (EventTransport): transport batching the events of the node, None to send each event at once.
         logger (logging.Logger): logger for the node.
         node_on_otns (bool): if the node has been reported to OTNS.
 
@@ -287,8 +419,17 @@ class OtnsNode(object):
         neighbors (List[int]): extended addresses of neighbors.
     """
 
-    def __init__(self, node_id: int, dut_serial: str, vis_x: int, vis_y: int, local_host: str, server_host: str,
-                 server_port: int, grpc_client: GRpcClient, logger: logging.Logger):
+    def __init__(self,
+                 node_id: int,
+                 dut_serial: str,
+                 vis_x: int,
+                 vis_y: int,
+                 local_host: str,
+                 server_host: str,
+                 server_port: int,
+                 grpc_client: GRpcClient,
+                 logger: logging.Logger,
+                 transport: EventTransport = None):
         """Initialize a node.
 
         Args:
@@ -299,8 +440,11 @@ class OtnsNode(object):
             local_host (str): host address of this machine.
             server_host (str): host address of the OTNS dispatcher.
             server_port (int): port number of the OTNS dispatcher.
-            grpc_client (GRpcClient): gRPC client instance from the manager.
+            grpc_client (GRpcClient): gRPC client instance from the manager. None for a headless node, which only keeps
+                track of its state without any socket or message to OTNS.
             logger (logging.Logger): logger for the node.
+            transport (EventTransport, optional): transport batching the events of the node. Defaults to None, to
+                send each event at once.
         """
         assert node_id > 0
 
@@ -309,17 +453,19 @@ class OtnsNode(object):
 
         self.logger = logger
 
-        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.sock = None
         self.source_addr = (local_host, server_port + node_id)
         self.dest_addr = (server_host, server_port)
-        self.logger.debug("Node {:d} socket from {:s}:{:d} to {:s}:{:d}".format(self.node_id, self.source_addr[0],
-                                                                                self.source_addr[1], self.dest_addr[0],
-                                                                                self.dest_addr[1]))
-        self.sock.bind(self.source_addr)
+        if grpc_client is not None:
+            self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+            self.logger.debug("Node {:d} socket from {:s}:{:d} to {:s}:{:d}".format(
+                self.node_id, self.source_addr[0], self.source_addr[1], self.dest_addr[0], self.dest_addr[1]))
+            self.sock.bind(self.source_addr)
 
         self.vis_x = vis_x
         self.vis_y = vis_y
         self.grpc_client = grpc_client
+        self.transport = transport
 
         self.extaddr = node_id
         self.role = RoleType.DISABLED
@@ -336,7 +482,10 @@ class OtnsNode(object):
     def close_socket(self):
         """Close the node's socket connection.
         """
-        self.sock.close()
+        if self.sock is not None:
+            if self.transport is not None:
+                self.transport.flush()
+            self.sock.close()
 
     def send_event(self, event_packet: bytes):
         """Send event bytes packet.
@@ -344,7 +493,12 @@ class OtnsNode(object):
         Args:
             event_packet (bytes): packaged event content in bytes.
         """
-        self.sock.sendto(event_packet, self.dest_addr)
+        if self.sock is None:
+            return
+        if self.transport is not None:
+            self.transport.send(self, event_packet)
+        else:
+            self.sock.sendto(event_packet, self.dest_addr)
 
     def send_extaddr_event(self):
         """Send extaddr event.
@@ -466,6 +620,8 @@ class OtnsNode(object):
     def create_otns_node(self):
         """Call gRPC client to create a node on server for itself.
         """
+        if self.grpc_client is None:
+            return
         if self.node_on_otns:
             self.logger.debug(f"Node {self.node_id} already on OTNS while trying to create")
             return
@@ -478,6 +634,8 @@ class OtnsNode(object):
     def delete_otns_node(self):
         """Call gRPC client to remove the node on server for itself.
         """
+        if self.grpc_client is None:
+            return
         if not self.node_on_otns:
             self.logger.debug(f"Node {self.node_id} not on OTNS while trying to delete")
             return
@@ -488,6 +646,8 @@ class OtnsNode(object):
     def update_otns_vis_position(self):
         """Call gRPC client to update the node's visualization position.
         """
+        if self.grpc_client is None:
+            return
         self.logger.debug(f"Moving node {self.node_id} to OTNS at ({self.vis_x},{self.vis_y})")
         self.grpc_client.move_node(self.node_id, self.vis_x, self.vis_y)
 
@@ -506,6 +666,9 @@ class WpantundOtnsMonitor(signal.Subscriber):
         otns_manager (OtnsManager): OTNS manager instance the monitor was created from.
     """
 
+    # Only OTNS status, extended address query and NCP version lines are processed
+    line_keywords = wpantund_log.OTNS_KEYWORDS
+
     def __init__(self, publisher: signal.Publisher, node: OtnsNode, otns_manager: "OtnsManager"):
         """Initialize a wpantund monitor.
 
@@ -761,13 +924,37 @@ class OtnsNodeSummaryCollection(object):
 
         return pandas.DataFrame(events, columns=columns)
 
+    def to_history(self, extaddr_map: Dict[int, int]) -> pandas.DataFrame:
+        """Generate the history of the nodes with one row per event, to be merged with the history of other logs.
+
+        Args:
+            extaddr_map (Dict[int, int]): table mapping extaddr to node ID.
+
+        Returns:
+            pandas.DataFrame: DataFrame of events, with the timestamp, node ID, history kind (extaddr, role, children
+                or neighbors) and the formatted event, ordered by time.
+        """
+        events = []
+        for summary in self.collection:
+            histories = [("extaddr", summary.format_extaddr_history()), ("role", summary.format_role_history()),
+                         ("children", summary.format_children_history(extaddr_map)),
+                         ("neighbors", summary.format_neighbors_history(extaddr_map))]
+            for kind, history in histories:
+                events.extend([(time, summary.node_id, kind, string) for time, string in history])
+        events.sort(key=lambda an_event: an_event[0])
+
+        rows = [(time.strftime(DATE_FORMAT)[:-3], node_id, kind, string) for time, node_id, kind, string in events]
+        return pandas.DataFrame(rows, columns=["timestamp", "node", "history", "event"])
+
 
 class OtnsManager(object):
     """OTNS communication manager for a test case.
 
     Attributes:
         server_host (str): host address of OTNS dispatcher.
-        grpc_client (GRpcClient): OTNS gRPC client.
+        grpc_client (GRpcClient): OTNS gRPC client, None for a headless manager.
+        event_transport (EventTransport): transport batching the events of all nodes, None unless
+            defaults.OTNS_EVENT_BATCH_WINDOW is set.
         otns_node_map (Dict[ThreadDevBoard, OtnsNode]): map from device to OTNS node.
         otns_monitor_map (Dict[ThreadDevBoard, WpantundOtnsMonitor]): map from device to OTNS monitor.
         local_host (str): host of this local machine.
@@ -775,18 +962,28 @@ class OtnsManager(object):
         auto_layout (bool): if manager should auto layout node positions.
         max_node_count (int): the maximum number of nodes ever managed by this manager.
         node_summaries (Dict[int, OtnsNodeSummary]): map from node ID to OtnsNodeSummary instances.
+        headless (bool): if the manager only tracks the node states and summaries, without any I/O with OTNS.
     """
 
-    def __init__(self, server_host: str, logger: logging.Logger):
+    def __init__(self, server_host: str, logger: logging.Logger, headless: bool = False):
         """Initialize an OTNS manager.
 
         Args:
             server_host (str): host address of OTNS dispatcher.
             logger (logging.Logger): logger for the manager.
+            headless (bool, optional): if the manager should not connect to OTNS, e.g. to only produce the node
+                summaries of a log. Defaults to False.
         """
         self.server_host = server_host
-        self.grpc_client = GRpcClient(server_addr=f"{server_host}:{GRPC_SERVER_PORT}",
-                                      logger=logger.getChild("gRPCClient"))
+        self.headless = headless
+        self.grpc_client = None
+        self.event_transport = None
+        if not headless:
+            self.grpc_client = GRpcClient(server_addr=f"{server_host}:{GRPC_SERVER_PORT}",
+                                          logger=logger.getChild("gRPCClient"))
+            if defaults.OTNS_EVENT_BATCH_WINDOW > 0:
+                self.event_transport = EventTransport(window=defaults.OTNS_EVENT_BATCH_WINDOW,
+                                                      logger=logger.getChild("EventTransport"))
         self.otns_node_map = {}
         self.otns_monitor_map = {}
 
@@ -794,10 +991,13 @@ class OtnsManager(object):
         self.max_node_count = 0
         self.node_summaries = {}
 
-        self.local_host = get_local_ip()
-
         self.logger = logger
-        self.logger.info(f"OTNS manager created, connect {self.local_host} to {server_host}.")
+        if headless:
+            self.local_host = None
+            self.logger.info("Headless OTNS manager created.")
+        else:
+            self.local_host = get_local_ip()
+            self.logger.info(f"OTNS manager created, connect {self.local_host} to {server_host}.")
 
     def wait_for_grpc_channel_ready(self, timeout: int = 10):
         """Blocking method that waits for the gRPC channel to be ready.
@@ -805,7 +1005,8 @@ class OtnsManager(object):
         Args:
             timeout (int, optional): wait timeout. Defaults to 10.
         """
-        self.grpc_client.wait_for_channel_ready(timeout)
+        if not self.headless:
+            self.grpc_client.wait_for_channel_ready(timeout)
 
     def set_test_title(self, title: str):
         """Set title of the test case.
@@ -813,7 +1014,8 @@ class OtnsManager(object):
         Args:
             title (str): title of the test case.
         """
-        self.grpc_client.set_title(title)
+        if not self.headless:
+            self.grpc_client.set_title(title)
 
     def set_replay_speed(self, speed: float):
         """Set speed of the replaying test log.
@@ -821,7 +1023,8 @@ class OtnsManager(object):
         Args:
             speed (float): speed of the replaying test log.
         """
-        self.grpc_client.set_speed(speed)
+        if not self.headless:
+            self.grpc_client.set_speed(speed)
 
     def add_device(self, device: HwModule) -> OtnsNode:
         """Add a hardware module to OTNS manager.
@@ -848,7 +1051,8 @@ class OtnsManager(object):
                              server_host=self.server_host,
                              server_port=SERVER_PORT,
                              grpc_client=self.grpc_client,
-                             logger=self.logger.getChild(f"OtnsNode{node_id}"))
+                             logger=self.logger.getChild(f"OtnsNode{node_id}"),
+                             transport=self.event_transport)
         self.logger.debug(f"Adding new node {node_id} to OTNS")
         otns_node.create_otns_node()
         return otns_node
@@ -907,6 +1111,19 @@ class OtnsManager(object):
         for node in nodes:
             self.remove_node(node)
 
+    def close(self):
+        """Stop batching events: send the queued events and stop the sender thread of the event transport.
+
+        The nodes still managed send their events directly afterwards.
+        """
+        if self.event_transport is None:
+            return
+
+        for otns_node in self.otns_node_map.values():
+            otns_node.transport = None
+        self.event_transport.close()
+        self.event_transport = None
+
     def process_node_status(self, node: ThreadDevBoard, message: str, time=datetime.now()):
         """Manually process a ThreadDevBoard status message.
 
@@ -926,78 +1143,55 @@ class OtnsManager(object):
             message (str): status message.
             time (datetime, optional): time of the update. Defaults to datetime.now().
         """
-        status_match = re.search(RegexType.STATUS.value, message)
-        if status_match:
-            message = status_match.group(2)
+        event = wpantund_log.classify(message)
+        if event is None:
+            return
 
-            extaddr_match = re.search(RegexType.EXTADDR_STATUS.value, message)
-            if extaddr_match:
-                extaddr = int(extaddr_match.group(1), 16)
-                node.update_extaddr(extaddr)
-                self.node_summaries[node.node_id].extaddr_changed(extaddr, time)
-                return
+        if event.type is LogEventType.OTNS_EXTADDR:
+            node.update_extaddr(event.value)
+            self.node_summaries[node.node_id].extaddr_changed(event.value, time)
 
-            role_match = re.search(RegexType.ROLE_STATUS.value, message)
-            if role_match:
-                role = RoleType(int(role_match.group(1)))
-                node.update_role(role)
-                self.node_summaries[node.node_id].role_changed(role, time)
-                self.update_layout()
+        elif event.type is LogEventType.OTNS_ROLE:
+            role = RoleType(event.value)
+            node.update_role(role)
+            self.node_summaries[node.node_id].role_changed(role, time)
+            self.update_layout()
 
-                if role in (RoleType.DISABLED, RoleType.DETACHED):
-                    for child in list(node.neighbors):
-                        node.remove_router(child)
-                        for neighbor in self.otns_node_map.values():
-                            if neighbor.extaddr == child:
-                                neighbor.remove_router(node.extaddr)
-                                break
-                    for child in list(node.children):
-                        node.remove_child(child)
-                return
+            if role in (RoleType.DISABLED, RoleType.DETACHED):
+                for child in list(node.neighbors):
+                    node.remove_router(child)
+                    for neighbor in self.otns_node_map.values():
+                        if neighbor.extaddr == child:
+                            neighbor.remove_router(node.extaddr)
+                            break
+                for child in list(node.children):
+                    node.remove_child(child)
 
-            child_added_match = re.search(RegexType.CHILD_ADDED_STATUS.value, message)
-            if child_added_match:
-                child = int(child_added_match.group(1), 16)
-                node.add_child(child)
-                self.node_summaries[node.node_id].child_changed(True, child, time)
-                return
+        elif event.type is LogEventType.OTNS_CHILD_ADDED:
+            node.add_child(event.value)
+            self.node_summaries[node.node_id].child_changed(True, event.value, time)
 
-            child_removed_match = re.search(RegexType.CHILD_REMOVED_STATUS.value, message)
-            if child_removed_match:
-                child = int(child_removed_match.group(1), 16)
-                node.remove_child(child)
-                self.node_summaries[node.node_id].child_changed(False, child, time)
-                return
+        elif event.type is LogEventType.OTNS_CHILD_REMOVED:
+            node.remove_child(event.value)
+            self.node_summaries[node.node_id].child_changed(False, event.value, time)
 
-            router_added_match = re.search(RegexType.ROUTER_ADDED_STATUS.value, message)
-            if router_added_match:
-                router = int(router_added_match.group(1), 16)
-                node.add_router(router)
-                self.node_summaries[node.node_id].neighbor_changed(True, router, time)
-                return
+        elif event.type is LogEventType.OTNS_ROUTER_ADDED:
+            node.add_router(event.value)
+            self.node_summaries[node.node_id].neighbor_changed(True, event.value, time)
 
-            router_removed_match = re.search(RegexType.ROUTER_REMOVED_STATUS.value, message)
-            if router_removed_match:
-                router = int(router_removed_match.group(1), 16)
-                node.remove_router(router)
-                self.node_summaries[node.node_id].neighbor_changed(False, router, time)
-                return
+        elif event.type is LogEventType.OTNS_ROUTER_REMOVED:
+            node.remove_router(event.value)
+            self.node_summaries[node.node_id].neighbor_changed(False, event.value, time)
 
-            event = Event.status_event(message)
-            node.send_event(event.to_bytes())
-            return
+        elif event.type is LogEventType.OTNS_STATUS:
+            if not self.headless:
+                node.send_event(Event.status_event(event.value).to_bytes())
 
-        get_extaddr_info_match = re.search(RegexType.GET_EXTADDR_RES.value, message)
-        if get_extaddr_info_match:
-            extaddr = get_extaddr_info_match.group(1)
-            node.update_extaddr(int(extaddr, 16))
-            return
+        elif event.type is LogEventType.EXTADDR_RESPONSE:
+            node.update_extaddr(event.value)
 
-        ncp_version_match = re.search(RegexType.NCP_VERSION.value, message)
-        if ncp_version_match:
-            ncp_version = ncp_version_match.group(1)
-            self.grpc_client.set_netinfo(version=ncp_version)
-            return
+        elif event.type is LogEventType.NCP_VERSION:
+            self.set_ncp_version(event.value)
 
     def set_ncp_version(self, version: str):
         """Set NCP version for display on OTNS.
@@ -1005,7 +1199,8 @@ class OtnsManager(object):
         Args:
             version (str): version string.
         """
-        self.grpc_client.set_netinfo(version=version)
+        if not self.headless:
+            self.grpc_client.set_netinfo(version=version)
 
     def update_extaddr(self, node: ThreadDevBoard, extaddr: int, time=datetime.now()):
         """Report a node's extended address to OTNS manager.
@@ -1064,7 +1259,7 @@ class OtnsManager(object):
             use_two_layer (bool, optional): if layout uses separate circles for routers and EDs. Defaults to False.
         """
         no_nodes = not self.otns_node_map or self.max_node_count == 0
-        if not self.auto_layout or no_nodes:
+        if self.headless or not self.auto_layout or no_nodes:
             return
 
         self.logger.debug("Updating nodes layout")
@@ -12,7 +12,9 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import collections
 import re
+import time
 
 from . import wpan_util
 from silk.config import wpan_constants as wpan
@@ -27,306 +29,490 @@ def check_child_is_detached(sed):
     return not is_associated(sed)
 
 
-class ChildAddressEntry(object):
-    """This object encapsulates a child Address entry.
+# Lines of a wpanctl table output holding an entry, e.g. `\t"E24C5F67F4B8CBB9, RLOC16:d402, ..."`
+ENTRY_LINE_REGEX = re.compile(r"^\t\".*\"$", re.MULTILINE)
+# First item of a table entry: extended address, followed by a `,`
+EXT_ADDRESS_REGEX = re.compile(r"\t\"\s*([^,\s\"]+)")
+# `Name:value` items of a table entry
+FIELD_REGEX = re.compile(r"([\w-]+):([^,\s\"]*)")
+# Child address entry, whose IPv6Addrs list holds `,` and `:` characters
+CHILD_ADDRESS_REGEX = re.compile(r"\t\"([^,]*), RLOC16:([^,\"]*)(?:, IPv6Addrs:(.*))?\"$")
+# Address and RLOC16 of an address cache entry
+ADDRESS_CACHE_REGEX = re.compile(r"\t\"\s*(\S+) -> ([^,\s]+),")
+
+
+def _is_yes(value):
+    return value == "yes"
+
+
+def _hex(value):
+    return int(value, 16)
+
+
+def _int(value):
+    return int(value, 0)
+
+
+def compile_fields_regex(fields):
+    """Compile a regex matching the extended address and the `Name:value` items of `fields` of a table entry, in the
+    order wpanctl prints them.
+    """
+    return re.compile(r"\t\"\s*([^,\s\"]+)" +
+                      "".join(r".*?[\s,]%s:([^,\s\"]*)" % re.escape(name) for _, name, _ in fields))
+
+
+def _parse_entries(entry_class, table):
+    """Create an entry object for each entry line of a table output, without parsing the entries yet.
     """
+    return [entry_class(match.group(0)) for match in ENTRY_LINE_REGEX.finditer(table)]
+
+
+class TableEntry(object):
+    """Base class of table entries, parsed from their text on first field access.
+
+    Subclasses either list their `Name:value` items in FIELDS, as (attribute, item name, conversion) tuples, along
+    with the FIELDS_REGEX compiled from them, or override _parse().
+
+    KEY_FIELD names the field identifying an entry within its table, see TableSnapshot. VOLATILE_FIELDS change
+    without the entry changing, e.g. ages, and are ignored when comparing entries.
+    """
+
+    __slots__ = ("_text", "_fields")
+
+    FIELDS = ()
+    FIELDS_REGEX = compile_fields_regex(FIELDS)
+    KEY_FIELD = "ext_address"
+    VOLATILE_FIELDS = ("age",)
 
     def __init__(self, text):
-        # Example of expected text:
-        #
-        # `\t"9A456FEEC738F641, RLOC16:1402, IPv6Addrs:[fd74:5d77:b280:0:c7a2:c449:b097:147f]"`
-        #
-        # We get rid of the first two chars `\t"` and last char `"``, split the rest using whitespace as separator.
-        # Then remove any `,` at end of items in the list.
-        items = text[2:-1].split(", ", 2)
+        self._text = text
+        self._fields = None
+
+    def _parse(self, text):
+        """Parse the text of the entry into a dictionary of field values.
+        """
+        match = self.FIELDS_REGEX.match(text)
+        if match is not None:
+            values = match.groups()
+            fields = {attribute: convert(value) for (attribute, _, convert), value in zip(self.FIELDS, values[1:])}
+            fields["ext_address"] = values[0]
+            return fields
+
+        # Items in another order, or missing
+        match = EXT_ADDRESS_REGEX.match(text)
+        if match is None:
+            raise ValueError(f"'{text}' does not seem to be a valid table entry")
+
+        items = dict(FIELD_REGEX.findall(text, match.end()))
+        fields = {attribute: convert(items[name]) for attribute, name, convert in self.FIELDS}
+        fields["ext_address"] = match.group(1)
+        return fields
+
+    def _parsed_fields(self):
+        if self._fields is None:
+            self._fields = self._parse(self._text)
+        return self._fields
+
+    def _field(self, name):
+        fields = self._parsed_fields()
+        try:
+            return fields[name]
+        except KeyError:
+            raise AttributeError(name) from None
+
+    def __repr__(self):
+        return "{}({})".format(type(self).__name__, self._parsed_fields())
 
-        # First item in the extended address
-        self._ext_address = items[0]
 
-        # Convert the rest into a dictionary by splitting using `:` as separator
-        items_dict = {item.split(":", 1)[0]: item.split(":", 1)[1] for item in items[1:]}
+class ChildAddressEntry(TableEntry):
+    """This object encapsulates a child Address entry.
+    """
 
-        self._rloc16 = items_dict["RLOC16"]
-        self._ipv6_address = items_dict["IPv6Addrs"] if "IPv6Addrs" in items_dict else ""
+    # Example of expected text:
+    #
+    # `\t"9A456FEEC738F641, RLOC16:1402, IPv6Addrs:[fd74:5d77:b280:0:c7a2:c449:b097:147f]"`
+
+    __slots__ = ()
+
+    def _parse(self, text):
+        match = CHILD_ADDRESS_REGEX.match(text)
+        if match is None:
+            raise ValueError(f"'{text}' does not seem to be a valid child address entry")
+        return {"ext_address": match.group(1), "rloc16": match.group(2), "ipv6_address": match.group(3) or ""}
 
     @property
     def ext_address(self):
-        return self._ext_address
+        return self._field("ext_address")
 
     @property
     def rloc16(self):
-        return self._rloc16
+        return self._field("rloc16")
 
     @property
     def ipv6_address(self):
-        return self._ipv6_address
-
-    def __repr__(self):
-        return "ChildEntry({})".format(self.__dict__)
+        return self._field("ipv6_address")
 
 
-class ChildEntry(object):
+class ChildEntry(TableEntry):
     """This object encapsulates a child entry.
     """
 
-    def __init__(self, text):
-        # Example of expected text:
-        #
-        # `\t"E24C5F67F4B8CBB9, RLOC16:d402, NetDataVer:175, LQIn:3, AveRssi:-20, LastRssi:-20, Timeout:120, Age:0, `
-        # `RxOnIdle:no, FTD:no, SecDataReq:yes, FullNetData:yes"`
-        #
-
-        # We get rid of the first two chars `\t"` and last char `"`, split the rest using whitespace as separator.
-        # Then remove any `,` at end of items in the list.
-        items = [item[:-1] if item[-1] == "," else item for item in text[2:-1].split()]
-
-        # First item in the extended address
-        self._ext_address = items[0]
+    # Example of expected text:
+    #
+    # `\t"E24C5F67F4B8CBB9, RLOC16:d402, NetDataVer:175, LQIn:3, AveRssi:-20, LastRssi:-20, Timeout:120, Age:0, `
+    # `RxOnIdle:no, FTD:no, SecDataReq:yes, FullNetData:yes"`
 
-        # Convert the rest into a dictionary by splitting using `:` as separator
-        items_dict = {item.split(":")[0]: item.split(":")[1] for item in items[1:]}
+    __slots__ = ()
 
-        self._rloc16 = items_dict["RLOC16"]
-        self._timeout = items_dict["Timeout"]
-        self._rx_on_idle = (items_dict["RxOnIdle"] == "yes")
-        self._ftd = (items_dict["FTD"] == "yes")
-        self._sec_data_req = (items_dict["SecDataReq"] == "yes")
-        self._full_net_data = (items_dict["FullNetData"] == "yes")
+    FIELDS = (
+        ("rloc16", "RLOC16", str),
+        ("timeout", "Timeout", str),
+        ("rx_on_idle", "RxOnIdle", _is_yes),
+        ("ftd", "FTD", _is_yes),
+        ("sec_data_req", "SecDataReq", _is_yes),
+        ("full_net_data", "FullNetData", _is_yes),
+    )
+    FIELDS_REGEX = compile_fields_regex(FIELDS)
 
     @property
     def ext_address(self):
-        return self._ext_address
+        return self._field("ext_address")
 
     @property
     def rloc16(self):
-        return self._rloc16
+        return self._field("rloc16")
 
     @property
     def timeout(self):
-        return self._timeout
+        return self._field("timeout")
 
     def is_rx_on_when_idle(self):
-        return self._rx_on_idle
+        return self._field("rx_on_idle")
 
     def is_ftd(self):
-        return self._ftd
+        return self._field("ftd")
 
     def is_sec_data_req(self):
-        return self._sec_data_req
+        return self._field("sec_data_req")
 
     def is_full_net_data(self):
-        return self._full_net_data
-
-    def __repr__(self):
-        return "ChildEntry({})".format(self.__dict__)
+        return self._field("full_net_data")
 
 
 def parse_child_table_result(child_table_list):
     """Parses child table list string and returns an array of `ChildEntry` objects.
     """
-    items = child_table_list.split("\n")[1:-1]
-    if items and "]" in items[-1]:
-        items.pop()
-    return [ChildEntry(item) for item in items]
+    return _parse_entries(ChildEntry, child_table_list)
 
 
 def parse_child_table_address_result(child_table_list):
     """Parses child table list string and returns an array of `ChildEntry` objects.
     """
-    items = child_table_list.split("\n")[1:-1]
-    if items and "]" == items[-1]:
-        items.pop()
-    return [ChildAddressEntry(item) for item in items]
+    return _parse_entries(ChildAddressEntry, child_table_list)
 
 
-class NeighborEntry(object):
+class NeighborEntry(TableEntry):
     """This object encapsulates a neighbor entry.
     """
 
-    def __init__(self, text):
-        # Example of expected text:
-        #
-        # `\t"5AC95ED4646D6565, RLOC16:9403, LQIn:3, AveRssi:-20, LastRssi:-20, Age:0, LinkFC:8, MleFC:0, `
-        # `IsChild:yes, RxOnIdle:no, FTD:no, SecDataReq:yes, FullNetData:yes"`
-        #
-
-        # We get rid of the first two chars `\t"` and last char `"`, split the rest using whitespace as separator.
-        # Then remove any `,` at end of items in the list.
-        items = [item[:-1] if item[-1] == "," else item for item in text[2:-1].split()]
-
-        # First item in the extended address
-        self._ext_address = items[0]
+    # Example of expected text:
+    #
+    # `\t"5AC95ED4646D6565, RLOC16:9403, LQIn:3, AveRssi:-20, LastRssi:-20, Age:0, LinkFC:8, MleFC:0, `
+    # `IsChild:yes, RxOnIdle:no, FTD:no, SecDataReq:yes, FullNetData:yes"`
 
-        # Convert the rest into a dictionary by splitting the text using `:` as separator
-        items_dict = {item.split(":")[0]: item.split(":")[1] for item in items[1:]}
+    __slots__ = ()
 
-        self._rloc16 = items_dict["RLOC16"]
-        self._is_child = (items_dict["IsChild"] == "yes")
-        self._rx_on_idle = (items_dict["RxOnIdle"] == "yes")
-        self._ftd = (items_dict["FTD"] == "yes")
+    FIELDS = (
+        ("rloc16", "RLOC16", str),
+        ("is_child", "IsChild", _is_yes),
+        ("rx_on_idle", "RxOnIdle", _is_yes),
+        ("ftd", "FTD", _is_yes),
+    )
+    FIELDS_REGEX = compile_fields_regex(FIELDS)
 
     @property
     def ext_address(self):
-        return self._ext_address
+        return self._field("ext_address")
 
     @property
     def rloc16(self):
-        return self._rloc16
+        return self._field("rloc16")
 
     def is_rx_on_when_idle(self):
-        return self._rx_on_idle
+        return self._field("rx_on_idle")
 
     def is_ftd(self):
-        return self._ftd
+        return self._field("ftd")
 
     def is_child(self):
-        return self._is_child
-
-    def __repr__(self):
-        return "NeighborEntry({})".format(self.__dict__)
+        return self._field("is_child")
 
 
 def parse_neighbor_table_result(neighbor_table_list):
     """Parses neighbor table list string and returns an array of `NeighborEntry` objects.
     """
-    items = neighbor_table_list.split("\n")[1:-1]
-    if items and "]" in items[-1]:
-        items.pop()
-    return [NeighborEntry(item) for item in items]
+    return _parse_entries(NeighborEntry, neighbor_table_list)
 
 
-class RouterTableEntry(object):
+class RouterTableEntry(TableEntry):
     """This object encapsulates a router table entry.
     """
 
-    def __init__(self, text):
-        # Example of expected text:
-        #
-        # `\t"8A970B3251810826, RLOC16:4000, RouterId:16, NextHop:43, PathCost:1, LQIn:3, LQOut:3, Age:3, LinkEst:yes"`
-        #
-
-        # We get rid of the first two chars `\t"` and last char `"`, split the rest using whitespace as separator.
-        # Then remove any `,` at end of items in the list.
-        items = [item[:-1] if item[-1] == "," else item for item in text[2:-1].split()]
-
-        # First item in the extended address
-        self._ext_address = items[0]
+    # Example of expected text:
+    #
+    # `\t"8A970B3251810826, RLOC16:4000, RouterId:16, NextHop:43, PathCost:1, LQIn:3, LQOut:3, Age:3, LinkEst:yes"`
 
-        # Convert the rest into a dictionary by splitting the text using `:` as separator
-        items_dict = {item.split(":")[0]: item.split(":")[1] for item in items[1:]}
+    __slots__ = ()
 
-        self._rloc16 = int(items_dict["RLOC16"], 16)
-        self._router_id = int(items_dict["RouterId"], 0)
-        self._next_hop = int(items_dict["NextHop"], 0)
-        self._path_cost = int(items_dict["PathCost"], 0)
-        self._age = int(items_dict["Age"], 0)
-        self._le = items_dict["LinkEst"] == "yes"
+    # Routers without a link report an all-zero extended address, only their RLOC16 is unique
+    KEY_FIELD = "rloc16"
+    FIELDS = (
+        ("rloc16", "RLOC16", _hex),
+        ("router_id", "RouterId", _int),
+        ("next_hop", "NextHop", _int),
+        ("path_cost", "PathCost", _int),
+        ("age", "Age", _int),
+        ("le", "LinkEst", _is_yes),
+    )
+    FIELDS_REGEX = compile_fields_regex(FIELDS)
 
     @property
     def ext_address(self):
-        return self._ext_address
+        return self._field("ext_address")
 
     @property
     def rloc16(self):
-        return self._rloc16
+        return self._field("rloc16")
 
     @property
     def router_id(self):
-        return self._router_id
+        return self._field("router_id")
 
     @property
     def next_hop(self):
-        return self._next_hop
+        return self._field("next_hop")
 
     @property
     def path_cost(self):
-        return self._path_cost
+        return self._field("path_cost")
 
     def is_link_established(self):
-        return self._le
-
-    def __repr__(self):
-        return "RouterTableEntry({})".format(self.__dict__)
+        return self._field("le")
 
 
 def parse_router_table_result(router_table_list):
     """Parses router table list string and returns an array of `RouterTableEntry` objects.
     """
-    return [RouterTableEntry(item) for item in router_table_list.split("\n")[1:-1]]
+    return _parse_entries(RouterTableEntry, router_table_list)
 
 
-class AddressCacheEntry(object):
+class AddressCacheEntry(TableEntry):
     """This object encapsulates an address cache entry.
     """
 
-    def __init__(self, text):
-
-        # Example of expected text:
-        #
-        # `\t"fd00:1234::100:8 -> 0xfffe, Age:1, State:query, CanEvict:no, Timeout:3, RetryDelay:15"`
-        # `\t"fd00:1234::3:2 -> 0x2000, Age:0, State:cached, LastTrans:0, ML-EID:fd40:ea58:a88c:0:b7ab:4919:aa7b:11a3"`
-
-        # We get rid of the first two chars `\t"` and last char `"`, split the rest using whitespace as separator.
-        # Then remove any `,` at end of items in the list.
-        items = [item[:-1] if item[-1] == "," else item for item in text[2:-1].split()]
-
-        # First item in the extended address
-        self._address = items[0]
-        self._rloc16 = int(items[2], 16)
-
-        # Convert the rest into a dictionary by splitting the text using `:` as separator
-        items_dict = {item.split(":")[0]: item.split(":")[1] for item in items[3:]}
-
-        self._age = int(items_dict['Age'], 0)
-
-        self._state = items_dict['State']
-
-        if self._state == wpan.ADDRESS_CACHE_ENTRY_STATE_CACHED:
-            self._last_trans = int(items_dict.get("LastTrans", "-1"), 0)
+    # Example of expected text:
+    #
+    # `\t"fd00:1234::100:8 -> 0xfffe, Age:1, State:query, CanEvict:no, Timeout:3, RetryDelay:15"`
+    # `\t"fd00:1234::3:2 -> 0x2000, Age:0, State:cached, LastTrans:0, ML-EID:fd40:ea58:a88c:0:b7ab:4919:aa7b:11a3"`
+
+    __slots__ = ()
+
+    KEY_FIELD = "address"
+    VOLATILE_FIELDS = ("age", "timeout", "retry_delay", "last_trans")
+
+    # Fields of entries in other states than cached
+    QUERY_FIELDS = (
+        ("can_evict", "CanEvict", _is_yes),
+        ("timeout", "Timeout", int),
+        ("retry_delay", "RetryDelay", int),
+    )
+
+    def _parse(self, text):
+        match = ADDRESS_CACHE_REGEX.match(text)
+        if match is None:
+            raise ValueError(f"'{text}' does not seem to be a valid address cache entry")
+
+        items = dict(FIELD_REGEX.findall(text, match.end()))
+        fields = {
+            "address": match.group(1),
+            "rloc16": _hex(match.group(2)),
+            "age": _int(items["Age"]),
+            "state": items["State"],
+        }
+        if fields["state"] == wpan.ADDRESS_CACHE_ENTRY_STATE_CACHED:
+            fields["last_trans"] = _int(items.get("LastTrans", "-1"))
         else:
-            self._can_evict = (items_dict['CanEvict'] == 'yes')
-            self._timeout = int(items_dict['Timeout'])
-            self._retry_delay = int(items_dict['RetryDelay'])
+            fields.update((attribute, convert(items[name])) for attribute, name, convert in self.QUERY_FIELDS)
+        return fields
 
     @property
     def address(self):
-        return self._address
+        return self._field("address")
 
     @property
     def rloc16(self):
-        return self._rloc16
+        return self._field("rloc16")
 
     @property
     def age(self):
-        return self._age
+        return self._field("age")
 
     @property
     def state(self):
-        return self._state
+        return self._field("state")
 
     def can_evict(self):
-        return self._can_evict
+        return self._field("can_evict")
 
     @property
     def timeout(self):
-        return self._timeout
+        return self._field("timeout")
 
     @property
     def retry_delay(self):
-        return self._retry_delay
+        return self._field("retry_delay")
 
     @property
     def last_trans(self):
-        return self._last_trans
-
-    def __repr__(self):
-        return "AddressCacheEntry({})".format(self.__dict__)
+        return self._field("last_trans")
 
 
 def parse_address_cache_table_result(addr_cache_table_list):
     """Parses address cache table list string and returns an array of `AddressCacheEntry` objects.
     """
-    return [AddressCacheEntry(item) for item in addr_cache_table_list.split("\n")[1:-2]]
+    return _parse_entries(AddressCacheEntry, addr_cache_table_list)
+
+
+# Table properties and the class of their entries
+TABLE_ENTRY_CLASSES = {
+    wpan.WPAN_THREAD_CHILD_TABLE: ChildEntry,
+    wpan.WPAN_THREAD_CHILD_TABLE_ADDRESSES: ChildAddressEntry,
+    wpan.WPAN_THREAD_NEIGHBOR_TABLE: NeighborEntry,
+    wpan.WPAN_THREAD_ROUTER_TABLE: RouterTableEntry,
+    wpan.WPAN_THREAD_ADDRESS_CACHE_TABLE: AddressCacheEntry,
+}
+
+
+class TableDelta(collections.namedtuple("TableDelta", ["added", "removed", "changed"])):
+    """Difference between two snapshots of a table.
+
+    Attributes:
+        added (list): entries only in the newer snapshot.
+        removed (list): entries only in the older snapshot.
+        changed (list): (older, newer) pairs of entries with the same key whose fields differ.
+    """
+
+    __slots__ = ()
+
+    def __bool__(self):
+        return bool(self.added or self.removed or self.changed)
+
+
+def _rloc16_key(rloc16):
+    return int(rloc16, 16) if isinstance(rloc16, str) else rloc16
+
+
+def _stable_fields(entry):
+    fields = entry._parsed_fields()
+    return {name: value for name, value in fields.items() if name not in entry.VOLATILE_FIELDS}
+
+
+class TableSnapshot(object):
+    """Entries of a table read at one point in time, indexed by their key, e.g. the extended address.
+
+    Raises ValueError if the entries have no key field, or if two entries have the same key.
+
+    Attributes:
+        entries (list): entries in table order.
+        timestamp (float): time the snapshot was taken.
+    """
+
+    def __init__(self, entries, timestamp=None):
+        self.entries = list(entries)
+        self.timestamp = time.time() if timestamp is None else timestamp
+        self._by_key = {}
+        for entry in self.entries:
+            if entry.KEY_FIELD is None:
+                raise ValueError(f"{type(entry).__name__} entries have no key to index them by")
+            key = entry._field(entry.KEY_FIELD)
+            if key in self._by_key:
+                raise ValueError(f"Duplicate {type(entry).__name__} {entry.KEY_FIELD} {key!r}")
+            self._by_key[key] = entry
+        self._by_text = {entry._text: entry for entry in self.entries}
+        self._by_rloc16 = None
+
+    @classmethod
+    def from_output(cls, entry_class, output, previous=None):
+        """Create a snapshot from a table output, as returned by the node's get().
+
+        Args:
+            entry_class (type): TableEntry subclass of the entries.
+            output (str): table output.
+            previous (TableSnapshot, optional): earlier snapshot of the table, whose entries are reused for the lines
+                that did not change instead of being parsed again. Defaults to None.
+
+        Returns:
+            TableSnapshot: the snapshot.
+        """
+        reusable = previous._by_text if previous is not None else {}
+        return cls(reusable.get(line) or entry_class(line) for line in ENTRY_LINE_REGEX.findall(output))
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __iter__(self):
+        return iter(self.entries)
+
+    def __contains__(self, key):
+        return key in self._by_key
+
+    def __getitem__(self, key):
+        return self._by_key[key]
+
+    def get(self, key, default=None):
+        """Get the entry with a key, e.g. an extended address or a router's RLOC16 as an integer, or `default`.
+        """
+        return self._by_key.get(key, default)
+
+    def keys(self):
+        return self._by_key.keys()
+
+    def by_rloc16(self, rloc16, default=None):
+        """Get the first entry with an RLOC16, or `default`.
+
+        Args:
+            rloc16 (int or str): RLOC16, as an integer or a hexadecimal string.
+        """
+        if self._by_rloc16 is None:
+            self._by_rloc16 = {}
+            for entry in self.entries:
+                self._by_rloc16.setdefault(_rloc16_key(entry.rloc16), entry)
+        return self._by_rloc16.get(_rloc16_key(rloc16), default)
+
+    def diff(self, previous):
+        """Compute the changes since an earlier snapshot of the same table.
+
+        Entries whose line did not change are not parsed again to be compared.
+
+        Args:
+            previous (TableSnapshot): the earlier snapshot.
+
+        Returns:
+            TableDelta: the changes.
+        """
+        added = [entry for key, entry in self._by_key.items() if key not in previous._by_key]
+        removed = [entry for key, entry in previous._by_key.items() if key not in self._by_key]
+        changed = []
+        for key, entry in self._by_key.items():
+            old_entry = previous._by_key.get(key)
+            if old_entry is None or old_entry is entry or old_entry._text == entry._text:
+                continue
+            if _stable_fields(old_entry) != _stable_fields(entry):
+                changed.append((old_entry, entry))
+        return TableDelta(added, removed, changed)
+
+    def __repr__(self):
+        return "TableSnapshot({})".format(self.entries)
 
 
 class ScanResult(object):
@@ -455,6 +641,10 @@ def is_in_scan_result(node, scan_results):
     return False
 
 
+# First item of each entry line of a list output
+LIST_ENTRY_REGEX = re.compile(r"^\t\"\s*([^\s\"]+)", re.MULTILINE)
+
+
 def parse_list(list_string):
     """
     Parses IPv6/prefix/route list string (output of wpanctl get for properties WPAN_IP6_ALL_ADDRESSES,
@@ -468,96 +658,91 @@ def parse_list(list_string):
     # \t"fe80::2092:9358:97ea:71c6                prefix_len:64   origin:ncp      valid:forever   preferred:forever"\n
     # ]`
     #
-    # We split the lines (`\n` as separator) and skip the first and last lines which are `[` and `]`.
-    # For each line, skip the first two characters (which are `\t"`) and last character (`"`), then split the string
-    # using whitespace as separator. The first entry is the IPv6 address.
+    # The first item of each entry line, after `\t"`, is the IPv6 address.
     #
-    return [line[2:-1].split()[0] for line in list_string.split("\n")[1:-1]]
+    return LIST_ENTRY_REGEX.findall(list_string)
+
+
+ON_MESH_PREFIX_REGEX = re.compile(r"\t\"(?P<prefix>[0-9a-fA-F:]+)\s*prefix_len:(?P<prefix_len>\d+)\s+"
+                                  r"origin:(?P<origin>\w*)\s+stable:(?P<stable>\w*).* \["
+                                  r"on-mesh:(?P<on_mesh>\d)\s+def-route:(?P<def_route>\d)\s+config:(?P<config>\d)\s+"
+                                  r"dhcp:(?P<dhcp>\d)\s+slaac:(?P<slaac>\d)\s+pref:(?P<preferred>\d)\s+"
+                                  r"nd-dns:(?P<nd_dns>\d)\s+dp:(?P<dp>\d)\s+prio:(?P<priority>\w*)\]"
+                                  r"\s+rloc:(?P<rloc16>0x[0-9a-fA-F]+)")
+ON_MESH_PREFIX_FLAGS = ("on_mesh", "def_route", "config", "dhcp", "slaac", "preferred", "nd_dns", "dp")
 
 
-class OnMeshPrefix(object):
+class OnMeshPrefix(TableEntry):
     """This object encapsulates an on-mesh prefix.
     """
 
-    def __init__(self, text):
-        # Example of expected text:
-        #
-        # `\t"fd00:abba:cafe::       prefix_len:64   origin:user     stable:yes flags:0x31`
-        # ` [on-mesh:1 def-route:0 config:0 dhcp:0 slaac:1 pref:1 nd-dns:0 dp:0 prio:med] rloc:0x0000"`
-
-        m = re.match(
-            r"\t\"([0-9a-fA-F:]+)\s*prefix_len:(\d+)\s+origin:(\w*)\s+stable:(\w*).* \[" +
-            r"on-mesh:(\d)\s+def-route:(\d)\s+config:(\d)\s+dhcp:(\d)\s+slaac:(\d)\s+pref:(\d)\s+" +
-            r"nd-dns:(\d)\s+dp:(\d)\s+prio:(\w*)\]" +
-            r"\s+rloc:(0x[0-9a-fA-F]+)", text)
-        wpan_util.verify(m is not None)
-        data = m.groups()
-
-        self._prefix = data[0]
-        self._prefix_len = data[1]
-        self._origin = data[2]
-        self._stable = (data[3] == "yes")
-        self._on_mesh = (data[4] == "1")
-        self._def_route = (data[5] == "1")
-        self._config = (data[6] == "1")
-        self._dhcp = (data[7] == "1")
-        self._slaac = (data[8] == "1")
-        self._preferred = (data[9] == "1")
-        self._nd_dns = (data[10] == "1")
-        self._dp = (data[11] == "1")
-        self._priority = (data[12])
-        self._rloc16 = (data[13])
+    # Example of expected text:
+    #
+    # `\t"fd00:abba:cafe::       prefix_len:64   origin:user     stable:yes flags:0x31`
+    # ` [on-mesh:1 def-route:0 config:0 dhcp:0 slaac:1 pref:1 nd-dns:0 dp:0 prio:med] rloc:0x0000"`
+
+    __slots__ = ()
+
+    # The same prefix may be published by several nodes
+    KEY_FIELD = None
+
+    def _parse(self, text):
+        match = ON_MESH_PREFIX_REGEX.match(text)
+        wpan_util.verify(match is not None)
+
+        fields = match.groupdict()
+        fields["stable"] = (fields["stable"] == "yes")
+        for flag in ON_MESH_PREFIX_FLAGS:
+            fields[flag] = (fields[flag] == "1")
+        return fields
 
     @property
     def prefix(self):
-        return self._prefix
+        return self._field("prefix")
 
     @property
     def prefix_len(self):
-        return self._prefix_len
+        return self._field("prefix_len")
 
     @property
     def origin(self):
-        return self._origin
+        return self._field("origin")
 
     @property
     def priority(self):
-        return self._priority
+        return self._field("priority")
 
     def is_stable(self):
-        return self._stable
+        return self._field("stable")
 
     def is_on_mesh(self):
-        return self._on_mesh
+        return self._field("on_mesh")
 
     def is_def_route(self):
-        return self._def_route
+        return self._field("def_route")
 
     def is_config(self):
-        return self._config
+        return self._field("config")
 
     def is_dhcp(self):
-        return self._dhcp
+        return self._field("dhcp")
 
     def is_slaac(self):
-        return self._slaac
+        return self._field("slaac")
 
     def is_preferred(self):
-        return self._preferred
+        return self._field("preferred")
 
     def is_nd_dns(self):
-        return self._nd_dns
+        return self._field("nd_dns")
 
     def is_dp(self):
-        return self._dp
+        return self._field("dp")
 
     def rloc16(self):
-        return self._rloc16
-
-    def __repr__(self):
-        return "OnMeshPrefix({})".format(self.__dict__)
+        return self._field("rloc16")
 
 
 def parse_on_mesh_prefix_result(on_mesh_prefix_list):
     """Parses on-mesh prefix list string and returns an array of `OnMeshPrefix` objects"""
-    return [OnMeshPrefix(item) for item in on_mesh_prefix_list.split("\n")[1:-1]]
+    return _parse_entries(OnMeshPrefix, on_mesh_prefix_list)
@@ -12,15 +12,24 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import collections
 import inspect
 import logging
 import time
 
 from silk.config import wpan_constants as wpan
+from silk.utils.state_change import StateChangeMonitor
 from . import wpan_table_parser
 
 logger = logging.getLogger(__name__)
 
+# Longest interval between two checks of verify_within, unless its `delay_time` is longer
+VERIFY_MAX_DELAY_TIME = 2
+
+# checks (int): number of times the condition was checked.
+# duration (float): seconds until the condition passed.
+WaitResult = collections.namedtuple("WaitResult", ["checks", "duration"])
+
 
 def is_associated(device):
     return device.get(wpan.WPAN_STATE) == wpan.STATE_ASSOCIATED
@@ -46,47 +55,100 @@ def verify(condition):
         raise VerifyError(error_message)
 
 
-def verify_within(condition_checker_func, wait_time, delay_time=0.1):
+def verify_within(condition_checker_func,
+                  wait_time,
+                  delay_time=0.1,
+                  nodes=None,
+                  max_delay_time=VERIFY_MAX_DELAY_TIME,
+                  backoff=False):
     """Verifies that a given function `condition_checker_func` passes successfully within a given wait timeout.
         `wait_time` is maximum time waiting for condition_checker to pass (in seconds).
-        `delay_time` specifies a delay interval added between failed attempts (in seconds).
+        `delay_time` specifies the delay interval between failed attempts (in seconds).
+        `nodes` are the nodes whose state the condition depends on. If any of them reports state changes, the
+        condition is checked again once their state changed, at most once per `delay_time`, or after
+        `max_delay_time` without a change. Otherwise the condition is checked every `delay_time`.
+        `backoff` doubles the delay interval after every failed attempt, up to `max_delay_time`, when no node reports
+        state changes.
+    Returns a WaitResult with the number of checks and the time the condition took to pass.
     """
     global _is_in_verify_within
     start_time = time.time()
+    max_delay_time = max(delay_time, max_delay_time)
+    delay = delay_time
+    checks = 0
     old_is_in_verify_within = _is_in_verify_within
     _is_in_verify_within = True
-    while True:
+    try:
+        with StateChangeMonitor(nodes or ()) as monitor:
+            while True:
+                change_count = monitor.change_count
+                check_time = time.time()
+                checks += 1
+                try:
+                    condition_checker_func()
+                except VerifyError:
+                    remaining = wait_time - (time.time() - start_time)
+                    if remaining <= 0:
+                        logger.error("Took too long to pass the condition ({}>{} sec, {} checks)".format(
+                            time.time() - start_time, wait_time, checks))
+                        raise
+                else:
+                    break
+
+                if monitor.has_sources:
+                    monitor.wait_for_change(change_count, min(max_delay_time, remaining))
+                    # Changes often come in bursts, check at most once per delay_time
+                    time.sleep(max(0, min(delay_time - (time.time() - check_time), remaining)))
+                elif delay != 0:
+                    time.sleep(min(delay, remaining))
+                    if backoff:
+                        delay = min(delay * 2, max_delay_time)
+    finally:
+        _is_in_verify_within = old_is_in_verify_within
+
+    result = WaitResult(checks, time.time() - start_time)
+    logger.debug("Condition passed after {:.3f} sec and {} checks".format(result.duration, result.checks))
+    return result
+
+
+def _addresses_with_prefix(node, prefix):
+    """Returns the IPv6 addresses of `node` with the given `prefix`, read over netlink if the node has it enabled.
+    """
+    netlink = getattr(node, "netlink", None)
+    if netlink is not None:
         try:
-            condition_checker_func()
-        except VerifyError:
-            if time.time() - start_time > wait_time:
-                logger.error("Took too long to pass the condition ({}>{} sec)".format(
-                    time.time() - start_time, wait_time))
-                raise
-        except BaseException:
-            raise
-        else:
-            break
-        if delay_time != 0:
-            time.sleep(delay_time)
-    _is_in_verify_within = old_is_in_verify_within
-    return True
+            return netlink.find_addresses(prefix, node.thread_interface)
+        except OSError as error:
+            logger.warning("Netlink address query on {} failed, falling back to wpanctl: {}".format(node, error))
+
+    all_addrs = wpan_table_parser.parse_list(node.get(wpan.WPAN_IP6_ALL_ADDRESSES))
+    return [addr for addr in all_addrs if addr.startswith(prefix[:-1])]
 
 
 def verify_address(node_list, prefix):
     """This function verifies that all nodes in the `node_list` contain an IPv6 address with the given `prefix`.
     """
     for node in node_list:
-        all_addrs = wpan_table_parser.parse_list(node.get(wpan.WPAN_IP6_ALL_ADDRESSES))
-        verify(any([addr.startswith(prefix[:-1]) for addr in all_addrs]))
+        verify(len(_addresses_with_prefix(node, prefix)) > 0)
 
 
 def verify_no_address(node_list, prefix):
     """This function verifies that none of nodes in the `node_list` contain an IPv6 address with the given `prefix`.
     """
     for node in node_list:
-        all_addrs = wpan_table_parser.parse_list(node.get(wpan.WPAN_IP6_ALL_ADDRESSES))
-        verify(all([not addr.startswith(prefix[:-1]) for addr in all_addrs]))
+        verify(len(_addresses_with_prefix(node, prefix)) == 0)
+
+
+def wait_for_address(node_list, prefix, wait_time):
+    """Waits until all nodes in the `node_list` contain an IPv6 address with the given `prefix`, otherwise raises a
+    VerifyError. Nodes with netlink enabled wait for the address notification instead of polling.
+        `wait_time` is the maximum time waiting for all the addresses (in seconds).
+    """
+    end_time = time.time() + wait_time
+    for node in node_list:
+        address = node.wait_for_ip6_address_with_prefix(prefix, max(end_time - time.time(), 0))
+        if not address:
+            raise VerifyError("No address with prefix {} on node {} within {} sec".format(prefix, node, wait_time))
 
 
 def verify_prefix(node_list,
@@ -209,16 +271,50 @@ def verify_no_prefix_with_rloc16(node_list, prefix, rloc16):
 def check_neighbor_table(node, neighbors):
     """This function verifies that the neighbor table of a given `node` contains the node in the `neighbors` list.
     """
-    neighbor_table = wpan_table_parser.parse_neighbor_table_result(node.get(wpan.WPAN_THREAD_NEIGHBOR_TABLE))
+    neighbor_table = node.table_snapshot(wpan.WPAN_THREAD_NEIGHBOR_TABLE)
     for neighbor in neighbors:
         ext_addr = neighbor.get(wpan.WPAN_EXT_ADDRESS)[1:-1]
-        for entry in neighbor_table:
-            if entry.ext_address == ext_addr:
-                break
-        else:
+        if ext_addr not in neighbor_table:
             raise VerifyError("Failed to find a neighbor entry for extended address {} in table".format(ext_addr))
 
 
+def wait_for_table(node, prop_name, condition, wait_time, delay_time=0.1, baseline=None):
+    """Wait until a condition on a table property of a node and its changes passes.
+
+    The table is read into a TableSnapshot at each check, reusing the entries that did not change since the previous
+    check, and `condition(snapshot, delta)` is called with the TableDelta since `baseline`. The condition raises a
+    VerifyError, e.g. through verify(), while it does not pass.
+
+    Args:
+        node (WpantundWpanNode): node to read the table from.
+        prop_name (str): table property, one of wpan_table_parser.TABLE_ENTRY_CLASSES.
+        condition (Callable): condition on the snapshot and the delta.
+        wait_time (float): maximum time to wait in seconds.
+        delay_time (float, optional): minimum time between checks in seconds. Defaults to 0.1.
+        baseline (TableSnapshot, optional): snapshot to compute the delta from. Defaults to the table when the wait
+            starts.
+
+    Returns:
+        TableSnapshot: the table for which the condition passed.
+    """
+    if baseline is None:
+        baseline = node.table_snapshot(prop_name)
+    snapshot = baseline
+
+    def check_table():
+        nonlocal snapshot
+        snapshot = node.table_snapshot(prop_name, previous=snapshot)
+        condition(snapshot, snapshot.diff(baseline))
+
+    verify_within(check_table, wait_time, delay_time, nodes=[node])
+    return snapshot
+
+
+# Properties of a child read by the parent/child checks, fetched in one round trip per child
+CHILD_PROPERTIES = (wpan.WPAN_EXT_ADDRESS, wpan.WPAN_THREAD_PARENT, wpan.WPAN_THREAD_RLOC16,
+                    wpan.WPAN_THREAD_CHILD_TIMEOUT, wpan.WPAN_NODE_TYPE)
+
+
 def check_parent_on_child_and_childtable_on_parent(parent, children):
     """Check parent on each child and on parent verify all children are present.
     """
@@ -226,29 +322,29 @@ def check_parent_on_child_and_childtable_on_parent(parent, children):
     # Get parent's extended address
     parent_ext_addr = parent.getprop(wpan.WPAN_EXT_ADDRESS)[1:-1]
 
+    child_snapshots = [child.snapshot(CHILD_PROPERTIES) for child in children]
+
     # Verify parent on children
-    for child in children:
+    for child, snapshot in zip(children, child_snapshots):
         # get the extended address(it's length is always 16) of the parent from child
-        thread_parent = child.getprop(wpan.WPAN_THREAD_PARENT)[1:17]
+        thread_parent = snapshot[wpan.WPAN_THREAD_PARENT][1:17]
         verify(parent_ext_addr == thread_parent)
         logger.info("***** parent {} has extended address: {}, child {} selected parent: {} *****".format(
             parent.name, parent_ext_addr, child.name, thread_parent))
 
     # verify all children are present in selected parent's childtable
     child_table = parent.wpanctl("get", "get " + wpan.WPAN_THREAD_CHILD_TABLE, 2)
-    child_table = wpan_table_parser.parse_child_table_result(child_table)
+    child_table = wpan_table_parser.TableSnapshot.from_output(wpan_table_parser.ChildEntry, child_table)
     verify(len(child_table) == len(children))
 
     counter = 0
-    for i, child in enumerate(children):
-        ext_addr = child.getprop(wpan.WPAN_EXT_ADDRESS)[1:-1]
-
-        for entry in child_table:
-            if entry.ext_address == ext_addr:
-                verify(int(entry.rloc16, 16) == int(child.get(wpan.WPAN_THREAD_RLOC16), 16))
-                verify(int(entry.timeout) == int(child.getprop(wpan.WPAN_THREAD_CHILD_TIMEOUT)))
-                verify(child.get(wpan.WPAN_NODE_TYPE) == wpan.NODE_TYPE_SLEEPY_END_DEVICE)
-                counter += 1
+    for snapshot in child_snapshots:
+        entry = child_table.get(snapshot[wpan.WPAN_EXT_ADDRESS][1:-1])
+        if entry is not None:
+            verify(int(entry.rloc16, 16) == int(snapshot[wpan.WPAN_THREAD_RLOC16], 16))
+            verify(int(entry.timeout) == int(snapshot[wpan.WPAN_THREAD_CHILD_TIMEOUT]))
+            verify(snapshot[wpan.WPAN_NODE_TYPE] == wpan.NODE_TYPE_SLEEPY_END_DEVICE)
+            counter += 1
 
     missing_entry = len(children) - counter
     verify(missing_entry == 0)
@@ -281,9 +377,12 @@ def verify_channel(nodes, new_channel, wait_time=40):
     """
     start_time = time.time()
 
-    while not all([(new_channel == int(node.get(wpan.WPAN_CHANNEL), 0)) for node in nodes]):
-        if time.time() - start_time > wait_time:
-            print('Took too long to switch to channel {} ({}>{} sec)'.format(new_channel,
-                                                                             time.time() - start_time, wait_time))
-            exit(1)
-        time.sleep(0.1)
+    def check_channel():
+        verify(all([(new_channel == int(node.get(wpan.WPAN_CHANNEL), 0)) for node in nodes]))
+
+    try:
+        verify_within(check_channel, wait_time, nodes=nodes)
+    except VerifyError:
+        print('Took too long to switch to channel {} ({}>{} sec)'.format(new_channel,
+                                                                         time.time() - start_time, wait_time))
+        exit(1)
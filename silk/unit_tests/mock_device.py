@@ -78,6 +78,14 @@ class MockHwModule(HwModule):
         self._layout_center = x, y
         self._layout_radius = radius
 
+    def get_dut_serial(self) -> str:
+        """Get mock DUT serial number.
+
+        Returns:
+            str: mock DUT serial number.
+        """
+        return self._dut_serial
+
 
 class MockThreadDevBoard(ThreadDevBoard):
     """Mock ThreadDevBoard for unit testing.
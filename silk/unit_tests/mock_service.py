@@ -20,6 +20,7 @@ import queue
 import socket
 import time
 
+from silk.node import wpantund_dbus
 from silk.tools.otns_manager import Event, GRpcClient
 from silk.unit_tests.test_utils import commands_almost_equal
 
@@ -131,3 +132,58 @@ class MockUDPServer(object):
                 time.sleep(0.01)
             except socket.timeout:
                 pass
+
+
+class MockWpantundDbusService(object):
+    """Mock wpantund D-Bus API, used as the transport of a WpantundDbusClient.
+
+    Properties are stored as (signature, value) variants, as a D-Bus library would decode them.
+    """
+
+    STATUS_OK = 0
+    STATUS_PROPERTY_NOT_FOUND = 0xF0000
+
+    def __init__(self, interface_name: str, props: dict = None):
+        """Initialize a mock wpantund D-Bus service.
+
+        Args:
+            interface_name (str): interface name served by the mock wpantund.
+            props (dict, optional): initial properties as (signature, value) variants. Defaults to None.
+        """
+        self.interface_name = interface_name
+        self.props = dict(props or {})
+        self.calls = []
+        self.closed = False
+
+    def call(self, bus_name: str, path: str, interface: str, method: str, signature: str = None, body=(),
+             timeout: float = None):
+        """Handle a D-Bus method call and return the reply body.
+        """
+        self.calls.append((bus_name, path, interface, method, body))
+
+        if method == wpantund_dbus.METHOD_GET_INTERFACES:
+            return ([(self.interface_name, wpantund_dbus.WPANTUND_DBUS_NAME)],)
+
+        assert path == "%s/%s" % (wpantund_dbus.WPANTUND_DBUS_APIV1_PATH, self.interface_name)
+        prop_name = body[0]
+
+        if method == wpantund_dbus.METHOD_PROP_GET:
+            if prop_name not in self.props:
+                return self.STATUS_PROPERTY_NOT_FOUND, ("s", "")
+            return self.STATUS_OK, self.props[prop_name]
+
+        variant_signature, value = body[1]
+        if method == wpantund_dbus.METHOD_PROP_SET:
+            self.props[prop_name] = (variant_signature, value)
+        elif method == wpantund_dbus.METHOD_PROP_INSERT:
+            self.props.setdefault(prop_name, ("as", []))[1].append(value)
+        elif method == wpantund_dbus.METHOD_PROP_REMOVE:
+            if prop_name not in self.props or value not in self.props[prop_name][1]:
+                return (self.STATUS_PROPERTY_NOT_FOUND,)
+            self.props[prop_name][1].remove(value)
+        return (self.STATUS_OK,)
+
+    def close(self):
+        """Close the mock connection.
+        """
+        self.closed = True
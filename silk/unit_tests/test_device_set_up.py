@@ -0,0 +1,135 @@
+# Copyright 2020 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import collections
+import logging
+import threading
+import time
+import unittest
+
+from silk.tests import testcase
+from silk.unit_tests.testcase import SilkTestCase
+
+SET_UP_DELAY = 0.2
+
+
+class MockDevice(object):
+    """Mock device that takes some time to set up and tear down.
+    """
+
+    def __init__(self, name, fail_set_up=False):
+        self.name = name
+        self.fail_set_up = fail_set_up
+        self.is_set_up = False
+        self.torn_down = 0
+
+    def set_up(self):
+        time.sleep(SET_UP_DELAY)
+        if self.fail_set_up:
+            raise RuntimeError(f"Not able to start wpantund on {self.name}")
+        self.is_set_up = True
+
+    def tear_down(self):
+        time.sleep(SET_UP_DELAY)
+        self.torn_down += 1
+
+
+class MockHarness(testcase.TestCase):
+    """Test harness class with the attributes set up by setup_class_decorator.
+    """
+
+    current_test_class = "MockHarness"
+    logger = logging.getLogger("silk.unit_tests.harness")
+    otns_manager = None
+
+
+class DeviceSetUpTest(SilkTestCase):
+    """Silk unit test case for concurrent device set up and tear down in the test harness.
+    """
+
+    def setUp(self):
+        """Test method set up.
+        """
+        MockHarness.results = collections.OrderedDict([(MockHarness.current_test_class, collections.OrderedDict())])
+        MockHarness.device_list = []
+
+    def testSetUpDevicesConcurrently(self):
+        """Test that devices are set up concurrently and their durations are recorded.
+        """
+        devices = [MockDevice(f"device-{i}") for i in range(8)]
+
+        start_time = time.time()
+        MockHarness.set_up_devices(devices, max_workers=8)
+        elapsed = time.time() - start_time
+
+        self.assertTrue(all(device.is_set_up for device in devices))
+        self.assertLess(elapsed, SET_UP_DELAY * len(devices) / 2)
+
+        durations = MockHarness.results[MockHarness.current_test_class][testcase.DEVICE_SET_UP_TIME]
+        self.assertEqual([device.name for device in devices], list(durations.keys()))
+        self.assertTrue(all(duration >= SET_UP_DELAY for duration in durations.values()))
+
+    def testMaxWorkers(self):
+        """Test that no more than max_workers devices are set up at once.
+        """
+        active = []
+        peak = []
+        lock = threading.Lock()
+
+        class CountingDevice(MockDevice):
+
+            def set_up(self):
+                with lock:
+                    active.append(self)
+                    peak.append(len(active))
+                time.sleep(0.05)
+                with lock:
+                    active.remove(self)
+
+        MockHarness.set_up_devices([CountingDevice(f"device-{i}") for i in range(6)], max_workers=2)
+        self.assertEqual(2, max(peak))
+
+    def testPartialFailure(self):
+        """Test that failures are reported per device and claimed hardware is released.
+        """
+        devices = [MockDevice("good-1"), MockDevice("bad-1", fail_set_up=True), MockDevice("good-2"),
+                   MockDevice("bad-2", fail_set_up=True)]
+        for device in devices:
+            MockHarness.add_test_device(device)
+
+        with self.assertRaises(testcase.DeviceSetUpError) as context:
+            MockHarness.set_up_devices(devices)
+
+        self.assertEqual(["bad-1", "bad-2"], list(context.exception.failures.keys()))
+        self.assertTrue(devices[0].is_set_up)
+        self.assertTrue(devices[2].is_set_up)
+
+        MockHarness.release_devices()
+        self.assertEqual([1, 1, 1, 1], [device.torn_down for device in devices])
+
+    def testTearDownDevices(self):
+        """Test that devices are torn down concurrently.
+        """
+        devices = [MockDevice(f"device-{i}") for i in range(8)]
+
+        start_time = time.time()
+        MockHarness.tear_down_devices(devices)
+        elapsed = time.time() - start_time
+
+        self.assertEqual([1] * len(devices), [device.torn_down for device in devices])
+        self.assertLess(elapsed, SET_UP_DELAY * len(devices) / 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
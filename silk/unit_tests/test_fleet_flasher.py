@@ -0,0 +1,271 @@
+# Copyright 2020 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+import unittest
+from unittest import mock
+
+from silk.tools.firmware_cache import FirmwareCache, hash_image, is_valid_version
+from silk.tools.fleet_flasher import FleetFlasher, UNKNOWN_HUB, usb_hub_of
+from silk.unit_tests.mock_device import MockThreadDevBoard
+from silk.unit_tests.testcase import SilkTestCase
+from silk.utils.directorypath import DirectoryPath
+
+FLASH_DELAY = 0.3
+
+# Stand-in for the nrfjprog.sh flashing script. The serial number is the last argument; a board fails once for each
+# fail_<serial> file in the script directory.
+FAKE_NRFJPROG = f"""#!/bin/sh
+for serial in "$@"; do :; done
+sleep {FLASH_DELAY}
+if [ -e "$(dirname "$0")/fail_$serial" ]; then
+    rm "$(dirname "$0")/fail_$serial"
+    echo "ERROR: JLinkARM DLL reported an error"
+    exit 1
+fi
+echo "Script processing completed"
+"""
+
+FIRMWARE_FILE = "/tmp/nrf52840_image/ot-ncp-ftd.hex"
+NCP_VERSION = "OPENTHREAD/20191113-00534-gc6a258e3; NRF52840; Apr 30 2020 10:00:00"
+
+
+class FleetFlasherTest(SilkTestCase):
+    """Silk unit test case for the fleet flasher.
+    """
+
+    def setUp(self):
+        """Test method set up.
+        """
+        self.work_dir = tempfile.mkdtemp()
+        self.shell_dir = os.path.join(self.work_dir, "shell") + "/"
+        os.mkdir(self.shell_dir)
+        script_path = os.path.join(self.shell_dir, "nrfjprog.sh")
+        with open(script_path, "w") as script:
+            script.write(FAKE_NRFJPROG)
+        os.chmod(script_path, 0o755)
+
+        self.patches = [
+            mock.patch.object(DirectoryPath, "get_dir", return_value=self.shell_dir),
+            mock.patch.object(MockThreadDevBoard, "netns_killall"),
+        ]
+        for patch in self.patches:
+            patch.start()
+
+        self.boards = [MockThreadDevBoard(i + 1) for i in range(6)]
+        for board in self.boards:
+            board.flash_erase_settle_time = 0
+            board.flash_settle_time = 0
+
+    def tearDown(self):
+        """Test method tear down.
+        """
+        for patch in self.patches:
+            patch.stop()
+        shutil.rmtree(self.work_dir)
+
+    def testFlashConcurrently(self):
+        """Test that boards on different hubs are flashed concurrently and the results are reported.
+        """
+        flasher = FleetFlasher(max_per_hub=1, hub_of=lambda port: port, logger=self.logger)
+
+        start_time = time.time()
+        results = flasher.flash(self.boards, FIRMWARE_FILE, self.work_dir)
+        elapsed = time.time() - start_time
+
+        self.assertEqual([board.name for board in self.boards], [result.name for result in results])
+        self.assertTrue(all(result.success and result.attempts == 1 for result in results))
+        self.assertTrue(all(board.flash_result for board in self.boards))
+        # Erasing and flashing takes two script runs per board
+        self.assertLess(elapsed, 2 * FLASH_DELAY * len(self.boards) / 2)
+
+        for board in self.boards:
+            log_file = os.path.join(self.work_dir, board.device.get_dut_serial(), "nrf52840_flash.log")
+            self.assertTrue(os.path.exists(log_file))
+
+        report_path = os.path.join(self.work_dir, "report.json")
+        flasher.write_report(results, report_path)
+        with open(report_path) as report_file:
+            report = json.load(report_file)
+        self.assertEqual(len(self.boards), len(report))
+        self.assertTrue(all(entry["success"] for entry in report))
+
+    def testHubLimit(self):
+        """Test that no more than max_per_hub boards behind one hub are flashed at once.
+        """
+        lock = threading.Lock()
+        active = {}
+        peak = {}
+        hubs = {board.device.port(): "hub%d" % (i % 2) for i, board in enumerate(self.boards)}
+
+        def track(board, flash_firmware):
+
+            def flash(*args):
+                hub = hubs[board.device.port()]
+                with lock:
+                    active[hub] = active.get(hub, 0) + 1
+                    peak[hub] = max(peak.get(hub, 0), active[hub])
+                try:
+                    return flash_firmware(*args)
+                finally:
+                    with lock:
+                        active[hub] -= 1
+
+            return flash
+
+        for board in self.boards:
+            board.flash_firmware = track(board, board.flash_firmware)
+
+        flasher = FleetFlasher(max_per_hub=2, hub_of=hubs.get, logger=self.logger)
+        results = flasher.flash(self.boards, FIRMWARE_FILE, self.work_dir)
+
+        self.assertTrue(all(result.success for result in results))
+        self.assertEqual({"hub0": 2, "hub1": 2}, peak)
+
+    def testRetry(self):
+        """Test that transient failures are retried and persistent failures are reported.
+        """
+        flaky = self.boards[0].device.get_dut_serial()
+        broken = self.boards[1].device.get_dut_serial()
+        open(os.path.join(self.shell_dir, "fail_" + flaky), "w").close()
+
+        flasher = FleetFlasher(retries=1, retry_delay=0, logger=self.logger)
+        with mock.patch.object(self.boards[1], "flash_firmware", return_value=False):
+            results = flasher.flash(self.boards[:3], FIRMWARE_FILE, self.work_dir)
+
+        self.assertEqual([True, False, True], [result.success for result in results])
+        self.assertEqual([2, 2, 1], [result.attempts for result in results])
+        self.assertEqual(broken, results[1].serial)
+        self.assertIsNotNone(results[1].error)
+
+    def testUnsupportedImage(self):
+        """Test that unsupported images fail without retrying.
+        """
+        flasher = FleetFlasher(retries=3, retry_delay=0, logger=self.logger)
+        results = flasher.flash(self.boards[:1], "/tmp/unknown.hex", self.work_dir)
+
+        self.assertFalse(results[0].success)
+        self.assertEqual(1, results[0].attempts)
+
+    def __write_image(self, content: bytes) -> str:
+        fw_file = os.path.join(self.work_dir, "ot-ncp-ftd-nrf52840.hex")
+        with open(fw_file, "wb") as image:
+            image.write(content)
+        return fw_file
+
+    def __fake_wpantund(self, boards, versions):
+        """Patch the boards to report the NCP version in `versions` while their wpantund runs, and wpanctl's error
+        once it has been stopped.
+        """
+        running = set(board.name for board in boards)
+
+        def wpanctl(board, action, command, timeout):
+            if board.name not in running:
+                return "wpanctl: error: No WPAN interface named \"%s\" found." % board.netns
+            return "NCPVersion = %s" % versions[board.name]
+
+        patches = [
+            mock.patch.object(MockThreadDevBoard, "wpanctl", autospec=True, side_effect=wpanctl),
+            mock.patch.object(MockThreadDevBoard,
+                              "_FifteenFourDevBoardNode__start_wpantund",
+                              autospec=True,
+                              side_effect=lambda board, thread_mode: running.add(board.name)),
+            mock.patch.object(MockThreadDevBoard, "_FifteenFourDevBoardNode__stop_wpantund", autospec=True),
+        ]
+        patches += [
+            mock.patch.object(board, "netns_killall", side_effect=lambda name=board.name: running.discard(name))
+            for board in boards
+        ]
+        for patch in patches:
+            patch.start()
+            self.addCleanup(patch.stop)
+
+    def testFirmwareCache(self):
+        """Test that boards already running the image are skipped unless forced.
+        """
+        fw_file = self.__write_image(b":10000000FFFFFFFF")
+        cache = FirmwareCache(os.path.join(self.work_dir, "firmware_cache.json"))
+        flasher = FleetFlasher(retry_delay=0, cache=cache, logger=self.logger)
+        boards = self.boards[:3]
+        versions = {board.name: NCP_VERSION for board in boards}
+        self.__fake_wpantund(boards, versions)
+
+        results = flasher.flash(boards, fw_file, self.work_dir)
+        self.assertEqual([False] * 3, [result.skipped for result in results])
+        self.assertEqual(NCP_VERSION, cache.get(boards[0].device.get_dut_serial())["ncp_version"])
+
+        # A fresh cache loaded from the record skips every board
+        cache = FirmwareCache(cache.path)
+        flasher.cache = cache
+        results = flasher.flash(boards, fw_file, self.work_dir)
+        self.assertEqual([True] * 3, [result.skipped for result in results])
+        self.assertTrue(all(result.success and result.attempts == 0 for result in results))
+        self.assertEqual(NCP_VERSION, cache.get(boards[0].device.get_dut_serial())["ncp_version"])
+
+        # A board reporting a different NCP version than recorded is flashed again, and records the version the
+        # flashed image reports
+        versions[boards[0].name] = "OPENTHREAD/other"
+        results = flasher.flash(boards, fw_file, self.work_dir)
+        self.assertEqual([False, True, True], [result.skipped for result in results])
+        self.assertEqual("OPENTHREAD/other", cache.get(boards[0].device.get_dut_serial())["ncp_version"])
+        versions[boards[0].name] = NCP_VERSION
+
+        results = flasher.flash(boards, fw_file, self.work_dir, force=True)
+        self.assertEqual([False] * 3, [result.skipped for result in results])
+        self.assertEqual(NCP_VERSION, cache.get(boards[0].device.get_dut_serial())["ncp_version"])
+
+        # A board whose wpantund cannot be restarted after flashing is not trusted to run the image
+        with mock.patch.object(boards[0], "_FifteenFourDevBoardNode__start_wpantund", side_effect=RuntimeError):
+            flasher.flash(boards, fw_file, self.work_dir, force=True)
+        self.assertIsNone(cache.get(boards[0].device.get_dut_serial())["ncp_version"])
+        results = flasher.flash(boards, fw_file, self.work_dir)
+        self.assertEqual([False, True, True], [result.skipped for result in results])
+        self.assertEqual(NCP_VERSION, cache.get(boards[0].device.get_dut_serial())["ncp_version"])
+
+        # A new image is flashed, and a failed flash invalidates the record
+        fw_file = self.__write_image(b":10000000EEEEEEEE")
+        with mock.patch.object(boards[0], "flash_firmware", return_value=False):
+            results = flasher.flash(boards, fw_file, self.work_dir)
+        self.assertEqual([False, True, True], [result.success for result in results])
+        self.assertIsNone(cache.get(boards[0].device.get_dut_serial()))
+        self.assertEqual(hash_image(fw_file), cache.get(boards[1].device.get_dut_serial())["image_hash"])
+
+    def testVersionErrors(self):
+        """Test that wpanctl error messages are not taken for NCP versions.
+        """
+        self.assertTrue(is_valid_version(NCP_VERSION))
+        for output in (None, "", "wpanctl: error: No WPAN interface named \"wpan1\" found.",
+                       "getprop failed with error 1", "Error: Unable to connect to wpantund"):
+            self.assertFalse(is_valid_version(output), output)
+
+    def testUsbHubOf(self):
+        """Test finding the USB hub from the sysfs path of a serial device.
+        """
+        sysfs_paths = {
+            "/sys/class/tty/ttyACM0/device": "/sys/devices/pci0000:00/0000:00:14.0/usb1/1-1/1-1.3/1-1.3:1.0",
+            "/sys/class/tty/ttyACM1/device": "/sys/devices/pci0000:00/0000:00:14.0/usb2/2-4/2-4:1.0",
+        }
+        with mock.patch("os.path.realpath", side_effect=lambda path: sysfs_paths.get(path, path)):
+            self.assertEqual("1-1", usb_hub_of("/dev/ttyACM0"))
+            self.assertEqual("usb2", usb_hub_of("/dev/ttyACM1"))
+            self.assertEqual(UNKNOWN_HUB, usb_hub_of("/dev/ttyACM2"))
+
+
+if __name__ == "__main__":
+    unittest.main()
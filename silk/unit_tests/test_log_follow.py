@@ -0,0 +1,186 @@
+# Copyright 2020 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from pathlib import Path
+import os
+import shutil
+import tempfile
+import threading
+import time
+import unittest
+from unittest import mock
+
+from silk.tests.silk_replay import LOG_LINE_REGEX, SilkReplayer
+from silk.unit_tests.testcase import SilkTestCase
+
+FIXTURE_DIR = Path(__file__).parent / "fixture"
+CHUNK_LINES = 700
+
+
+class LogFollowTest(SilkTestCase):
+    """Silk unit test case for following a growing log.
+    """
+
+    def setUp(self):
+        """Test method set up.
+        """
+        self.temp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.temp_dir)
+        self.log_path = os.path.join(self.temp_dir, "silk.log")
+        open(self.log_path, "w").close()
+
+        with open(FIXTURE_DIR / "partition_merge_log.txt") as log_file:
+            self.lines = log_file.readlines()
+        self.messages = [match.group(4) for match in map(LOG_LINE_REGEX.search, self.lines) if match]
+
+        self.replayer = SilkReplayer(argv=[
+            "tests/silk_replay.py", "-v0", "-c",
+            str(FIXTURE_DIR / "hwconfig.ini"), "-r", self.temp_dir, "--analyze", self.log_path
+        ],
+                                     run_now=False)
+        self.replayer.poll_interval = 0.01
+        self.executed = []
+        self.replayer.execute_message = lambda entity_name, message, timestamp: self.executed.append(message)
+        self.thread = None
+
+    def tearDown(self):
+        """Test method tear down.
+        """
+        if self.thread is not None:
+            self.replayer.stop()
+            self.thread.join()
+
+    def start_following(self, **kwargs):
+        """Start following the log in a thread, and wait until it reached the end of the log.
+        """
+        at_end = threading.Event()
+        rotated = self.replayer._rotated
+
+        def check_rotated(file):
+            at_end.set()
+            return rotated(file)
+
+        self.replayer._rotated = check_rotated
+        self.thread = threading.Thread(target=self.replayer.run, kwargs=dict(kwargs, follow=True), daemon=True)
+        self.thread.start()
+        self.assertTrue(at_end.wait(10))
+
+    def append(self, lines):
+        """Append lines to the log.
+        """
+        with open(self.log_path, "a") as log_file:
+            log_file.writelines(lines)
+
+    def wait_for_messages(self, lines):
+        """Wait until the messages of a number of the fixture lines are executed.
+        """
+        count = len([line for line in lines if LOG_LINE_REGEX.search(line)])
+        deadline = time.time() + 10
+        while len(self.executed) < count and time.time() < deadline:
+            time.sleep(0.01)
+        self.assertEqual(self.messages[:count], self.executed)
+
+    def testFollowAppends(self):
+        """Test that lines are replayed as they are appended, and partially written lines once complete.
+        """
+        self.start_following()
+        for start in range(0, len(self.lines), CHUNK_LINES):
+            self.append(self.lines[start:start + CHUNK_LINES])
+            self.wait_for_messages(self.lines[:start + CHUNK_LINES])
+
+        self.append(["[2020-08-27 16:30:00,000] [silk] [INFO] TEAR DOWN CLASS DONE TestP"])
+        time.sleep(0.1)
+        self.assertEqual(len(self.messages), len(self.executed))
+        self.append(["artitionMerge\n"])
+        self.lines.append("[2020-08-27 16:30:00,000] [silk] [INFO] TEAR DOWN CLASS DONE TestPartitionMerge\n")
+        self.messages.append("TEAR DOWN CLASS DONE TestPartitionMerge")
+        self.wait_for_messages(self.lines)
+
+        self.replayer.stop()
+        self.thread.join(timeout=1)
+        self.assertFalse(self.thread.is_alive())
+
+    def testRotation(self):
+        """Test that the rest of a rotated log is replayed before the new log.
+        """
+        self.start_following()
+        self.append(self.lines[:CHUNK_LINES])
+        self.wait_for_messages(self.lines[:CHUNK_LINES])
+
+        self.append(self.lines[CHUNK_LINES:2 * CHUNK_LINES])
+        os.rename(self.log_path, self.log_path + ".1")
+        self.append(self.lines[2 * CHUNK_LINES:])
+        self.wait_for_messages(self.lines)
+
+    def testTruncation(self):
+        """Test that a log truncated in place is replayed again from its start.
+        """
+        self.start_following()
+        self.append(self.lines[:2 * CHUNK_LINES])
+        self.wait_for_messages(self.lines[:2 * CHUNK_LINES])
+
+        with open(self.log_path, "w") as log_file:
+            log_file.writelines(self.lines[2 * CHUNK_LINES:3 * CHUNK_LINES])
+        self.wait_for_messages(self.lines[:3 * CHUNK_LINES])
+
+    def testCatchUp(self):
+        """Test that the lines already in the log are replayed without waiting, and appended lines in real time.
+        """
+        self.replayer.analyze = False
+        self.append(self.lines[:CHUNK_LINES])
+        with mock.patch("time.sleep") as sleep:
+            self.start_following()
+            self.wait_for_messages(self.lines[:CHUNK_LINES])
+            sleep.assert_not_called()
+
+            self.append(self.lines[CHUNK_LINES:2 * CHUNK_LINES])
+            self.wait_for_messages(self.lines[:2 * CHUNK_LINES])
+            self.replayer.stop()
+            self.thread.join()
+        self.assertTrue(sleep.called)
+
+    def testFromEnd(self):
+        """Test that following from the end of the log only replays the lines appended afterwards.
+        """
+        line_count = len(self.lines)
+        self.append(self.lines[:CHUNK_LINES])
+        self.start_following(from_end=True)
+        self.assertEqual([], self.executed)
+
+        self.append(self.lines[CHUNK_LINES:])
+        self.lines = self.lines[CHUNK_LINES:]
+        self.messages = [match.group(4) for match in map(LOG_LINE_REGEX.search, self.lines) if match]
+        self.wait_for_messages(self.lines)
+
+        self.replayer.stop()
+        self.thread.join()
+        # the line numbers count the skipped lines
+        self.assertEqual(line_count, self.replayer.next_line)
+
+    def testIdleTimeout(self):
+        """Test that following stops once no line is appended for the idle timeout, like replaying the whole log.
+        """
+        self.append(self.lines)
+        start_time = time.time()
+        line_number = self.replayer.run(follow=True, idle_timeout=0.2)
+        self.assertGreaterEqual(time.time() - start_time, 0.2)
+        self.assertEqual(self.messages, self.executed)
+
+        self.executed.clear()
+        self.assertEqual(line_number, self.replayer.run())
+        self.assertEqual(self.messages, self.executed)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,153 @@
+# Copyright 2020 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from datetime import datetime
+from pathlib import Path
+import os
+import shutil
+import tempfile
+import time
+import unittest
+from unittest import mock
+
+from silk.tests.silk_replay import DATE_FORMAT, LogIndex, SilkReplayer
+from silk.unit_tests.testcase import SilkTestCase
+
+FIXTURE_DIR = Path(__file__).parent / "fixture"
+TEST_CLASS = "TestFormNetwork"
+
+
+class LogIndexTest(SilkTestCase):
+    """Silk unit test case for the replay log index.
+    """
+
+    def setUp(self):
+        """Test method set up.
+        """
+        self.temp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.temp_dir)
+        self.log_path = os.path.join(self.temp_dir, "form_network_log.txt")
+        shutil.copy(FIXTURE_DIR / "form_network_log.txt", self.log_path)
+        with open(self.log_path) as log_file:
+            self.lines = log_file.readlines()
+
+    def create_replayer(self) -> SilkReplayer:
+        """Create a replayer of the test log recording the messages it executes instead of sending them to OTNS.
+        """
+        replayer = SilkReplayer(argv=[
+            "tests/silk_replay.py", "-v0", "-c",
+            str(FIXTURE_DIR / "hwconfig.ini"), "-r", self.temp_dir, "-p", "1000000", self.log_path
+        ],
+                                run_now=False)
+        replayer.otns_manager = mock.Mock()
+        replayer.executed = []
+        replayer.execute_message = lambda entity_name, message, timestamp: replayer.executed.append(message)
+        return replayer
+
+    def testPhases(self):
+        """Test that the test phase markers are indexed with the offsets of their lines.
+        """
+        index = LogIndex.build(self.log_path)
+        self.assertEqual(("SET UP CLASS", TEST_CLASS, 1), index.phases[0][:3])
+        self.assertEqual(("TEAR DOWN CLASS DONE", TEST_CLASS, 5483), index.phases[-1][:3])
+        self.assertEqual(3 * 5 + 3, len(index.phases))
+
+        with open(self.log_path, "rb") as log_file:
+            for marker in index.phases:
+                log_file.seek(marker.offset)
+                self.assertEqual(self.lines[marker.line], log_file.readline().decode())
+
+        self.assertEqual((2104, 2625), index.phase_lines(f"{TEST_CLASS}.test02_GetWpanStatus"))
+        self.assertEqual((1, None), index.phase_lines(TEST_CLASS))
+        with self.assertRaises(ValueError):
+            index.phase_lines("TestMissing")
+
+    def testSeek(self):
+        """Test that seeking moves to an indexed line at or before the requested line or time.
+        """
+        index = LogIndex.build(self.log_path)
+        with open(self.log_path) as log_file:
+            for line in (0, 10, 999, 1000, 2105, 4500, len(self.lines) - 1):
+                found_line = index.seek(log_file, line)
+                self.assertLessEqual(found_line, line)
+                self.assertLess(line - found_line, LogIndex.CHECKPOINT_INTERVAL)
+                self.assertEqual(self.lines[found_line], log_file.readline())
+
+            start_time = datetime.strptime("2020-08-27 16:13:51,328", DATE_FORMAT)
+            found_line = index.seek(log_file, start_time=start_time)
+            self.assertLess(found_line, 2624)
+            self.assertLessEqual(self.lines[found_line][1:24], "2020-08-27 16:13:51,328")
+
+    def testCache(self):
+        """Test that the index is cached next to the log and rebuilt once the log changes.
+        """
+        with mock.patch.object(LogIndex, "build", wraps=LogIndex.build) as build:
+            index = LogIndex.load(self.log_path)
+            self.assertTrue(os.path.exists(LogIndex.cache_path(self.log_path)))
+            self.assertEqual(index.phases, LogIndex.load(self.log_path).phases)
+            self.assertEqual(1, build.call_count)
+
+            with open(self.log_path, "a") as log_file:
+                log_file.write("[2020-08-27 16:18:23,000] [silk] [INFO] SET UP CLASS TestAppended\n")
+            self.assertEqual("TestAppended", LogIndex.load(self.log_path).phases[-1].name)
+            self.assertEqual(2, build.call_count)
+
+    def testRunPhase(self):
+        """Test that replaying a phase executes exactly the lines of the phase.
+        """
+        replayer = self.create_replayer()
+        self.assertEqual(2625, replayer.run_phase(f"{TEST_CLASS}.test02_GetWpanStatus"))
+        self.assertEqual("SET UP TestFormNetwork.test02_GetWpanStatus", replayer.executed[0])
+        self.assertEqual("TEAR DOWN TestFormNetwork.test02_GetWpanStatus", replayer.executed[-1])
+
+        legacy = self.create_replayer()
+        legacy.run(stop_regex="SET UP TestFormNetwork.test02_GetWpanStatus")
+        legacy.executed = []
+        legacy.run(start_line=2104, stop_regex="SET UP TestFormNetwork.test03_PingRouterLLA")
+        self.assertEqual(legacy.executed, replayer.executed)
+
+    def testRunTimeWindow(self):
+        """Test that replaying a time window skips the lines logged before and after it.
+        """
+        replayer = self.create_replayer()
+        replayer.run(start_time=datetime.strptime("2020-08-27 16:12:19,380", DATE_FORMAT),
+                     stop_time=datetime.strptime("2020-08-27 16:12:19,380", DATE_FORMAT))
+        self.assertEqual(
+            ["SET UP TestFormNetwork.test02_GetWpanStatus", "RUNNING TEST TestFormNetwork.test02_GetWpanStatus"],
+            [message for message in replayer.executed if message.startswith(("SET UP", "RUNNING TEST", "TEAR DOWN"))])
+        self.assertEqual(2107, replayer.next_line)
+
+    def testBenchmark(self):
+        """Benchmark replaying the last test phase through the index against scanning the log up to it.
+        """
+        replayer = self.create_replayer()
+        replayer.log_index
+
+        start_time = time.perf_counter()
+        replayer.run_phase(f"{TEST_CLASS}.test05_PingRouterULA")
+        indexed_elapsed = time.perf_counter() - start_time
+
+        legacy = self.create_replayer()
+        start_time = time.perf_counter()
+        legacy.run(stop_regex="SET UP TestFormNetwork.test05_PingRouterULA")
+        legacy.run(start_line=legacy.next_line, stop_regex="TEAR DOWN CLASS TestFormNetwork")
+        scan_elapsed = time.perf_counter() - start_time
+
+        self.logger.info(f"Replaying the last phase: {indexed_elapsed * 1000:.1f}ms through the index, "
+                         f"{scan_elapsed * 1000:.1f}ms scanning the log")
+        self.assertEqual(legacy.executed[-1], replayer.executed[-1])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,231 @@
+# Copyright 2020 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import errno
+import ipaddress
+import os
+import socket
+import subprocess
+import threading
+import time
+import unittest
+from unittest import mock
+
+from silk.device import netlink
+from silk.device.netns_base import StandaloneNetworkNamespace
+from silk.tools import wpan_util
+from silk.unit_tests.testcase import SilkTestCase
+import silk.config.defaults as defaults
+
+NETNS = "silk-netlink-test"
+INTERFACE = "silk-veth"
+PEER_INTERFACE = "silk-veth-peer"
+
+
+def netns_supported():
+    """Check whether network namespaces can be created and entered by this process.
+    """
+    if os.geteuid() != 0:
+        return False
+    try:
+        return subprocess.run(["ip", "netns", "list"], stdout=subprocess.DEVNULL,
+                              stderr=subprocess.DEVNULL).returncode == 0
+    except OSError:
+        return False
+
+
+def address_message(msg_type, index, address, prefix_len):
+    """Build an address notification as the kernel sends it.
+    """
+    address = ipaddress.ip_address(address)
+    payload = netlink.IFADDRMSG.pack(socket.AF_INET6, prefix_len, 0, 0, index)
+    payload += netlink.pack_attribute(netlink.IFA_ADDRESS, address.packed)
+    payload += netlink.pack_attribute(netlink.IFA_FLAGS, netlink.U32.pack(0x80))
+    return netlink.NLMSG_HEADER.pack(netlink.NLMSG_HEADER.size + len(payload), msg_type, 0, 0, 0) + payload
+
+
+class NetlinkParserTest(SilkTestCase):
+    """Silk unit test case for parsing netlink messages.
+    """
+
+    def testParseAddress(self):
+        """Test that address messages are split and parsed into Address entries.
+        """
+        data = address_message(netlink.RTM_NEWADDR, 3, "fd00:abba::1", 64)
+        data += address_message(netlink.RTM_DELADDR, 4, "fe80::1", 64)
+
+        messages = netlink.parse_messages(data)
+        self.assertEqual([netlink.RTM_NEWADDR, netlink.RTM_DELADDR], [message[0] for message in messages])
+
+        address = netlink.parse_address(messages[0][3], {3: "wpan0"})
+        self.assertEqual(netlink.Address("wpan0", 3, ipaddress.ip_interface("fd00:abba::1/64"), 0, 0x80), address)
+        self.assertIsNone(netlink.parse_address(messages[1][3], {3: "wpan0"}).interface)
+
+    def testAddressHasPrefix(self):
+        """Test that prefixes match like in the wpanctl address lists.
+        """
+        self.assertTrue(netlink.address_has_prefix(ipaddress.ip_address("fd00:abba::1"), "fd00:abba::"))
+        self.assertTrue(netlink.address_has_prefix(ipaddress.ip_address("fd00:abba:0:1::1"), "fd00:abba::"))
+        self.assertFalse(netlink.address_has_prefix(ipaddress.ip_address("fd00:abbb::1"), "fd00:abba::"))
+
+    def testCurrentNamespace(self):
+        """Test that the links, addresses and routes of the current namespace are listed without privileges.
+        """
+        with netlink.NetlinkReader() as reader:
+            state = reader.state(socket.AF_UNSPEC)
+            self.assertIn("lo", [link.name for link in state.links])
+            self.assertIn(ipaddress.ip_interface("127.0.0.1/8"),
+                          [address.address for address in state.addresses if address.interface == "lo"])
+            self.assertEqual(["127.0.0.1"], reader.find_addresses("127.", "lo"))
+
+
+@unittest.skipUnless(netns_supported(), "network namespaces cannot be entered without root privileges")
+class NetlinkNamespaceTest(SilkTestCase):
+    """Silk unit test case for querying a network namespace over netlink.
+    """
+
+    def setUp(self):
+        """Test method set up.
+        """
+        subprocess.run(["ip", "netns", "add", NETNS], check=True)
+        for command in ("link add %s type veth peer name %s" % (INTERFACE, PEER_INTERFACE),
+                        "link set %s up" % INTERFACE, "link set %s up" % PEER_INTERFACE):
+            subprocess.run(["ip", "-n", NETNS] + command.split(), check=True)
+        self.reader = netlink.NetlinkReader(NETNS)
+
+    def tearDown(self):
+        """Test method tear down.
+        """
+        self.reader.close()
+        subprocess.run(["ip", "netns", "del", NETNS])
+
+    def testQueries(self):
+        """Test that links, addresses and routes of the namespace are listed, not those of the caller.
+        """
+        self.reader.add_address(INTERFACE, "fd00:abba::1/64")
+
+        links = {link.name: link for link in self.reader.links()}
+        self.assertEqual({"lo", INTERFACE, PEER_INTERFACE}, set(links))
+        self.assertTrue(links[INTERFACE].up)
+        self.assertFalse(links["lo"].up)
+
+        self.assertEqual(["fd00:abba::1"], self.reader.find_addresses("fd00:abba::"))
+        self.assertEqual([], self.reader.find_addresses("fd00:abba::", "lo"))
+        routes = self.reader.routes()
+        self.assertIn(ipaddress.ip_network("fd00:abba::/64"),
+                      [route.destination for route in routes if route.interface == INTERFACE])
+
+        with self.assertRaises(OSError) as context:
+            self.reader.add_address(INTERFACE, "fd00:abba::1/64")
+        self.assertEqual(errno.EEXIST, context.exception.errno)
+
+        self.reader.delete_address(INTERFACE, "fd00:abba::1/64")
+        self.assertEqual([], self.reader.find_addresses("fd00:abba::"))
+        with self.assertRaises(OSError):
+            self.reader.add_address("silk-missing", "fd00:abba::1/64")
+
+    def testWaitForAddress(self):
+        """Test that waiting for an address returns as soon as it is added, and times out otherwise.
+        """
+        timer = threading.Timer(
+            0.2, subprocess.run,
+            [["ip", "-n", NETNS, "address", "add", "fd00:abba::2/64", "dev", INTERFACE, "nodad"]])
+        start_time = time.time()
+        timer.start()
+        try:
+            self.assertEqual("fd00:abba::2", self.reader.wait_for_address("fd00:abba::", 5, INTERFACE))
+        finally:
+            timer.join()
+        self.assertLess(time.time() - start_time, 1)
+
+        # Already assigned
+        self.assertEqual("fd00:abba::2", self.reader.wait_for_address("fd00:abba::", 0))
+
+        start_time = time.time()
+        self.assertEqual("", self.reader.wait_for_address("fd00:beef::", 0.3))
+        self.assertGreaterEqual(time.time() - start_time, 0.3)
+
+    def testSubscription(self):
+        """Test that added and deleted addresses are notified in order.
+        """
+        with self.reader.subscribe_addresses() as subscription:
+            self.reader.add_address(INTERFACE, "fd00:abba::3/64")
+            self.reader.delete_address(INTERFACE, "fd00:abba::3/64")
+
+            events = []
+            while True:
+                event = subscription.next_event(1)
+                if event is None:
+                    break
+                if event.address.address == ipaddress.ip_interface("fd00:abba::3/64"):
+                    events.append((event.added, event.address.interface))
+            self.assertEqual([(True, INTERFACE), (False, INTERFACE)], events)
+
+    def testController(self):
+        """Test that a network namespace controller adds and finds addresses over netlink.
+        """
+        with mock.patch.object(defaults, "NETLINK_QUERIES", True), \
+                mock.patch.object(StandaloneNetworkNamespace, "create_netns"):
+            controller = StandaloneNetworkNamespace(NETNS)
+        self.assertIsNotNone(controller.netns)
+
+        controller.add_ip6_addr("00abba0000", "0001", "0200000000000001", INTERFACE, "addr")
+        self.assertIsNone(controller.wait_for_completion())
+        self.assertEqual([str(ipaddress.ip_address(controller.get_data("addr")))],
+                         controller.netlink.find_addresses("fd00:abba::", INTERFACE))
+
+        node = mock.Mock(netlink=controller.netlink, thread_interface=INTERFACE)
+        wpan_util.verify_address([node], "fd00:abba::")
+        wpan_util.verify_no_address([node], "fd00:beef::")
+        node.get.assert_not_called()
+
+        controller.close_netlink()
+        self.assertIsNone(controller.netlink)
+
+    def testWaitForAddressOnNodes(self):
+        """Test that waiting for addresses on several nodes fails if one of them has none.
+        """
+        nodes = [mock.Mock(), mock.Mock()]
+        nodes[0].wait_for_ip6_address_with_prefix.return_value = "fd00:abba::1"
+        nodes[1].wait_for_ip6_address_with_prefix.return_value = ""
+
+        wpan_util.wait_for_address(nodes[:1], "fd00:abba::", 1)
+        with self.assertRaises(wpan_util.VerifyError):
+            wpan_util.wait_for_address(nodes, "fd00:abba::", 1)
+
+    def testBenchmark(self):
+        """Benchmark address queries over netlink against `ip netns exec` commands.
+        """
+        num_queries = 50
+        self.reader.add_address(INTERFACE, "fd00:abba::1/64")
+
+        start_time = time.time()
+        for _ in range(num_queries):
+            addresses = self.reader.find_addresses("fd00:abba::", INTERFACE)
+        netlink_duration = time.time() - start_time
+
+        start_time = time.time()
+        for _ in range(num_queries):
+            subprocess.run("ip netns exec %s ip -6 addr show dev %s" % (NETNS, INTERFACE),
+                           shell=True,
+                           stdout=subprocess.PIPE,
+                           stderr=subprocess.STDOUT)
+        command_duration = time.time() - start_time
+
+        self.logger.info(f"{num_queries} queries: netlink {netlink_duration:.3f}s, commands {command_duration:.3f}s")
+        self.assertEqual(["fd00:abba::1"], addresses)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,154 @@
+# Copyright 2020 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import subprocess
+import time
+import unittest
+from unittest import mock
+
+from silk.device.netns_base import StandaloneNetworkNamespace
+from silk.device.netns_helper import command_argv, NetnsHelperClient
+from silk.device.system_call_manager import SystemCallOutput
+from silk.unit_tests.testcase import SilkTestCase
+
+# Starts the helper in a new network namespace owned by a new user namespace, which needs no privileges
+USER_NAMESPACE_LAUNCHER = ["unshare", "--user", "--map-root-user", "--net"]
+
+
+def user_namespaces_supported():
+    """Check whether unprivileged user and network namespaces can be created.
+    """
+    try:
+        return subprocess.run(USER_NAMESPACE_LAUNCHER + ["true"], stdout=subprocess.DEVNULL,
+                              stderr=subprocess.DEVNULL).returncode == 0
+    except OSError:
+        return False
+
+
+class CommandArgvTest(SilkTestCase):
+    """Silk unit test case for converting command lines for the netns helper.
+    """
+
+    def testCommandArgv(self):
+        """Test that only commands using shell syntax run through /bin/sh.
+        """
+        self.assertEqual(["ip", "-6", "addr"], command_argv("ip -6  addr"))
+        self.assertEqual(["ifconfig"], command_argv("ifconfig"))
+        for command in ("echo a; echo b", "cat file | grep x", "nc -6u host 1 <<< \"message\"",
+                        "sysctl -w net.ipv6.conf.all.forwarding=1", "echo $HOME"):
+            self.assertEqual(["/bin/sh", "-c", command], command_argv(command))
+
+
+@unittest.skipUnless(user_namespaces_supported(), "unprivileged user namespaces are not available")
+class NetnsHelperTest(SilkTestCase):
+    """Silk unit test case for running commands through the netns helper.
+    """
+
+    def setUp(self):
+        """Test method set up.
+        """
+        self.helper = NetnsHelperClient(launcher=USER_NAMESPACE_LAUNCHER)
+        self.assertTrue(self.helper.start())
+
+    def tearDown(self):
+        """Test method tear down.
+        """
+        self.helper.stop()
+
+    def __run(self, command, timeout=5):
+        collector = SystemCallOutput(self.logger.debug)
+        self.assertTrue(self.helper.run(command, timeout, collector))
+        collector.finish()
+        return collector.getvalue()
+
+    def testNamespace(self):
+        """Test that commands run inside the network namespace of the helper.
+        """
+        output = self.__run("ip -o link")
+        self.assertIn("lo:", output)
+        self.assertEqual(1, len(output.splitlines()))
+
+    def testOutput(self):
+        """Test that the output of direct and shell commands is returned completely.
+        """
+        self.assertEqual("first second\n", self.__run("echo first  second"))
+        self.assertEqual("first\nsecond\n\nthird", self.__run("printf 'first\\nsecond\\n\\nthird'"))
+        self.assertEqual("error\n", self.__run("echo error >&2"))
+        self.assertIn("No such file or directory", self.__run("silk-missing-command argument"))
+
+    def testReturnsOnExit(self):
+        """Test that a call returns promptly when the command exits while a descendant keeps the output open.
+        """
+        start_time = time.time()
+        self.assertEqual("started\n", self.__run("echo started; sleep 10 &", 10))
+        self.assertLess(time.time() - start_time, 2)
+
+    def testTimeout(self):
+        """Test that a command running past the timeout is killed and partial output returned.
+        """
+        start_time = time.time()
+        self.assertEqual("started\n", self.__run("echo started; exec sleep 10", 1))
+        self.assertLess(time.time() - start_time, 3)
+
+    def testStop(self):
+        """Test that commands cannot run once the helper stopped.
+        """
+        self.helper.stop()
+        self.assertFalse(self.helper.is_alive())
+        self.assertFalse(self.helper.run("true", 1, SystemCallOutput(self.logger.debug)))
+
+    def testController(self):
+        """Test that a network namespace controller runs synchronous and queued commands through the helper.
+        """
+        controller = StandaloneNetworkNamespace("silk-helper-test")
+        controller.netns_helper = self.helper
+        self.assertEqual(1, len(controller.make_netns_call("ip -o link").splitlines()))
+
+        controller.make_netns_call_async("ip -o link", r"(?P<index>\d+): lo:", 5, ["index"], read_only=True)
+        controller.make_netns_call_async("echo done", "done", 5, "done", exact_match=True)
+        self.assertIsNone(controller.wait_for_completion())
+        self.assertEqual("1", controller.get_data("index"))
+        self.assertEqual("done", controller.get_data("done"))
+
+        # Commands fall back to ip netns exec once the helper is gone
+        self.helper.stop()
+        with mock.patch.object(controller, "_make_system_call", return_value="fallback\n") as make_system_call:
+            self.assertEqual("fallback\n", controller.make_netns_call("echo fallback", 5))
+        make_system_call.assert_called_once_with("netns-exec", controller.construct_netns_command("echo fallback"), 5)
+
+    def testBenchmark(self):
+        """Benchmark commands through the helper against a shell per command entering the namespace.
+        """
+        num_calls = 50
+        helper_pid = int(self.__run("echo $PPID"))
+
+        start_time = time.time()
+        for _ in range(num_calls):
+            output = self.__run("ip -o link")
+        helper_duration = time.time() - start_time
+
+        start_time = time.time()
+        for _ in range(num_calls):
+            subprocess.run("nsenter --target %d --user --net ip -o link" % helper_pid,
+                           shell=True,
+                           stdout=subprocess.PIPE,
+                           stderr=subprocess.STDOUT)
+        shell_duration = time.time() - start_time
+
+        self.logger.info(f"{num_calls} commands: helper {helper_duration:.3f}s, shell {shell_duration:.3f}s")
+        self.assertIn("lo:", output)
+
+
+if __name__ == "__main__":
+    unittest.main()
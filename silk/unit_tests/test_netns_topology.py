@@ -0,0 +1,227 @@
+# Copyright 2020 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import ipaddress
+import os
+import subprocess
+import time
+import unittest
+from unittest import mock
+
+from silk.device.netns_base import StandaloneNetworkNamespace
+from silk.device.netns_topology import DUMP_NETNS_MARKER, NetnsState, ROOT_NETNS, TopologyError, TopologyProvisioner
+from silk.device.netns_topology import route_key
+from silk.unit_tests.testcase import SilkTestCase
+
+NUM_NODES = 20
+
+
+def privileged_command_prefix():
+    """Get the command prefix to manage network namespaces with, or None if this is not possible.
+    """
+    for prefix in ("", "sudo -n "):
+        if prefix == "" and os.geteuid() != 0:
+            continue
+        try:
+            if subprocess.run(prefix + "ip netns list", shell=True, stdout=subprocess.DEVNULL,
+                              stderr=subprocess.DEVNULL).returncode == 0:
+                return prefix
+        except OSError:
+            pass
+    return None
+
+
+COMMAND_PREFIX = privileged_command_prefix()
+
+
+def node_topology(num_nodes, prefix=""):
+    """Build a topology with a namespace per node, linked to the root namespace by a veth pair with an address.
+    """
+    topology = TopologyProvisioner(prefix)
+    for i in range(num_nodes):
+        netns = "silk-topo-%d" % i
+        topology.add_netns(netns)
+        topology.add_link_pair("silk-topo-%d" % i, "silk-topo-%dn" % i, peer_netns=netns)
+        topology.add_address(netns, "silk-topo-%dn" % i, "fd00:%x::1/64" % i)
+        topology.add_route(netns, "fd01:%x::/64" % i, "fd00:%x::2" % i, "silk-topo-%dn" % i)
+    return topology
+
+
+class TopologyProvisionerTest(SilkTestCase):
+    """Silk unit test case for building and verifying topology batches.
+    """
+
+    def testBatches(self):
+        """Test that operations are grouped into one batch per namespace, the root namespace first.
+        """
+        topology = node_topology(2)
+
+        batches = topology.batches()
+        self.assertEqual([ROOT_NETNS, "silk-topo-0", "silk-topo-1"], list(batches))
+        self.assertEqual([
+            "netns add silk-topo-0",
+            "netns add silk-topo-1",
+            "link add name silk-topo-0 type veth peer name silk-topo-0n netns silk-topo-0",
+            "link set dev silk-topo-0 up",
+            "link add name silk-topo-1 type veth peer name silk-topo-1n netns silk-topo-1",
+            "link set dev silk-topo-1 up",
+        ], batches[ROOT_NETNS])
+        self.assertEqual([
+            "link set dev silk-topo-1n up",
+            "address add fd00:1::1/64 dev silk-topo-1n",
+            "route add fd01:1::/64 via fd00:1::2 dev silk-topo-1n",
+        ], batches["silk-topo-1"])
+
+    def testVerify(self):
+        """Test that missing namespaces, links, addresses and routes are reported from a dump.
+        """
+        topology = node_topology(3)
+        states = {
+            ROOT_NETNS: NetnsState({"lo": True, "silk-topo-0": True, "silk-topo-1": False}, set(), set()),
+            "silk-topo-0": NetnsState({"lo": False, "silk-topo-0n": True},
+                                      {("silk-topo-0n", ipaddress.ip_interface("fd00:0:0::1/64"))},
+                                      {route_key("fd01:0::/64", "fd00:0::2", "silk-topo-0n")}),
+            "silk-topo-1": NetnsState({"lo": False, "silk-topo-1n": True}, set(), set()),
+        }
+
+        self.assertEqual([
+            "Network namespace silk-topo-2 does not exist",
+            "Link silk-topo-1 is down in the root namespace",
+            "Link silk-topo-2 is missing in the root namespace",
+            "Address fd00:1::1/64 is missing on silk-topo-1n in namespace silk-topo-1",
+            "Route to fd01:1::/64 via fd00:1::2 is missing on silk-topo-1n in namespace silk-topo-1",
+        ], topology.verify(states))
+
+    def testDump(self):
+        """Test that links, addresses and IPv4 and IPv6 routes are parsed from a dump.
+        """
+        topology = node_topology(1)
+        output = "\n".join([
+            DUMP_NETNS_MARKER,
+            "1: lo: <LOOPBACK,UP,LOWER_UP> mtu 65536 qdisc noqueue state UNKNOWN mode DEFAULT group default",
+            "3: silk-topo-0@if2: <BROADCAST,MULTICAST,UP,LOWER_UP> mtu 1500 qdisc noqueue state UP",
+            "default via 192.0.2.1 dev eth0",
+            DUMP_NETNS_MARKER + "silk-topo-0",
+            "1: lo: <LOOPBACK> mtu 65536 qdisc noop state DOWN mode DEFAULT group default qlen 1000",
+            "2: silk-topo-0n@if3: <BROADCAST,MULTICAST,UP,LOWER_UP> mtu 1500 qdisc noqueue state UP",
+            "2: silk-topo-0n    inet6 fd00::1/64 scope global \\       valid_lft forever preferred_lft forever",
+            "fd00::/64 dev silk-topo-0n proto kernel metric 256 pref medium",
+            "fd01::/64 via fd00::2 dev silk-topo-0n metric 1024 pref medium",
+            "unreachable fd02::/64 dev lo metric 1024 pref medium",
+        ])
+        with mock.patch.object(topology, "_TopologyProvisioner__run", return_value=output):
+            states = topology.dump()
+
+        self.assertEqual({route_key("default", "192.0.2.1", "eth0")}, states[ROOT_NETNS].routes)
+        self.assertEqual({"lo": False, "silk-topo-0n": True}, states["silk-topo-0"].links)
+        self.assertEqual({route_key("fd00::/64", None, "silk-topo-0n"),
+                          route_key("fd01::/64", "fd00::2", "silk-topo-0n")}, states["silk-topo-0"].routes)
+        self.assertEqual([], topology.verify(states))
+
+
+@unittest.skipIf(COMMAND_PREFIX is None, "network namespaces cannot be managed")
+class TopologyProvisioningTest(SilkTestCase):
+    """Silk unit test case for provisioning topologies, which needs privileges to manage network namespaces.
+    """
+
+    def testProvision(self):
+        """Test that a topology is created, verified and deleted in bulk.
+        """
+        topology = node_topology(NUM_NODES, COMMAND_PREFIX)
+        try:
+            self.assertTrue(topology.apply())
+            self.assertTrue(topology.applied)
+
+            states = topology.dump()
+            self.assertEqual([], topology.verify(states))
+            self.assertIn(("silk-topo-3n", ipaddress.ip_interface("fd00:3::1/64")), states["silk-topo-3"].addresses)
+            self.assertIn(route_key("fd01:3::/64", "fd00:3::2", "silk-topo-3n"), states["silk-topo-3"].routes)
+        finally:
+            topology.tear_down()
+
+        states = topology.dump()
+        self.assertEqual([ROOT_NETNS], list(states))
+        self.assertNotIn("silk-topo-0", states[ROOT_NETNS].links)
+
+    def testFailure(self):
+        """Test that operations that cannot be applied are reported.
+        """
+        topology = TopologyProvisioner(COMMAND_PREFIX)
+        topology.add_netns("silk-topo-bad")
+        topology.add_link_pair("silk-topo-name-too-long", "silk-topo-bad-peer", peer_netns="silk-topo-bad")
+        try:
+            with self.assertRaises(TopologyError) as context:
+                with topology.collect():
+                    pass
+            self.assertFalse(topology.applied)
+            self.assertIn("Link silk-topo-name-too-long is missing in the root namespace", context.exception.problems)
+        finally:
+            topology.tear_down()
+
+    def testControllers(self):
+        """Test that network namespace controllers created in a collect() block are provisioned in bulk.
+        """
+        topology = TopologyProvisioner(COMMAND_PREFIX)
+        with topology.collect():
+            controllers = [StandaloneNetworkNamespace("silk-topo-%d" % i) for i in range(2)]
+            for i, controller in enumerate(controllers):
+                self.assertIs(topology, controller.pending_topology)
+                topology.add_link_pair("silk-topo-%d" % i, "silk-topo-%dn" % i, peer_netns=controller.netns)
+                controller.add_ip6_addr("%010x" % i, "0001", "0200000000000001", "silk-topo-%dn" % i, "addr")
+            self.assertEqual(["silk-topo-0", "silk-topo-1"], topology.namespaces)
+            self.assertEqual(2, len(topology.addresses))
+
+        try:
+            states = topology.dump()
+            for i, controller in enumerate(controllers):
+                self.assertIsNone(controller.pending_topology)
+                address = ipaddress.ip_interface(controller.get_data("addr") + "/64")
+                self.assertIn(("silk-topo-%dn" % i, address), states[controller.netns].addresses)
+        finally:
+            for controller in controllers:
+                controller.delete_netns()
+            self.assertEqual(2, len(topology.dump()) - 1)
+            topology.tear_down()
+
+    def testBenchmark(self):
+        """Benchmark bulk provisioning against one ip call per operation.
+        """
+        topology = node_topology(NUM_NODES, COMMAND_PREFIX)
+        start_time = time.time()
+        try:
+            self.assertTrue(topology.apply())
+        finally:
+            topology.tear_down()
+        bulk_duration = time.time() - start_time
+
+        start_time = time.time()
+        try:
+            for i in range(NUM_NODES):
+                for command in ("ip netns add silk-topo-{0}",
+                                "ip link add name silk-topo-{0} type veth peer name silk-topo-{0}n",
+                                "ip link set silk-topo-{0}n netns silk-topo-{0}", "ip link set silk-topo-{0} up",
+                                "ip netns exec silk-topo-{0} ip link set silk-topo-{0}n up",
+                                "ip netns exec silk-topo-{0} ip addr add fd00:{0:x}::1/64 dev silk-topo-{0}n"):
+                    subprocess.run(COMMAND_PREFIX + command.format(i), shell=True)
+        finally:
+            for i in range(NUM_NODES):
+                for command in ("ip link del silk-topo-{0}", "ip netns del silk-topo-{0}"):
+                    subprocess.run(COMMAND_PREFIX + command.format(i), shell=True)
+        sequential_duration = time.time() - start_time
+
+        self.logger.info(f"{NUM_NODES} nodes: bulk {bulk_duration:.3f}s, sequential {sequential_duration:.3f}s")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,152 @@
+# Copyright 2020 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import threading
+import time
+import unittest
+
+from silk.device.system_call_manager import TemporarySystemCallManager
+from silk.unit_tests.testcase import SilkTestCase
+from silk.utils import event_loop
+from silk.utils.subprocess_runner import AsyncSubprocessRunner
+
+NUM_NODES = 64
+MAX_WORKERS = 4
+
+
+@unittest.skipUnless(event_loop.is_supported(), "the node event loop requires Python 3.8")
+class NodeEventLoopTest(SilkTestCase):
+    """Silk unit test case for running node system calls on a shared event loop.
+    """
+
+    def setUp(self):
+        """Test method set up.
+        """
+        self.event_loop = event_loop.NodeEventLoop(max_workers=MAX_WORKERS, name="test-event-loop")
+
+    def tearDown(self):
+        """Test method tear down.
+        """
+        self.event_loop.close()
+
+    def testQueuedSystemCalls(self):
+        """Test that queued system calls of many managers run on the shared loop and store their results.
+        """
+        thread_count = threading.active_count()
+        managers = [TemporarySystemCallManager(f"node-{i}", self.event_loop) for i in range(NUM_NODES)]
+        self.assertEqual(thread_count, threading.active_count())
+
+        for i, manager in enumerate(managers):
+            manager.make_system_call_async("echo", f"sleep 0.2; echo value-{i}", r"value-(?P<value>\d+)", 5, ["value"])
+
+        start_time = time.time()
+        for manager in managers:
+            self.assertIsNone(manager.wait_for_completion())
+        self.assertLess(time.time() - start_time, 0.2 * NUM_NODES / 4)
+
+        self.assertEqual([str(i) for i in range(NUM_NODES)], [manager.get_data("value") for manager in managers])
+        self.assertLessEqual(threading.active_count(), thread_count + MAX_WORKERS)
+
+    def testOrder(self):
+        """Test that system calls and functions queued on one manager run one after the other.
+        """
+        manager = TemporarySystemCallManager("node", self.event_loop)
+        calls = []
+
+        def record(value, delegates):
+            calls.append(value)
+            return True
+
+        manager.make_function_call_async(record, "first")
+        manager.make_system_call_async("echo", "sleep 0.1; echo second", "second", 5, "second")
+        manager.make_function_call_async(lambda delegates: record(manager.get_data("second"), delegates))
+
+        self.assertIsNone(manager.wait_for_completion())
+        self.assertEqual(["first", "second"], calls)
+
+    def testConcurrentReadOnlyCalls(self):
+        """Test that consecutive read-only calls of one manager run at the same time.
+        """
+        manager = TemporarySystemCallManager("node", self.event_loop)
+        # Keep the manager busy until all calls are queued, so that they are grouped as queued
+        manager.make_system_call_async("hold", "sleep 0.2", None, 5)
+        for i in range(manager.max_concurrent_calls):
+            manager.make_system_call_async("read", f"sleep 0.5; echo value-{i}", r"value-\d+", 5, f"value-{i}",
+                                           read_only=True)
+        manager.make_system_call_async("write", "echo done", "done", 5, "done")
+
+        start_time = time.time()
+        self.assertIsNone(manager.wait_for_completion())
+        self.assertLess(time.time() - start_time, 0.2 + 0.5 * manager.max_concurrent_calls - 0.5)
+        self.assertEqual("value-0", manager.get_data("value-0"))
+        self.assertEqual("done", manager.get_data("done"))
+
+    def testErrors(self):
+        """Test that a failed expectation is reported and drops the remaining queued items.
+        """
+        manager = TemporarySystemCallManager("node", self.event_loop)
+        manager.make_system_call_async("echo", "echo actual", "expected", 5)
+        manager.make_system_call_async("echo", "echo later", "later", 5, "later")
+
+        self.assertIsNotNone(manager.wait_for_completion())
+        self.assertIsNone(manager.get_data("later"))
+
+        manager.make_system_call_async("echo", "echo again", "again", 5, "again")
+        self.assertIsNone(manager.wait_for_completion())
+        self.assertEqual("again", manager.get_data("again"))
+
+    def testSynchronousCalls(self):
+        """Test the synchronous facade, including timeouts.
+        """
+        manager = TemporarySystemCallManager("node", self.event_loop)
+        self.assertEqual("hello\n", manager._make_system_call("echo", "echo hello", 5))
+
+        start_time = time.time()
+        self.assertEqual("partial\n", manager._make_system_call("sleep", "echo partial; exec sleep 10", 0.3))
+        self.assertLess(time.time() - start_time, 5)
+
+        with self.assertRaises(RuntimeError):
+            self.event_loop.run(self.__run_on_loop(manager))
+
+    async def __run_on_loop(self, manager):
+        return manager._make_system_call("echo", "echo deadlock", 5)
+
+    def testSubprocessRunner(self):
+        """Test that the event loop runner streams output lines without a thread of its own.
+        """
+        thread_count = threading.active_count()
+        runner = AsyncSubprocessRunner("for i in 1 2 3; do echo line-$i; done; exec sleep 30", self.event_loop)
+        lines = []
+        received = threading.Event()
+
+        def handle(sender, **kwargs):
+            lines.extend(kwargs["lines"])
+            if len(lines) == 3:
+                received.set()
+
+        runner.subscribe(handle, batch=True)
+        runner.start()
+        self.assertTrue(received.wait(5))
+        self.assertEqual(["line-1", "line-2", "line-3"], lines)
+        self.assertTrue(runner.is_alive())
+        self.assertLessEqual(threading.active_count(), thread_count + MAX_WORKERS)
+
+        runner.stop(5)
+        self.assertFalse(runner.is_alive())
+        self.assertFalse(runner.running)
+        self.assertEqual(0, runner.queue_depth)
+
+
+if __name__ == "__main__":
+    unittest.main()
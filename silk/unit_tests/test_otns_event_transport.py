@@ -0,0 +1,194 @@
+# Copyright 2020 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from typing import Dict, List
+from unittest import mock
+import queue
+import socket
+import threading
+import time
+import unittest
+
+from silk.tools.otns_manager import SERVER_PORT, Event, EventTransport, OtnsManager, OtnsNode
+from silk.unit_tests.mock_service import MockUDPServer
+from silk.unit_tests.testcase import SilkTestCase
+import silk.config.defaults as defaults
+
+NODE_COUNT = 16
+
+
+class OtnsEventTransportTest(SilkTestCase):
+    """Silk unit test case for the batched OTNS event transport.
+    """
+
+    def setUp(self):
+        """Test method set up.
+        """
+        self.udp_server = MockUDPServer(queue.Queue())
+        self.addCleanup(self.udp_server.close)
+        self.received = []
+        self.receiving = True
+        self.receiver = threading.Thread(target=self.receive, daemon=True)
+        self.receiver.start()
+
+        self.transport = EventTransport(window=0.005, logger=self.logger.getChild("EventTransport"))
+        self.nodes = [self.create_node(node_id, self.transport) for node_id in range(1, NODE_COUNT + 1)]
+
+    def tearDown(self):
+        """Test method tear down.
+        """
+        self.transport.close()
+        for node in self.nodes:
+            node.close_socket()
+        self.receiving = False
+        self.receiver.join()
+
+    def create_node(self, node_id: int, transport: EventTransport) -> OtnsNode:
+        """Create an OTNS node sending to the mock UDP server.
+        """
+        return OtnsNode(node_id=node_id,
+                        dut_serial=f"serial{node_id}",
+                        vis_x=0,
+                        vis_y=0,
+                        local_host="127.0.0.1",
+                        server_host="localhost",
+                        server_port=SERVER_PORT,
+                        grpc_client=mock.Mock(),
+                        logger=self.logger.getChild(f"OtnsNode{node_id}"),
+                        transport=transport)
+
+    def receive(self):
+        """Receive the datagrams sent to the mock UDP server.
+        """
+        while self.receiving:
+            try:
+                self.received.append(self.udp_server.sock.recvfrom(0xfff))
+            except socket.timeout:
+                pass
+            except OSError:
+                return
+
+    def wait_for_statuses(self, count: int) -> Dict[int, List[str]]:
+        """Wait until a number of status messages are received, and split them per node.
+
+        Returns:
+            Dict[int, List[str]]: status messages received from each node ID, in order.
+        """
+        deadline = time.time() + 10
+        while time.time() < deadline:
+            statuses = {}
+            for data, address in list(self.received):
+                statuses.setdefault(address[1] - SERVER_PORT, []).extend(Event.from_bytes(data).message.split(";"))
+            if sum(len(messages) for messages in statuses.values()) >= count:
+                return statuses
+            time.sleep(0.01)
+        self.fail(f"Received {len(self.received)} datagrams")
+
+    def testOrderPerNode(self):
+        """Test that the interleaved status events of all nodes arrive in order per node, in fewer datagrams.
+        """
+        for i in range(20):
+            for node in self.nodes:
+                node.send_event(Event.status_event(f"seq={i}").to_bytes())
+
+        statuses = self.wait_for_statuses(20 * NODE_COUNT)
+        for node in self.nodes:
+            self.assertEqual([f"seq={i}" for i in range(20)], statuses[node.node_id])
+        self.assertLess(self.transport.sent_datagrams, 20 * NODE_COUNT)
+
+    def testCoalesce(self):
+        """Test that only consecutive status events are joined, up to the maximum size.
+        """
+        alarm = Event.alarm_event(5).to_bytes()
+        packets = [Event.status_event(message).to_bytes() for message in ("role=1", "extaddr=0a", "x" * 1020)]
+        datagrams = self.transport.coalesce(packets[:2] + [alarm] + packets[1:])
+
+        self.assertEqual(["role=1;extaddr=0a", "extaddr=0a", "x" * 1020],
+                         [Event.from_bytes(datagram).message for datagram in datagrams if datagram != alarm])
+        self.assertEqual(alarm, datagrams[1])
+
+    def testCloseSocketFlushes(self):
+        """Test that the queued events of a node are sent before its socket is closed.
+        """
+        transport = EventTransport(window=60, logger=self.logger.getChild("EventTransport"))
+        node = self.nodes.pop()
+        node.transport = transport
+        node.send_event(Event.status_event("role=0").to_bytes())
+        node.close_socket()
+        self.assertEqual({node.node_id: ["role=0"]}, self.wait_for_statuses(1))
+        transport.close()
+
+    def testManager(self):
+        """Test that the manager only batches events when enabled.
+        """
+        self.assertIsNone(OtnsManager("localhost", self.logger.getChild("OtnsManager")).event_transport)
+        with mock.patch.object(defaults, "OTNS_EVENT_BATCH_WINDOW", 0.01):
+            manager = OtnsManager("localhost", self.logger.getChild("OtnsManager"))
+        self.assertEqual(0.01, manager.event_transport.window)
+        self.assertIsNone(OtnsManager("localhost", self.logger.getChild("OtnsManager"), headless=True).event_transport)
+
+    def testManagerClose(self):
+        """Test that closing the manager sends the queued events and stops the sender thread.
+        """
+        with mock.patch.object(defaults, "OTNS_EVENT_BATCH_WINDOW", 60):
+            manager = OtnsManager("localhost", self.logger.getChild("OtnsManager"))
+        transport = manager.event_transport
+        node = self.nodes.pop()
+        node.transport = transport
+        manager.otns_node_map[mock.Mock()] = node
+        node.send_event(Event.status_event("role=0").to_bytes())
+
+        manager.close()
+        self.assertIsNone(manager.event_transport)
+        self.assertIsNone(node.transport)
+        self.assertFalse(transport._thread.is_alive())
+        node.send_event(Event.status_event("role=1").to_bytes())
+        self.assertEqual({node.node_id: ["role=0", "role=1"]}, self.wait_for_statuses(2))
+        node.close_socket()
+        manager.close()
+
+    def testBenchmark(self):
+        """Benchmark sending bursts of status events from all nodes with and without the transport.
+        """
+        for node in self.nodes:
+            node.close_socket()
+        elapsed = {}
+        datagrams = {}
+        for name, transport in (("direct", None), ("batched", self.transport)):
+            self.nodes = [self.create_node(node_id, transport) for node_id in range(1, NODE_COUNT + 1)]
+            # best of 3 bursts
+            for _ in range(3):
+                self.received.clear()
+                start_time = time.perf_counter()
+                for i in range(200):
+                    for node in self.nodes:
+                        node.send_event(Event.status_event(f"role={i % 5}").to_bytes())
+                if transport is not None:
+                    transport.flush()
+                elapsed[name] = min(elapsed.get(name, float("inf")), time.perf_counter() - start_time)
+
+                time.sleep(0.2)
+                datagrams[name] = len(self.received)
+            for node in self.nodes:
+                node.close_socket()
+
+        self.logger.info(f"{200 * NODE_COUNT} events from {NODE_COUNT} nodes: "
+                         f"{elapsed['direct'] * 1000:.1f}ms, {datagrams['direct']} datagrams received sent directly; "
+                         f"{elapsed['batched'] * 1000:.1f}ms, {datagrams['batched']} datagrams batched")
+        # the timings depend on the scheduling of the sender and receiver threads, the datagram count does not
+        self.assertLess(datagrams["batched"], 200 * NODE_COUNT / 10)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,137 @@
+# Copyright 2020 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import time
+import unittest
+from unittest import mock
+
+from silk.config import wpan_constants as wpan
+from silk.node.fifteen_four_dev_board import WpantundMonitor
+from silk.node.wpantund_base import PropertyCache
+from silk.unit_tests.mock_device import MockThreadDevBoard
+from silk.unit_tests.testcase import SilkTestCase
+import silk.config.defaults as defaults
+
+MAX_AGE = 5
+
+
+class PropertyCacheTest(SilkTestCase):
+    """Silk unit test case for the node property cache.
+    """
+
+    def setUp(self):
+        """Test method set up.
+        """
+        with mock.patch.object(defaults, "PROPERTY_CACHE_MAX_AGE", MAX_AGE):
+            self.node = MockThreadDevBoard(1)
+            self.cache = self.node.property_cache
+        self.monitor = WpantundMonitor(publisher=self.node.wpantund_process)
+        self.monitor.property_cache = self.cache
+        self.values = {wpan.WPAN_STATE: "\"offline\"", wpan.WPAN_PANID: "0x1234", wpan.WPAN_PARTITION_ID: "8"}
+
+        patcher = mock.patch.object(self.node, "wpanctl", side_effect=self.wpanctl)
+        self.wpanctl_mock = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def wpanctl(self, action, command, timeout):
+        """Answer getprop commands from self.values.
+        """
+        prop_name = command.split()[-1]
+        if "-v" in command.split():
+            return self.values[prop_name] + "\n"
+        return "%s = %s\n" % (prop_name, self.values[prop_name])
+
+    def testHitsAndMisses(self):
+        """Test that cached properties are read once, and other properties every time without counting as misses.
+        """
+        for _ in range(3):
+            self.assertEqual("\"offline\"", self.node.get(wpan.WPAN_STATE))
+            self.assertEqual("0x1234", self.node.getprop(wpan.WPAN_PANID))
+            self.assertEqual("8", self.node.get(wpan.WPAN_PARTITION_ID))
+        self.assertEqual("%s = \"offline\"" % wpan.WPAN_STATE, self.node.get(wpan.WPAN_STATE, value_only=False))
+
+        self.assertEqual(5, self.wpanctl_mock.call_count)
+        self.assertEqual(5, self.cache.hits)
+        self.assertEqual(2, self.cache.misses)
+
+    def testLiveRead(self):
+        """Test that a live read bypasses the cache and refreshes it.
+        """
+        self.node.get(wpan.WPAN_STATE)
+        self.values[wpan.WPAN_STATE] = "\"associated\""
+        self.assertEqual("\"offline\"", self.node.get(wpan.WPAN_STATE))
+        self.assertEqual("\"associated\"", self.node.get(wpan.WPAN_STATE, live=True))
+        self.assertEqual("\"associated\"", self.node.get(wpan.WPAN_STATE))
+        self.assertEqual(2, self.wpanctl_mock.call_count)
+
+        self.node.getprop(wpan.WPAN_PANID)
+        self.values[wpan.WPAN_PANID] = "0x4321"
+        self.assertEqual("0x1234", self.node.getprop(wpan.WPAN_PANID))
+        self.assertEqual("0x4321", self.node.getprop(wpan.WPAN_PANID, live=True))
+        self.assertEqual("0x4321", self.node.getprop(wpan.WPAN_PANID))
+        self.assertEqual(4, self.wpanctl_mock.call_count)
+
+    def testExpiry(self):
+        """Test that values are read again once older than the staleness bound.
+        """
+        self.node.get(wpan.WPAN_STATE)
+        with mock.patch("silk.node.wpantund_base.time.time", return_value=time.time() + MAX_AGE + 1):
+            self.node.get(wpan.WPAN_STATE)
+        self.assertEqual(2, self.wpanctl_mock.call_count)
+        self.assertEqual(0, self.cache.hits)
+
+    def testFailedReads(self):
+        """Test that errors are not cached.
+        """
+        self.values[wpan.WPAN_STATE] = "Error: wpantund is not running"
+        self.node.get(wpan.WPAN_STATE)
+        self.node.get(wpan.WPAN_STATE)
+        self.assertEqual(2, self.wpanctl_mock.call_count)
+
+    def testCommandsInvalidate(self):
+        """Test that commands that may change the node state drop the cached values.
+        """
+        self.node.get(wpan.WPAN_PANID)
+        self.node.invalidate_properties()
+        self.node.get(wpan.WPAN_PANID)
+        self.assertEqual(2, self.wpanctl_mock.call_count)
+
+    def testLogEvents(self):
+        """Test that state changes reported by wpantund update the cache without any wpanctl call.
+        """
+        self.node.get(wpan.WPAN_PANID)
+        self.node.wpantund_process.emit_status("State change: \"offline\" -> \"associating\"")
+        self.assertEqual("\"associating\"", self.node.get(wpan.WPAN_STATE))
+        self.assertEqual(1, self.wpanctl_mock.call_count)
+
+        self.node.wpantund_process.emit_status("Node type change: \"unknown\" -> \"leader\"")
+        self.assertEqual("\"associating\"", self.node.get(wpan.WPAN_STATE))
+        self.assertEqual("\"leader\"", self.node.get(wpan.WPAN_NODE_TYPE))
+        self.assertEqual(1, self.wpanctl_mock.call_count)
+
+        self.node.wpantund_process.emit_status("[-NCP-]: NCP was reset (RESET_SOFTWARE)")
+        self.node.get(wpan.WPAN_STATE)
+        self.assertEqual(2, self.wpanctl_mock.call_count)
+
+    def testDisabled(self):
+        """Test that the cache is disabled by default.
+        """
+        cache = PropertyCache()
+        cache.put(wpan.WPAN_STATE, "\"offline\"")
+        self.assertIsNone(cache.get(wpan.WPAN_STATE))
+        self.assertEqual(0, cache.misses)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,154 @@
+# Copyright 2020 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from datetime import datetime
+from pathlib import Path
+import os
+import shutil
+import tempfile
+import time
+import unittest
+from unittest import mock
+
+import pandas
+
+from silk.tests.silk_replay import DATE_FORMAT, SilkReplayer, parse_log_time
+from silk.unit_tests.testcase import SilkMockingTestCase
+
+FIXTURE_DIR = Path(__file__).parent / "fixture"
+LOG_FILENAMES = [
+    "child_table_log.txt", "form_network_log.txt", "neighbor_table_log.txt", "partition_merge_log.txt",
+    "router_table_log.txt"
+]
+
+
+class ReplayAnalysisTest(SilkMockingTestCase):
+    """Silk unit test case for the headless analysis replay mode.
+    """
+
+    def setUp(self):
+        """Test method set up.
+        """
+        super().setUp()
+        self.temp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.temp_dir)
+
+    def create_replayer(self, log_filename: str, analyze: bool) -> SilkReplayer:
+        """Prepare a replayer of a fixture log, replaying through the mocked OTNS unless analyzing.
+
+        Args:
+            log_filename (str): log file basename.
+            analyze (bool): if the replayer runs in analyze mode.
+
+        Returns:
+            SilkReplayer: a SilkReplayer prepared for a test.
+        """
+        argv = ["tests/silk_replay.py", "-v0", "-c", str(FIXTURE_DIR / "hwconfig.ini"), "-r", self.temp_dir]
+        argv += ["--analyze"] if analyze else ["-p", "1000000"]
+        replayer = SilkReplayer(argv=argv + [str(FIXTURE_DIR / log_filename)], run_now=False)
+        if not analyze:
+            replayer.otns_manager = self.manager
+        return replayer
+
+    def summary(self, replayer: SilkReplayer, log_filename: str) -> pandas.DataFrame:
+        """Write the summary CSV of a replay and read it back.
+        """
+        csv_path = os.path.join(self.temp_dir, f"{log_filename}.csv")
+        replayer.output_summary(coalesced=True, csv_path=csv_path)
+        return pandas.read_csv(csv_path)
+
+    def testParseLogTime(self):
+        """Test that the fixed format parser reads timestamps like datetime.strptime.
+        """
+        for value in ("2020-08-27 16:11:55,328", "2020-12-31 23:59:59,999", "2021-01-01 00:00:00,000",
+                      "2020-08-27 16:11:55,328000", "2020-08-27 16:11:55,3"):
+            self.assertEqual(datetime.strptime(value, DATE_FORMAT), parse_log_time(value))
+        with self.assertRaises(ValueError):
+            parse_log_time("2020-08-27 16:11:55.328")
+
+    def testHeadlessManager(self):
+        """Test that analyzing a log creates neither sockets nor gRPC channels.
+        """
+        replayer = self.create_replayer("form_network_log.txt", analyze=True)
+        self.assertTrue(replayer.otns_manager.headless)
+        self.assertIsNone(replayer.otns_manager.grpc_client)
+
+        with mock.patch("time.sleep") as sleep:
+            replayer.run(stop_regex="SET UP TestFormNetwork.test01_Pairing")
+        sleep.assert_not_called()
+        self.assertEqual(7, len(replayer.otns_manager.otns_node_map))
+        for node in replayer.otns_manager.otns_node_map.values():
+            self.assertIsNone(node.sock)
+            self.assertFalse(node.node_on_otns)
+
+    def testSummaries(self):
+        """Test that analyzing a log summarizes the nodes like replaying it through OTNS.
+        """
+        for log_filename in LOG_FILENAMES:
+            replayer = self.create_replayer(log_filename, analyze=True)
+            replayer.run()
+            analyzed = self.summary(replayer, log_filename)
+
+            self.manager.node_summaries.clear()
+            replayer = self.create_replayer(log_filename, analyze=False)
+            replayer.run()
+            self.manager.remove_all_nodes()
+
+            self.assertFalse(analyzed.empty)
+            self.assertTrue(analyzed.equals(self.summary(replayer, log_filename)), log_filename)
+
+    def testRunNow(self):
+        """Test that analyzing from the command line writes the summary to the results directory.
+        """
+        SilkReplayer(argv=[
+            "tests/silk_replay.py", "-v0", "-c",
+            str(FIXTURE_DIR / "hwconfig.ini"), "-r", self.temp_dir, "--analyze",
+            str(FIXTURE_DIR / "partition_merge_log.txt")
+        ])
+        csv_path = os.path.join(self.temp_dir, "silk_replay_summary_for_partition_merge_log.txt.csv")
+        self.assertFalse(pandas.read_csv(csv_path).empty)
+
+    def testBenchmark(self):
+        """Benchmark analyzing the fixture logs against replaying them at maximum speed, and the timestamp parsers.
+        """
+        size = sum(os.path.getsize(FIXTURE_DIR / log_filename) for log_filename in LOG_FILENAMES)
+        elapsed = {}
+        for analyze in (True, False):
+            replayers = [self.create_replayer(log_filename, analyze) for log_filename in LOG_FILENAMES]
+            start_time = time.perf_counter()
+            for replayer in replayers:
+                replayer.run()
+            elapsed[analyze] = time.perf_counter() - start_time
+            self.manager.remove_all_nodes()
+
+        timestamps = ["2020-08-27 16:%02d:%02d,%03d" % (i // 600 % 60, i // 10 % 60, i % 1000) for i in range(20000)]
+        start_time = time.perf_counter()
+        for value in timestamps:
+            datetime.strptime(value, DATE_FORMAT)
+        strptime_elapsed = time.perf_counter() - start_time
+        start_time = time.perf_counter()
+        for value in timestamps:
+            parse_log_time(value)
+        parse_elapsed = time.perf_counter() - start_time
+
+        self.logger.info(f"Fixture logs ({size / 1e6:.1f}MB): {elapsed[True] * 1000:.0f}ms analyzing "
+                         f"({size / 1e6 / elapsed[True]:.1f}MB/s), {elapsed[False] * 1000:.0f}ms replaying")
+        self.logger.info(f"{len(timestamps)} timestamps: {parse_elapsed * 1000:.1f}ms with parse_log_time, "
+                         f"{strptime_elapsed * 1000:.1f}ms with strptime")
+        self.assertEqual([datetime.strptime(value, DATE_FORMAT) for value in timestamps[::997]],
+                         [parse_log_time(value) for value in timestamps[::997]])
+
+
+if __name__ == "__main__":
+    unittest.main()
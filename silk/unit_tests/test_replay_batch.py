@@ -0,0 +1,135 @@
+# Copyright 2020 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from pathlib import Path
+import os
+import shutil
+import tempfile
+import time
+import unittest
+
+from silk.tests.silk_replay import SilkReplayer
+from silk.tests.silk_replay_batch import HISTORY_COLUMNS, SilkReplayBatch, class_name_of_log, find_logs
+from silk.unit_tests.testcase import SilkTestCase
+
+FIXTURE_DIR = Path(__file__).parent / "fixture"
+HWCONFIG_PATH = str(FIXTURE_DIR / "hwconfig.ini")
+LOG_CLASSES = {
+    "child_table_log.txt": "TestChildTable",
+    "form_network_log.txt": "TestFormNetwork",
+    "neighbor_table_log.txt": "TestNeighborTable",
+    "partition_merge_log.txt": "TestPartitionMerge",
+    "router_table_log.txt": "TestRouterTable",
+}
+
+
+class ReplayBatchTest(SilkTestCase):
+    """Silk unit test case for the batch log analyzer.
+    """
+
+    def setUp(self):
+        """Test method set up. Lay the fixture logs out as the results directory of a test run.
+        """
+        self.results_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.results_dir)
+        self.log_paths = {}
+        for i, (log_filename, test_class) in enumerate(sorted(LOG_CLASSES.items())):
+            output_dir = os.path.join(self.results_dir, f"2020-08-27_16.1{i}.00_{test_class}")
+            os.makedirs(output_dir)
+            self.log_paths[test_class] = os.path.join(output_dir, "silk.log")
+            shutil.copy(FIXTURE_DIR / log_filename, self.log_paths[test_class])
+
+    def create_batch(self, jobs: int = 2) -> SilkReplayBatch:
+        """Create a batch analyzer of the results directory.
+        """
+        return SilkReplayBatch(argv=["tests/silk_replay_batch.py", "-v0", "-c", HWCONFIG_PATH, "-j",
+                                     str(jobs), self.results_dir],
+                               run_now=False)
+
+    def testFindLogs(self):
+        """Test that the logs and their test classes are found from the output directory names.
+        """
+        logs = find_logs(self.results_dir)
+        self.assertEqual(sorted(self.log_paths.values()), logs)
+        self.assertEqual(sorted(LOG_CLASSES.values()), sorted(class_name_of_log(log_path) for log_path in logs))
+        self.assertEqual("fixture", class_name_of_log(str(FIXTURE_DIR / "form_network_log.txt")))
+
+    def testMergedHistory(self):
+        """Test that the merged history holds the history of each log, as replayed alone, with its test class.
+        """
+        batch = self.create_batch()
+        merged = batch.run()
+        self.assertEqual(HISTORY_COLUMNS, list(merged.columns))
+        self.assertEqual(sorted(LOG_CLASSES.values()), sorted(merged["test_class"].unique()))
+        self.assertEqual(5, len(batch.analyzed))
+        self.assertTrue(os.path.exists(batch.output_path))
+
+        replayer = SilkReplayer(argv=[
+            "tests/silk_replay.py", "-v0", "-c", HWCONFIG_PATH, "-r", self.results_dir, "--analyze",
+            self.log_paths["TestFormNetwork"]
+        ],
+                                run_now=False)
+        replayer.run()
+        expected = replayer.summary_history()
+        history = merged[merged["test_class"] == "TestFormNetwork"]
+        self.assertEqual(expected["event"].tolist(), history["event"].tolist())
+        self.assertEqual(expected["timestamp"].tolist(), history["timestamp"].tolist())
+        self.assertEqual(set(["extaddr", "role", "children", "neighbors"]), set(history["history"]))
+
+    def testCache(self):
+        """Test that logs are only replayed again once their content changes.
+        """
+        first = self.create_batch().run()
+
+        batch = self.create_batch()
+        self.assertTrue(first.equals(batch.run()))
+        self.assertEqual([], batch.analyzed)
+        self.assertEqual(5, len(batch.cached))
+
+        with open(self.log_paths["TestRouterTable"], "a") as log_file:
+            log_file.write("[2020-08-27 16:30:00,000] [silk] [INFO] TEAR DOWN CLASS DONE TestRouterTable\n")
+        batch.run()
+        self.assertEqual([self.log_paths["TestRouterTable"]], batch.analyzed)
+        self.assertEqual(4, len(batch.cached))
+
+    def testFailedLog(self):
+        """Test that a log that cannot be replayed is reported without stopping the others.
+        """
+        with open(self.log_paths["TestRouterTable"], "w") as log_file:
+            log_file.write("[2020-08-27 16:30:00] [silk] [INFO] SET UP CLASS TestRouterTable\n")
+        batch = self.create_batch()
+        merged = batch.run()
+        self.assertEqual([self.log_paths["TestRouterTable"]], batch.failed)
+        self.assertNotIn("TestRouterTable", merged["test_class"].unique())
+        self.assertEqual(4, len(merged["test_class"].unique()))
+
+    def testBenchmark(self):
+        """Benchmark analyzing the results directory serially, in parallel, and from the cache.
+        """
+        elapsed = {}
+        for name, jobs in (("serial", 1), ("parallel", 4)):
+            shutil.rmtree(os.path.join(self.results_dir, ".silk_replay_cache"), ignore_errors=True)
+            start_time = time.perf_counter()
+            merged = self.create_batch(jobs).run()
+            elapsed[name] = time.perf_counter() - start_time
+        start_time = time.perf_counter()
+        cached = self.create_batch(4).run()
+        elapsed["cached"] = time.perf_counter() - start_time
+
+        self.logger.info(", ".join(f"{name}: {seconds * 1000:.0f}ms" for name, seconds in elapsed.items()))
+        self.assertEqual(len(merged), len(cached))
+
+
+if __name__ == "__main__":
+    unittest.main()
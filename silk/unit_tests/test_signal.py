@@ -0,0 +1,246 @@
+# Copyright 2020 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import gc
+import logging
+import os
+import subprocess
+import sys
+import threading
+import time
+import unittest
+
+from silk.node.fifteen_four_dev_board import WpantundMonitor
+from silk.unit_tests.testcase import SilkTestCase
+from silk.utils import signal
+
+try:
+    from django.dispatch import Signal as DjangoSignal
+except ImportError:
+    DjangoSignal = None
+
+NUM_EMITS = 100000
+NUM_SUBSCRIBERS = 2
+LOG_LINE = "wpantund[1234]: NCP => [OTNS] role=2"
+
+
+class RecordingSubscriber(signal.Subscriber):
+    """Subscriber that records the lines it receives.
+    """
+
+    def __init__(self, publisher=None):
+        self.lines = []
+        super().__init__(publisher)
+
+    def subscribe_handle(self, sender, **kwargs):
+        self.lines.append(kwargs.get("line"))
+
+
+class KeywordSubscriber(RecordingSubscriber):
+    """Subscriber that only receives role and extaddr lines.
+    """
+
+    line_keywords = ("role=", "extaddr=")
+
+
+class SignalTest(SilkTestCase):
+    """Silk unit test case for signal publishers and subscribers.
+    """
+
+    def testSubscribeUnsubscribe(self):
+        """Test that handles receive emits in subscription order until unsubscribed.
+        """
+        publisher = signal.Publisher()
+        received = []
+
+        def first(sender, **kwargs):
+            received.append(("first", sender, kwargs))
+
+        def second(sender, **kwargs):
+            received.append(("second", sender, kwargs))
+
+        publisher.subscribe(first)
+        publisher.subscribe(second)
+        publisher.subscribe(first)
+        publisher.emit(line="a", extra=1)
+        self.assertEqual([("first", publisher, {"line": "a", "extra": 1}),
+                          ("second", publisher, {"line": "a", "extra": 1})], received)
+
+        publisher.unsubscribe(first)
+        received.clear()
+        publisher.emit(line="b")
+        self.assertEqual([("second", publisher, {"line": "b"})], received)
+
+    def testLineFilter(self):
+        """Test that line filters and subscriber keywords select the delivered lines.
+        """
+        publisher = signal.Publisher()
+        everything = RecordingSubscriber(publisher)
+        keywords = KeywordSubscriber(publisher)
+        received = []
+        publisher.subscribe(lambda sender, **kwargs: received.append(kwargs),
+                            line_filter=lambda line: line.startswith("x"),
+                            weak=False)
+
+        for line in ["role=2", "x", "extaddr=0123456789abcdef", "other"]:
+            publisher.emit(line=line)
+        publisher.emit(value=1)
+
+        self.assertEqual(["role=2", "x", "extaddr=0123456789abcdef", "other", None], everything.lines)
+        self.assertEqual(["role=2", "extaddr=0123456789abcdef", None], keywords.lines)
+        self.assertEqual([{"line": "x"}, {"value": 1}], received)
+
+        keywords.set_line_filter(None)
+        publisher.emit(line="other")
+        self.assertEqual("other", keywords.lines[-1])
+
+    def testWeakReference(self):
+        """Test that garbage collected subscribers are unsubscribed.
+        """
+        publisher = signal.Publisher()
+        subscriber = RecordingSubscriber(publisher)
+        publisher.emit(line="a")
+        self.assertEqual(["a"], subscriber.lines)
+
+        del subscriber
+        gc.collect()
+        publisher.emit(line="b")
+        self.assertEqual((), publisher._subscribers)
+
+        lines = []
+        publisher.subscribe(lambda sender, **kwargs: lines.append(kwargs["line"]))
+        gc.collect()
+        publisher.emit(line="b")
+        self.assertEqual([], lines)
+
+    def testCollectWithLockHeld(self):
+        """Test that a subscriber garbage collected while its publisher lock is held does not deadlock.
+        """
+        publisher = signal.Publisher()
+        subscriber = RecordingSubscriber(publisher)
+        # a reference cycle, so that the subscriber is only freed by the collector
+        subscriber.cycle = subscriber
+
+        def collect():
+            with publisher._subscribers_lock:
+                nonlocal subscriber
+                del subscriber
+                gc.collect()
+
+        thread = threading.Thread(target=collect, daemon=True)
+        thread.start()
+        thread.join(timeout=5)
+        self.assertFalse(thread.is_alive())
+        self.assertTrue(publisher._dead_subscribers)
+
+        other = RecordingSubscriber(publisher)
+        self.assertEqual(1, len(publisher._subscribers))
+        self.assertFalse(publisher._dead_subscribers)
+        publisher.emit(line="a")
+        self.assertEqual(["a"], other.lines)
+
+    def testUnsubscribeDuringEmit(self):
+        """Test that handles can unsubscribe while an emit is in progress.
+        """
+        publisher = signal.Publisher()
+        received = []
+
+        def once(sender, **kwargs):
+            received.append("once")
+            publisher.unsubscribe(once)
+
+        def always(sender, **kwargs):
+            received.append("always")
+
+        publisher.subscribe(once)
+        publisher.subscribe(always)
+        publisher.emit(line="a")
+        publisher.emit(line="b")
+        self.assertEqual(["once", "always", "always"], received)
+
+    def testWpantundMonitorFilter(self):
+        """Test that WpantundMonitor only filters lines while no logger is attached.
+        """
+        publisher = signal.Publisher()
+        monitor = WpantundMonitor(publisher)
+        logger = logging.getLogger("silk.unit_tests.wpantund")
+
+        with self.assertLogs(logger, logging.DEBUG) as logs:
+            logger.debug("start")
+            publisher.emit(line="Finished initializing NCP")
+            publisher.emit(line="unrelated")
+            monitor.logger = logger
+            publisher.emit(line="logged")
+        self.assertTrue(monitor.running)
+        self.assertEqual(["start", "logged"], [record.getMessage() for record in logs.records])
+
+    def testBenchmarkEmit(self):
+        """Benchmark emit throughput against django.dispatch.Signal.
+        """
+        publisher = signal.Publisher()
+        handles = [lambda sender, **kwargs: None for _ in range(NUM_SUBSCRIBERS)]
+        for a_handle in handles:
+            publisher.subscribe(a_handle)
+
+        start_time = time.perf_counter()
+        for _ in range(NUM_EMITS):
+            publisher.emit(line=LOG_LINE)
+        elapsed = time.perf_counter() - start_time
+        self.logger.info(f"Publisher: {NUM_EMITS / elapsed:.0f} emits/s to {NUM_SUBSCRIBERS} handles")
+
+        filtered = signal.Publisher()
+        subscribers = [KeywordSubscriber(filtered) for _ in range(NUM_SUBSCRIBERS)]
+        start_time = time.perf_counter()
+        for _ in range(NUM_EMITS):
+            filtered.emit(line="wpantund[1234]: unrelated line")
+        filtered_elapsed = time.perf_counter() - start_time
+        self.logger.info(f"Publisher with filtered subscribers: {NUM_EMITS / filtered_elapsed:.0f} emits/s")
+        self.assertEqual([[]] * NUM_SUBSCRIBERS, [subscriber.lines for subscriber in subscribers])
+
+        if DjangoSignal is None:
+            self.skipTest("Django is not installed")
+
+        django_signal = DjangoSignal()
+        for a_handle in handles:
+            django_signal.connect(a_handle)
+        start_time = time.perf_counter()
+        for _ in range(NUM_EMITS):
+            django_signal.send(sender=publisher, line=LOG_LINE)
+        django_elapsed = time.perf_counter() - start_time
+        self.logger.info(f"django.dispatch.Signal: {NUM_EMITS / django_elapsed:.0f} emits/s to "
+                         f"{NUM_SUBSCRIBERS} handles")
+
+    def testImportTime(self):
+        """Test that importing the signal module does not import Django, and compare import times.
+        """
+        env = dict(os.environ, PYTHONPATH=os.pathsep.join(sys.path))
+
+        def import_time(statement: str) -> float:
+            script = f"import time; start = time.perf_counter(); {statement}; print(time.perf_counter() - start)"
+            output = subprocess.check_output([sys.executable, "-c", script], env=env)
+            return float(output.decode().split()[-1])
+
+        output = subprocess.check_output(
+            [sys.executable, "-c", "import sys; import silk.utils.signal; print('django' in sys.modules)"], env=env)
+        self.assertEqual("False", output.decode().strip())
+
+        signal_time = import_time("import silk.utils.signal")
+        self.logger.info(f"Import silk.utils.signal: {signal_time * 1000:.1f}ms")
+        if DjangoSignal is not None:
+            django_time = import_time("import silk.utils.signal, django.dispatch")
+            self.logger.info(f"Import silk.utils.signal with django.dispatch: {django_time * 1000:.1f}ms")
+
+
+if __name__ == "__main__":
+    unittest.main()
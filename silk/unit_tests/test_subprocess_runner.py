@@ -0,0 +1,126 @@
+# Copyright 2020 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import threading
+import time
+import unittest
+
+from silk.unit_tests.testcase import SilkTestCase
+from silk.utils import signal
+from silk.utils.subprocess_runner import SubprocessRunner
+
+NUM_LINES = 20000
+
+
+class LineSubscriber(signal.Subscriber):
+    """Subscriber that records the lines it receives.
+    """
+
+    def __init__(self, publisher=None, batch_lines=False):
+        self.lines = []
+        self.calls = 0
+        self.batch_lines = batch_lines
+        super().__init__(publisher)
+
+    def subscribe_handle(self, sender, **kwargs):
+        self.calls += 1
+        if self.batch_lines:
+            self.lines.extend(kwargs["lines"])
+        else:
+            self.lines.append(kwargs["line"])
+
+
+class SubprocessRunnerTest(SilkTestCase):
+    """Silk unit test case for SubprocessRunner.
+    """
+
+    def __run(self, command, timeout=10, **kwargs):
+        runner = SubprocessRunner(command, **kwargs)
+        subscribers = [LineSubscriber(runner), LineSubscriber(runner, batch_lines=True)]
+        runner.start()
+        runner.join(timeout)
+        self.assertFalse(runner.is_alive())
+        runner.stop(timeout)
+        return runner, subscribers
+
+    def testLines(self):
+        """Test that output lines are published in order, including a last line without newline.
+        """
+        runner, subscribers = self.__run("printf 'first\\n\\nsecond  \\r\\nthird'")
+
+        for subscriber in subscribers:
+            self.assertEqual(["first", "second", "third"], subscriber.lines)
+        self.assertFalse(runner.running)
+        self.assertEqual(0, runner.queue_depth)
+        self.assertEqual(0, runner.dropped_lines)
+
+    def testBatches(self):
+        """Test that batch subscribers receive many lines per call.
+        """
+        runner, subscribers = self.__run(f"seq 1 {NUM_LINES}", max_queued_lines=NUM_LINES)
+
+        expected = [str(i) for i in range(1, NUM_LINES + 1)]
+        self.assertEqual(expected, subscribers[0].lines)
+        self.assertEqual(expected, subscribers[1].lines)
+        self.assertEqual(NUM_LINES, subscribers[0].calls)
+        self.assertLess(subscribers[1].calls, NUM_LINES / 10)
+
+    def testBackpressure(self):
+        """Test that a slow subscriber does not block reading, and that lines beyond the queue are dropped.
+        """
+        runner = SubprocessRunner(f"seq 1 {NUM_LINES}", max_queued_lines=100)
+        blocked = threading.Event()
+        released = threading.Event()
+        received = []
+
+        def slow_handle(sender, **kwargs):
+            blocked.set()
+            released.wait(10)
+            received.extend(kwargs["lines"])
+
+        runner.subscribe(slow_handle, batch=True)
+        runner.start()
+
+        # The output is read to the end while the subscriber is still busy with the first batch
+        runner.join(10)
+        self.assertFalse(runner.is_alive())
+        self.assertTrue(blocked.is_set())
+        self.assertLessEqual(runner.queue_depth, 100)
+        self.assertGreater(runner.dropped_lines, 0)
+
+        released.set()
+        runner.stop()
+        self.assertEqual(0, runner.queue_depth)
+        self.assertEqual(NUM_LINES, len(received) + runner.dropped_lines)
+        self.assertEqual("1", received[0])
+
+    def testStop(self):
+        """Test that a long running command is stopped.
+        """
+        runner = SubprocessRunner("echo started; sleep 30")
+        subscriber = LineSubscriber(runner)
+        runner.start()
+
+        start_time = time.time()
+        while not subscriber.lines and time.time() - start_time < 5:
+            time.sleep(0.05)
+        self.assertEqual(["started"], subscriber.lines)
+
+        runner.stop()
+        self.assertFalse(runner.is_alive())
+        self.assertFalse(runner.running)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,206 @@
+# Copyright 2020 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import fcntl
+import os
+import select
+import subprocess
+import tempfile
+import time
+import unittest
+
+from silk.device.system_call_manager import SystemCallOutput, TemporarySystemCallManager
+from silk.unit_tests.testcase import SilkTestCase
+
+
+def legacy_make_system_call(manager: TemporarySystemCallManager, command: str, timeout: float) -> str:
+    """Byte-at-a-time capture loop that SystemCallManager used before chunked reads, kept for benchmarking.
+
+    Args:
+        manager (TemporarySystemCallManager): manager to log output lines to.
+        command (str): shell command to run.
+        timeout (float): timeout in seconds.
+
+    Returns:
+        str: captured output.
+    """
+    proc = subprocess.Popen(command, bufsize=0, shell=True, stdout=subprocess.PIPE, stderr=subprocess.STDOUT)
+    flags = fcntl.fcntl(proc.stdout, fcntl.F_GETFL)
+    fcntl.fcntl(proc.stdout, fcntl.F_SETFL, flags | os.O_NONBLOCK)
+
+    stdout = ""
+    curr_line = ""
+
+    t_start = time.time()
+    while True:
+        if proc.poll() == 0:
+            break
+        try:
+            poll_list = select.select([proc.stdout], [], [], 1)
+            if len(poll_list[0]) > 0:
+                curr_line += proc.stdout.read(1).decode("utf-8")
+        except Exception:
+            break
+
+        if len(curr_line) > 0 and curr_line[-1] == "\n" and not curr_line.isspace():
+            manager.log_debug("[stdout] %s" % (curr_line.rstrip()))
+            stdout += curr_line
+            curr_line = ""
+
+        if time.time() - t_start > timeout:
+            proc.kill()
+            break
+
+    this_stdout = ""
+    while True:
+        try:
+            new_char = proc.stdout.read(1)
+            if not new_char:
+                break
+            this_stdout += new_char.decode("utf-8")
+        except Exception:
+            break
+    if this_stdout:
+        this_stdout = curr_line + this_stdout
+        for line in this_stdout.splitlines():
+            manager.log_debug("[stdout] %s" % (line.rstrip()))
+        stdout += this_stdout
+    return stdout
+
+
+class SystemCallManagerTest(SilkTestCase):
+    """Silk unit test case for SystemCallManager system calls.
+    """
+
+    def setUp(self):
+        """Test method set up.
+        """
+        self.manager = TemporarySystemCallManager()
+
+    def testOutputCapture(self):
+        """Test that output is captured completely, including a trailing line without newline.
+        """
+        output = self.manager._make_system_call("test", "printf 'first\\nsecond\\n\\nthird'", 5)
+        self.assertEqual("first\nsecond\n\nthird", output)
+
+    def testLineLogging(self):
+        """Test that each non-empty output line is logged once with the [stdout] prefix.
+        """
+        with self.assertLogs(self.manager.logger, level="DEBUG") as logs:
+            self.manager._make_system_call("test", "printf 'alpha\\n\\nbeta\\ngamma'", 5)
+
+        stdout_lines = [record.getMessage() for record in logs.records if "[stdout]" in record.getMessage()]
+        self.assertEqual(3, len(stdout_lines))
+        for expected, line in zip(["alpha", "beta", "gamma"], stdout_lines):
+            self.assertTrue(line.endswith("[stdout] %s" % expected))
+
+    def testSplitMultiByteCharacter(self):
+        """Test decoding of a multi-byte UTF-8 character split across two reads.
+        """
+        logged = []
+        collector = SystemCallOutput(logged.append)
+        encoded = "café\n".encode("utf-8")
+        collector.feed(encoded[:4])
+        collector.feed(encoded[4:])
+        collector.finish()
+
+        self.assertEqual("café\n", collector.getvalue())
+        self.assertEqual(["[stdout] café"], logged)
+
+    def testReturnsOnExit(self):
+        """Test that the call returns promptly when the child exits, whatever its exit status.
+        """
+        for command in ("echo done", "echo failed; exit 3"):
+            start_time = time.time()
+            self.manager._make_system_call("test", command, 10)
+            self.assertLess(time.time() - start_time, 1)
+
+    def testTimeout(self):
+        """Test that a child running past the timeout is killed and partial output returned.
+        """
+        start_time = time.time()
+        output = self.manager._make_system_call("test", "echo started; exec sleep 10", 1)
+        self.assertLess(time.time() - start_time, 3)
+        self.assertEqual("started\n", output)
+
+    def __hold_worker(self):
+        """Keep the worker busy until all items of a test are queued, so that they are grouped as queued.
+        """
+        self.manager.make_system_call_async("hold", "sleep 0.2", None, 5)
+
+    def testConcurrentReadOnlyCalls(self):
+        """Test that consecutive read-only calls run at the same time.
+        """
+        num_calls = self.manager.max_concurrent_calls
+        self.__hold_worker()
+        for i in range(num_calls):
+            self.manager.make_system_call_async("read", f"sleep 0.5; echo value-{i}", r"value-\d+", 5, f"value-{i}",
+                                                read_only=True)
+
+        start_time = time.time()
+        self.assertIsNone(self.manager.wait_for_completion())
+        self.assertLess(time.time() - start_time, 0.2 + 0.5 * num_calls - 0.5)
+        self.assertEqual([f"value-{i}" for i in range(num_calls)],
+                         [self.manager.get_data(f"value-{i}") for i in range(num_calls)])
+
+    def testReadOnlyCallOrder(self):
+        """Test that read-only calls wait for earlier state changes, and that later state changes wait for them.
+        """
+        with tempfile.NamedTemporaryFile() as state_file:
+            path = state_file.name
+            self.__hold_worker()
+            self.manager.make_system_call_async("write", f"sleep 0.3; echo first > {path}", None, 5)
+            for i in range(3):
+                self.manager.make_system_call_async("read", f"sleep 0.3; cat {path}", "first", 5, f"read-{i}",
+                                                    read_only=True)
+            self.manager.make_system_call_async("write", f"echo second > {path}", None, 5)
+            self.manager.make_system_call_async("read", f"cat {path}", "second", 5, "read-last", read_only=True)
+
+            self.assertIsNone(self.manager.wait_for_completion())
+            self.assertEqual(["first"] * 3, [self.manager.get_data(f"read-{i}") for i in range(3)])
+            self.assertEqual("second", self.manager.get_data("read-last"))
+
+    def testConcurrentCallError(self):
+        """Test that an error in a read-only call is reported and drops the items queued after it.
+        """
+        self.__hold_worker()
+        self.manager.make_system_call_async("read", "echo actual", "expected", 5, read_only=True)
+        self.manager.make_system_call_async("read", "sleep 0.2; echo other", "other", 5, "other", read_only=True)
+        self.manager.make_system_call_async("write", "echo later", "later", 5, "later")
+
+        self.assertIsNotNone(self.manager.wait_for_completion())
+        self.assertEqual("other", self.manager.get_data("other"))
+        self.assertIsNone(self.manager.get_data("later"))
+
+    def testBenchmarkLargeOutput(self):
+        """Benchmark chunked capture against the legacy byte-at-a-time loop on a large output.
+        """
+        command = "seq 1 20000"
+        expected = "".join("%d\n" % i for i in range(1, 20001))
+
+        start_time = time.time()
+        legacy_output = legacy_make_system_call(self.manager, command, 60)
+        legacy_duration = time.time() - start_time
+
+        start_time = time.time()
+        output = self.manager._make_system_call("benchmark", command, 60)
+        duration = time.time() - start_time
+
+        self.logger.info(f"Captured {len(expected)} bytes: legacy {legacy_duration:.3f}s, chunked {duration:.3f}s")
+        self.assertEqual(expected, output)
+        self.assertEqual(expected, legacy_output)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,172 @@
+# Copyright 2020 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import threading
+import time
+import unittest
+
+from silk.tools import wpan_util
+from silk.unit_tests.testcase import SilkTestCase
+from silk.utils import signal, wpantund_log
+from silk.utils.state_change import StateChangeMonitor
+
+
+class StateChangeNode(object):
+    """Node reporting the state changes of a value, and the wpantund lines of a fake wpantund process.
+    """
+
+    def __init__(self):
+        self.value = None
+        self.gets = 0
+        self.changes = signal.Publisher()
+        self.wpantund_process = signal.Publisher()
+
+    def subscribe_state_changes(self, handle):
+        self.changes.subscribe(handle, weak=False)
+        self.wpantund_process.subscribe(handle,
+                                        line_filter=signal.keyword_filter(wpantund_log.STATE_CHANGE_KEYWORDS),
+                                        weak=False,
+                                        batch=True)
+
+    def unsubscribe_state_changes(self, handle):
+        self.changes.unsubscribe(handle)
+        self.wpantund_process.unsubscribe(handle)
+
+    def get(self):
+        self.gets += 1
+        return self.value
+
+    def set(self, value):
+        self.value = value
+        self.changes.emit(value=value)
+
+
+class VerifyWithinTest(SilkTestCase):
+    """Silk unit test case for waiting on conditions with verify_within.
+    """
+
+    def testBackoff(self):
+        """Test that the interval between checks grows without state change notifications.
+        """
+        start_time = time.time()
+
+        def check_elapsed():
+            wpan_util.verify(time.time() - start_time >= 1)
+
+        result = wpan_util.verify_within(check_elapsed, 5, 0.1, max_delay_time=1, backoff=True)
+        # Checks at 0, 0.1, 0.3, 0.7 and 1.5 seconds instead of every 0.1 seconds
+        self.assertEqual(5, result.checks)
+        self.assertGreaterEqual(result.duration, 1)
+        self.assertLess(result.duration, 2)
+
+    def testFixedInterval(self):
+        """Test that the condition is checked every delay_time unless backoff is requested.
+        """
+        start_time = time.time()
+
+        def check_elapsed():
+            wpan_util.verify(time.time() - start_time >= 1)
+
+        result = wpan_util.verify_within(check_elapsed, 5, 0.25)
+        # Checks at 0, 0.25, 0.5, 0.75 and 1 seconds
+        self.assertGreaterEqual(result.checks, 5)
+        self.assertLessEqual(result.checks, 6)
+        self.assertLess(result.duration, 1.25)
+
+    def testStateChange(self):
+        """Test that the condition is checked again as soon as a node reports a state change.
+        """
+        node = StateChangeNode()
+        timer = threading.Timer(0.3, node.set, ["ready"])
+        timer.start()
+        try:
+            result = wpan_util.verify_within(lambda: wpan_util.verify(node.get() == "ready"),
+                                             10,
+                                             nodes=[node],
+                                             max_delay_time=5)
+        finally:
+            timer.join()
+
+        self.assertEqual(2, result.checks)
+        self.assertLess(result.duration, 1)
+        self.assertEqual(0, len(node.changes._subscribers))
+
+    def testWpantundLines(self):
+        """Test that only wpantund lines reporting state changes trigger a check.
+        """
+        node = StateChangeNode()
+        with StateChangeMonitor([node, object()]) as monitor:
+            self.assertTrue(monitor.has_sources)
+            node.wpantund_process.emit_lines(["wpantund[1]: [NCP->] Frame", "wpantund[1]: [->NCP] Frame"])
+            self.assertFalse(monitor.wait_for_change(0, 0))
+            node.wpantund_process.emit_lines(["wpantund[1]: State change: \"offline\" -> \"associating\""])
+            self.assertTrue(monitor.wait_for_change(0, 0))
+            self.assertEqual(1, monitor.change_count)
+
+        self.assertEqual(0, len(node.wpantund_process._subscribers))
+        self.assertFalse(StateChangeMonitor([object()]).has_sources)
+
+    def testChangeBurst(self):
+        """Test that a burst of state changes does not check more often than once per delay_time.
+        """
+        node = StateChangeNode()
+        done = threading.Event()
+
+        def emit_changes():
+            while not done.is_set():
+                node.changes.emit(value=None)
+                time.sleep(0.001)
+
+        thread = threading.Thread(target=emit_changes)
+        thread.start()
+        start_time = time.time()
+        try:
+            result = wpan_util.verify_within(lambda: wpan_util.verify(time.time() - start_time >= 0.5),
+                                             5,
+                                             0.1,
+                                             nodes=[node])
+        finally:
+            done.set()
+            thread.join()
+
+        self.assertLessEqual(result.checks, 7)
+
+    def testTimeout(self):
+        """Test that a condition that does not pass in time raises after a last check.
+        """
+        node = StateChangeNode()
+        start_time = time.time()
+        with self.assertRaises(wpan_util.VerifyError):
+            wpan_util.verify_within(lambda: wpan_util.verify(node.get() == "ready"), 0.5, nodes=[node])
+
+        self.assertGreaterEqual(time.time() - start_time, 0.5)
+        self.assertLess(time.time() - start_time, 1.5)
+        self.assertFalse(wpan_util._is_in_verify_within)
+        self.assertEqual(0, len(node.changes._subscribers))
+
+    def testPolls(self):
+        """Compare the number of checks over a 3 second wait with backoff against the fixed 0.1 second interval.
+        """
+        start_time = time.time()
+
+        def check_elapsed():
+            wpan_util.verify(time.time() - start_time >= 3)
+
+        result = wpan_util.verify_within(check_elapsed, 10, backoff=True)
+        self.logger.info(f"{result.checks} checks in {result.duration:.3f}s, instead of {int(3 / 0.1)}")
+        self.assertLess(result.checks, 10)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,363 @@
+# Copyright 2020 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import threading
+import time
+import unittest
+from unittest import mock
+
+from silk.config import wpan_constants as wpan
+from silk.tools import wpan_table_parser, wpan_util
+from silk.tools.wpan_table_parser import TableSnapshot
+from silk.tools.wpan_util import VerifyError
+from silk.unit_tests.mock_device import MockThreadDevBoard
+from silk.unit_tests.testcase import SilkTestCase
+
+NUM_ENTRIES = 500
+
+CHILD_LINE = ("\t\"{:016X}, RLOC16:{:04x}, NetDataVer:175, LQIn:3, AveRssi:-20, LastRssi:-20, Timeout:120, Age:0, "
+              "RxOnIdle:{}, FTD:no, SecDataReq:yes, FullNetData:yes\"")
+NEIGHBOR_LINE = ("\t\"{:016X}, RLOC16:{:04x}, LQIn:3, AveRssi:-20, LastRssi:-20, Age:0, LinkFC:8, MleFC:0, "
+                 "IsChild:{}, RxOnIdle:no, FTD:no, SecDataReq:yes, FullNetData:yes\"")
+ROUTER_LINE = ("\t\"{:016X}, RLOC16:{:04x}, RouterId:{}, NextHop:43, PathCost:1, LQIn:3, LQOut:3, Age:3, "
+               "LinkEst:yes\"")
+CHILD_ADDRESS_LINE = "\t\"{:016X}, RLOC16:{:04x}, IPv6Addrs:[fd00:1234::{:x}, fd00:1234::1:{:x}]\""
+ADDRESS_CACHE_LINES = (
+    "\t\"fd00:1234::3:{:x} -> 0x{:04x}, Age:0, State:cached, LastTrans:0, "
+    "ML-EID:fd40:ea58:a88c:0:b7ab:4919:aa7b:11a3\"",
+    "\t\"fd00:1234::100:{:x} -> 0x{:04x}, Age:1, State:query, CanEvict:no, Timeout:3, RetryDelay:15\"",
+)
+ON_MESH_PREFIX_LINE = ("\t\"fd00:{:x}::       prefix_len:64   origin:user     stable:yes flags:0x31 "
+                       "[on-mesh:1 def-route:0 config:0 dhcp:0 slaac:1 pref:1 nd-dns:0 dp:0 prio:med] rloc:0x{:04x}\"")
+
+
+def table(lines):
+    """Format entry lines like wpanctl table output.
+    """
+    return "[\n" + "\n".join(lines) + "\n]"
+
+
+def legacy_child_entry(text):
+    """Parse a child table entry as ChildEntry did before the compiled parsers, kept for benchmarking.
+    """
+    items = [item[:-1] if item[-1] == "," else item for item in text[2:-1].split()]
+    items_dict = {item.split(":")[0]: item.split(":")[1] for item in items[1:]}
+    return {
+        "ext_address": items[0],
+        "rloc16": items_dict["RLOC16"],
+        "timeout": items_dict["Timeout"],
+        "rx_on_idle": items_dict["RxOnIdle"] == "yes",
+        "ftd": items_dict["FTD"] == "yes",
+        "sec_data_req": items_dict["SecDataReq"] == "yes",
+        "full_net_data": items_dict["FullNetData"] == "yes",
+    }
+
+
+def legacy_parse_child_table(child_table_list):
+    """Parse a child table as parse_child_table_result did before the compiled parsers, kept for benchmarking.
+    """
+    items = child_table_list.split("\n")[1:-1]
+    if items and "]" in items[-1]:
+        items.pop()
+    return [legacy_child_entry(item) for item in items]
+
+
+class WpanTableParserTest(SilkTestCase):
+    """Silk unit test case for the wpanctl table parsers.
+    """
+
+    def testChildTable(self):
+        """Test that child table entries keep their fields and types.
+        """
+        entries = wpan_table_parser.parse_child_table_result(
+            table([CHILD_LINE.format(0xE24C5F67F4B8CBB9, 0xd402, "no"),
+                   CHILD_LINE.format(1, 0xd403, "yes")]))
+        self.assertEqual(2, len(entries))
+        self.assertEqual("E24C5F67F4B8CBB9", entries[0].ext_address)
+        self.assertEqual("d402", entries[0].rloc16)
+        self.assertEqual("120", entries[0].timeout)
+        self.assertFalse(entries[0].is_rx_on_when_idle())
+        self.assertTrue(entries[1].is_rx_on_when_idle())
+        self.assertFalse(entries[0].is_ftd())
+        self.assertTrue(entries[0].is_sec_data_req())
+        self.assertTrue(entries[0].is_full_net_data())
+        self.assertIn("'rloc16': 'd402'", repr(entries[0]))
+
+        with self.assertRaises(AttributeError):
+            entries[0].unknown = 1
+        self.assertEqual([], wpan_table_parser.parse_child_table_result("[]"))
+
+    def testNeighborTable(self):
+        """Test that neighbor table entries keep their fields and types.
+        """
+        entry, = wpan_table_parser.parse_neighbor_table_result(table([NEIGHBOR_LINE.format(2, 0x9403, "yes")]))
+        self.assertEqual("0000000000000002", entry.ext_address)
+        self.assertEqual("9403", entry.rloc16)
+        self.assertTrue(entry.is_child())
+        self.assertFalse(entry.is_rx_on_when_idle())
+        self.assertFalse(entry.is_ftd())
+
+    def testRouterTable(self):
+        """Test that router table entries convert their numeric fields.
+        """
+        entry, = wpan_table_parser.parse_router_table_result(table([ROUTER_LINE.format(3, 0x4000, 16)]))
+        self.assertEqual(0x4000, entry.rloc16)
+        self.assertEqual(16, entry.router_id)
+        self.assertEqual(43, entry.next_hop)
+        self.assertEqual(1, entry.path_cost)
+        self.assertTrue(entry.is_link_established())
+
+    def testChildAddressTable(self):
+        """Test that child address entries keep the whole address list.
+        """
+        entries = wpan_table_parser.parse_child_table_address_result(
+            table([CHILD_ADDRESS_LINE.format(4, 0x1402, 1, 2), "\t\"0000000000000005, RLOC16:1403\""]))
+        self.assertEqual("1402", entries[0].rloc16)
+        self.assertEqual("[fd00:1234::1, fd00:1234::1:2]", entries[0].ipv6_address)
+        self.assertEqual("0000000000000005", entries[1].ext_address)
+        self.assertEqual("", entries[1].ipv6_address)
+
+    def testAddressCacheTable(self):
+        """Test that address cache entries have the fields of their state.
+        """
+        cached, query = wpan_table_parser.parse_address_cache_table_result(
+            table([ADDRESS_CACHE_LINES[0].format(2, 0x2000), ADDRESS_CACHE_LINES[1].format(8, 0xfffe)]))
+        self.assertEqual("fd00:1234::3:2", cached.address)
+        self.assertEqual(0x2000, cached.rloc16)
+        self.assertEqual("cached", cached.state)
+        self.assertEqual(0, cached.last_trans)
+        with self.assertRaises(AttributeError):
+            cached.timeout
+
+        self.assertEqual(0xfffe, query.rloc16)
+        self.assertEqual(1, query.age)
+        self.assertFalse(query.can_evict())
+        self.assertEqual(3, query.timeout)
+        self.assertEqual(15, query.retry_delay)
+
+    def testOnMeshPrefixes(self):
+        """Test that on-mesh prefix flags are parsed, and malformed entries fail verification on access.
+        """
+        prefix, malformed = wpan_table_parser.parse_on_mesh_prefix_result(
+            table([ON_MESH_PREFIX_LINE.format(0xabba, 0), "\t\"fd00::  prefix_len:64\""]))
+        self.assertEqual("fd00:abba::", prefix.prefix)
+        self.assertEqual("64", prefix.prefix_len)
+        self.assertEqual("user", prefix.origin)
+        self.assertEqual("med", prefix.priority)
+        self.assertEqual("0x0000", prefix.rloc16())
+        self.assertTrue(prefix.is_stable())
+        self.assertTrue(prefix.is_on_mesh())
+        self.assertFalse(prefix.is_def_route())
+        self.assertTrue(prefix.is_slaac())
+        self.assertTrue(prefix.is_preferred())
+        self.assertFalse(prefix.is_dp())
+
+        with self.assertRaises(VerifyError):
+            malformed.prefix
+
+    def testParseList(self):
+        """Test that the first item of each list entry is returned.
+        """
+        addresses = table([
+            "\t\"fdf4:5632:4940:0:8798:8701:85d4:e2be     prefix_len:64   origin:ncp      valid:forever\"",
+            "\t\"fe80::2092:9358:97ea:71c6\"",
+        ])
+        self.assertEqual(["fdf4:5632:4940:0:8798:8701:85d4:e2be", "fe80::2092:9358:97ea:71c6"],
+                         wpan_table_parser.parse_list(addresses))
+        self.assertEqual([], wpan_table_parser.parse_list("[]"))
+
+    def testFieldOrder(self):
+        """Test that entries with items in another order than wpanctl prints them are still parsed.
+        """
+        entry = wpan_table_parser.ChildEntry(
+            "\t\"00000000000000AB, Timeout:60, RLOC16:0c01, FullNetData:no, RxOnIdle:yes, FTD:yes, SecDataReq:no\"")
+        self.assertEqual("00000000000000AB", entry.ext_address)
+        self.assertEqual("0c01", entry.rloc16)
+        self.assertEqual("60", entry.timeout)
+        self.assertTrue(entry.is_rx_on_when_idle())
+        self.assertFalse(entry.is_full_net_data())
+
+        with self.assertRaises(KeyError):
+            wpan_table_parser.ChildEntry("\t\"00000000000000AB, RLOC16:0c01\"").rloc16
+
+    def testLegacyEquivalence(self):
+        """Test that child entries have the same fields as with the previous parser.
+        """
+        child_table = table(CHILD_LINE.format(i, i, "yes" if i % 2 else "no") for i in range(NUM_ENTRIES))
+        entries = wpan_table_parser.parse_child_table_result(child_table)
+        legacy_entries = legacy_parse_child_table(child_table)
+        self.assertEqual(legacy_entries, [entry._parsed_fields() for entry in entries])
+
+    def testBenchmark(self):
+        """Benchmark parsing 500 entry tables against the previous parser.
+        """
+        child_table = table(CHILD_LINE.format(i, i, "yes" if i % 2 else "no") for i in range(NUM_ENTRIES))
+
+        start_time = time.perf_counter()
+        for _ in range(10):
+            legacy_rloc16s = [entry["rloc16"] for entry in legacy_parse_child_table(child_table)]
+        legacy_elapsed = time.perf_counter() - start_time
+
+        start_time = time.perf_counter()
+        for _ in range(10):
+            entries = wpan_table_parser.parse_child_table_result(child_table)
+            rloc16s = [entry.rloc16 for entry in entries]
+        elapsed = time.perf_counter() - start_time
+
+        start_time = time.perf_counter()
+        for _ in range(10):
+            num_entries = len(wpan_table_parser.parse_child_table_result(child_table))
+        count_elapsed = time.perf_counter() - start_time
+
+        start_time = time.perf_counter()
+        for _ in range(10):
+            for entry in wpan_table_parser.parse_child_table_result(child_table):
+                entry._parsed_fields()
+        full_elapsed = time.perf_counter() - start_time
+
+        self.assertEqual(legacy_rloc16s, rloc16s)
+        self.assertEqual(NUM_ENTRIES, num_entries)
+        self.logger.info(f"Parsing {NUM_ENTRIES} child entries: {legacy_elapsed * 100:.2f}ms with the previous "
+                         f"parser, {elapsed * 100:.2f}ms with the compiled parser, {count_elapsed * 100:.2f}ms "
+                         f"without field access, {full_elapsed * 100:.2f}ms parsing all fields")
+
+        tables = {
+            "neighbor": (wpan_table_parser.parse_neighbor_table_result,
+                         table(NEIGHBOR_LINE.format(i, i, "yes") for i in range(NUM_ENTRIES))),
+            "router": (wpan_table_parser.parse_router_table_result,
+                       table(ROUTER_LINE.format(i, i, i % 63) for i in range(NUM_ENTRIES))),
+            "address cache": (wpan_table_parser.parse_address_cache_table_result,
+                              table(ADDRESS_CACHE_LINES[i % 2].format(i, i) for i in range(NUM_ENTRIES))),
+            "on-mesh prefix": (wpan_table_parser.parse_on_mesh_prefix_result,
+                               table(ON_MESH_PREFIX_LINE.format(i, i) for i in range(NUM_ENTRIES))),
+        }
+        for name, (parse, text) in tables.items():
+            start_time = time.perf_counter()
+            entries = parse(text)
+            for entry in entries:
+                repr(entry)
+            self.logger.info(f"Parsing {NUM_ENTRIES} {name} entries: {(time.perf_counter() - start_time) * 1000:.2f}ms")
+            self.assertEqual(NUM_ENTRIES, len(entries))
+
+
+class TableSnapshotTest(SilkTestCase):
+    """Silk unit test case for indexed table snapshots and their deltas.
+    """
+
+    def testIndex(self):
+        """Test that entries are looked up by their key and RLOC16.
+        """
+        router_table = TableSnapshot.from_output(
+            wpan_table_parser.RouterTableEntry,
+            table(ROUTER_LINE.format(i, i << 10, i) for i in range(NUM_ENTRIES)))
+        self.assertEqual(NUM_ENTRIES, len(router_table))
+        self.assertIn(3 << 10, router_table)
+        self.assertEqual(3, router_table[3 << 10].router_id)
+        self.assertIsNone(router_table.get((3 << 10) + 1))
+        self.assertEqual(5, router_table.by_rloc16(5 << 10).router_id)
+        self.assertEqual(5, router_table.by_rloc16("%04x" % (5 << 10)).router_id)
+
+        child_table = TableSnapshot.from_output(wpan_table_parser.ChildEntry,
+                                                table([CHILD_LINE.format(1, 0x3c01, "no")]))
+        self.assertEqual("3c01", child_table.by_rloc16(0x3c01).rloc16)
+        self.assertIsNone(child_table.by_rloc16(0x3c02))
+
+        address_cache = TableSnapshot.from_output(wpan_table_parser.AddressCacheEntry,
+                                                  table([ADDRESS_CACHE_LINES[0].format(2, 0x2000)]))
+        self.assertEqual(["fd00:1234::3:2"], list(address_cache.keys()))
+
+        with self.assertRaises(ValueError):
+            TableSnapshot.from_output(wpan_table_parser.OnMeshPrefix, table([ON_MESH_PREFIX_LINE.format(1, 0)]))
+
+    def testDuplicateKey(self):
+        """Test that routers sharing an extended address are kept, and that a duplicate key is rejected.
+        """
+        router_table = TableSnapshot.from_output(
+            wpan_table_parser.RouterTableEntry,
+            table([ROUTER_LINE.format(0, 0x400, 1), ROUTER_LINE.format(0, 0x800, 2)]))
+        self.assertEqual([0x400, 0x800], list(router_table.keys()))
+
+        with self.assertRaises(ValueError):
+            TableSnapshot.from_output(wpan_table_parser.ChildEntry,
+                                      table([CHILD_LINE.format(1, 0x3c01, "no"), CHILD_LINE.format(1, 0x3c02, "no")]))
+
+    def testDiff(self):
+        """Test that added, removed and changed entries are reported, ignoring ages.
+        """
+        previous = TableSnapshot.from_output(
+            wpan_table_parser.RouterTableEntry,
+            table([ROUTER_LINE.format(1, 0x400, 1),
+                   ROUTER_LINE.format(2, 0x800, 2),
+                   ROUTER_LINE.format(3, 0xc00, 3)]))
+        current = TableSnapshot.from_output(
+            wpan_table_parser.RouterTableEntry,
+            table([
+                ROUTER_LINE.format(1, 0x400, 1).replace("Age:3", "Age:4"),
+                ROUTER_LINE.format(2, 0x800, 2).replace("LinkEst:yes", "LinkEst:no"),
+                ROUTER_LINE.format(4, 0x1000, 4),
+            ]),
+            previous=previous)
+
+        delta = current.diff(previous)
+        self.assertTrue(delta)
+        self.assertEqual(["0000000000000004"], [entry.ext_address for entry in delta.added])
+        self.assertEqual(["0000000000000003"], [entry.ext_address for entry in delta.removed])
+        self.assertEqual([(True, False)],
+                         [(old.is_link_established(), new.is_link_established()) for old, new in delta.changed])
+        self.assertFalse(current.diff(current))
+
+    def testReuse(self):
+        """Test that entries of unchanged lines are reused instead of being parsed again.
+        """
+        lines = [CHILD_LINE.format(i, i, "no") for i in range(NUM_ENTRIES)]
+        previous = TableSnapshot.from_output(wpan_table_parser.ChildEntry, table(lines))
+        lines[0] = CHILD_LINE.format(0, 0, "yes")
+
+        current = TableSnapshot.from_output(wpan_table_parser.ChildEntry, table(lines), previous=previous)
+        self.assertIsNot(previous.entries[0], current.entries[0])
+        self.assertTrue(all(old is new for old, new in zip(previous.entries[1:], current.entries[1:])))
+        self.assertEqual(1, len(current.diff(previous).changed))
+
+    def testWaitForTable(self):
+        """Test waiting on a node until a neighbor is added to its table.
+        """
+        node = MockThreadDevBoard(1)
+        tables = {"neighbors": table([NEIGHBOR_LINE.format(1, 0x400, "no")])}
+
+        def add_neighbor():
+            tables["neighbors"] = table([NEIGHBOR_LINE.format(1, 0x400, "no"), NEIGHBOR_LINE.format(2, 0x401, "yes")])
+            node.invalidate_properties()
+
+        def check_child_added(snapshot, delta):
+            wpan_util.verify([entry.ext_address for entry in delta.added] == ["0000000000000002"])
+            wpan_util.verify(snapshot["0000000000000002"].is_child())
+
+        timer = threading.Timer(0.3, add_neighbor)
+        with mock.patch.object(node, "get", side_effect=lambda prop_name: tables["neighbors"]) as get:
+            timer.start()
+            try:
+                snapshot = wpan_util.wait_for_table(node, wpan.WPAN_THREAD_NEIGHBOR_TABLE, check_child_added, 5)
+            finally:
+                timer.join()
+            get.assert_called_with(wpan.WPAN_THREAD_NEIGHBOR_TABLE)
+
+        self.assertEqual(2, len(snapshot))
+        with mock.patch.object(node, "get", return_value=tables["neighbors"]):
+            wpan_util.check_neighbor_table(node, [mock.Mock(get=mock.Mock(return_value="[0000000000000001]"))])
+            with self.assertRaises(VerifyError):
+                wpan_util.check_neighbor_table(node, [mock.Mock(get=mock.Mock(return_value="[0000000000000003]"))])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,207 @@
+# Copyright 2020 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import os
+import sys
+import tempfile
+import time
+import unittest
+from unittest import mock
+
+from silk.config import wpan_constants as wpan
+import silk.config.defaults as defaults
+from silk.device.system_call_manager import TemporarySystemCallManager
+from silk.node.wpanctl_session import WpanctlSession, WpanctlSessionError
+from silk.unit_tests.mock_device import MockThreadDevBoard
+from silk.unit_tests.testcase import SilkTestCase
+
+FAKE_WPANCTL = r'''
+import sys
+import time
+
+props = {"NCP:State": "associated", "Network:PANID": "0x1234", "NCP:Channel": "15"}
+
+
+def run(args):
+    if args[0] == "getprop":
+        value_only = "-v" in args
+        name = args[-1]
+        print(props[name] if value_only else "%s = %s" % (name, props[name]))
+    elif args[0] in ("set", "setprop"):
+        props[args[1]] = args[-1]
+    elif args[0] == "hang":
+        time.sleep(60)
+    elif args[0] == "quit":
+        sys.exit(0)
+
+
+args = sys.argv[1:]
+if args[:1] == ["-I"]:
+    args = args[2:]
+
+if args:
+    run(args)
+    sys.exit(0)
+
+while True:
+    sys.stdout.write("wpanctl:wpan1> ")
+    sys.stdout.flush()
+    line = sys.stdin.readline()
+    if not line:
+        break
+    if line.split():
+        run(line.split())
+'''
+
+
+class WpanctlSessionTest(SilkTestCase):
+    """Silk unit test case for the persistent wpanctl session.
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        fd, cls.fake_wpanctl_path = tempfile.mkstemp(suffix=".py")
+        with os.fdopen(fd, "w") as script:
+            script.write(FAKE_WPANCTL)
+        cls.fake_wpanctl = f"{sys.executable} {cls.fake_wpanctl_path}"
+
+    @classmethod
+    def tearDownClass(cls):
+        os.remove(cls.fake_wpanctl_path)
+
+    def setUp(self):
+        """Test method set up.
+        """
+        self.session = WpanctlSession(self.fake_wpanctl, logger=self.logger)
+
+    def tearDown(self):
+        """Test method tear down.
+        """
+        self.session.close()
+
+    def testExecute(self):
+        """Test running commands and framing responses by prompt.
+        """
+        self.assertTrue(self.session.start())
+        self.assertEqual("associated", self.session.execute("getprop -v NCP:State", 2).strip())
+        self.assertEqual("Network:PANID = 0x1234", self.session.execute("getprop Network:PANID", 2).strip())
+
+        self.assertEqual("", self.session.execute("setprop NCP:Channel 20", 2).strip())
+        self.assertEqual("20", self.session.execute("getprop -v NCP:Channel", 2).strip())
+
+    def testRestart(self):
+        """Test that the session restarts after the process exits or a command times out.
+        """
+        with self.assertRaises(WpanctlSessionError):
+            self.session.execute("quit", 2)
+        self.assertFalse(self.session.alive)
+        self.assertEqual("associated", self.session.execute("getprop -v NCP:State", 2).strip())
+
+        with self.assertRaises(WpanctlSessionError):
+            self.session.execute("hang", 0.5)
+        self.assertEqual("associated", self.session.execute("getprop -v NCP:State", 2).strip())
+
+    def testNodeUsesSession(self):
+        """Test that node property access goes through the session when one is set.
+        """
+        node = MockThreadDevBoard(1)
+        node.wpanctl_session = self.session
+
+        self.assertEqual("associated", node.get(wpan.WPAN_STATE))
+        self.assertEqual("0x1234", node.getprop(wpan.WPAN_PANID))
+        self.assertTrue(self.session.alive)
+
+    def testNodeFallback(self):
+        """Test that only queries are run again as a separate process after the session fails on them.
+        """
+        node = MockThreadDevBoard(1)
+        node.netns = "wpan1"
+        node.wpanctl_session = self.session
+
+        with mock.patch.object(defaults, "WPANCTL_PATH", self.fake_wpanctl), \
+                mock.patch.object(node, "construct_netns_command", side_effect=lambda command: command), \
+                mock.patch.object(node, "_make_system_call", wraps=node._make_system_call) as system_call, \
+                mock.patch.object(self.session, "execute", side_effect=WpanctlSessionError("", "TIMEOUT", "")):
+            self.assertEqual("associated", node.wpanctl("get", "getprop -v NCP:State", 2).strip())
+            self.assertEqual(1, system_call.call_count)
+
+            self.assertEqual("", node.wpanctl("set", "setprop NCP:Channel 20", 2))
+            self.assertEqual(1, system_call.call_count)
+
+        # a session that cannot start never sent the command
+        node.wpanctl_session = WpanctlSession("exit 1", logger=self.logger)
+        with mock.patch.object(node, "make_netns_call", return_value="") as netns_call:
+            node.wpanctl("set", "setprop NCP:Channel 20", 2)
+        netns_call.assert_called_once()
+
+    def testGetManyBatch(self):
+        """Test that get_many without a session runs all queries in a single system call.
+        """
+        node = MockThreadDevBoard(1)
+        node.netns = "wpan1"
+        prop_names = [wpan.WPAN_STATE, wpan.WPAN_PANID, wpan.WPAN_CHANNEL]
+
+        with mock.patch.object(defaults, "WPANCTL_PATH", self.fake_wpanctl), \
+                mock.patch.object(node, "construct_netns_command", side_effect=lambda command: command), \
+                mock.patch.object(node, "_make_system_call", wraps=node._make_system_call) as system_call:
+            values = node.get_many(prop_names)
+
+        self.assertEqual({wpan.WPAN_STATE: "associated", wpan.WPAN_PANID: "0x1234", wpan.WPAN_CHANNEL: "15"}, values)
+        self.assertEqual(1, system_call.call_count)
+
+    def testSnapshot(self):
+        """Test that a snapshot is reused until the node changes state.
+        """
+        node = MockThreadDevBoard(1)
+        node.wpanctl_session = self.session
+
+        with mock.patch.object(node, "get_many", wraps=node.get_many) as get_many:
+            snapshot = node.snapshot([wpan.WPAN_STATE, wpan.WPAN_CHANNEL], max_age=60)
+            self.assertEqual("associated", snapshot[wpan.WPAN_STATE])
+            self.assertEqual("15", snapshot[wpan.WPAN_CHANNEL])
+            self.assertEqual(1, get_many.call_count)
+
+            node.get(wpan.WPAN_PANID)
+            self.assertTrue(snapshot.valid)
+
+            node.set(wpan.WPAN_CHANNEL, "20")
+            self.assertFalse(snapshot.valid)
+            self.assertEqual("20", snapshot[wpan.WPAN_CHANNEL])
+            self.assertEqual(2, get_many.call_count)
+
+    def testBenchmarkLatency(self):
+        """Benchmark per-command latency of the session against a process per command.
+        """
+        iterations = 20
+        manager = TemporarySystemCallManager()
+
+        start_time = time.time()
+        for _ in range(iterations):
+            output = manager._make_system_call("getprop", f"{self.fake_wpanctl} getprop -v NCP:State", 5)
+            self.assertEqual("associated", output.strip())
+        process_latency = (time.time() - start_time) / iterations
+
+        self.session.start()
+        start_time = time.time()
+        for _ in range(iterations):
+            self.assertEqual("associated", self.session.execute("getprop -v NCP:State", 2).strip())
+        session_latency = (time.time() - start_time) / iterations
+
+        self.logger.info(f"wpanctl latency: process per command {process_latency * 1000:.2f}ms, "
+                         f"session {session_latency * 1000:.2f}ms")
+
+
+if __name__ == "__main__":
+    unittest.main()
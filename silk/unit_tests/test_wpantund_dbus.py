@@ -0,0 +1,123 @@
+# Copyright 2020 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import unittest
+from unittest import mock
+
+from silk.config import wpan_constants as wpan
+from silk.node import wpantund_dbus
+from silk.node.wpantund_dbus import WpantundDbusClient, WpantundDbusError
+from silk.unit_tests.mock_device import MockThreadDevBoard
+from silk.unit_tests.mock_service import MockWpantundDbusService
+from silk.unit_tests.testcase import SilkTestCase
+
+CHILD_ENTRY = ("E24C5F67F4B8CBB9, RLOC16:d402, NetDataVer:175, LQIn:3, AveRssi:-20, LastRssi:-20, Timeout:120, "
+               "Age:0, RxOnIdle:no, FTD:no, SecDataReq:yes, FullNetData:yes")
+
+
+class WpantundDbusTest(SilkTestCase):
+    """Silk unit test case for the wpantund D-Bus client.
+    """
+
+    def setUp(self):
+        """Test method set up.
+        """
+        self.service = MockWpantundDbusService(
+            "wpan1", {
+                wpan.WPAN_STATE: ("s", "associated"),
+                wpan.WPAN_NAME: ("s", "silk-net"),
+                wpan.WPAN_PANID: ("q", 0x1234),
+                wpan.WPAN_CHANNEL: ("y", 15),
+                wpan.WPAN_XPANID: ("t", 0xdead00beef00cafe),
+                wpan.WPAN_EXT_ADDRESS: ("ay", bytes.fromhex("E24C5F67F4B8CBB9")),
+                wpan.WPAN_MAC_ALLOWLIST_ENABLED: ("b", False),
+                wpan.WPAN_THREAD_CHILD_TABLE: ("as", [CHILD_ENTRY]),
+                wpan.WPAN_IP6_ALL_ADDRESSES: ("as", ["fd00::1  prefix_len:64  origin:ncp  valid:forever"]),
+            })
+        self.client = WpantundDbusClient("wpan1", transport=self.service)
+
+    def testGet(self):
+        """Test typed and wpanctl formatted property values.
+        """
+        self.assertEqual("associated", self.client.get(wpan.WPAN_STATE))
+        self.assertEqual(0x1234, self.client.get(wpan.WPAN_PANID))
+        self.assertEqual(bytes.fromhex("E24C5F67F4B8CBB9"), self.client.get(wpan.WPAN_EXT_ADDRESS))
+
+        self.assertEqual("\"silk-net\"", self.client.get_string(wpan.WPAN_NAME))
+        self.assertEqual("0x1234", self.client.get_string(wpan.WPAN_PANID))
+        self.assertEqual("0x0F", self.client.get_string(wpan.WPAN_CHANNEL))
+        self.assertEqual("0xDEAD00BEEF00CAFE", self.client.get_string(wpan.WPAN_XPANID))
+        self.assertEqual("[E24C5F67F4B8CBB9]", self.client.get_string(wpan.WPAN_EXT_ADDRESS))
+        self.assertEqual("false", self.client.get_string(wpan.WPAN_MAC_ALLOWLIST_ENABLED))
+
+        with self.assertRaises(WpantundDbusError):
+            self.client.get("Unknown:Property")
+
+    def testBusNameResolvedOnce(self):
+        """Test that the wpantund bus name is looked up once and reused.
+        """
+        self.client.get(wpan.WPAN_STATE)
+        self.client.get(wpan.WPAN_PANID)
+        methods = [call[3] for call in self.service.calls]
+        self.assertEqual(1, methods.count(wpantund_dbus.METHOD_GET_INTERFACES))
+        self.assertEqual(wpantund_dbus.WPANTUND_DBUS_NAME, self.service.calls[-1][0])
+
+    def testGetTable(self):
+        """Test that table properties are returned as parsed entries.
+        """
+        children = self.client.get_table(wpan.WPAN_THREAD_CHILD_TABLE)
+        self.assertEqual(1, len(children))
+        self.assertEqual("E24C5F67F4B8CBB9", children[0].ext_address)
+        self.assertEqual("d402", children[0].rloc16)
+        self.assertFalse(children[0].is_rx_on_when_idle())
+
+        self.assertEqual(["fd00::1"], self.client.get_table(wpan.WPAN_IP6_ALL_ADDRESSES))
+
+    def testUpdate(self):
+        """Test setting, inserting and removing property values.
+        """
+        self.client.set(wpan.WPAN_MAC_ALLOWLIST_ENABLED, True)
+        self.assertEqual(("b", True), self.service.props[wpan.WPAN_MAC_ALLOWLIST_ENABLED])
+
+        self.client.add(wpan.WPAN_MAC_ALLOWLIST_ENTRIES, "0011223344556677")
+        self.assertEqual(["0011223344556677"], self.service.props[wpan.WPAN_MAC_ALLOWLIST_ENTRIES][1])
+        self.client.remove(wpan.WPAN_MAC_ALLOWLIST_ENTRIES, "0011223344556677")
+        self.assertEqual([], self.service.props[wpan.WPAN_MAC_ALLOWLIST_ENTRIES][1])
+
+        with self.assertRaises(WpantundDbusError):
+            self.client.remove(wpan.WPAN_MAC_ALLOWLIST_ENTRIES, "0011223344556677")
+
+    def testNodeUsesDbusClient(self):
+        """Test that node property access goes through the D-Bus client and falls back to wpanctl on failure.
+        """
+        node = MockThreadDevBoard(1)
+        node.dbus_client = self.client
+
+        with mock.patch.object(node, "wpanctl", return_value="fallback") as wpanctl:
+            self.assertEqual("\"associated\"", node.get(wpan.WPAN_STATE))
+            self.assertEqual("0x1234", node.getprop(wpan.WPAN_PANID))
+            self.assertEqual("", node.set(wpan.WPAN_NAME, "other-net"))
+            self.assertEqual(("s", "other-net"), self.service.props[wpan.WPAN_NAME])
+            self.assertEqual("", node.set(wpan.WPAN_KEY, "00112233", binary_data=True))
+            self.assertEqual(("ay", bytes.fromhex("00112233")), self.service.props[wpan.WPAN_KEY])
+            self.assertTrue(node.get("Unknown:Property").startswith("Error"))
+            wpanctl.assert_not_called()
+
+            with mock.patch.object(self.service, "call", side_effect=RuntimeError("bus down")):
+                self.assertEqual("fallback", node.get(wpan.WPAN_STATE))
+            wpanctl.assert_called_once()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,162 @@
+# Copyright 2020 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from pathlib import Path
+import re
+import time
+import unittest
+
+from silk.tools.otns_manager import RegexType
+from silk.unit_tests.testcase import SilkTestCase
+from silk.utils import wpantund_log
+from silk.utils.wpantund_log import LogEvent, LogEventType
+
+FIXTURE_LOGS = ["child_table_log.txt", "form_network_log.txt", "neighbor_table_log.txt", "partition_merge_log.txt",
+                "router_table_log.txt"]
+LOG_LINE_PREFIX = "] [DEBUG] "
+STATE_REGEX = r"State change: \"(?P<old_state>[^\"]+)\" -> \"(?P<new_state>[^\"]+)\""
+
+LEGACY_STATUS_REGEXES = [
+    (RegexType.EXTADDR_STATUS, LogEventType.OTNS_EXTADDR),
+    (RegexType.ROLE_STATUS, LogEventType.OTNS_ROLE),
+    (RegexType.CHILD_ADDED_STATUS, LogEventType.OTNS_CHILD_ADDED),
+    (RegexType.CHILD_REMOVED_STATUS, LogEventType.OTNS_CHILD_REMOVED),
+    (RegexType.ROUTER_ADDED_STATUS, LogEventType.OTNS_ROUTER_ADDED),
+    (RegexType.ROUTER_REMOVED_STATUS, LogEventType.OTNS_ROUTER_REMOVED),
+]
+
+
+def legacy_monitor_event(line):
+    """Classify a line as WpantundMonitor did before the shared classifier, kept for comparison.
+    """
+    match = re.search(STATE_REGEX, line)
+    if match is not None:
+        return LogEvent(LogEventType.STATE_CHANGE, match.group("new_state"))
+    if "FATAL ERROR" in line:
+        return wpantund_log.FATAL_ERROR_EVENT
+    if "Finished initializing NCP" in line:
+        return wpantund_log.NCP_INITIALIZED_EVENT
+    if "Framing error" in line:
+        return wpantund_log.FRAMING_ERROR_EVENT
+    return None
+
+
+def legacy_otns_event(line):
+    """Classify a line as OtnsManager.update_status did before the shared classifier, kept for comparison.
+    """
+    status_match = re.search(RegexType.STATUS.value, line)
+    if status_match:
+        status = status_match.group(2)
+        for regex, event_type in LEGACY_STATUS_REGEXES:
+            match = re.search(regex.value, status)
+            if match:
+                return LogEvent(event_type, int(match.group(1), 16))
+        return LogEvent(LogEventType.OTNS_STATUS, status)
+
+    match = re.search(RegexType.GET_EXTADDR_RES.value, line)
+    if match:
+        return LogEvent(LogEventType.EXTADDR_RESPONSE, int(match.group(1), 16))
+
+    match = re.search(RegexType.NCP_VERSION.value, line)
+    if match:
+        return LogEvent(LogEventType.NCP_VERSION, match.group(1))
+    return None
+
+
+def fixture_wpantund_lines():
+    """Read the wpantund output lines of the fixture logs.
+    """
+    lines = []
+    for log_filename in FIXTURE_LOGS:
+        with open(Path(__file__).parent / f"fixture/{log_filename}") as log_file:
+            for line in log_file:
+                if ".wpantund] [DEBUG] " in line:
+                    lines.append(line.rstrip("\n").split(LOG_LINE_PREFIX, 1)[1])
+    return lines
+
+
+class WpantundLogTest(SilkTestCase):
+    """Silk unit test case for the wpantund log line classifier.
+    """
+
+    def testClassify(self):
+        """Test that each kind of line is classified.
+        """
+        prefix = "wpantund[1234]: "
+        otns_prefix = prefix + "NCP => [OTNS] "
+        expected = {
+            prefix + "State change: \"offline\" -> \"associating\"": (LogEventType.STATE_CHANGE, "associating"),
+            prefix + "Node type change: \"end-device\" -> \"router\"": (LogEventType.NODE_TYPE_CHANGE, "router"),
+            prefix + "[-NCP-]: NCP was reset (RESET_POWER_ON)": (LogEventType.NCP_RESET, None),
+            prefix + "FATAL ERROR: NCP reset": (LogEventType.FATAL_ERROR, None),
+            prefix + "Finished initializing NCP": (LogEventType.NCP_INITIALIZED, None),
+            prefix + "Framing error": (LogEventType.FRAMING_ERROR, None),
+            prefix + "NCP is running \"OPENTHREAD/1.0; NRF52840\"": (LogEventType.NCP_VERSION, "OPENTHREAD/1.0; NRF52840"),
+            "[stdout] [0123456789ABCDEF]": (LogEventType.EXTADDR_RESPONSE, 0x0123456789ABCDEF),
+            otns_prefix + "extaddr=0123456789abcdef": (LogEventType.OTNS_EXTADDR, 0x0123456789ABCDEF),
+            otns_prefix + "role=3": (LogEventType.OTNS_ROLE, 3),
+            otns_prefix + "child_added=0123456789abcdef": (LogEventType.OTNS_CHILD_ADDED, 0x0123456789ABCDEF),
+            otns_prefix + "child_removed=0123456789abcdef": (LogEventType.OTNS_CHILD_REMOVED, 0x0123456789ABCDEF),
+            otns_prefix + "router_added=0123456789abcdef": (LogEventType.OTNS_ROUTER_ADDED, 0x0123456789ABCDEF),
+            otns_prefix + "router_removed=0123456789abcdef": (LogEventType.OTNS_ROUTER_REMOVED, 0x0123456789ABCDEF),
+            otns_prefix + "rloc16=fc00": (LogEventType.OTNS_STATUS, "rloc16=fc00"),
+            prefix + "Role change": None,
+            prefix + "State change without states": None,
+        }
+
+        for line, event in expected.items():
+            self.assertEqual(event, wpantund_log.classify(line), line)
+
+    def testFixtureLogs(self):
+        """Test that the classifier agrees with the previous per-monitor matching on the fixture logs.
+        """
+        lines = fixture_wpantund_lines()
+        self.assertTrue(lines)
+
+        classified = 0
+        for line in lines:
+            legacy_event = legacy_monitor_event(line) or legacy_otns_event(line)
+            event = wpantund_log.classify(line)
+            if event is not None and event.type in (LogEventType.NODE_TYPE_CHANGE, LogEventType.NCP_RESET):
+                # Only reported since the property cache, see PropertyCache
+                self.assertIsNone(legacy_event, line)
+                continue
+            self.assertEqual(legacy_event, event, line)
+            classified += legacy_event is not None
+        self.assertGreater(classified, 0)
+
+    def testBenchmarkFixtureLogs(self):
+        """Benchmark classifying the fixture logs against the previous per-monitor matching.
+        """
+        lines = fixture_wpantund_lines()
+
+        start_time = time.perf_counter()
+        for line in lines:
+            legacy_monitor_event(line)
+            legacy_otns_event(line)
+        legacy_elapsed = time.perf_counter() - start_time
+
+        start_time = time.perf_counter()
+        for line in lines:
+            # Both monitors classify each line they receive
+            wpantund_log.classify(line)
+            wpantund_log.classify(line)
+        elapsed = time.perf_counter() - start_time
+
+        self.logger.info(f"Classifying {len(lines)} lines: {legacy_elapsed * 1000:.1f}ms with per-monitor regexes, "
+                         f"{elapsed * 1000:.1f}ms with the shared classifier")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,125 @@
+# Copyright 2020 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import threading
+import time
+import unittest
+
+from silk.node.fifteen_four_dev_board import WpantundMonitor
+from silk.unit_tests.mock_device import MockThreadDevBoard
+from silk.unit_tests.testcase import SilkTestCase
+
+NUM_NODES = 32
+START_DELAY = 0.5
+
+
+def legacy_wait_for_start(monitor, timeout):
+    """Startup wait as it was done before WpantundMonitor had events, kept for benchmarking.
+    """
+    start_time = time.time()
+    while (time.time() - start_time) < timeout:
+        if monitor.running:
+            return True
+    return False
+
+
+class WpantundMonitorTest(SilkTestCase):
+    """Silk unit test case for WpantundMonitor.
+    """
+
+    def setUp(self):
+        """Test method set up.
+        """
+        self.node = MockThreadDevBoard(1)
+        self.monitor = WpantundMonitor(publisher=self.node.wpantund_process)
+
+    def testReady(self):
+        """Test that the monitor signals readiness once the NCP is initialized.
+        """
+        self.assertFalse(self.monitor.wait_for_start(0.05))
+        self.node.wpantund_process.emit_status("Finished initializing NCP")
+        self.assertTrue(self.monitor.ready.is_set())
+        self.assertTrue(self.monitor.wait_for_start(0))
+
+    def testStateChange(self):
+        """Test that state changes are recorded, and that the startup wait outlasts a fault that is recovered from.
+        """
+        self.node.wpantund_process.emit_status("State change: \"uninitialized\" -> \"offline\"")
+        self.assertEqual("offline", self.monitor.state)
+
+        self.node.wpantund_process.emit_status("State change: \"offline\" -> \"uninitialized:fault\"")
+        self.assertTrue(self.monitor.fault.is_set())
+        start_time = time.time()
+        self.assertFalse(self.monitor.wait_for_start(0.1))
+        self.assertGreaterEqual(time.time() - start_time, 0.1)
+
+        timer = threading.Timer(0.1, self.node.wpantund_process.emit_status, ["Finished initializing NCP"])
+        timer.start()
+        self.assertTrue(self.monitor.wait_for_start(10))
+        self.assertFalse(self.monitor.fault.is_set())
+
+    def testCrash(self):
+        """Test that a fatal error ends the startup wait.
+        """
+        self.node.wpantund_process.emit_status("Finished initializing NCP")
+        self.node.wpantund_process.emit_status("FATAL ERROR")
+        self.assertTrue(self.monitor.crash.is_set())
+        self.assertFalse(self.monitor.ready.is_set())
+        self.assertTrue(self.monitor.crashed)
+        self.assertFalse(self.monitor.wait_for_start(0))
+
+    def __bring_up(self, wait_func):
+        """Wait for NUM_NODES mocked wpantund instances that finish initializing after START_DELAY.
+
+        Returns:
+            float: CPU time used by this process during bring-up, in seconds.
+        """
+        nodes = [MockThreadDevBoard(i + 1) for i in range(NUM_NODES)]
+        monitors = [WpantundMonitor(publisher=node.wpantund_process) for node in nodes]
+        results = [None] * NUM_NODES
+
+        def wait(index):
+            results[index] = wait_func(monitors[index], 30)
+
+        def initialize():
+            for node in nodes:
+                node.wpantund_process.emit_status("Finished initializing NCP")
+
+        threads = [threading.Thread(target=wait, args=(i,)) for i in range(NUM_NODES)]
+        timer = threading.Timer(START_DELAY, initialize)
+
+        start_cpu_time = time.process_time()
+        for thread in threads:
+            thread.start()
+        timer.start()
+        for thread in threads:
+            thread.join()
+        cpu_time = time.process_time() - start_cpu_time
+
+        self.assertTrue(all(results))
+        return cpu_time
+
+    def testBenchmarkBringUp(self):
+        """Benchmark CPU time spent waiting for many mocked nodes to start.
+        """
+        event_cpu_time = self.__bring_up(lambda monitor, timeout: monitor.wait_for_start(timeout))
+        spin_cpu_time = self.__bring_up(legacy_wait_for_start)
+
+        self.logger.info(f"Bring-up of {NUM_NODES} nodes: CPU time {spin_cpu_time:.3f}s with busy wait, "
+                         f"{event_cpu_time:.3f}s with events")
+        self.assertLess(event_cpu_time, START_DELAY / 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
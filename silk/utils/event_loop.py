@@ -0,0 +1,132 @@
+# Copyright 2020 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""asyncio event loop shared by all nodes.
+
+Instead of a worker thread and output reader threads per node, nodes can run their system calls and stream wpantund
+output as coroutines on one event loop, which runs in a single background thread. Work that has to block, such as
+queued Python functions and subscribers of output lines, runs on a small thread pool owned by the loop.
+
+Subprocesses are watched from a thread other than the main thread, which asyncio supports from Python 3.8 on.
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+import asyncio
+import sys
+import threading
+
+import silk.config.defaults as defaults
+
+_shared_event_loop = None
+_shared_event_loop_lock = threading.Lock()
+
+
+def is_supported() -> bool:
+    """Check whether subprocesses can be run on an event loop in a background thread.
+    """
+    return sys.version_info >= (3, 8)
+
+
+class NodeEventLoop(object):
+    """asyncio event loop running in a background thread.
+
+    Attributes:
+        loop (asyncio.AbstractEventLoop): the event loop.
+        executor (ThreadPoolExecutor): thread pool for blocking work scheduled from coroutines.
+    """
+
+    def __init__(self, max_workers: int = None, name: str = "silk-event-loop"):
+        """Create an event loop and start its thread.
+
+        Args:
+            max_workers (int, optional): number of threads for blocking work. Defaults to
+                defaults.NODE_EVENT_LOOP_MAX_WORKERS.
+            name (str, optional): name of the event loop thread. Defaults to "silk-event-loop".
+        """
+        if max_workers is None:
+            max_workers = defaults.NODE_EVENT_LOOP_MAX_WORKERS
+
+        self.loop = asyncio.new_event_loop()
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=name + "-worker")
+        self.loop.set_default_executor(self.executor)
+
+        self._thread = threading.Thread(target=self.__run, name=name, daemon=True)
+        self._thread.start()
+
+    def __run(self):
+        asyncio.set_event_loop(self.loop)
+        self.loop.run_forever()
+
+    def in_loop_thread(self) -> bool:
+        """Check whether the caller runs on the event loop thread.
+        """
+        return threading.current_thread() is self._thread
+
+    def submit(self, coroutine):
+        """Schedule a coroutine on the event loop.
+
+        Args:
+            coroutine (Coroutine): coroutine to run.
+
+        Returns:
+            concurrent.futures.Future: future of the coroutine result.
+        """
+        return asyncio.run_coroutine_threadsafe(coroutine, self.loop)
+
+    def run(self, coroutine, timeout: float = None):
+        """Run a coroutine on the event loop and wait for its result.
+
+        Args:
+            coroutine (Coroutine): coroutine to run.
+            timeout (float, optional): maximum time to wait in seconds. Defaults to None, which waits forever.
+
+        Raises:
+            RuntimeError: if called from the event loop thread, which would deadlock.
+
+        Returns:
+            the result of the coroutine.
+        """
+        if self.in_loop_thread():
+            coroutine.close()
+            raise RuntimeError("Cannot wait for a coroutine on the event loop thread")
+        return self.submit(coroutine).result(timeout)
+
+    def call_soon(self, callback, *args):
+        """Schedule a callback on the event loop from any thread.
+        """
+        self.loop.call_soon_threadsafe(callback, *args)
+
+    def close(self):
+        """Stop the event loop and its thread pool.
+        """
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self._thread.join()
+        self.loop.close()
+        self.executor.shutdown(wait=False)
+
+
+def shared_event_loop() -> NodeEventLoop:
+    """Get the event loop shared by all nodes, creating it on first use.
+
+    Raises:
+        RuntimeError: if this Python version cannot run subprocesses on the shared event loop.
+    """
+    global _shared_event_loop
+
+    if not is_supported():
+        raise RuntimeError("The node event loop requires Python 3.8 or later")
+
+    with _shared_event_loop_lock:
+        if _shared_event_loop is None:
+            _shared_event_loop = NodeEventLoop()
+        return _shared_event_loop
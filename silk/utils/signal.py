@@ -12,15 +12,53 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 """Implements publisher/subscriber classes for passing messages.
+
+Publishers deliver every emit() synchronously to their subscribers, in subscription order. The subscribers are kept
+in a tuple that is replaced on every subscribe and unsubscribe, so emitting needs no lock and handles can subscribe or
+unsubscribe while an emit is in progress.
+
+Weakly referenced handles that are garbage collected are only flagged by their weak reference callback, which may run
+on a thread that already holds the subscriber lock. They are pruned on the next subscribe or emit.
+
+A subscription may have a line filter, a callable that receives the `line` argument of each emit and returns whether
+the handle should be called. Line handlers that only react to a few kinds of lines use it to skip the rest cheaply.
 """
 
 import logging
-
-from django.dispatch import Signal
+import threading
+import weakref
 
 from silk.utils import decorator
 
 
+def keyword_filter(keywords):
+    """Build a line filter that accepts lines containing any of `keywords`.
+
+    Args:
+        keywords (Iterable[str]): substrings to look for.
+
+    Returns:
+        Callable[[str], bool]: the line filter.
+    """
+    keywords = tuple(keywords)
+
+    def line_filter(line):
+        for keyword in keywords:
+            if keyword in line:
+                return True
+        return False
+
+    return line_filter
+
+
+def _handle_key(handle):
+    """Identify a handle, so that bound methods of the same object and function compare equal.
+    """
+    if hasattr(handle, "__self__") and hasattr(handle, "__func__"):
+        return id(handle.__self__), id(handle.__func__)
+    return id(handle)
+
+
 class SignalLoggerAdapter(logging.LoggerAdapter):
     """LoggerAdapter for adding extra logging to signal classes.
     """
@@ -109,38 +147,156 @@ class SignalLogger(object):
         self.logger.exception(msg, *args, **kwargs)
 
 
+class _StrongReference(object):
+    """Callable with the interface of a weak reference that keeps its handle alive.
+    """
+
+    __slots__ = ("handle",)
+
+    def __init__(self, handle):
+        self.handle = handle
+
+    def __call__(self):
+        return self.handle
+
+
 class Publisher(SignalLogger):
     """Base class for signaling Publisher.
 
-    The base __init__ function setups the signaling object that a Subscriber can connect to.
+    The base __init__ function setups the subscriber list that a Subscriber can connect to.
     """
 
     def __init__(self):
         """Setups signaling object.
         """
         super().__init__()
-        self._signal = Signal()
+        # Tuple of (key, reference to handle, line filter, batch), replaced as a whole on every change
+        self._subscribers = ()
+        self._subscribers_lock = threading.Lock()
+        # Set when a weakly referenced handle was garbage collected, see __removal_callback()
+        self._dead_subscribers = False
 
-    def subscribe(self, handle):
+    def subscribe(self, handle, line_filter=None, weak=True, batch=False):
         """Subscribe a handle to this publisher.
+
+        Subscribing a handle again replaces its line filter and batch setting.
+
+        Args:
+            handle (Callable): called with `sender` and the emitted keyword arguments.
+            line_filter (Callable[[str], bool], optional): only call the handle for emits whose `line` argument it
+                accepts. Emits without a `line` argument are always delivered. Defaults to None, which accepts all.
+            weak (bool, optional): only keep a weak reference to the handle, so that it is unsubscribed when garbage
+                collected. Defaults to True.
+            batch (bool, optional): call the handle with a `lines` list instead of once per `line`. Lines published
+                with emit_lines() are then delivered together. Defaults to False.
         """
-        self._signal.connect(handle)
+        key = _handle_key(handle)
+        if not weak:
+            reference = _StrongReference(handle)
+        elif hasattr(handle, "__self__") and hasattr(handle, "__func__"):
+            reference = weakref.WeakMethod(handle, self.__removal_callback(key))
+        else:
+            reference = weakref.ref(handle, self.__removal_callback(key))
+
+        with self._subscribers_lock:
+            subscribers = list(self.__live_subscribers())
+            for i, subscriber in enumerate(subscribers):
+                if subscriber[0] == key:
+                    subscribers[i] = (key, reference, line_filter, batch)
+                    break
+            else:
+                subscribers.append((key, reference, line_filter, batch))
+            self._subscribers = tuple(subscribers)
 
     def unsubscribe(self, handle):
         """Unsubscribe a handle from this publisher.
         """
-        self._signal.disconnect(handle)
+        self.__remove(_handle_key(handle))
 
     def emit(self, **kwargs):
         """Emits arguments to the subscribers.
         """
-        self._signal.send(sender=self, **kwargs)
+        if self._dead_subscribers:
+            self.__prune()
+
+        line = kwargs.get("line")
+        for _, reference, line_filter, batch in self._subscribers:
+            if line_filter is not None and line is not None and not line_filter(line):
+                continue
+            handle = reference()
+            if handle is None:
+                continue
+            if batch and line is not None:
+                handle(sender=self, lines=[line])
+            else:
+                handle(sender=self, **kwargs)
+
+    def emit_lines(self, lines):
+        """Emits a list of lines to the subscribers.
+
+        Batch subscribers receive all the lines their filter accepts in one call, the others one call per line.
+
+        Args:
+            lines (List[str]): lines to emit.
+        """
+        if self._dead_subscribers:
+            self.__prune()
+
+        for _, reference, line_filter, batch in self._subscribers:
+            handle = reference()
+            if handle is None:
+                continue
+            if batch:
+                accepted = lines if line_filter is None else [line for line in lines if line_filter(line)]
+                if accepted:
+                    handle(sender=self, lines=accepted)
+            else:
+                for line in lines:
+                    if line_filter is None or line_filter(line):
+                        handle(sender=self, line=line)
+
+    def __removal_callback(self, key):
+        # Only refer weakly to the publisher, so that subscriptions do not keep it alive
+        publisher_reference = weakref.ref(self)
+
+        def flag_dead(_):
+            # Garbage collection can run this on a thread that holds _subscribers_lock, so it must not take the lock
+            publisher = publisher_reference()
+            if publisher is not None:
+                publisher._dead_subscribers = True
+
+        return flag_dead
+
+    def __live_subscribers(self):
+        # Must be called with _subscribers_lock held
+        if not self._dead_subscribers:
+            return self._subscribers
+        # Cleared first, so that a handle collected while filtering is pruned next time
+        self._dead_subscribers = False
+        return tuple(subscriber for subscriber in self._subscribers if subscriber[1]() is not None)
+
+    def __prune(self):
+        with self._subscribers_lock:
+            self._subscribers = self.__live_subscribers()
+
+    def __remove(self, key):
+        with self._subscribers_lock:
+            self._subscribers = tuple(subscriber for subscriber in self.__live_subscribers() if subscriber[0] != key)
 
 
 class Subscriber(SignalLogger):
     """Base class for signaling Subscriber.
+
+    Publishers only refer weakly to the subscriber, so it is unsubscribed from all of them once garbage collected.
+
+    Subclasses that only handle some lines can set `line_keywords`, so that publishers only deliver lines containing
+    one of the keywords. Subclasses that set `batch_lines` receive a `lines` list in subscribe_handle instead of a
+    single `line`.
     """
 
+    line_keywords = None
+    batch_lines = False
+
     def __init__(self, publisher=None, source_name=None):
         """Creates a new subscriber for parsing logs.
 
@@ -152,15 +308,11 @@ class Subscriber(SignalLogger):
 
         self.publishers = []
         self.source_name = source_name
+        self.line_filter = keyword_filter(self.line_keywords) if self.line_keywords else None
 
         if publisher:
             self.subscribe(publisher)
 
-    def __del__(self):
-        """Automatically unsubscribe from all publishers if the object is deleted.
-        """
-        self.unsubscribe()
-
     def subscribe(self, publisher):
         """
         Subscribe to a given publisher.
@@ -168,16 +320,24 @@ class Subscriber(SignalLogger):
         if not isinstance(publisher, Publisher):
             raise TypeError("publisher must be a type Publisher but was %s" % type(publisher))
 
-        publisher.subscribe(self.subscribe_handle)
+        publisher.subscribe(self.subscribe_handle, line_filter=self.line_filter, batch=self.batch_lines)
         self.publishers.append(publisher)
 
+    def set_line_filter(self, line_filter):
+        """Change the line filter of this subscriber on all its publishers.
+
+        Args:
+            line_filter (Callable[[str], bool]): new line filter, or None to receive all lines.
+        """
+        self.line_filter = line_filter
+        for publisher in getattr(self, "publishers", []):
+            publisher.subscribe(self.subscribe_handle, line_filter=line_filter, batch=self.batch_lines)
+
     def unsubscribe(self, publisher=None):
         """Unsubscribe from the publisher.
 
         If publisher argument is None (default), this function will unsubscribe from all publishers.
         """
-        # Defaulting to an empty list here works around a race condition where
-        # this object is destroyed via __del__ before __init__ was called.
         publishers = getattr(self, "publishers", [])
         if publisher is None:
             for a_publisher in publishers:
@@ -186,6 +346,7 @@ class Subscriber(SignalLogger):
         else:
             if publisher in publishers:
                 publisher.unsubscribe(self.subscribe_handle)
+                publishers.remove(publisher)
 
     def subscribe_handle(self, sender, **kwargs):
         """Handler method that should be overwritten from the publisher.
@@ -0,0 +1,81 @@
+# Copyright 2020 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Notifications of node state changes, for waiting on a condition without polling at a fixed rate.
+
+Nodes that can report state changes provide subscribe_state_changes(handle) and unsubscribe_state_changes(handle),
+calling the handle with a `sender` and keyword arguments whenever their state may have changed, e.g. when wpantund
+logs a state change or a command changed a property. A StateChangeMonitor counts these notifications across a set of
+nodes, so that a waiter can block until the count moves on.
+"""
+
+import threading
+
+
+class StateChangeMonitor(object):
+    """Counts state change notifications of a set of nodes.
+
+    Attributes:
+        change_count (int): number of notifications received so far.
+    """
+
+    def __init__(self, nodes=()):
+        """Subscribe to the state changes of the nodes that report them.
+
+        Args:
+            nodes (Iterable, optional): nodes to monitor. Nodes without subscribe_state_changes() are ignored.
+                Defaults to ().
+        """
+        self._condition = threading.Condition()
+        self.change_count = 0
+        self._nodes = []
+        for node in nodes:
+            subscribe = getattr(node, "subscribe_state_changes", None)
+            if subscribe is not None:
+                subscribe(self.handle_change)
+                self._nodes.append(node)
+
+    @property
+    def has_sources(self) -> bool:
+        """Whether any of the nodes reports state changes.
+        """
+        return bool(self._nodes)
+
+    def handle_change(self, sender=None, **kwargs):
+        """Record a state change. Has the signature of a signal handle.
+        """
+        with self._condition:
+            self.change_count += 1
+            self._condition.notify_all()
+
+    def wait_for_change(self, change_count: int, timeout: float) -> bool:
+        """Block until a state change arrives after `change_count` changes, or `timeout` seconds passed.
+
+        Returns:
+            bool: True if there was a change.
+        """
+        with self._condition:
+            return self._condition.wait_for(lambda: self.change_count != change_count, timeout)
+
+    def close(self):
+        """Unsubscribe from all nodes.
+        """
+        for node in self._nodes:
+            node.unsubscribe_state_changes(self.handle_change)
+        self._nodes = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
@@ -12,6 +12,10 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+from concurrent.futures import TimeoutError as FutureTimeoutError
+import asyncio
+import collections
+import os
 import re
 import select
 import subprocess
@@ -19,31 +23,133 @@ import threading
 import traceback
 
 from silk.utils import signal
+import silk.config.defaults as defaults
+
+READ_CHUNK_SIZE = 64 * 1024
+SELECT_TIMEOUT = 1
+
+
+def split_lines(output):
+    """Decode output and split it into lines, without empty lines and trailing whitespace.
+
+    :param bytes output:
+        output ending with a complete line
+    """
+    lines = [line.rstrip() for line in output.decode("utf-8", "replace").split("\n")]
+    return [line for line in lines if line]
+
+
+def command_line(command):
+    # Added code to handle wpantund start in RCP mode
+    # sudo /usr/local/sbin/wpantund -o Config:NCP:SocketPath "system:openthread/output/posix/x86_64-unknown-linux-
+    # gnu/bin/ot-ncp /dev/ttyACM0 115200" -o Config:TUN:InterfaceName wpan0 -o Daemon:SyslogMask "all"
+
+    command = re.findall(r"(?:\".*?\"|\S)+", command)
+
+    return " ".join(e for e in command)
+
+
+class OutputLineQueue(object):
+    """Bounded queue of output lines waiting to be dispatched to subscribers.
+
+    Lines count towards the depth until their dispatch is done. Lines that do not fit are dropped and counted. The
+    queue is not thread safe.
+
+    :param max_lines:
+        maximum number of queued lines
+    """
+
+    def __init__(self, max_lines):
+        self.max_lines = max_lines
+        self.depth = 0
+        self.dropped = 0
+        self._batches = collections.deque()
+
+    def __bool__(self):
+        return bool(self._batches)
+
+    def put(self, output):
+        """Queue the lines of some output.
+
+        :param bytes output:
+            output ending with a complete line
+        :return:
+            the number of lines dropped
+        """
+        lines = split_lines(output)
+        space = max(self.max_lines - self.depth, 0)
+        dropped = max(len(lines) - space, 0)
+        if dropped:
+            self.dropped += dropped
+            lines = lines[:space]
+
+        if lines:
+            self._batches.append(lines)
+            self.depth += len(lines)
+        return dropped
+
+    def take(self):
+        """Take all queued lines, which stay counted in the depth until done() is called.
+        """
+        batches = list(self._batches)
+        self._batches.clear()
+        return batches[0] if len(batches) == 1 else [line for batch in batches for line in batch]
+
+    def done(self, lines):
+        """Mark lines returned by take() as dispatched.
+        """
+        self.depth -= len(lines)
 
 
 class SubprocessRunner(signal.Publisher, threading.Thread):
-    """A class which runs a command.
+    """A class which runs a command and publishes its output lines.
+
+    The runner thread reads the output in chunks and splits them into lines, and a dispatcher thread emits the lines
+    to the subscribers in batches. The two are decoupled by a bounded queue, so that slow subscribers never stop the
+    output pipe of the command from being drained. Lines that do not fit in the queue are dropped and counted.
 
     :param command:
         command to run
+    :param max_queued_lines:
+        maximum number of lines waiting to be dispatched, defaults to defaults.SUBPROCESS_MAX_QUEUED_LINES
     """
 
-    def __init__(self, command):
+    def __init__(self, command, max_queued_lines=None):
         super().__init__()
         threading.Thread.__init__(self)
 
         self.command = command
+        if max_queued_lines is None:
+            max_queued_lines = defaults.SUBPROCESS_MAX_QUEUED_LINES
 
         self.running = False
         self.daemon = True
 
+        self.__lines = OutputLineQueue(max_queued_lines)
+        self.__condition = threading.Condition()
+        self.__reading = False
+        self.__dispatcher = threading.Thread(target=self.__dispatch, daemon=True)
+
+    @property
+    def queue_depth(self):
+        """Number of lines read but not dispatched yet.
+        """
+        return self.__lines.depth
+
+    @property
+    def dropped_lines(self):
+        """Number of lines dropped because the queue was full.
+        """
+        return self.__lines.dropped
+
     def start(self):
         """Start the subprocess runner, this does not start process.
         """
         try:
-            super().start()
             self.running = True
+            super().start()
         except Exception as e:
+            self.running = False
             traceback.print_exc()
             print("Error in SubprocessRunner start:", str(e))
 
@@ -61,32 +167,245 @@ class SubprocessRunner(signal.Publisher, threading.Thread):
                 self.warn("SubprocessRunner join timed out")
                 self.proc.kill()
 
+        if self.__dispatcher.is_alive():
+            self.__dispatcher.join(timeout)
+
     def run(self):
         """start the command.
         """
 
-        # Added code to handle wpantund start in RCP mode
-        # sudo /usr/local/sbin/wpantund -o Config:NCP:SocketPath "system:openthread/output/posix/x86_64-unknown-linux-
-        # gnu/bin/ot-ncp /dev/ttyACM0 115200" -o Config:TUN:InterfaceName wpan0 -o Daemon:SyslogMask "all"
+        command = command_line(self.command)
 
-        command = re.findall(r"(?:\".*?\"|\S)+", self.command)
+        self.proc = subprocess.Popen(command, bufsize=0, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, shell=True)
 
-        command = " ".join(e for e in command)
+        self.__reading = True
+        self.__dispatcher.start()
 
-        self.proc = subprocess.Popen(command, bufsize=0, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, shell=True)
+        stdout = self.proc.stdout.fileno()
+        # Output after the last complete line
+        pending = bytearray()
         try:
             while self.running:
-                for s in select.select([self.proc.stdout], [], [], 1)[0]:
-                    line = s.readline().rstrip()
-                    if line:
-                        line = line.decode("utf-8")
-                        self.emit(line=line)
+                if not select.select([stdout], [], [], SELECT_TIMEOUT)[0]:
+                    continue
+
+                chunk = os.read(stdout, READ_CHUNK_SIZE)
+                if not chunk:
+                    # The command closed its output
+                    break
+
+                pending += chunk
+                end = pending.rfind(b"\n")
+                if end >= 0:
+                    self.__enqueue(pending[:end])
+                    del pending[:end + 1]
+
+            self.__enqueue(pending)
         except Exception as e:
             traceback.print_exc()
             print("Error in SubprocessRunner run:", str(e))
         finally:
             self.running = False
+            with self.__condition:
+                self.__reading = False
+                self.__condition.notify_all()
             try:
                 self.proc.terminate()
             except OSError:
                 pass
+
+    def __enqueue(self, output):
+        with self.__condition:
+            dropped = self.__lines.put(output)
+            if dropped and dropped == self.__lines.dropped:
+                self.warn("Subscribers are too slow, dropping output lines")
+            if self.__lines:
+                self.__condition.notify()
+
+    def __dispatch(self):
+        while True:
+            with self.__condition:
+                self.__condition.wait_for(lambda: self.__lines or not self.__reading)
+                if not self.__lines:
+                    return
+                lines = self.__lines.take()
+
+            try:
+                self.emit_lines(lines)
+            except Exception as e:
+                traceback.print_exc()
+                print("Error in SubprocessRunner dispatch:", str(e))
+
+            with self.__condition:
+                self.__lines.done(lines)
+
+
+class AsyncSubprocessRunner(signal.Publisher):
+    """Event loop counterpart of SubprocessRunner.
+
+    The command runs as an asyncio subprocess on a NodeEventLoop and its output is read by a coroutine, so no thread
+    is dedicated to the runner. Batches of lines are emitted on the event loop's thread pool, one batch at a time so
+    that the lines stay in order, which keeps slow subscribers from blocking the loop.
+
+    :param command:
+        command to run
+    :param event_loop:
+        NodeEventLoop to run on
+    :param max_queued_lines:
+        maximum number of lines waiting to be dispatched, defaults to defaults.SUBPROCESS_MAX_QUEUED_LINES
+    """
+
+    def __init__(self, command, event_loop, max_queued_lines=None):
+        super().__init__()
+
+        self.command = command
+        self.event_loop = event_loop
+        if max_queued_lines is None:
+            max_queued_lines = defaults.SUBPROCESS_MAX_QUEUED_LINES
+
+        self.running = False
+        self.proc = None
+
+        self.__lines = OutputLineQueue(max_queued_lines)
+        self.__reading = False
+        self.__wakeup = None
+        self.__future = None
+
+    @property
+    def queue_depth(self):
+        """Number of lines read but not dispatched yet.
+        """
+        return self.__lines.depth
+
+    @property
+    def dropped_lines(self):
+        """Number of lines dropped because the queue was full.
+        """
+        return self.__lines.dropped
+
+    def start(self):
+        """Start the command on the event loop.
+        """
+        self.running = True
+        self.__future = self.event_loop.submit(self.__run())
+
+    def stop(self, timeout=15):
+        """End the command and wait until its output is dispatched.
+
+        :param int timeout:
+            the seconds to wait before force stopping the process
+        """
+        if self.running:
+            self.running = False
+            self.event_loop.call_soon(self.__signal, "terminate")
+
+        if self.__future is None:
+            return
+
+        try:
+            self.__future.result(timeout)
+        except FutureTimeoutError:
+            self.warn("AsyncSubprocessRunner stop timed out")
+            self.event_loop.call_soon(self.__signal, "kill")
+
+    def is_alive(self):
+        """Check whether the command output is still being read or dispatched.
+        """
+        return self.__future is not None and not self.__future.done()
+
+    def join(self, timeout=None):
+        """Wait until the command output has been read and dispatched.
+        """
+        if self.__future is not None:
+            try:
+                self.__future.result(timeout)
+            except FutureTimeoutError:
+                pass
+
+    def __signal(self, action):
+        if self.proc is not None and self.proc.returncode is None:
+            try:
+                getattr(self.proc, action)()
+            except OSError:
+                pass
+
+    async def __run(self):
+        try:
+            self.proc = await asyncio.create_subprocess_exec("/bin/sh",
+                                                             "-c",
+                                                             command_line(self.command),
+                                                             stdout=subprocess.PIPE,
+                                                             stderr=subprocess.STDOUT)
+        except Exception as e:
+            self.running = False
+            traceback.print_exc()
+            print("Error in AsyncSubprocessRunner run:", str(e))
+            return
+
+        self.__reading = True
+        self.__wakeup = asyncio.Event()
+        dispatcher = asyncio.ensure_future(self.__dispatch())
+
+        # Output after the last complete line
+        pending = bytearray()
+        # The read is kept across polls rather than cancelled on timeout, so that no output is lost
+        read_task = None
+        try:
+            while self.running:
+                if read_task is None:
+                    read_task = asyncio.ensure_future(self.proc.stdout.read(READ_CHUNK_SIZE))
+
+                done, _ = await asyncio.wait([read_task], timeout=SELECT_TIMEOUT)
+                if not done:
+                    continue
+
+                chunk = read_task.result()
+                read_task = None
+                if not chunk:
+                    # The command closed its output
+                    break
+
+                pending += chunk
+                end = pending.rfind(b"\n")
+                if end >= 0:
+                    self.__enqueue(pending[:end])
+                    del pending[:end + 1]
+
+            self.__enqueue(pending)
+        except Exception as e:
+            traceback.print_exc()
+            print("Error in AsyncSubprocessRunner run:", str(e))
+        finally:
+            if read_task is not None:
+                read_task.cancel()
+            self.running = False
+            self.__reading = False
+            self.__wakeup.set()
+            self.__signal("terminate")
+            await dispatcher
+            await self.proc.wait()
+
+    def __enqueue(self, output):
+        dropped = self.__lines.put(output)
+        if dropped and dropped == self.__lines.dropped:
+            self.warn("Subscribers are too slow, dropping output lines")
+        if self.__lines:
+            self.__wakeup.set()
+
+    async def __dispatch(self):
+        loop = asyncio.get_event_loop()
+        while True:
+            if not self.__lines:
+                if not self.__reading:
+                    return
+                self.__wakeup.clear()
+                await self.__wakeup.wait()
+                continue
+
+            lines = self.__lines.take()
+            try:
+                await loop.run_in_executor(None, self.emit_lines, lines)
+            except Exception as e:
+                traceback.print_exc()
+                print("Error in AsyncSubprocessRunner dispatch:", str(e))
+            self.__lines.done(lines)
@@ -0,0 +1,146 @@
+# Copyright 2020 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Classifier for wpantund output lines.
+
+Every wpantund output line goes through the log monitors, so classifying lines is on the hot path. A line is first
+checked against a few literals; only lines containing one of them are searched with a single compiled alternation,
+whose matching named group decides the type of the event.
+"""
+
+import collections
+import enum
+import re
+
+
+class LogEventType(enum.Enum):
+    """Types of wpantund log events.
+    """
+    STATE_CHANGE = 0
+    FATAL_ERROR = 1
+    NCP_INITIALIZED = 2
+    FRAMING_ERROR = 3
+    NCP_VERSION = 4
+    EXTADDR_RESPONSE = 5
+    OTNS_STATUS = 6
+    OTNS_EXTADDR = 7
+    OTNS_ROLE = 8
+    OTNS_CHILD_ADDED = 9
+    OTNS_CHILD_REMOVED = 10
+    OTNS_ROUTER_ADDED = 11
+    OTNS_ROUTER_REMOVED = 12
+    NODE_TYPE_CHANGE = 13
+    NCP_RESET = 14
+
+
+# type (LogEventType): type of the event.
+# value: new state for STATE_CHANGE, new node type for NODE_TYPE_CHANGE, version string for NCP_VERSION, status
+#     message for OTNS_STATUS, role for OTNS_ROLE, extended address for EXTADDR_RESPONSE and the other OTNS events,
+#     None otherwise.
+LogEvent = collections.namedtuple("LogEvent", ["type", "value"])
+
+# Lines without any of these literals cannot match LOG_LINE_REGEX
+MONITOR_KEYWORDS = ("State change", "FATAL ERROR", "Finished initializing NCP", "Framing error", "Node type change",
+                    "NCP was reset")
+OTNS_KEYWORDS = ("[OTNS]", "[stdout] [", "NCP is running")
+KEYWORDS = MONITOR_KEYWORDS + OTNS_KEYWORDS
+# Lines reporting a change of the NCP state or of one of its properties, see StateChangeMonitor
+STATE_CHANGE_KEYWORDS = ("State change", "Node type change", "[-NCP-]", "NCP =>")
+
+LOG_LINE_REGEX = re.compile(r"State change: \"(?P<old_state>[^\"]+)\" -> \"(?P<state>[^\"]+)\""
+                            r"|Node type change: \"(?P<old_node_type>[^\"]+)\" -> \"(?P<node_type>[^\"]+)\""
+                            r"|wpantund\[\d+\]: NCP => .*\[OTNS\] (?P<status>\w+=[A-Fa-f0-9,rsdn]+)"
+                            r"|\[stdout\] \[(?P<extaddr>[A-Fa-f0-9]{16})\]"
+                            r"|NCP is running \"(?P<ncp_version>.*)\""
+                            r"|(?P<fatal_error>FATAL ERROR)"
+                            r"|(?P<ncp_initialized>Finished initializing NCP)"
+                            r"|(?P<framing_error>Framing error)"
+                            r"|(?P<ncp_reset>NCP was reset)")
+
+OTNS_STATUS_REGEX = re.compile(r"extaddr=(?P<extaddr>[A-Fa-f0-9]{16})"
+                               r"|role=(?P<role>[0-4])"
+                               r"|child_added=(?P<child_added>[A-Fa-f0-9]{16})"
+                               r"|child_removed=(?P<child_removed>[A-Fa-f0-9]{16})"
+                               r"|router_added=(?P<router_added>[A-Fa-f0-9]{16})"
+                               r"|router_removed=(?P<router_removed>[A-Fa-f0-9]{16})")
+
+OTNS_STATUS_EVENT_TYPES = {
+    "extaddr": LogEventType.OTNS_EXTADDR,
+    "role": LogEventType.OTNS_ROLE,
+    "child_added": LogEventType.OTNS_CHILD_ADDED,
+    "child_removed": LogEventType.OTNS_CHILD_REMOVED,
+    "router_added": LogEventType.OTNS_ROUTER_ADDED,
+    "router_removed": LogEventType.OTNS_ROUTER_REMOVED,
+}
+
+FATAL_ERROR_EVENT = LogEvent(LogEventType.FATAL_ERROR, None)
+NCP_INITIALIZED_EVENT = LogEvent(LogEventType.NCP_INITIALIZED, None)
+FRAMING_ERROR_EVENT = LogEvent(LogEventType.FRAMING_ERROR, None)
+NCP_RESET_EVENT = LogEvent(LogEventType.NCP_RESET, None)
+
+
+def classify_status(status: str) -> LogEvent:
+    """Classify an OTNS status message.
+
+    Args:
+        status (str): status message, e.g. "role=2".
+
+    Returns:
+        LogEvent: event of the status.
+    """
+    match = OTNS_STATUS_REGEX.search(status)
+    if match is None:
+        return LogEvent(LogEventType.OTNS_STATUS, status)
+
+    group = match.lastgroup
+    value = match.group(group)
+    return LogEvent(OTNS_STATUS_EVENT_TYPES[group], int(value) if group == "role" else int(value, 16))
+
+
+def classify(line: str) -> LogEvent:
+    """Classify a wpantund output line.
+
+    Args:
+        line (str): output line.
+
+    Returns:
+        LogEvent: event of the line, or None if the line is not of interest.
+    """
+    for keyword in KEYWORDS:
+        if keyword in line:
+            return _classify_match(LOG_LINE_REGEX.search(line))
+    return None
+
+
+def _classify_match(match) -> LogEvent:
+    if match is None:
+        return None
+
+    group = match.lastgroup
+    if group == "state":
+        return LogEvent(LogEventType.STATE_CHANGE, match.group("state"))
+    elif group == "node_type":
+        return LogEvent(LogEventType.NODE_TYPE_CHANGE, match.group("node_type"))
+    elif group == "status":
+        return classify_status(match.group("status"))
+    elif group == "extaddr":
+        return LogEvent(LogEventType.EXTADDR_RESPONSE, int(match.group("extaddr"), 16))
+    elif group == "ncp_version":
+        return LogEvent(LogEventType.NCP_VERSION, match.group("ncp_version"))
+    elif group == "fatal_error":
+        return FATAL_ERROR_EVENT
+    elif group == "ncp_initialized":
+        return NCP_INITIALIZED_EVENT
+    elif group == "ncp_reset":
+        return NCP_RESET_EVENT
+    return FRAMING_ERROR_EVENT